@@ -318,6 +318,21 @@ def parse_command_line():
 
     parser.add_argument("--remote-host", action="store", dest="remote_host")
 
+    parser.add_argument(
+        "--remote-topics",
+        action="store",
+        dest="remote_topics",
+        help="Comma-separated topics (fnmatch patterns) sent to the remote host, '*' for all.",
+    )
+
+    parser.add_argument(
+        "--remote-batch",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        dest="remote_batch",
+        help="Send the messages to the remote host in 'from_neuronavigation_batch' events.",
+    )
+
     parser.add_argument("-s", "--save", help="Save the project after an import.")
 
     parser.add_argument(
@@ -591,7 +606,14 @@ def main(connection=None, remote_host=None):
     if remote_host is not None or args.remote_host is not None:
         from invesalius.net.remote_control import RemoteControl
 
-        remote_control = RemoteControl(remote_host or args.remote_host)
+        if args.remote_topics:
+            remote_control = RemoteControl(
+                remote_host or args.remote_host,
+                topics=args.remote_topics.split(","),
+                batch=args.remote_batch,
+            )
+        else:
+            remote_control = RemoteControl(remote_host or args.remote_host, batch=args.remote_batch)
         remote_control.connect()
 
     if args.use_pedal:
@@ -289,6 +289,12 @@ THRESHOLD_OUTVALUE = 0
 # Mask properties
 MASK_NAME_PATTERN = _("Mask %d")
 MASK_OPACITY = 0.40
+
+# Undo history of the mask editions: memory (in bytes) used by the history
+# before the oldest states are moved to disk, and the zlib level used to
+# compress them.
+MASK_HISTORY_MEMORY_BUDGET = 256 * 1024 * 1024
+MASK_HISTORY_COMPRESSION_LEVEL = 1
 # MASK_OPACITY = 0.35
 MASK_COLOUR: List[List[float]] = [
     [0.33, 1, 0.33],
@@ -368,6 +374,10 @@ SURFACE_QUALITY_LIST = [_("Low"), _("Medium"), _("High"), _("Optimal *")]
 SURFACE_TRANSPARENCY = 0.0
 SURFACE_NAME_PATTERN = _("Surface %d")
 
+# Seconds the processes used to create surfaces are kept alive after the
+# last surface is created.
+SURFACE_POOL_IDLE_TIMEOUT = 60
+
 # Surface importing/exporting options
 SURFACE_SPACE_WORLD = 0
 SURFACE_SPACE_INV = 1
@@ -786,6 +796,13 @@ PROJECTION_CONTOUR_MIDA = 8
 PROJECTION_BORDER_SIZE = 1.0
 PROJECTION_MIP_SIZE = 2
 
+# ------------ Slice cache ---------------------------
+# Memory budget (in bytes) of rendered slices kept per orientation.
+SLICE_CACHE_IMAGE_SIZE = 128 * 1024 * 1024
+SLICE_CACHE_MASK_SIZE = 64 * 1024 * 1024
+# Number of slices ahead (in the scroll direction) rendered in background.
+SLICE_PREFETCH_SIZE = 4
+
 # ------------- Boolean operations ------------------
 BOOLEAN_UNION = 1
 BOOLEAN_DIFF = 2
@@ -1009,6 +1026,13 @@ EFIELD_ROI_SIZE = 20
 SLEEP_NAVIGATION = 0.1
 SLEEP_COORDINATES = 0.1
 
+# The navigation threads wait for new data, waking up at least this often (in seconds) to check whether
+# the navigation was stopped.
+NAVIGATION_WAIT_TIMEOUT = 0.1
+
+# Interval (in seconds) between the latency statistics of the navigation sent to "Navigation latency".
+NAVIGATION_LATENCY_INTERVAL = 1.0
+
 BRAIN_OPACITY = 0.6
 N_CPU = psutil.cpu_count()
 # the max_sampling_step can be set to something different as well. Above 100 is probably not necessary
@@ -27,6 +27,7 @@ import numpy as np
 import wx
 
 import invesalius.constants as const
+import invesalius.data.image_statistics as image_statistics
 import invesalius.data.imagedata_utils as image_utils
 import invesalius.data.measures as measures
 import invesalius.data.slice_ as sl
@@ -355,6 +356,8 @@ class Controller:
         self.Slice._open_image_matrix(
             proj.matrix_filename, tuple(proj.matrix_shape), proj.matrix_dtype
         )
+        if proj.image_statistics is not None:
+            self.Slice.statistics = proj.image_statistics
 
         self.Slice.window_level = proj.level
         self.Slice.window_width = proj.window
@@ -394,7 +397,9 @@ class Controller:
             )
 
             try:
-                prj.Project().SavePlistProject(dirpath, filename, compress)
+                proj = prj.Project()
+                proj.image_statistics = self.Slice.statistics
+                proj.SavePlistProject(dirpath, filename, compress)
             except PermissionError as err:
                 if wx.GetApp() is None:
                     print(
@@ -580,6 +585,8 @@ class Controller:
         self.Slice._open_image_matrix(
             proj.matrix_filename, tuple(proj.matrix_shape), proj.matrix_dtype
         )
+        if proj.image_statistics is not None:
+            self.Slice.statistics = proj.image_statistics
 
         self.Slice.window_level = proj.level
         self.Slice.window_width = proj.window
@@ -690,7 +697,7 @@ class Controller:
         #  proj.original_orientation = const.AXIAL
         proj.window = float(dicom.image.window)
         proj.level = float(dicom.image.level)
-        proj.threshold_range = int(matrix.min()), int(matrix.max())
+        proj.threshold_range = self.Slice.get_scalar_range()
         proj.spacing = self.Slice.spacing
 
         filename = proj.name + ".inv3"
@@ -723,10 +730,10 @@ class Controller:
         # proj.dicom_sample = dicom
 
         proj.original_orientation = name_to_const[orientation.upper()]
-        proj.window = float(matrix.max())
-        proj.level = float(matrix.max() / 4)
+        proj.threshold_range = self.Slice.get_scalar_range()
+        proj.window = float(proj.threshold_range[1])
+        proj.level = float(proj.threshold_range[1] / 4)
 
-        proj.threshold_range = int(matrix.min()), int(matrix.max())
         # const.THRESHOLD_RANGE = proj.threshold_range
 
         proj.spacing = self.Slice.spacing
@@ -757,7 +764,7 @@ class Controller:
 
         proj.window = self.Slice.window_width
         proj.level = self.Slice.window_level
-        proj.threshold_range = int(matrix.min()), int(matrix.max())
+        proj.threshold_range = self.Slice.get_scalar_range()
         proj.spacing = self.Slice.spacing
         # TODO: Check that this is needed with the new way of using affine
         #  now the affine should be at least the identity(4) and never None
@@ -789,10 +796,12 @@ class Controller:
         spacing: The spacing between the center of the voxels in X, Y and Z direction.
         modality: Imaging modality.
         """
+        statistics = image_statistics.compute_statistics(matrix)
+        min_value, max_value = statistics.scalar_range
         if window_width is None:
-            window_width = matrix.max() - matrix.min()
+            window_width = max_value - min_value
         if window_level is None:
-            window_level = (matrix.max() + matrix.min()) // 2
+            window_level = (max_value + min_value) // 2
 
         window_width = int(window_width)
         window_level = int(window_level)
@@ -808,6 +817,7 @@ class Controller:
                 name_to_const[orientation],
                 window_width,
                 window_level,
+                statistics,
             )
         else:
             # Verifying if there is a project open
@@ -824,6 +834,7 @@ class Controller:
 
             self.Slice = sl.Slice()
             self.Slice.matrix = mmap_matrix
+            self.Slice.statistics = statistics
             self.Slice.matrix_filename = mmap_matrix.filename
             self.Slice.spacing = spacing
 
@@ -842,7 +853,7 @@ class Controller:
 
             proj.original_orientation = name_to_const[orientation]
 
-            proj.threshold_range = int(matrix.min()), int(matrix.max())
+            proj.threshold_range = statistics.scalar_range
             proj.spacing = self.Slice.spacing
 
             Publisher.sendMessage(
@@ -908,12 +919,13 @@ class Controller:
 
         xyspacing = xyspacing[0] / resolution_percentage, xyspacing[1] / resolution_percentage
 
-        self.matrix, scalar_range, self.filename = image_utils.bitmap2memmap(
+        self.matrix, statistics, self.filename = image_utils.bitmap2memmap(
             filelist, size, orientation, (sp_z, sp_y, sp_x), resolution_percentage
         )
 
         self.Slice = sl.Slice()
         self.Slice.matrix = self.matrix
+        self.Slice.statistics = statistics
         self.Slice.matrix_filename = self.filename
 
         if orientation == "AXIAL":
@@ -923,10 +935,10 @@ class Controller:
         elif orientation == "SAGITTAL":
             self.Slice.spacing = zspacing, xyspacing[1], xyspacing[0]
 
-        self.Slice.window_level = float(self.matrix.max() / 4)
-        self.Slice.window_width = float(self.matrix.max())
+        scalar_range = statistics.scalar_range
+        self.Slice.window_level = float(scalar_range[1] / 4)
+        self.Slice.window_width = float(scalar_range[1])
 
-        scalar_range = int(self.matrix.min()), int(self.matrix.max())
         Publisher.sendMessage("Update threshold limits list", threshold_range=scalar_range)
 
         return self.matrix, self.filename  # , dicom
@@ -1026,7 +1038,7 @@ class Controller:
 
             xyspacing = xyspacing[0] / resolution_percentage, xyspacing[1] / resolution_percentage
 
-            self.matrix, scalar_range, self.filename = image_utils.dcm2memmap(
+            self.matrix, statistics, self.filename = image_utils.dcm2memmap(
                 filelist, size, orientation, resolution_percentage
             )
 
@@ -1037,12 +1049,13 @@ class Controller:
             elif orientation == "SAGITTAL":
                 spacing = zspacing, xyspacing[1], xyspacing[0]
         else:
-            self.matrix, scalar_range, spacing, self.filename = image_utils.dcmmf2memmap(
+            self.matrix, statistics, spacing, self.filename = image_utils.dcmmf2memmap(
                 filelist[0], orientation
             )
 
         self.Slice = sl.Slice()
         self.Slice.matrix = self.matrix
+        self.Slice.statistics = statistics
         self.Slice.matrix_filename = self.filename
 
         if gui and (spacing[0] == 0.0 or spacing[1] == 0.0 or spacing[2] == 0.0):
@@ -1066,11 +1079,14 @@ class Controller:
         elif (tilt_value) and not (gui):
             tilt_value = -1 * tilt_value
             image_utils.FixGantryTilt(self.matrix, self.Slice.spacing, tilt_value)
+        if tilt_value:
+            # The values were interpolated.
+            self.Slice.statistics = None
 
         self.Slice.window_level = wl
         self.Slice.window_width = ww
 
-        scalar_range = int(self.matrix.min()), int(self.matrix.max())
+        scalar_range = self.Slice.get_scalar_range()
 
         Publisher.sendMessage("Update threshold limits list", threshold_range=scalar_range)
 
@@ -1078,14 +1094,14 @@ class Controller:
 
     def OpenOtherFiles(self, group):
         # Retreaving matrix from image data
-        self.matrix, scalar_range, self.filename = image_utils.img2memmap(group)
+        self.matrix, statistics, self.filename = image_utils.img2memmap(group)
 
         hdr = group.header
         hdr.set_data_dtype("int16")
 
         # Calculate the 2% and 98% percentile
-        percentile_2 = np.percentile(self.matrix, 2)
-        percentile_98 = np.percentile(self.matrix, 98)
+        percentile_2 = statistics.percentile(2)
+        percentile_98 = statistics.percentile(98)
 
         # define ww and wl based on 2-98 percentiles saturates
         # the high pixel intensities that usually cause the image to
@@ -1103,6 +1119,7 @@ class Controller:
 
         self.Slice = sl.Slice()
         self.Slice.matrix = self.matrix
+        self.Slice.statistics = statistics
         self.Slice.matrix_filename = self.filename
         # even though the axes 0 and 2 are swapped when creating self.matrix
         # the spacing should be kept the original, as it is modified somewhere later
@@ -1124,7 +1141,7 @@ class Controller:
         else:
             self.Slice.affine = None
 
-        scalar_range = int(scalar_range[0]), int(scalar_range[1])
+        scalar_range = statistics.scalar_range
 
         Publisher.sendMessage("Update threshold limits list", threshold_range=scalar_range)
 
@@ -1191,7 +1208,15 @@ class Controller:
         self.Slice.apply_reorientation()
 
     def start_new_inv_instance(
-        self, image, name, spacing, modality, orientation, window_width, window_level
+        self,
+        image,
+        name,
+        spacing,
+        modality,
+        orientation,
+        window_width,
+        window_level,
+        statistics=None,
     ):
         p = prj.Project()
         project_folder = tempfile.mkdtemp()
@@ -1204,6 +1229,7 @@ class Controller:
             window_level,
             image,
             folder=project_folder,
+            statistics=statistics,
         )
         err_msg = ""
         try:
@@ -0,0 +1,135 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Colour lookup tables of the slices. The colour of every value an integer
+slice may have is calculated once, with the same VTK filters used to colour
+a slice, and then each slice is coloured with a single numpy take. Mask and
+auxiliary overlays are blended with numpy as well.
+"""
+
+from typing import Callable, Optional
+
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import vtkDataArray
+from vtkmodules.vtkCommonDataModel import vtkImageData
+
+import invesalius.data.converters as converters
+
+# Slices with a larger range of values are coloured by VTK.
+LUT_MAX_SIZE = 1 << 20
+
+# Opacity of the overlays (mask and auxiliary matrices) over the image.
+OVERLAY_OPACITY = 0.8
+
+
+class ColourLUT:
+    """
+    Colour (uint8 RGB or RGBA) of each integer value from min_value to
+    min_value + len(table) - 1.
+    """
+
+    def __init__(self, table: np.ndarray, min_value: int):
+        self.table = table
+        self.min_value = min_value
+
+    @property
+    def max_value(self) -> int:
+        return self.min_value + len(self.table) - 1
+
+    def covers(self, min_value: int, max_value: int) -> bool:
+        return self.min_value <= min_value and max_value <= self.max_value
+
+    def map(self, values: np.ndarray) -> np.ndarray:
+        """
+        Returns the colours of values, with shape values.shape + (components,).
+        """
+        index = values.astype(np.intp) - self.min_value
+        return self.table.take(index, axis=0, mode="clip")
+
+
+def can_use_lut(dtype: np.dtype, min_value: int, max_value: int) -> bool:
+    return np.issubdtype(dtype, np.integer) and int(max_value) - int(min_value) < LUT_MAX_SIZE
+
+
+def build_lut(
+    colour: Callable[[vtkImageData], vtkImageData],
+    dtype: np.dtype,
+    min_value: int,
+    max_value: int,
+) -> ColourLUT:
+    """
+    Builds the lookup table of values from min_value to max_value applying
+    colour, a function that colours a vtkImageData, to all of them at once.
+    """
+    values = np.arange(int(min_value), int(max_value) + 1, dtype=dtype)
+    image = colour(converters.to_vtk(values.reshape(1, -1)))
+    table = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
+    return ColourLUT(np.array(table.reshape(len(values), -1), dtype=np.uint8), int(min_value))
+
+
+def get_colours(image: vtkImageData) -> np.ndarray:
+    """
+    Returns the (n_points, components) scalars of image, without copying.
+    """
+    scalars = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
+    return scalars.reshape(scalars.shape[0], -1)
+
+
+def blend(out: np.ndarray, overlay: np.ndarray, opacity: float = OVERLAY_OPACITY) -> None:
+    """
+    Blends the RGBA overlay over the RGB colours in out, in place. Gives the
+    same result as vtkImageBlend (normal mode) for unsigned char images.
+    """
+    o = int(round(256 * opacity))
+    r = overlay[..., 3:4].astype(np.int32) * o
+    f = 65280 - r
+    out[:] = (out * f + overlay[..., :3] * r) // 65280
+
+
+class BlendBuffer:
+    """
+    Image reused to blend the overlays of a slice, so no image is allocated
+    while the slices are changed.
+    """
+
+    def __init__(self):
+        self.colours: Optional[np.ndarray] = None
+        self.scalars: Optional[vtkDataArray] = None
+        self.image = vtkImageData()
+
+    def blend(self, image: vtkImageData, overlays) -> vtkImageData:
+        """
+        Returns the colours of image with the RGBA overlays blended over them.
+        """
+        colours = get_colours(image)
+        if self.colours is None or self.colours.shape != colours.shape:
+            self.colours = np.empty_like(colours)
+            self.scalars = numpy_support.numpy_to_vtk(self.colours)
+
+        self.colours[:] = colours
+        for overlay in overlays:
+            blend(self.colours, get_colours(overlay))
+
+        # CopyStructure also removes the scalars.
+        self.image.CopyStructure(image)
+        self.image.GetPointData().SetScalars(self.scalars)
+        self.scalars.Modified()
+        self.image.Modified()
+        return self.image
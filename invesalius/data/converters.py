@@ -17,7 +17,7 @@
 #    detalhes.
 # --------------------------------------------------------------------------
 
-from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
 
 import gdcm
 import numpy as np
@@ -30,28 +30,25 @@ from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkImageData, vtkPolyDat
 if TYPE_CHECKING:
     import os
 
+ID_TYPE = numpy_support.ID_TYPE_CODE
 
-def to_vtk(
-    n_array: np.ndarray,
-    spacing: Sequence[float] = (1.0, 1.0, 1.0),
-    slice_number: int = 0,
-    orientation: str = "AXIAL",
-    origin: Sequence[float] = (0, 0, 0),
-    padding: Tuple[int, int, int] = (0, 0, 0),
-) -> vtkImageData:
+
+def _get_image_geometry(
+    shape: Tuple[int, int, int],
+    slice_number: int,
+    orientation: str,
+    padding: Tuple[int, int, int],
+) -> Tuple[Tuple[int, int, int], Tuple[int, int, int, int, int, int]]:
+    """
+    Returns the dimensions and the extent of the vtkImageData of an array of
+    the given (dz, dy, dx) shape.
+    """
     if orientation == "SAGITTAL":
         orientation = "SAGITAL"
 
-    try:
-        dz, dy, dx = n_array.shape
-    except ValueError:
-        dy, dx = n_array.shape
-        dz = 1
-
+    dz, dy, dx = shape
     px, py, pz = padding
 
-    v_image = numpy_support.numpy_to_vtk(n_array.flat)
-
     if orientation == "AXIAL":
         extent = (
             0 - px,
@@ -82,11 +79,32 @@ def to_vtk(
             dz - 1 - pz,
         )
 
+    return (dx, dy, dz), extent
+
+
+def to_vtk(
+    n_array: np.ndarray,
+    spacing: Sequence[float] = (1.0, 1.0, 1.0),
+    slice_number: int = 0,
+    orientation: str = "AXIAL",
+    origin: Sequence[float] = (0, 0, 0),
+    padding: Tuple[int, int, int] = (0, 0, 0),
+) -> vtkImageData:
+    try:
+        dz, dy, dx = n_array.shape
+    except ValueError:
+        dy, dx = n_array.shape
+        dz = 1
+
+    v_image = numpy_support.numpy_to_vtk(n_array.flat)
+
+    dimensions, extent = _get_image_geometry((dz, dy, dx), slice_number, orientation, padding)
+
     # Generating the vtkImageData
     image = vtkImageData()
     image.SetOrigin(origin)
     image.SetSpacing(spacing)
-    image.SetDimensions(dx, dy, dz)
+    image.SetDimensions(dimensions)
     # SetNumberOfScalarComponents and SetScalrType were replaced by
     # AllocateScalars
     #  image.SetNumberOfScalarComponents(1)
@@ -101,6 +119,30 @@ def to_vtk(
     return image_copy
 
 
+def to_vtk_colour(
+    n_array: np.ndarray,
+    spacing: Sequence[float] = (1.0, 1.0, 1.0),
+    slice_number: int = 0,
+    orientation: str = "AXIAL",
+) -> vtkImageData:
+    """
+    Converts a (dy, dx, components) array with the colours of a slice to a
+    vtkImageData placed like the one given by to_vtk. The array is not
+    copied, the vtkImageData keeps a reference to it.
+    """
+    dy, dx, components = n_array.shape
+    dimensions, extent = _get_image_geometry((1, dy, dx), slice_number, orientation, (0, 0, 0))
+
+    image = vtkImageData()
+    image.SetSpacing(spacing)
+    image.SetDimensions(dimensions)
+    image.SetExtent(extent)
+    image.GetPointData().SetScalars(
+        numpy_support.numpy_to_vtk(np.ascontiguousarray(n_array).reshape(-1, components))
+    )
+    return image
+
+
 def to_vtk_mask(
     n_array: np.ndarray,
     spacing: Tuple[float, float, float] = (1.0, 1.0, 1.0),
@@ -238,3 +280,72 @@ def convert_custom_bin_to_vtk(filename: "str | bytes | os.PathLike[str]") -> Opt
     else:
         print("File does not exists")
         return None
+
+
+def polydata_to_numpy(polydata: vtkPolyData) -> Dict[str, Any]:
+    """
+    Returns the points, the polygons (as VTK offsets and connectivity arrays)
+    and the point and cell data arrays of polydata as numpy arrays, so they
+    can be sent to another process without serializing polydata to a file.
+    Vertices, lines and strips are not converted.
+    """
+    points = polydata.GetPoints()
+    if points is None:
+        np_points = np.empty((0, 3), dtype=np.float32)
+    else:
+        np_points = np.array(numpy_support.vtk_to_numpy(points.GetData()))
+
+    polys = polydata.GetPolys()
+    offsets = np.array(numpy_support.vtk_to_numpy(polys.GetOffsetsArray()))
+    connectivity = np.array(numpy_support.vtk_to_numpy(polys.GetConnectivityArray()))
+
+    def arrays(data):
+        result = {}
+        for i in range(data.GetNumberOfArrays()):
+            array = data.GetArray(i)
+            if array is not None and array.GetName():
+                result[array.GetName()] = np.array(numpy_support.vtk_to_numpy(array))
+        return result
+
+    return {
+        "points": np_points,
+        "offsets": offsets,
+        "connectivity": connectivity,
+        "point_data": arrays(polydata.GetPointData()),
+        "cell_data": arrays(polydata.GetCellData()),
+    }
+
+
+def numpy_to_polydata(arrays: Dict[str, Any]) -> vtkPolyData:
+    """
+    Builds a vtkPolyData from the arrays returned by polydata_to_numpy.
+    """
+    polydata = vtkPolyData()
+
+    points = vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(arrays["points"], deep=1))
+    polydata.SetPoints(points)
+
+    polys = vtkCellArray()
+    polys.SetData(
+        numpy_support.numpy_to_vtkIdTypeArray(
+            np.ascontiguousarray(arrays["offsets"], dtype=ID_TYPE), deep=1
+        ),
+        numpy_support.numpy_to_vtkIdTypeArray(
+            np.ascontiguousarray(arrays["connectivity"], dtype=ID_TYPE), deep=1
+        ),
+    )
+    polydata.SetPolys(polys)
+
+    for data, np_arrays in (
+        (polydata.GetPointData(), arrays["point_data"]),
+        (polydata.GetCellData(), arrays["cell_data"]),
+    ):
+        for name, np_array in np_arrays.items():
+            array = numpy_support.numpy_to_vtk(np_array, deep=1)
+            array.SetName(name)
+            data.AddArray(array)
+
+    if "Normals" in arrays["point_data"]:
+        polydata.GetPointData().SetActiveNormals("Normals")
+    return polydata
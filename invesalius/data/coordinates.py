@@ -18,9 +18,9 @@
 # --------------------------------------------------------------------------
 
 import threading
+import time
 from math import cos, sin
 from random import uniform
-from time import sleep
 from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
@@ -36,11 +36,20 @@ if TYPE_CHECKING:
 
 
 class TrackerCoordinates:
-    def __init__(self):
+    def __init__(self, publish: bool = True):
         self.coord: Optional[np.ndarray] = None
         self.marker_visibilities = [False, False, False]
         self.previous_marker_visibilities = self.marker_visibilities
         self.nav_status = False
+        # Publish the poses to the GUI, disabled when running without it.
+        self.publish = publish
+
+        # Number of the last coordinates set, when they were set and when the tracker started
+        # reading them (time.perf_counter). The condition is notified when new coordinates are set.
+        self.sequence = 0
+        self.timestamp = 0.0
+        self.started = 0.0
+        self.condition = threading.Condition()
         self.__bind_events()
 
     def __bind_events(self) -> None:
@@ -49,10 +58,17 @@ class TrackerCoordinates:
     def OnUpdateNavigationStatus(self, nav_status: bool, vis_status) -> None:
         self.nav_status = nav_status
 
-    def SetCoordinates(self, coord, marker_visibilities: List[bool]) -> None:
-        self.coord = coord
-        self.marker_visibilities = marker_visibilities
-        if not self.nav_status:
+    def SetCoordinates(
+        self, coord, marker_visibilities: List[bool], started: Optional[float] = None
+    ) -> None:
+        with self.condition:
+            self.coord = coord
+            self.marker_visibilities = marker_visibilities
+            self.sequence += 1
+            self.timestamp = time.perf_counter()
+            self.started = self.timestamp if started is None else started
+            self.condition.notify_all()
+        if self.publish and not self.nav_status:
             wx.CallAfter(
                 Publisher.sendMessage,
                 "From Neuronavigation: Update tracker poses",
@@ -68,8 +84,25 @@ class TrackerCoordinates:
                 wx.CallAfter(Publisher.sendMessage, "Render volume viewer")
                 self.previous_marker_visibilities = self.marker_visibilities
 
+    def WaitCoordinates(self, sequence: int, timeout: Optional[float] = None) -> int:
+        """
+        Waits until coordinates newer than the ones numbered sequence are set, or until timeout
+        seconds have passed. Returns the number of the last coordinates set.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence != sequence, timeout)
+            return self.sequence
+
+    def GetTimestamps(self) -> Tuple[int, float, float]:
+        """
+        Returns the number of the last coordinates set, when the tracker started reading them and
+        when they were set.
+        """
+        with self.condition:
+            return self.sequence, self.started, self.timestamp
+
     def GetCoordinates(self) -> Tuple[Optional[np.ndarray], List[bool]]:
-        if self.nav_status:
+        if self.publish and self.nav_status:
             wx.CallAfter(
                 Publisher.sendMessage,
                 "From Neuronavigation: Update tracker poses",
@@ -545,7 +578,7 @@ def DebugCoordRandom(tracker_connection: "TrackerConnection", tracker_id: int, r
         [uniform(*dx), uniform(*dx), uniform(*dx), uniform(*dt), uniform(*dt), uniform(*dt)]
     )
 
-    sleep(0.15)
+    time.sleep(0.15)
 
     # coord1 = np.array([uniform(1, 200), uniform(1, 200), uniform(1, 200),
     #                    uniform(-180.0, 180.0), uniform(-180.0, 180.0), uniform(-180.0, 180.0)])
@@ -771,8 +804,10 @@ class ReceiveCoordinates(threading.Thread):
 
     def run(self) -> None:
         while not self.event.is_set():
+            started = time.perf_counter()
             coord_raw, marker_visibilities = GetCoordinatesForThread(
                 self.tracker_connection, self.tracker_id, const.DEFAULT_REF_MODE
             )
-            self.TrackerCoordinates.SetCoordinates(coord_raw, marker_visibilities)
-            sleep(self.sleep_coord)
+            self.TrackerCoordinates.SetCoordinates(coord_raw, marker_visibilities, started)
+            # Waiting on the event instead of sleeping stops the thread as soon as it is set.
+            self.event.wait(self.sleep_coord)
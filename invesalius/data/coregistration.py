@@ -19,7 +19,7 @@
 
 import queue
 import threading
-from time import sleep
+import time
 
 import numpy as np
 
@@ -27,6 +27,7 @@ import invesalius.constants as const
 import invesalius.data.bases as bases
 import invesalius.data.coordinates as dco
 import invesalius.data.transformations as tr
+from invesalius.navigation.latency import PoseRecord
 
 # TODO: Replace the use of degrees by radians in every part of the navigation pipeline
 
@@ -298,6 +299,222 @@ def apply_icp(m_img, icp):
     return m_img
 
 
+def euler_matrices(angles, axes="sxyz"):
+    """Stacked version of transformations.euler_matrix.
+
+    :param angles: N x 3 array of Euler angles in radians
+    :type angles: numpy.ndarray
+    :param axes: One of 24 axis sequences as string
+    :type axes: str
+    :return: N x 4 x 4 numpy double array
+    :rtype: numpy.ndarray
+    """
+    firstaxis, parity, repetition, frame = tr._AXES2TUPLE[axes]
+    i = firstaxis
+    j = tr._NEXT_AXIS[i + parity]
+    k = tr._NEXT_AXIS[i - parity + 1]
+
+    ai, aj, ak = np.asarray(angles, dtype=np.float64).T
+    if frame:
+        ai, ak = ak, ai
+    if parity:
+        ai, aj, ak = -ai, -aj, -ak
+
+    si, sj, sk = np.sin(ai), np.sin(aj), np.sin(ak)
+    ci, cj, ck = np.cos(ai), np.cos(aj), np.cos(ak)
+    cc, cs = ci * ck, ci * sk
+    sc, ss = si * ck, si * sk
+
+    M = np.zeros((len(ai), 4, 4))
+    M[:, 3, 3] = 1.0
+    if repetition:
+        M[:, i, i] = cj
+        M[:, i, j] = sj * si
+        M[:, i, k] = sj * ci
+        M[:, j, i] = sj * sk
+        M[:, j, j] = -cj * ss + cc
+        M[:, j, k] = -cj * cs - sc
+        M[:, k, i] = -sj * ck
+        M[:, k, j] = cj * sc + cs
+        M[:, k, k] = cj * cc - ss
+    else:
+        M[:, i, i] = cj * ck
+        M[:, i, j] = sj * sc - cs
+        M[:, i, k] = sj * cc + ss
+        M[:, j, i] = cj * sk
+        M[:, j, j] = sj * ss + cc
+        M[:, j, k] = sj * cs - sc
+        M[:, k, i] = -sj
+        M[:, k, j] = cj * si
+        M[:, k, k] = cj * ci
+    return M
+
+
+def euler_from_matrices(matrices, axes="sxyz"):
+    """Stacked version of transformations.euler_from_matrix.
+
+    :param matrices: N x 4 x 4 (or N x 3 x 3) array of rotation matrices
+    :type matrices: numpy.ndarray
+    :param axes: One of 24 axis sequences as string
+    :type axes: str
+    :return: N x 3 array of Euler angles in radians
+    :rtype: numpy.ndarray
+    """
+    firstaxis, parity, repetition, frame = tr._AXES2TUPLE[axes]
+    i = firstaxis
+    j = tr._NEXT_AXIS[i + parity]
+    k = tr._NEXT_AXIS[i - parity + 1]
+
+    M = np.asarray(matrices, dtype=np.float64)[:, :3, :3]
+    if repetition:
+        sy = np.sqrt(M[:, i, j] * M[:, i, j] + M[:, i, k] * M[:, i, k])
+        regular = sy > tr._EPS
+        ax = np.where(
+            regular, np.arctan2(M[:, i, j], M[:, i, k]), np.arctan2(-M[:, j, k], M[:, j, j])
+        )
+        ay = np.arctan2(sy, M[:, i, i])
+        az = np.where(regular, np.arctan2(M[:, j, i], -M[:, k, i]), 0.0)
+    else:
+        cy = np.sqrt(M[:, i, i] * M[:, i, i] + M[:, j, i] * M[:, j, i])
+        regular = cy > tr._EPS
+        ax = np.where(
+            regular, np.arctan2(M[:, k, j], M[:, k, k]), np.arctan2(-M[:, j, k], M[:, j, j])
+        )
+        ay = np.arctan2(-M[:, k, i], cy)
+        az = np.where(regular, np.arctan2(M[:, j, i], M[:, i, i]), 0.0)
+
+    if parity:
+        ax, ay, az = -ax, -ay, -az
+    if frame:
+        ax, az = az, ax
+    return np.column_stack((ax, ay, az))
+
+
+class CoregistrationKernel:
+    """Co-registers the probe and all the coils of a tracker frame at once.
+
+    The matrices that don't change during the navigation (inverses of the object registration bases, the
+    stylus orientation and the rotation from the object basis to the image) are computed once when the kernel
+    is created. Each frame then takes the markers of the probe and of every coil as a N x 6 array and computes
+    all image-space poses with stacked matrix products. The results are the same as corregistrate_probe
+    followed by corregistrate_object_dynamic (or corregistrate_object_static) for each coil.
+    """
+
+    def __init__(self, m_change, r_stylus, obj_datas, ref_mode_id, icp):
+        """
+        :param m_change: Corregistration transformation obtained from fiducials
+        :type m_change: numpy.ndarray
+        :param r_stylus: Stylus orientation, or None if it was not defined
+        :type r_stylus: numpy.ndarray
+        :param obj_datas: Transformations matrices of each coil, by coil name
+        :type obj_datas: dict
+        :param ref_mode_id: True to transform the markers to the reference (head) marker
+        :type ref_mode_id: bool
+        :param icp: use_icp and the ICP transformation matrix
+        :type icp: tuple
+        """
+        if r_stylus is None:
+            r_stylus = np.eye(3)
+            r_stylus[0] = -r_stylus[0]  # Flip over vtk x-axis
+
+        self.m_change = np.asarray(m_change, dtype=np.float64)
+        self.ref_mode_id = ref_mode_id
+        self.use_icp, m_icp = icp
+        self.m_icp = np.asarray(m_icp, dtype=np.float64) if self.use_icp else None
+        self.names = ["probe", *obj_datas]
+
+        # The probe goes through the same products as the coils, with identity matrices for the object
+        # registration. Its rotation to image space is done by the stylus orientation instead.
+        R = tr.euler_matrix(*np.radians([0, 0, -90]), axes="rxyz")[:3, :3]
+        marker_ids = [0]
+        r_s0_raw_inv = [np.identity(4)]
+        s0_raw = [np.identity(4)]
+        s0_raw_inv = [np.identity(4)]
+        t_obj_raw = [np.array([0.0, 0.0, 0.0, 1.0])]
+        r_left = [r_stylus @ R]
+        r_right = [np.linalg.inv(R)]
+        for obj_data in obj_datas.values():
+            obj_id, t_obj, s0, r_s0, s0_dyn, m_obj_raw, r_obj_img = (
+                np.asarray(m) for m in obj_data
+            )
+            marker_ids.append(int(obj_id))
+            r_s0_raw_inv.append(np.linalg.inv(r_s0))
+            s0_raw.append(s0)
+            s0_raw_inv.append(np.linalg.inv(s0))
+            t_obj_raw.append(t_obj[:, -1])
+            r_left.append((r_obj_img @ np.linalg.inv(m_obj_raw) @ np.linalg.inv(s0_dyn))[:3, :3])
+            r_right.append(m_obj_raw[:3, :3])
+
+        self.marker_ids = np.array(marker_ids)
+        self.r_s0_raw_inv = np.array(r_s0_raw_inv, dtype=np.float64)
+        self.s0_raw = np.array(s0_raw, dtype=np.float64)
+        self.s0_raw_inv = np.array(s0_raw_inv, dtype=np.float64)
+        self.t_obj_raw = np.array(t_obj_raw, dtype=np.float64)[:, :, np.newaxis]
+        self.r_left = np.array(r_left, dtype=np.float64)
+        self.r_right = np.array(r_right, dtype=np.float64)
+
+    def corregistrate_all(self, coord_raw):
+        """Compute the image-space pose of the probe and of each coil.
+
+        :param coord_raw: Coordinates returned by the tracking device, one row for each marker
+        :type coord_raw: numpy.ndarray
+        :return: N x 6 array of coordinates (position and Euler angles in degrees) and N x 4 x 4 array of
+            transformation matrices in image space, in the order of names (probe first)
+        :rtype: tuple
+        """
+        coord_raw = np.asarray(coord_raw, dtype=np.float64)
+        markers = coord_raw[self.marker_ids]
+        n = len(markers)
+
+        # transform raw marker coordinates to object centers
+        r_probe = euler_matrices(np.radians(markers[:, 3:]), "rzyx")
+        t_probe_raw = np.tile(np.identity(4), (n, 1, 1))
+        t_probe_raw[:, :3, -1] = markers[:, :3]
+        t_offset = np.tile(np.identity(4), (n, 1, 1))
+        t_offset[:, :, -1] = (self.r_s0_raw_inv @ (r_probe @ self.t_obj_raw))[:, :, 0]
+        t_probe = self.s0_raw @ t_offset @ self.s0_raw_inv @ t_probe_raw
+        m_probe = t_probe @ r_probe
+
+        # transform object centers to reference marker
+        if self.ref_mode_id:
+            m_ref = dco.coordinates_to_transformation_matrix(
+                position=coord_raw[1, :3],
+                orientation=coord_raw[1, 3:],
+                axes="rzyx",
+            )
+            m_probe = np.linalg.inv(m_ref) @ m_probe
+
+        # invert y coordinate
+        m_probe[:, 2, -1] = -m_probe[:, 2, -1]
+
+        # corregistrate from tracker to image space
+        m_img = self.m_change @ m_probe
+        m_img[:, :3, :3] = self.r_left @ m_probe[:, :3, :3] @ self.r_right
+
+        # ICP only changes the positions, the same as bases.transform_icp
+        if self.use_icp:
+            position = np.ones((n, 4))
+            position[:, :3] = m_img[:, :3, -1]
+            position[:, 1] = -position[:, 1]
+            m_img[:, :3, -1] = (position @ self.m_icp.T)[:, :3]
+            m_img[:, 1, -1] = -m_img[:, 1, -1]
+
+        angles = np.degrees(euler_from_matrices(m_img, axes="sxyz"))
+        coords = np.column_stack((m_img[:, :3, -1], angles))
+
+        return coords, m_img
+
+    def corregistrate(self, coord_raw):
+        """Same as corregistrate_all, with the coordinates and matrices in dicts by name ("probe" or the
+        coil names), as they are put in the navigation coordinate queue.
+        """
+        coords, m_imgs = self.corregistrate_all(coord_raw)
+        return (
+            {name: tuple(coord) for name, coord in zip(self.names, coords)},
+            {name: m_img for name, m_img in zip(self.names, m_imgs)},
+        )
+
+
 def ComputeRelativeDistanceToTarget(target_coord=None, img_coord=None, m_target=None, m_img=None):
     if m_target is None:
         m_target = dco.coordinates_to_transformation_matrix(
@@ -339,11 +556,11 @@ class CoordinateCorregistrate(threading.Thread):
         view_tracts,
         queues,
         event,
-        sle,
         tracker_id,
         target,
         icp,
         e_field_loaded,
+        latency_monitor=None,
     ):
         threading.Thread.__init__(self, name="CoordCoregObject")
         self.ref_mode_id = ref_mode_id
@@ -357,13 +574,18 @@ class CoordinateCorregistrate(threading.Thread):
         self.efield_queue = queues[3]
         self.e_field_loaded = e_field_loaded
         self.event = event
-        self.sle = sle
         self.use_icp = icp.use_icp
         self.m_icp = icp.m_icp
         self.last_coord = None
         self.tracker_id = tracker_id
         self.target = target
         self.target_flag = False
+        self.latency_monitor = latency_monitor
+
+        m_change, r_stylus = coreg_data
+        self.kernel = CoregistrationKernel(
+            m_change, r_stylus, obj_datas, ref_mode_id, (self.use_icp, self.m_icp)
+        )
 
         if self.target is not None:
             self.target = np.array(self.target)
@@ -375,34 +597,38 @@ class CoordinateCorregistrate(threading.Thread):
             self.target[1] = -self.target[1]
 
     def run(self):
-        m_change, r_stylus = self.coreg_data
         obj_datas = self.obj_datas
+        kernel = self.kernel
+        latency_monitor = self.latency_monitor
 
-        corregistrate_object = (
-            corregistrate_object_dynamic if self.ref_mode_id else corregistrate_object_static
-        )
-
-        icp = (self.use_icp, self.m_icp)
+        tracker_coordinates = self.tracker.TrackerCoordinates
+        sequence = tracker_coordinates.sequence
+        record_sequence = sequence
         while not self.event.is_set():
+            # Co-registers the coordinates as soon as the tracker sets new ones.
+            new_sequence = tracker_coordinates.WaitCoordinates(
+                sequence, timeout=const.NAVIGATION_WAIT_TIMEOUT
+            )
+            if new_sequence == sequence:
+                continue
+            sequence = new_sequence
+
             try:
                 if not self.object_at_target_queue.empty():
                     self.target_flag = self.object_at_target_queue.get_nowait()
 
-                coord_raw, marker_visibilities = self.tracker.TrackerCoordinates.GetCoordinates()
-
-                coord_probe, m_img_probe = corregistrate_probe(
-                    m_change, r_stylus, coord_raw, self.ref_mode_id, icp=icp
-                )
+                record = None
+                if latency_monitor is not None:
+                    last_record_sequence = record_sequence
+                    record_sequence, started, acquired = tracker_coordinates.GetTimestamps()
+                    record = PoseRecord(record_sequence, started, acquired)
+                    # The poses set by the tracker while co-registering the previous one are skipped.
+                    latency_monitor.drop("acquisition", record_sequence - last_record_sequence - 1)
 
-                coords = {"probe": coord_probe}
-                m_imgs = {"probe": m_img_probe}
+                coord_raw, marker_visibilities = tracker_coordinates.GetCoordinates()
 
-                for coil_name in obj_datas:
-                    coord_coil, m_img_coil = corregistrate_object(
-                        m_change, obj_datas[coil_name], coord_raw, icp
-                    )
-                    coords[coil_name] = coord_coil
-                    m_imgs[coil_name] = m_img_coil
+                # The probe and all the coils are co-registered at once.
+                coords, m_imgs = kernel.corregistrate(coord_raw)
 
                 # LUKATODO: this is an arbitrary coil, so efields/tracts work correctly with 1 coil but may bug out when using multiple
                 main_coil = next(iter(obj_datas))
@@ -427,7 +653,12 @@ class CoordinateCorregistrate(threading.Thread):
                     translate = coord[0:3]
                     m_imgs[main_coil] = tr.compose_matrix(angles=angles, translate=translate)
 
-                self.coord_queue.put_nowait([coords, marker_visibilities, m_imgs])
+                dropped_count = self.coord_queue.dropped_count
+                if record is not None:
+                    record.coregistered = time.perf_counter()
+                self.coord_queue.put_nowait([coords, marker_visibilities, m_imgs, record])
+                if latency_monitor is not None:
+                    latency_monitor.drop("queue", self.coord_queue.dropped_count - dropped_count)
 
                 # Compute data for efield/tracts
                 m_img_flip = m_img.copy()
@@ -437,8 +668,5 @@ class CoordinateCorregistrate(threading.Thread):
                     self.coord_tracts_queue.put_nowait(m_img_flip)
                 if self.e_field_loaded:
                     self.efield_queue.put_nowait([m_img, coord])
-            except queue.Full:
+            except queue.Empty:
                 pass
-
-            # The sleep has to be in both threads
-            sleep(self.sle)
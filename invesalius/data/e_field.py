@@ -1,10 +1,11 @@
 import queue
 import threading
-import time
 
 import numpy as np
 from vtkmodules.vtkCommonCore import vtkIdList
 
+import invesalius.constants as const
+
 
 def Get_coil_position(m_img):
     # coil position cp : the center point at the bottom of the coil casing,
@@ -34,7 +35,7 @@ def Get_coil_position(m_img):
 
 
 class Visualize_E_field_Thread(threading.Thread):
-    def __init__(self, queues, event, sle, neuronavigation_api, debug_efield_enorm, plot_vectors):
+    def __init__(self, queues, event, neuronavigation_api, debug_efield_enorm, plot_vectors):
         threading.Thread.__init__(self, name="Visualize_E_field_Thread")
         # self.inp = inp #list of inputs
         self.efield_queue = queues[0]
@@ -43,7 +44,6 @@ class Visualize_E_field_Thread(threading.Thread):
         # self.tracts_queue = queues[1]
         # self.visualization_queue = visualization_queue
         self.event = event
-        self.sle = sle
         self.neuronavigation_api = neuronavigation_api
         self.ID_list = vtkIdList()
         self.coord_old = []
@@ -55,49 +55,41 @@ class Visualize_E_field_Thread(threading.Thread):
         self.plot_vectors = plot_vectors
 
     def run(self):
+        id_list = []
         while not self.event.is_set():
-            if not self.e_field_IDs_queue.empty():
-                try:
-                    self.ID_list = self.e_field_IDs_queue.get_nowait()
-                    self.e_field_IDs_queue.task_done()
-                    id_list = []
-                    for h in range(self.ID_list.GetNumberOfIds()):
-                        id_list.append(self.ID_list.GetId(h))
-                except queue.Full:
-                    self.e_field_IDs_queue.task_done()
-
-                if not self.efield_queue.empty():
-                    try:
-                        [m_img, coord] = self.efield_queue.get_nowait()
-                        self.efield_queue.task_done()
-                    except queue.Full:
-                        self.efield_queue.task_done()
-
-                    if self.ID_list.GetNumberOfIds() != 0:
-                        if np.all(self.coord_old != coord):
-                            [T_rot, cp] = Get_coil_position(m_img)
-                            if self.debug:
-                                enorm = self.enorm_debug
-                            else:
-                                if self.plot_vectors:
-                                    enorm = self.neuronavigation_api.update_efield_vectorROIMax(
-                                        position=cp,
-                                        orientation=coord[3:],
-                                        T_rot=T_rot,
-                                        id_list=id_list,
-                                    )
-                                else:
-                                    enorm = self.neuronavigation_api.update_efield(
-                                        position=cp, orientation=coord[3:], T_rot=T_rot
-                                    )
-                            try:
-                                self.e_field_norms_queue.put_nowait(
-                                    [T_rot, cp, coord, enorm, id_list]
-                                )
+            # Waits for a new coil position.
+            try:
+                [m_img, coord] = self.efield_queue.get(timeout=const.NAVIGATION_WAIT_TIMEOUT)
+            except queue.Empty:
+                continue
+            self.efield_queue.task_done()
 
-                            except queue.Full:
-                                pass
+            # The IDs of the cortex region around the coil, sent by the scene update.
+            try:
+                self.ID_list = self.e_field_IDs_queue.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self.e_field_IDs_queue.task_done()
+                id_list = [self.ID_list.GetId(h) for h in range(self.ID_list.GetNumberOfIds())]
 
-                            self.coord_old = coord
+            if self.ID_list.GetNumberOfIds() != 0:
+                if np.all(self.coord_old != coord):
+                    [T_rot, cp] = Get_coil_position(m_img)
+                    if self.debug:
+                        enorm = self.enorm_debug
+                    else:
+                        if self.plot_vectors:
+                            enorm = self.neuronavigation_api.update_efield_vectorROIMax(
+                                position=cp,
+                                orientation=coord[3:],
+                                T_rot=T_rot,
+                                id_list=id_list,
+                            )
+                        else:
+                            enorm = self.neuronavigation_api.update_efield(
+                                position=cp, orientation=coord[3:], T_rot=T_rot
+                            )
+                    self.e_field_norms_queue.put_nowait([T_rot, cp, coord, enorm, id_list])
 
-            time.sleep(self.sle)
+                    self.coord_old = coord
@@ -0,0 +1,228 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Histogram and scalar range of the image. They are calculated in a single
+pass over the image, in chunks of slices processed by a pool of threads,
+and saved in the project so opening it doesn't need to read the whole image
+again.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+# Number of slices (along the first axis) in each chunk of the image.
+STATISTICS_CHUNK_SIZE = 16
+
+# Maximum number of bins of the histogram. Integer images with a wider range
+# of values, and floating point images, get a histogram of bins wider than
+# one value.
+STATISTICS_MAX_BINS = 65536
+
+Number = Union[int, float]
+
+
+class ImageStatistics:
+    """
+    Histogram of an image. Without max_value, the histogram is exact:
+    counts[i] is the number of voxels with value min_value + i. Otherwise,
+    counts[i] is the number of voxels with value in [min_value + i *
+    bin_width, min_value + (i + 1) * bin_width), the last bin also counting
+    max_value.
+    """
+
+    def __init__(
+        self,
+        counts: np.ndarray,
+        min_value: Number,
+        bin_width: float = 1.0,
+        max_value: Optional[Number] = None,
+    ):
+        self.counts = counts
+        self.min_value = min_value
+        self.bin_width = bin_width
+        self._max_value = max_value
+
+    @property
+    def exact(self) -> bool:
+        return self._max_value is None
+
+    @property
+    def max_value(self) -> Number:
+        if self._max_value is not None:
+            return self._max_value
+        return self.min_value + len(self.counts) - 1
+
+    @property
+    def scalar_range(self) -> Tuple[int, int]:
+        return self.min_value, self.max_value
+
+    @property
+    def number_of_voxels(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def histogram(self) -> np.ndarray:
+        """
+        Histogram with max_value - min_value bins, the last one also counts
+        max_value. The same as np.histogram(image, max - min, (min, max)).
+        Histograms that aren't exact are returned as they are.
+        """
+        if not self.exact or len(self.counts) == 1:
+            return self.counts.copy()
+        histogram = self.counts[:-1].copy()
+        histogram[-1] += self.counts[-1]
+        return histogram
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the q-th percentile of the image, the same as
+        np.percentile(image, q). Histograms that aren't exact are
+        interpolated linearly inside the bins.
+        """
+        cumulative = np.cumsum(self.counts)
+        position = q / 100.0 * (cumulative[-1] - 1)
+        if not self.exact:
+            i = min(int(np.searchsorted(cumulative, position, side="right")), len(self.counts) - 1)
+            before = cumulative[i - 1] if i else 0
+            fraction = (position - before) / self.counts[i] if self.counts[i] else 0.0
+            value = self.min_value + (i + fraction) * self.bin_width
+            return float(min(value, self.max_value))
+        lower = int(np.floor(position))
+        upper = min(lower + 1, int(cumulative[-1]) - 1)
+        v0, v1 = self.min_value + np.searchsorted(cumulative, [lower, upper], side="right")
+        return float(v0 + (position - lower) * (v1 - v0))
+
+    @classmethod
+    def combine(cls, statistics: Iterable["ImageStatistics"]) -> "ImageStatistics":
+        """
+        Returns the statistics of the image made of the parts with the given
+        statistics. The result isn't exact when a part isn't or the range of
+        values is too wide, then the counts of each bin of the parts go to
+        the bin with its centre.
+        """
+        statistics = list(statistics)
+        min_value = min(s.min_value for s in statistics)
+        max_value = max(s.max_value for s in statistics)
+        if all(s.exact for s in statistics) and max_value - min_value < STATISTICS_MAX_BINS:
+            counts = np.zeros(max_value - min_value + 1, dtype=np.int64)
+            for s in statistics:
+                start = s.min_value - min_value
+                counts[start : start + len(s.counts)] += s.counts
+            return cls(counts, min_value)
+
+        bins = _get_number_of_bins(min_value, max_value)
+        bin_width = (max_value - min_value) / bins
+        counts = np.zeros(bins, dtype=np.int64)
+        for s in statistics:
+            centres = np.arange(len(s.counts), dtype=np.float64)
+            if not s.exact:
+                centres += 0.5
+            centres = s.min_value + centres * s.bin_width
+            index = np.clip(((centres - min_value) / bin_width).astype(np.intp), 0, bins - 1)
+            counts += np.bincount(index, s.counts, bins).astype(np.int64)
+        return cls(counts, min_value, bin_width, max_value)
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the statistics as a dict that can be saved in a plist.
+        """
+        if self.exact:
+            return {
+                "min_value": int(self.min_value),
+                "counts": self.counts.astype("<i8").tobytes(),
+            }
+        return {
+            "min_value": float(self.min_value),
+            "max_value": float(self.max_value),
+            "bin_width": float(self.bin_width),
+            "counts": self.counts.astype("<i8").tobytes(),
+        }
+
+    @classmethod
+    def from_dict(cls, statistics: Dict) -> "ImageStatistics":
+        counts = np.frombuffer(statistics["counts"], dtype="<i8").astype(np.int64)
+        if "max_value" not in statistics:
+            return cls(counts, int(statistics["min_value"]))
+        return cls(
+            counts,
+            statistics["min_value"],
+            statistics["bin_width"],
+            statistics["max_value"],
+        )
+
+
+def _get_number_of_bins(min_value: Number, max_value: Number) -> int:
+    return int(min(max(np.ceil(max_value - min_value), 1), STATISTICS_MAX_BINS))
+
+
+def get_statistics(array: np.ndarray) -> ImageStatistics:
+    """
+    Returns the statistics of array, calculated in the calling thread.
+    """
+    if not np.issubdtype(array.dtype, np.integer):
+        return get_binned_statistics(array, (float(np.nanmin(array)), float(np.nanmax(array))))
+    min_value, max_value = int(array.min()), int(array.max())
+    if max_value - min_value >= STATISTICS_MAX_BINS:
+        return get_binned_statistics(array, (min_value, max_value))
+    counts = np.bincount(np.subtract(array.ravel(), min_value, dtype=np.intp))
+    return ImageStatistics(counts.astype(np.int64), min_value)
+
+
+def get_binned_statistics(array: np.ndarray, value_range: Tuple[Number, Number]) -> ImageStatistics:
+    """
+    Returns the statistics of array with the bins of value_range (up to
+    STATISTICS_MAX_BINS bins about one value wide), for floating point
+    images and integer images with a too wide range.
+    """
+    min_value, max_value = value_range
+    bins = _get_number_of_bins(min_value, max_value)
+    counts = np.histogram(array, bins, value_range)[0]
+    bin_width = (max_value - min_value) / bins
+    return ImageStatistics(counts.astype(np.int64), min_value, bin_width, max_value)
+
+
+def compute_statistics(
+    image: np.ndarray, chunk_size: int = STATISTICS_CHUNK_SIZE
+) -> ImageStatistics:
+    """
+    Returns the statistics of image. The chunks of chunk_size slices are
+    processed in parallel.
+    """
+    if image.ndim < 3 or image.shape[0] <= chunk_size:
+        return get_statistics(np.asarray(image))
+
+    def get_chunks():
+        return (image[i : i + chunk_size] for i in range(0, image.shape[0], chunk_size))
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        statistics = list(executor.map(get_statistics, get_chunks()))
+        if all(s.exact for s in statistics):
+            return ImageStatistics.combine(statistics)
+        # The histograms of the chunks are taken again with the same bins, so
+        # combining them doesn't move the counts between bins.
+        value_range = (
+            min(s.min_value for s in statistics),
+            max(s.max_value for s in statistics),
+        )
+        get_chunk_statistics = partial(get_binned_statistics, value_range=value_range)
+        return ImageStatistics.combine(executor.map(get_chunk_statistics, get_chunks()))
@@ -27,7 +27,6 @@ import numpy as np
 from scipy.ndimage import shift, zoom
 from skimage.color import rgb2gray
 from skimage.measure import label
-from vtkmodules.util import numpy_support
 from vtkmodules.vtkFiltersCore import vtkImageAppend
 from vtkmodules.vtkImagingCore import vtkExtractVOI, vtkImageClip, vtkImageResample
 from vtkmodules.vtkImagingGeneral import vtkImageGaussianSmooth
@@ -38,7 +37,7 @@ import invesalius.data.converters as converters
 import invesalius.data.coordinates as dco
 import invesalius.data.slice_ as sl
 import invesalius.gui.dialogs as dlg
-import invesalius.reader.bitmap_reader as bitmap_reader
+from invesalius.data import image_statistics, volume_decoder
 from invesalius.data import vtk_utils as vtk_utils
 from invesalius.i18n import tr as _
 
@@ -304,115 +303,39 @@ def bitmap2memmap(files, slice_size, orientation, spacing, resolution_percentage
     returns it and its related filename.
     """
     message = _("Generating multiplanar visualization...")
+    update_progress = None
     if len(files) > 1:
         update_progress = vtk_utils.ShowProgress(len(files) - 1, dialog_type="ProgressDialog")
 
-    temp_fd, temp_file = tempfile.mkstemp()
-
     if orientation == "SAGITTAL":
-        if resolution_percentage == 1.0:
-            shape = slice_size[1], slice_size[0], len(files)
-        else:
-            shape = (
-                math.ceil(slice_size[1] * resolution_percentage),
-                math.ceil(slice_size[0] * resolution_percentage),
-                len(files),
-            )
-
+        placement = volume_decoder.Placement(2, flip=True)
     elif orientation == "CORONAL":
-        if resolution_percentage == 1.0:
-            shape = slice_size[1], len(files), slice_size[0]
-        else:
-            shape = (
-                math.ceil(slice_size[1] * resolution_percentage),
-                len(files),
-                math.ceil(slice_size[0] * resolution_percentage),
-            )
+        placement = volume_decoder.Placement(1, flip=True)
     else:
-        if resolution_percentage == 1.0:
-            shape = len(files), slice_size[1], slice_size[0]
-        else:
-            shape = (
-                len(files),
-                math.ceil(slice_size[1] * resolution_percentage),
-                math.ceil(slice_size[0] * resolution_percentage),
-            )
-
-    if resolution_percentage == 1.0:
-        matrix = np.memmap(temp_file, mode="w+", dtype="int16", shape=shape)
-
-    cont = 0
-    max_scalar = None
-    min_scalar = None
-
-    first_resample_entry = False
-
-    for n, f in enumerate(files):
-        image_as_array = bitmap_reader.ReadBitmap(f)
-        image = converters.to_vtk(
-            image_as_array,
-            spacing=spacing,
-            slice_number=1,
-            orientation=orientation.upper(),
-        )
-
-        if resolution_percentage != 1.0:
-            image_resized = ResampleImage2D(
-                image,
-                px=None,
-                py=None,
-                resolution_percentage=resolution_percentage,
-                update_progress=None,
-            )
-
-            yx_shape = (
-                image_resized.GetDimensions()[1],
-                image_resized.GetDimensions()[0],
-            )
-
-            if not (first_resample_entry):
-                shape = shape[0], yx_shape[0], yx_shape[1]
-                matrix = np.memmap(temp_file, mode="w+", dtype="int16", shape=shape)
-                first_resample_entry = True
-
-            image = image_resized
-
-        min_aux, max_aux = image.GetScalarRange()
-        if min_scalar is None or min_aux < min_scalar:
-            min_scalar = min_aux
-
-        if max_scalar is None or max_aux > max_scalar:
-            max_scalar = max_aux
-
-        array = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
-
-        if array.dtype == "uint16":
-            new_array = np.empty_like(array, dtype=np.int16)
-            new_array = array - 32768
-            array = new_array
-
-        if orientation == "CORONAL":
-            array.shape = matrix.shape[0], matrix.shape[2]
-            matrix[:, n, :] = array[:, ::-1]
-        elif orientation == "SAGITTAL":
-            array.shape = matrix.shape[0], matrix.shape[1]
-            # TODO: Verify if it's necessary to add the slices swapped only in
-            # sagittal rmi or only in # Rasiane's case or is necessary in all
-            # sagittal cases.
-            matrix[:, :, n] = array[:, ::-1]
-        else:
-            array.shape = matrix.shape[1], matrix.shape[2]
-            matrix[n] = array
+        placement = volume_decoder.Placement(0)
+
+    # The first slice gives the size of the (resampled) slices.
+    decode_args = (spacing, orientation, resolution_percentage)
+    first_slice = volume_decoder.decode_bitmap_slice(files[0], *decode_args)
+    shape = volume_decoder.get_volume_shape(first_slice.shape, len(files), placement.axis)
 
-        if len(files) > 1:
-            update_progress(cont, message)
-        cont += 1
+    temp_fd, temp_file = tempfile.mkstemp()
+    matrix = np.memmap(temp_file, mode="w+", dtype="int16", shape=shape)
+    statistics = volume_decoder.decode_volume(
+        matrix,
+        files,
+        volume_decoder.decode_bitmap_slice,
+        decode_args,
+        placement,
+        update_progress,
+        message,
+        first_slice=first_slice,
+    )
 
     matrix.flush()
-    scalar_range = min_scalar, max_scalar
     os.close(temp_fd)
 
-    return matrix, scalar_range, temp_file
+    return matrix, statistics, temp_file
 
 
 def dcm2memmap(files, slice_size, orientation, resolution_percentage):
@@ -420,43 +343,41 @@ def dcm2memmap(files, slice_size, orientation, resolution_percentage):
     From a list of dicom files it creates memmap file in the temp folder and
     returns it and its related filename.
     """
+    message = _("Generating multiplanar visualization...")
+    update_progress = None
     if len(files) > 1:
-        message = _("Generating multiplanar visualization...")
         update_progress = vtk_utils.ShowProgress(len(files) - 1, dialog_type="ProgressDialog")
 
-    first_slice = read_dcm_slice_as_np2(files[0], resolution_percentage)
-    slice_size = first_slice.shape[::-1]
-
-    temp_fd, temp_file = tempfile.mkstemp()
-
     if orientation == "SAGITTAL":
-        shape = slice_size[0], slice_size[1], len(files)
+        # TODO: Verify if it's necessary to add the slices swapped only in
+        # sagittal rmi or only in # Rasiane's case or is necessary in all
+        # sagittal cases.
+        placement = volume_decoder.Placement(2)
     elif orientation == "CORONAL":
-        shape = slice_size[1], len(files), slice_size[0]
+        placement = volume_decoder.Placement(1, reverse=True)
     else:
-        shape = len(files), slice_size[1], slice_size[0]
+        placement = volume_decoder.Placement(0)
+
+    first_slice = volume_decoder.decode_dicom_slice(files[0], resolution_percentage)
+    shape = volume_decoder.get_volume_shape(first_slice.shape, len(files), placement.axis)
 
+    temp_fd, temp_file = tempfile.mkstemp()
     matrix = np.memmap(temp_file, mode="w+", dtype="int16", shape=shape)
-    for n, f in enumerate(files):
-        im_array = read_dcm_slice_as_np2(f, resolution_percentage)[::-1]
-
-        if orientation == "CORONAL":
-            matrix[:, shape[1] - n - 1, :] = im_array
-        elif orientation == "SAGITTAL":
-            # TODO: Verify if it's necessary to add the slices swapped only in
-            # sagittal rmi or only in # Rasiane's case or is necessary in all
-            # sagittal cases.
-            matrix[:, :, n] = im_array
-        else:
-            matrix[n] = im_array
-        if len(files) > 1:
-            update_progress(n, message)
+    statistics = volume_decoder.decode_volume(
+        matrix,
+        files,
+        volume_decoder.decode_dicom_slice,
+        (resolution_percentage,),
+        placement,
+        update_progress,
+        message,
+        first_slice=first_slice,
+    )
 
     matrix.flush()
-    scalar_range = matrix.min(), matrix.max()
     os.close(temp_fd)
 
-    return matrix, scalar_range, temp_file
+    return matrix, statistics, temp_file
 
 
 def dcmmf2memmap(dcm_file, orientation):
@@ -488,10 +409,10 @@ def dcmmf2memmap(dcm_file, orientation):
         matrix[:] = np_image[:, ::-1, :]
 
     matrix.flush()
-    scalar_range = matrix.min(), matrix.max()
+    statistics = image_statistics.compute_statistics(matrix)
     os.close(temp_fd)
 
-    return matrix, scalar_range, spacing, temp_file
+    return matrix, statistics, spacing, temp_file
 
 
 def img2memmap(group):
@@ -530,10 +451,10 @@ def img2memmap(group):
     matrix[:] = data[:]
     matrix.flush()
 
-    scalar_range = np.amin(matrix), np.amax(matrix)
+    statistics = image_statistics.compute_statistics(matrix)
     os.close(temp_fd)
 
-    return matrix, scalar_range, temp_file
+    return matrix, statistics, temp_file
 
 
 def get_LUT_value_255(data, window, level):
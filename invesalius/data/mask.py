@@ -24,6 +24,7 @@ import shutil
 import tempfile
 import time
 import weakref
+import zlib
 
 import numpy as np
 from scipy import ndimage
@@ -36,59 +37,129 @@ from invesalius.pubsub import pub as Publisher
 from invesalius_cy import floodfill
 
 
+def get_changed_bbox(array, p_array):
+    """
+    Returns the slices of the bounding box of the voxels that differ between
+    array and p_array (empty slices if they are equal).
+    """
+    changed = array != p_array
+    bbox = []
+    for axis in range(changed.ndim):
+        other_axes = tuple(i for i in range(changed.ndim) if i != axis)
+        indices = np.flatnonzero(changed.any(axis=other_axes))
+        if not indices.size:
+            return tuple(slice(0, 0) for _ in range(changed.ndim))
+        bbox.append(slice(int(indices[0]), int(indices[-1]) + 1))
+    return tuple(bbox)
+
+
 class EditionHistoryNode:
-    def __init__(self, index, orientation, array, clean=False):
+    """
+    State of a region (bbox) of a mask slice, or of the whole mask if
+    orientation is "VOLUME", compressed in memory. It may be moved to a
+    temporary file (spill) to release memory.
+    """
+
+    def __init__(self, index, orientation, array, clean=False, bbox=None):
         self.index = index
         self.orientation = orientation
-        self.fd, self.filename = tempfile.mkstemp(suffix=".npy")
         self.clean = clean
+        if bbox is None:
+            bbox = tuple(slice(0, s) for s in array.shape)
+        self.bbox = bbox
+        self.filename = None
 
-        self._save_array(array)
+        self._save_array(array[bbox])
 
     def _save_array(self, array):
-        np.save(self.filename, array)
-        print("Saving history", self.index, self.orientation, self.filename, self.clean)
+        self.shape = array.shape
+        self.dtype = array.dtype
+        self._data = zlib.compress(
+            np.ascontiguousarray(array).tobytes(), const.MASK_HISTORY_COMPRESSION_LEVEL
+        )
+        print("Saving history", self.index, self.orientation, self.bbox, self.clean)
+
+    def _load_array(self):
+        if self._data is None:
+            with open(self.filename, "rb") as f:
+                data = f.read()
+        else:
+            data = self._data
+        return np.frombuffer(zlib.decompress(data), dtype=self.dtype).reshape(self.shape)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the node (0 if it was moved to disk).
+        """
+        if self._data is None:
+            return 0
+        return len(self._data)
+
+    def spill(self):
+        """
+        Moves the compressed array to a temporary file.
+        """
+        if self._data is None:
+            return
+        fd, self.filename = tempfile.mkstemp(suffix=".hist")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._data)
+        self._data = None
 
     def commit_history(self, mvolume):
-        array = np.load(self.filename)
+        array = self._load_array()
         if self.orientation == "AXIAL":
-            mvolume[self.index + 1, 1:, 1:] = array
+            mvolume[self.index + 1, 1:, 1:][self.bbox] = array
             if self.clean:
                 mvolume[self.index + 1, 0, 0] = 1
         elif self.orientation == "CORONAL":
-            mvolume[1:, self.index + 1, 1:] = array
+            mvolume[1:, self.index + 1, 1:][self.bbox] = array
             if self.clean:
                 mvolume[0, self.index + 1, 0] = 1
         elif self.orientation == "SAGITAL":
-            mvolume[1:, 1:, self.index + 1] = array
+            mvolume[1:, 1:, self.index + 1][self.bbox] = array
             if self.clean:
                 mvolume[0, 0, self.index + 1] = 1
         elif self.orientation == "VOLUME":
-            mvolume[:] = array
+            mvolume[self.bbox] = array
 
         print("applying to", self.orientation, "at slice", self.index)
 
     def __del__(self):
-        print("Removing", self.filename)
-        os.close(self.fd)
-        os.remove(self.filename)
+        if self.filename is not None:
+            print("Removing", self.filename)
+            try:
+                os.remove(self.filename)
+            except OSError:
+                pass
 
 
 class EditionHistory:
-    def __init__(self, size=50):
+    """
+    Undo/redo history of a mask. Each edition adds two nodes, with the state
+    of the changed region before and after it. Up to memory_budget bytes of
+    (compressed) nodes are kept in memory, the oldest ones are moved to disk.
+    """
+
+    def __init__(self, size=50, memory_budget=const.MASK_HISTORY_MEMORY_BUDGET):
         self.history = []
         self.index = -1
         self.size = size * 2
+        self.memory_budget = memory_budget
 
         Publisher.sendMessage("Enable undo", value=False)
         Publisher.sendMessage("Enable redo", value=False)
 
     def new_node(self, index, orientation, array, p_array, clean):
+        # Only the region changed by the edition is saved.
+        bbox = get_changed_bbox(array, p_array)
+
         # Saving the previous state, used to undo/redo correctly.
-        p_node = EditionHistoryNode(index, orientation, p_array, clean)
+        p_node = EditionHistoryNode(index, orientation, p_array, clean, bbox)
         self.add(p_node)
 
-        node = EditionHistoryNode(index, orientation, array, clean)
+        node = EditionHistoryNode(index, orientation, array, clean, bbox)
         self.add(node)
 
     def add(self, node):
@@ -100,6 +171,7 @@ class EditionHistory:
             self.history = self.history[: self.index + 1]
         self.history.append(node)
         self.index += 1
+        self._spill()
 
         print("INDEX", self.index, len(self.history), self.history)
         Publisher.sendMessage("Enable undo", value=True)
@@ -137,7 +209,7 @@ class EditionHistory:
 
         if self.index == 0:
             Publisher.sendMessage("Enable undo", value=False)
-        print("AT", self.index, len(self.history), self.history[self.index].filename)
+        print("AT", self.index, len(self.history))
 
     def redo(self, mvolume, actual_slices=None):
         h = self.history
@@ -172,7 +244,19 @@ class EditionHistory:
 
         if self.index == len(h) - 1:
             Publisher.sendMessage("Enable redo", value=False)
-        print("AT", self.index, len(h), h[self.index].filename)
+        print("AT", self.index, len(h))
+
+    def _spill(self):
+        """
+        Moves the oldest nodes to disk while the memory used by the history
+        is above the budget.
+        """
+        nbytes = sum(node.nbytes for node in self.history)
+        for node in self.history:
+            if nbytes <= self.memory_budget:
+                break
+            nbytes -= node.nbytes
+            node.spill()
 
     def _reload_slice(self, index):
         Publisher.sendMessage(
@@ -222,6 +306,12 @@ class Mask:
         self.volume = None
         self.auto_update_mask = True
         self.modified_time = 0
+        # Number of changes of the matrix, so the project only saves the mask
+        # file again when it changed (see Project.SavePlistProject).
+        self.version = 0
+        # (key, MaskStatistics) calculated by Slice.calc_mask_statistics,
+        # discarded when the mask is modified.
+        self.statistics_cache = None
         self.__bind_events()
         self._modified_callbacks = []
 
@@ -245,6 +335,8 @@ class Mask:
 
     def save_history(self, index, orientation, array, p_array, clean=False):
         self.history.new_node(index, orientation, array, p_array, clean)
+        # The edition was written to the matrix.
+        self.version += 1
 
     def undo_history(self, actual_slices):
         self.history.undo(self.matrix, actual_slices)
@@ -410,6 +502,8 @@ class Mask:
             self._update_imagedata()
 
         self.modified_time = time.monotonic()
+        self.version += 1
+        self.statistics_cache = None
         callbacks = []
         for callback in self._modified_callbacks:
             if callback() is not None:
@@ -0,0 +1,109 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Boolean operations between masks. The masks are read in slabs of slices and
+the result of each slab is calculated in buffers allocated once, so the
+memory used doesn't depend on the size of the masks, and an expression with
+any number of masks is calculated in a single pass.
+
+An expression is the index of a mask (in the list of masks given to
+evaluate) or a tuple (operation, expression, expression, ...) where
+operation is const.BOOLEAN_UNION, BOOLEAN_DIFF, BOOLEAN_AND or BOOLEAN_XOR.
+E.g. (BOOLEAN_DIFF, (BOOLEAN_UNION, 0, 1, 2), 3) is the union of the masks
+0, 1 and 2 minus the mask 3.
+"""
+
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+import invesalius.constants as const
+
+Expression = Union[int, Tuple]
+
+# Size in bytes of the slab read from each mask.
+BOOLEAN_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Mask voxels with values above this are inside the mask (thresholded or
+# added by edition).
+INSIDE_THRESHOLD = 2
+
+_OPERATIONS = {
+    const.BOOLEAN_UNION: np.logical_or,
+    const.BOOLEAN_AND: np.logical_and,
+    const.BOOLEAN_XOR: np.logical_xor,
+    # a and not b, for booleans it's the same as a > b.
+    const.BOOLEAN_DIFF: np.greater,
+}
+
+
+def get_depth(expression: Expression, n_masks: int) -> int:
+    """
+    Returns the number of buffers needed to evaluate expression, raising
+    ValueError if it's not a valid expression of n_masks masks.
+    """
+    if isinstance(expression, (int, np.integer)):
+        if not 0 <= expression < n_masks:
+            raise ValueError(f"Invalid mask index in boolean expression: {expression}")
+        return 1
+    if len(expression) < 3 or expression[0] not in _OPERATIONS:
+        raise ValueError(f"Invalid boolean expression: {expression}")
+    first = get_depth(expression[1], n_masks)
+    others = max(get_depth(e, n_masks) for e in expression[2:])
+    return max(first, others + 1)
+
+
+def _evaluate(
+    expression: Expression, slabs: Sequence[np.ndarray], buffers: List[np.ndarray], depth: int
+) -> np.ndarray:
+    out = buffers[depth]
+    if isinstance(expression, (int, np.integer)):
+        return np.greater(slabs[expression], INSIDE_THRESHOLD, out=out)
+    operation = _OPERATIONS[expression[0]]
+    _evaluate(expression[1], slabs, buffers, depth)
+    for operand in expression[2:]:
+        operation(out, _evaluate(operand, slabs, buffers, depth + 1), out=out)
+    return out
+
+
+def evaluate(
+    expression: Expression,
+    masks: Sequence[np.ndarray],
+    out: np.ndarray,
+    chunk_size: int = BOOLEAN_CHUNK_SIZE,
+) -> None:
+    """
+    Writes the result of expression over masks into out, 255 inside and 0
+    outside. masks and out are mask matrices, with the extra slice, row and
+    column at the start, which are not changed.
+    """
+    depth = get_depth(expression, len(masks))
+    dz, dy, dx = out.shape[0] - 1, out.shape[1] - 1, out.shape[2] - 1
+    for mask in masks:
+        if mask.shape != out.shape:
+            raise ValueError("Masks with different shapes")
+
+    n_slices = max(1, min(dz, chunk_size // (dy * dx)))
+    buffers = [np.empty((n_slices, dy, dx), dtype=bool) for _ in range(depth)]
+    for z0 in range(1, dz + 1, n_slices):
+        z1 = min(z0 + n_slices, dz + 1)
+        slabs = [mask[z0:z1, 1:, 1:] for mask in masks]
+        slab_buffers = [b[: z1 - z0] for b in buffers]
+        result = _evaluate(expression, slabs, slab_buffers, 0)
+        np.multiply(result.view(np.uint8), 255, out=out[z0:z1, 1:, 1:])
@@ -0,0 +1,127 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Statistics of the image inside a mask (density) and the volume and surface
+area of the mask. They are calculated in slabs of slices processed by a
+pool of threads, so the extra memory used doesn't depend on the size of the
+image.
+"""
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+# Number of slices in each slab.
+MASK_STATISTICS_CHUNK_SIZE = 16
+
+# Mask voxels with values above this are inside the mask.
+INSIDE_THRESHOLD = 127
+
+
+class MaskStatistics(NamedTuple):
+    min: float
+    max: float
+    mean: float
+    std: float
+    # Number of voxels inside the mask, and their volume (mm³).
+    voxels: int
+    volume: float
+    # Area (mm²) of the faces between voxels inside and outside the mask.
+    # Faces on the borders of the image are not counted.
+    area: float
+
+
+class _SlabStatistics(NamedTuple):
+    voxels: int
+    min: float
+    max: float
+    sum: float
+    sum_squares: float
+    # Number of faces between voxels inside and outside the mask along the
+    # z, y and x axes.
+    faces: Tuple[int, int, int]
+
+
+def _get_slab_statistics(image: np.ndarray, mask: np.ndarray, z0: int, z1: int) -> _SlabStatistics:
+    inside = mask[z0 + 1 : z1 + 1, 1:, 1:] > INSIDE_THRESHOLD
+
+    faces_z = np.count_nonzero(inside[1:] != inside[:-1])
+    if z1 < image.shape[0]:
+        next_slice = mask[z1 + 1, 1:, 1:] > INSIDE_THRESHOLD
+        faces_z += np.count_nonzero(inside[-1] != next_slice)
+    faces_y = np.count_nonzero(inside[:, 1:] != inside[:, :-1])
+    faces_x = np.count_nonzero(inside[:, :, 1:] != inside[:, :, :-1])
+    faces = (int(faces_z), int(faces_y), int(faces_x))
+
+    values = image[z0:z1][inside]
+    if not values.size:
+        return _SlabStatistics(0, 0, 0, 0, 0, faces)
+    if np.issubdtype(values.dtype, np.integer):
+        # Exact sums, so the standard deviation doesn't lose precision.
+        values = values.astype(np.int64)
+        total = int(values.sum())
+        total_squares = int(np.dot(values, values))
+    else:
+        values = values.astype(np.float64)
+        total = float(values.sum())
+        total_squares = float(np.dot(values, values))
+    return _SlabStatistics(
+        values.size, values.min().item(), values.max().item(), total, total_squares, faces
+    )
+
+
+def compute_statistics(
+    image: np.ndarray,
+    mask: np.ndarray,
+    spacing: Sequence[float],
+    chunk_size: int = MASK_STATISTICS_CHUNK_SIZE,
+) -> MaskStatistics:
+    """
+    Returns the statistics of image inside mask, a mask matrix (with the
+    extra slice, row and column at the start). spacing is (x, y, z).
+    """
+    dz = image.shape[0]
+    slabs = [(z, min(z + chunk_size, dz)) for z in range(0, dz, chunk_size)]
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(lambda s: _get_slab_statistics(image, mask, *s), slabs))
+
+    sx, sy, sz = spacing
+    faces_z, faces_y, faces_x = (sum(r.faces[i] for r in results) for i in range(3))
+    area = faces_z * sx * sy + faces_y * sx * sz + faces_x * sy * sz
+
+    results = [r for r in results if r.voxels]
+    if not results:
+        return MaskStatistics(0, 0, 0, 0, 0, 0.0, area)
+    n = sum(r.voxels for r in results)
+    total = sum(r.sum for r in results)
+    total_squares = sum(r.sum_squares for r in results)
+    mean = total / n
+    variance = (total_squares * n - total * total) / (n * n)
+    return MaskStatistics(
+        min(r.min for r in results),
+        max(r.max for r in results),
+        mean,
+        math.sqrt(max(variance, 0)),
+        n,
+        n * sx * sy * sz,
+        area,
+    )
@@ -0,0 +1,236 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Thick slab projections (MaxIP, MinIP, MeanIP, LMIP, MIDA and contour MIPs)
+used by Slice to show more than one slice at once.
+"""
+
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import invesalius.constants as const
+from invesalius_cy import mips
+
+ORIENTATION_AXIS = {"AXIAL": 0, "CORONAL": 1, "SAGITAL": 2}
+
+# Projections which may be updated when the slab moves by one slice. They
+# don't depend on the order of the slices, so inverted is ignored.
+INCREMENTAL_PROJECTIONS = (
+    const.PROJECTION_MaxIP,
+    const.PROJECTION_MinIP,
+    const.PROJECTION_MeanIP,
+)
+
+# If more than this fraction of pixels had its max (or min) in the slice
+# leaving the slab, the slab is reduced again from scratch.
+MAX_STALE_FRACTION = 0.25
+
+
+def get_slab(matrix: np.ndarray, axis: int, start: int, stop: int) -> np.ndarray:
+    """
+    Returns a view (not a copy) of the slices [start, stop) along axis.
+    """
+    index = [slice(None)] * 3
+    index[axis] = slice(start, stop)
+    # np.asarray drops the memmap subclass without copying.
+    return np.asarray(matrix[tuple(index)])
+
+
+def get_slice(matrix: np.ndarray, axis: int, n: int) -> np.ndarray:
+    """
+    Returns a view (not a copy) of the slice n along axis.
+    """
+    index = [slice(None)] * 3
+    index[axis] = n
+    return np.asarray(matrix[tuple(index)])
+
+
+def project_slab(
+    slab: np.ndarray,
+    axis: int,
+    projection: int,
+    window_level: float,
+    border_size: float = 1.0,
+    inverted: bool = False,
+) -> np.ndarray:
+    """
+    Reduces slab along axis using the given projection type.
+
+    slab may be a view into the image memmap: the reductions read directly
+    from it without copying it first.
+    """
+    if inverted:
+        index = [slice(None)] * 3
+        index[axis] = slice(None, None, -1)
+        slab = slab[tuple(index)]
+
+    if projection == const.PROJECTION_MaxIP:
+        return slab.max(axis)
+    elif projection == const.PROJECTION_MinIP:
+        return slab.min(axis)
+    elif projection == const.PROJECTION_MeanIP:
+        return slab.mean(axis)
+
+    shape = tuple(s for i, s in enumerate(slab.shape) if i != axis)
+    out = np.empty(shape=shape, dtype=slab.dtype)
+    if projection == const.PROJECTION_LMIP:
+        mips.lmip(slab, axis, window_level, window_level, out)
+    elif projection == const.PROJECTION_MIDA:
+        mips.mida(slab, axis, window_level, window_level, out)
+    elif projection == const.PROJECTION_CONTOUR_MIP:
+        mips.fast_countour_mip(slab, border_size, axis, window_level, window_level, 0, out)
+    elif projection == const.PROJECTION_CONTOUR_LMIP:
+        mips.fast_countour_mip(slab, border_size, axis, window_level, window_level, 1, out)
+    elif projection == const.PROJECTION_CONTOUR_MIDA:
+        mips.fast_countour_mip(slab, border_size, axis, window_level, window_level, 2, out)
+    else:
+        out[:] = np.take(slab, 0, axis)
+    return out
+
+
+class _SlabState(NamedTuple):
+    key: Tuple
+    start: int
+    stop: int
+    # Max or min for MaxIP and MinIP, the sum of the slices for MeanIP.
+    acc: np.ndarray
+
+
+class ProjectionEngine:
+    """
+    Computes the thick slab projections from the image matrix.
+
+    For MaxIP, MinIP and MeanIP the last result of each orientation is kept,
+    so when the slab moves by one slice only the slice entering and the slice
+    leaving the slab are read: MeanIP keeps a running sum and MaxIP/MinIP
+    only reduce again the pixels whose extreme value left the slab.
+
+    It may be used from more than one thread (e.g. the slice prefetcher).
+    reset must be called each time the image matrix changes.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, _SlabState] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._states = {}
+            self._generation += 1
+
+    def project(
+        self,
+        matrix: np.ndarray,
+        orientation: str,
+        slice_number: int,
+        number_slices: int,
+        projection: int,
+        window_level: float,
+        border_size: float = 1.0,
+        inverted: bool = False,
+    ) -> np.ndarray:
+        axis = ORIENTATION_AXIS[orientation]
+        start = slice_number
+        stop = min(slice_number + number_slices, matrix.shape[axis])
+
+        if projection not in INCREMENTAL_PROJECTIONS:
+            slab = get_slab(matrix, axis, start, stop)
+            return project_slab(slab, axis, projection, window_level, border_size, inverted)
+
+        key = (projection, matrix.shape, matrix.dtype.str)
+        with self._lock:
+            state = self._states.get(orientation)
+            generation = self._generation
+
+        acc: Optional[np.ndarray] = None
+        if (
+            state is not None
+            and state.key == key
+            and abs(start - state.start) == 1
+            and stop - start == state.stop - state.start
+        ):
+            acc = self._slide(matrix, axis, state, start, stop, projection)
+
+        if acc is None:
+            acc = self._reduce(get_slab(matrix, axis, start, stop), axis, projection)
+
+        with self._lock:
+            # If reset was called meanwhile acc may come from the old matrix.
+            if generation == self._generation:
+                self._states[orientation] = _SlabState(key, start, stop, acc)
+
+        if projection == const.PROJECTION_MeanIP:
+            return acc / (stop - start)
+        return acc
+
+    def _reduce(self, slab: np.ndarray, axis: int, projection: int) -> np.ndarray:
+        if projection == const.PROJECTION_MaxIP:
+            return slab.max(axis)
+        elif projection == const.PROJECTION_MinIP:
+            return slab.min(axis)
+        else:
+            return slab.sum(axis, dtype=_sum_dtype(slab.dtype))
+
+    def _slide(
+        self,
+        matrix: np.ndarray,
+        axis: int,
+        state: _SlabState,
+        start: int,
+        stop: int,
+        projection: int,
+    ) -> Optional[np.ndarray]:
+        if start > state.start:
+            removed = get_slice(matrix, axis, state.start)
+            added = get_slice(matrix, axis, stop - 1)
+        else:
+            removed = get_slice(matrix, axis, state.stop - 1)
+            added = get_slice(matrix, axis, start)
+
+        acc = state.acc
+        if projection == const.PROJECTION_MeanIP:
+            return acc + added - removed.astype(acc.dtype)
+
+        if projection == const.PROJECTION_MaxIP:
+            new_acc = np.maximum(acc, added)
+            stale = (removed == acc) & (added < acc)
+        else:
+            new_acc = np.minimum(acc, added)
+            stale = (removed == acc) & (added > acc)
+
+        n_stale = np.count_nonzero(stale)
+        if n_stale > MAX_STALE_FRACTION * stale.size:
+            return None
+        elif n_stale:
+            # Pixels whose max (or min) was in the slice that left the slab.
+            values = np.moveaxis(get_slab(matrix, axis, start, stop), axis, 0)[:, stale]
+            if projection == const.PROJECTION_MaxIP:
+                new_acc[stale] = values.max(0)
+            else:
+                new_acc[stale] = values.min(0)
+        return new_acc
+
+
+def _sum_dtype(dtype: np.dtype) -> np.dtype:
+    if np.issubdtype(dtype, np.floating):
+        return np.dtype(np.float64)
+    return np.dtype(np.int64)
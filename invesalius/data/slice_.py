@@ -24,7 +24,6 @@ import numpy as np
 from vtkmodules.vtkCommonCore import vtkLookupTable
 from vtkmodules.vtkImagingColor import vtkImageMapToWindowLevelColors
 from vtkmodules.vtkImagingCore import (
-    vtkImageBlend,
     vtkImageCast,
     vtkImageFlip,
     vtkImageMapToColors,
@@ -36,17 +35,20 @@ from vtkmodules.vtkRenderingCore import (
 )
 
 import invesalius.constants as const
+import invesalius.data.colour_lut as colour_lut
 import invesalius.data.converters as converters
+import invesalius.data.image_statistics as image_statistics
 import invesalius.data.imagedata_utils as iu
 import invesalius.session as ses
 import invesalius.style as st
 import invesalius.utils as utils
-from invesalius.data import transformations
+from invesalius.data import mask_boolean, mask_statistics, projection, transformations
 from invesalius.data.mask import Mask
+from invesalius.data.slice_cache import SliceCache, SlicePrefetcher
 from invesalius.i18n import tr as _
 from invesalius.project import Project
 from invesalius.pubsub import pub as Publisher
-from invesalius_cy import mips, transforms
+from invesalius_cy import threshold, transforms
 
 if TYPE_CHECKING:
     from vtkmodules.vtkCommonDataModel import vtkImageData
@@ -60,6 +62,11 @@ class SliceBuffer:
     """
     This class is used as buffer that mantains the vtkImageData and numpy array
     from actual slices from each orientation.
+
+    Besides the actual slice it keeps a LRU cache of the last rendered slices
+    (image_cache and mask_cache). Each discard method also discards the
+    related cache, so every place that invalidates the actual slice
+    invalidates the cached ones too.
     """
 
     def __init__(self):
@@ -68,18 +75,25 @@ class SliceBuffer:
         self.mask: Optional[np.ndarray] = None
         self.vtk_image: Optional[vtkImageData] = None
         self.vtk_mask: Optional[vtkImageData] = None
+        self.image_cache = SliceCache(const.SLICE_CACHE_IMAGE_SIZE)
+        self.mask_cache = SliceCache(const.SLICE_CACHE_MASK_SIZE)
+        self.blend_buffer = colour_lut.BlendBuffer()
 
     def discard_vtk_mask(self) -> None:
         self.vtk_mask = None
+        self.mask_cache.clear()
 
     def discard_vtk_image(self) -> None:
         self.vtk_image = None
+        self.image_cache.clear()
 
     def discard_mask(self) -> None:
         self.mask = None
+        self.mask_cache.clear()
 
     def discard_image(self) -> None:
         self.image = None
+        self.image_cache.clear()
 
     def discard_buffer(self) -> None:
         self.index = -1
@@ -87,6 +101,8 @@ class SliceBuffer:
         self.mask = None
         self.vtk_image = None
         self.vtk_mask = None
+        self.image_cache.clear()
+        self.mask_cache.clear()
 
 
 # Only one slice will be initialized per time (despite several viewers
@@ -96,7 +112,6 @@ class Slice(metaclass=utils.Singleton):
     def __init__(self):
         self.current_mask: Optional[Mask] = None
         self.blend_filter = None
-        self.histogram: Optional[np.ndarray] = None
         self._matrix: Optional[np.ndarray] = None
         self._affine: np.ndarray = np.identity(4)
         self._n_tracts: int = 0
@@ -130,6 +145,9 @@ class Slice(metaclass=utils.Singleton):
             "SAGITAL": SliceBuffer(),
         }
 
+        self.prefetcher = SlicePrefetcher(const.SLICE_PREFETCH_SIZE)
+        self.projection_engine = projection.ProjectionEngine()
+
         self.num_gradient = 0
         self.interaction_style = st.StyleStateManager()
 
@@ -140,18 +158,55 @@ class Slice(metaclass=utils.Singleton):
         self.__bind_events()
         self.opacity: float = 0.8
 
+        # (key, ColourLUT) of the image, the mask and the auxiliary matrices,
+        # the key is the state used to build the lookup table.
+        self._image_lut: Optional[Tuple[tuple, colour_lut.ColourLUT]] = None
+        self._mask_lut: Optional[Tuple[tuple, colour_lut.ColourLUT]] = None
+        self._aux_luts: dict[str, Tuple[tuple, colour_lut.ColourLUT]] = {}
+        self._statistics: Optional[image_statistics.ImageStatistics] = None
+
     @property
     def matrix(self) -> Optional[np.ndarray]:
         return self._matrix
 
     @matrix.setter
     def matrix(self, value: np.ndarray) -> None:
+        self.prefetcher.reset()
+        self.discard_slice_caches()
+        self.projection_engine.reset()
         self._matrix = value
-        i, e = value.min(), value.max()
-        r = int(e) - int(i)
-        self.histogram = np.histogram(self._matrix, r, (i, e))[0]
+        self._statistics = None
         self.center = [(s * d / 2.0) for (d, s) in zip(self.matrix.shape[::-1], self.spacing)]
 
+    @property
+    def statistics(self) -> image_statistics.ImageStatistics:
+        """
+        Histogram and scalar range of the image, calculated when first needed
+        unless they were set (e.g. from the project file).
+        """
+        if self._statistics is None:
+            self._statistics = image_statistics.compute_statistics(self.matrix)
+        return self._statistics
+
+    @statistics.setter
+    def statistics(self, value: Optional[image_statistics.ImageStatistics]) -> None:
+        # Set to None when the values of the image change, to calculate them
+        # again. The colours may depend on the scalar range of the image.
+        self._statistics = value
+        self.discard_slice_caches(masks=False)
+
+    @property
+    def histogram(self) -> np.ndarray:
+        return self.statistics.histogram
+
+    @property
+    def matrix_version(self) -> int:
+        """
+        Number of changes of the image in place (flips, swaps of the axes and
+        reorientations), kept by the project.
+        """
+        return Project().matrix_version
+
     @property
     def spacing(self) -> Tuple[float, float, float]:
         return self._spacing
@@ -275,6 +330,34 @@ class Slice(metaclass=utils.Singleton):
             buffer_.discard_vtk_mask()
             buffer_.discard_mask()
 
+    def get_scalar_range(self) -> Tuple[int, int]:
+        """
+        Returns the (min, max) values of the image.
+        """
+        return self.statistics.scalar_range
+
+    def discard_slice_caches(self, images: bool = True, masks: bool = True) -> None:
+        """
+        Discards the cached slices (not the actual ones) from all orientations.
+        """
+        if images:
+            # The colours may depend on the scalar range of the image.
+            self._image_lut = None
+        for buffer_ in self.buffer_slices.values():
+            if images:
+                buffer_.image_cache.clear()
+            if masks:
+                buffer_.mask_cache.clear()
+
+    def _on_current_mask_modified(self) -> None:
+        self.discard_slice_caches(images=False)
+
+    def _watch_mask(self, mask: Mask) -> None:
+        # Mask is modified by operations outside Slice (e.g. fill holes,
+        # undo, segmentation) so the cached mask slices must be discarded.
+        mask.remove_modified_callback(self._on_current_mask_modified)
+        mask.add_modified_callback(self._on_current_mask_modified)
+
     def get_world_to_invesalius_vtk_affine(
         self, inverse: bool = False
     ) -> Tuple[np.ndarray, "vtkMatrix4x4", float]:
@@ -369,9 +452,13 @@ class Slice(metaclass=utils.Singleton):
         self.CloseProject()
 
     def CloseProject(self):
+        self.prefetcher.reset()
+        self.discard_slice_caches()
+        self.projection_engine.reset()
         f = self._matrix.filename
         self._matrix._mmap.close()
         self._matrix = None
+        self._statistics = None
         os.remove(f)
         self.current_mask = None
 
@@ -658,78 +745,74 @@ class Slice(metaclass=utils.Singleton):
         session.ChangeProject()
 
     def GetSlices(self, orientation, slice_number, number_slices, inverted=False, border_size=1.0):
-        if (
-            self.buffer_slices[orientation].index == slice_number
-            and self._type_projection == const.PROJECTION_NORMAL
-        ):
-            if self.buffer_slices[orientation].vtk_image:
-                image = self.buffer_slices[orientation].vtk_image
+        buffer_ = self.buffer_slices[orientation]
+        if buffer_.index == slice_number and self._type_projection == const.PROJECTION_NORMAL:
+            if buffer_.vtk_image:
+                image = buffer_.vtk_image
             else:
-                n_image = self.get_image_slice(
+                image = self.get_colour_image_slice(
                     orientation, slice_number, number_slices, inverted, border_size
                 )
-                image = converters.to_vtk(n_image, self.spacing, slice_number, orientation)
-                ww_wl_image = self.do_ww_wl(image)
-                image = self.do_colour_image(ww_wl_image)
             if self.current_mask and self.current_mask.is_shown:
-                if self.buffer_slices[orientation].vtk_mask:
+                if buffer_.vtk_mask:
                     # Prints that during navigation causes delay in update
                     # print "Getting from buffer"
-                    mask = self.buffer_slices[orientation].vtk_mask
+                    mask = buffer_.vtk_mask
                 else:
                     # Prints that during navigation causes delay in update
                     # print "Do not getting from buffer"
-                    n_mask = self.get_mask_slice(orientation, slice_number)
-                    mask = converters.to_vtk(n_mask, self.spacing, slice_number, orientation)
-                    mask = self.do_colour_mask(mask, self.opacity)
-                    self.buffer_slices[orientation].mask = n_mask
-                final_image = self.do_blend(image, mask)
-                self.buffer_slices[orientation].vtk_mask = mask
+                    n_mask, mask = self.get_colour_mask_slice(orientation, slice_number)
+                    buffer_.mask = n_mask
+                overlays = [mask]
+                buffer_.vtk_mask = mask
             else:
-                final_image = image
-            self.buffer_slices[orientation].vtk_image = image
+                overlays = []
+            buffer_.vtk_image = image
         else:
-            n_image = self.get_image_slice(
+            image = self.get_colour_image_slice(
                 orientation, slice_number, number_slices, inverted, border_size
             )
-            image = converters.to_vtk(n_image, self.spacing, slice_number, orientation)
-            ww_wl_image = self.do_ww_wl(image)
-            image = self.do_colour_image(ww_wl_image)
 
             if self.current_mask and self.current_mask.is_shown:
-                n_mask = self.get_mask_slice(orientation, slice_number)
-                mask = converters.to_vtk(n_mask, self.spacing, slice_number, orientation)
-                mask = self.do_colour_mask(mask, self.opacity)
-                final_image = self.do_blend(image, mask)
+                n_mask, mask = self.get_colour_mask_slice(orientation, slice_number)
+                overlays = [mask]
             else:
                 n_mask = None
-                final_image = image
                 mask = None
+                overlays = []
 
-            self.buffer_slices[orientation].index = slice_number
-            self.buffer_slices[orientation].mask = n_mask
-            self.buffer_slices[orientation].vtk_image = image
-            self.buffer_slices[orientation].vtk_mask = mask
+            buffer_.index = slice_number
+            buffer_.mask = n_mask
+            buffer_.vtk_image = image
+            buffer_.vtk_mask = mask
+
+            self.prefetcher.schedule(
+                orientation,
+                slice_number,
+                self.GetMaxSliceNumber(orientation),
+                lambda n, stop: self._prefetch_slice(
+                    buffer_, orientation, n, number_slices, inverted, border_size, stop
+                ),
+            )
 
         if (
             self.to_show_aux == "watershed"
             and self.current_mask is not None
             and self.current_mask.is_shown
         ):
-            m = self.get_aux_slice("watershed", orientation, slice_number)
-            tmp_vimage = converters.to_vtk(m, self.spacing, slice_number, orientation)
-            cimage = self.do_custom_colour(
-                tmp_vimage,
-                {
-                    0: (0.0, 0.0, 0.0, 0.0),
-                    1: (0.0, 1.0, 0.0, 1.0),
-                    2: (1.0, 0.0, 0.0, 1.0),
-                },
+            overlays.append(
+                self.get_colour_aux_slice(
+                    "watershed",
+                    orientation,
+                    slice_number,
+                    {
+                        0: (0.0, 0.0, 0.0, 0.0),
+                        1: (0.0, 1.0, 0.0, 1.0),
+                        2: (1.0, 0.0, 0.0, 1.0),
+                    },
+                )
             )
-            final_image = self.do_blend(final_image, cimage)
         elif self.to_show_aux and self.current_mask:
-            m = self.get_aux_slice(self.to_show_aux, orientation, slice_number)
-            tmp_vimage = converters.to_vtk(m, self.spacing, slice_number, orientation)
             try:
                 colour_table = self.aux_matrices_colours[self.to_show_aux]
             except KeyError:
@@ -739,9 +822,202 @@ class Slice(metaclass=utils.Singleton):
                     254: (1.0, 0.0, 0.0, 1.0),
                     255: (1.0, 0.0, 0.0, 1.0),
                 }
-            aux_image = self.do_custom_colour(tmp_vimage, colour_table)
-            final_image = self.do_blend(final_image, aux_image)
-        return final_image
+            overlays.append(
+                self.get_colour_aux_slice(self.to_show_aux, orientation, slice_number, colour_table)
+            )
+
+        if overlays:
+            return buffer_.blend_buffer.blend(image, overlays)
+        return image
+
+    def get_colour_image_slice(
+        self,
+        orientation,
+        slice_number,
+        number_slices=1,
+        inverted=False,
+        border_size=1.0,
+    ):
+        """
+        Returns the given slice with window width & level and colour table
+        applied, using the slice cache when possible.
+        """
+        buffer_ = self.buffer_slices[orientation]
+        generation = buffer_.image_cache.generation
+        key = ("colour",) + self._get_slice_cache_key(
+            slice_number, number_slices, inverted, border_size
+        )
+        n_image = self.get_image_slice(
+            orientation, slice_number, number_slices, inverted, border_size
+        )
+        image = buffer_.image_cache.get(key)
+        if image is None:
+            image = self._colour_image_slice(n_image, orientation, slice_number)
+            buffer_.image_cache.put(key, image, generation)
+        return image
+
+    def get_colour_mask_slice(self, orientation, slice_number):
+        """
+        Returns the current mask slice and its coloured vtkImageData, using the
+        slice cache when possible.
+        """
+        buffer_ = self.buffer_slices[orientation]
+        generation = buffer_.mask_cache.generation
+        key = (
+            slice_number,
+            self.current_mask.index,
+            tuple(self.current_mask.threshold_range),
+            tuple(self.current_mask.colour[:3]),
+            self.opacity,
+        )
+        # The actual slice may have been edited and not applied to the mask
+        # matrix yet, so it's never taken from the cache.
+        if buffer_.index != slice_number or buffer_.mask is None:
+            cached = buffer_.mask_cache.get(key)
+            if cached is not None:
+                return cached
+        n_mask = self.get_mask_slice(orientation, slice_number)
+        mask = converters.to_vtk_colour(
+            self._get_mask_lut().map(n_mask), self.spacing, slice_number, orientation
+        )
+        buffer_.mask_cache.put(key, (n_mask, mask), generation)
+        return n_mask, mask
+
+    def get_colour_aux_slice(self, name, orientation, slice_number, colour_table):
+        """
+        Returns the coloured vtkImageData of the given slice of the auxiliary
+        matrix name.
+        """
+        m = self.get_aux_slice(name, orientation, slice_number)
+        key = tuple(sorted(colour_table.items()))
+        if m.dtype != np.uint8:
+            tmp_vimage = converters.to_vtk(m, self.spacing, slice_number, orientation)
+            return self.do_custom_colour(tmp_vimage, colour_table)
+        try:
+            lut_key, lut = self._aux_luts[name]
+        except KeyError:
+            lut_key = None
+        if lut_key != key:
+            lut = colour_lut.build_lut(
+                lambda image: self.do_custom_colour(image, colour_table), m.dtype, 0, 255
+            )
+            self._aux_luts[name] = (key, lut)
+        return converters.to_vtk_colour(lut.map(m), self.spacing, slice_number, orientation)
+
+    def _colour_image_slice(self, n_image, orientation, slice_number):
+        lut = self._get_image_lut(n_image)
+        if lut is None:
+            image = converters.to_vtk(n_image, self.spacing, slice_number, orientation)
+            ww_wl_image = self.do_ww_wl(image)
+            return self.do_colour_image(ww_wl_image)
+        return converters.to_vtk_colour(lut.map(n_image), self.spacing, slice_number, orientation)
+
+    def _get_colour_table_key(self):
+        """
+        Returns the state used by do_ww_wl and do_colour_image to colour the
+        image slices.
+        """
+        if self.from_ == PLIST:
+            colours = tuple(tuple(colour) for colour in self.values)
+        elif self.from_ == WIDGET:
+            colours = tuple((node.value, tuple(node.colour)) for node in self.nodes)
+        else:
+            colours = (
+                self.saturation_range,
+                self.hue_range,
+                self.value_range,
+            )
+        return (self.from_, self.window_width, self.window_level, colours)
+
+    def _get_image_lut(self, n_image) -> Optional[colour_lut.ColourLUT]:
+        """
+        Returns the lookup table with the colours of the image slice n_image,
+        or None if it can't be coloured by a lookup table. The lookup table is
+        built again only when the window & level or the colour table change.
+        """
+        if not np.issubdtype(n_image.dtype, np.integer):
+            return None
+        key = (n_image.dtype.str,) + self._get_colour_table_key()
+        min_value, max_value = n_image.min(), n_image.max()
+        current = self._image_lut
+        if current is not None and current[0] == key and current[1].covers(min_value, max_value):
+            return current[1]
+
+        # The table covers all the values of the image, and of the projections
+        # outside them.
+        scalar_min, scalar_max = self.get_scalar_range()
+        min_value = min(min_value, scalar_min)
+        max_value = max(max_value, scalar_max)
+        if current is not None and current[0] == key:
+            min_value = min(min_value, current[1].min_value)
+            max_value = max(max_value, current[1].max_value)
+        if not colour_lut.can_use_lut(n_image.dtype, min_value, max_value):
+            return None
+        lut = colour_lut.build_lut(
+            lambda image: self.do_colour_image(self.do_ww_wl(image)),
+            n_image.dtype,
+            min_value,
+            max_value,
+        )
+        self._image_lut = (key, lut)
+        return lut
+
+    def _get_mask_lut(self) -> colour_lut.ColourLUT:
+        key = (tuple(self.current_mask.colour[:3]), self.opacity)
+        if self._mask_lut is None or self._mask_lut[0] != key:
+            lut = colour_lut.build_lut(
+                lambda image: self.do_colour_mask(image, self.opacity), np.uint8, 0, 255
+            )
+            self._mask_lut = (key, lut)
+        return self._mask_lut[1]
+
+    def _get_slice_cache_key(self, slice_number, number_slices, inverted, border_size):
+        """
+        Returns the key of the given slice in the slice cache. It contains all
+        the state used to render the image slice.
+        """
+        if self._type_projection == const.PROJECTION_NORMAL:
+            number_slices = 1
+            inverted = False
+            border_size = const.PROJECTION_BORDER_SIZE
+        return (
+            slice_number,
+            number_slices,
+            bool(inverted),
+            border_size,
+            self._type_projection,
+            self.interp_method,
+            tuple(self.q_orientation),
+            getattr(self, "window_width", None),
+            getattr(self, "window_level", None),
+            self.from_,
+        )
+
+    def _prefetch_slice(
+        self, buffer_, orientation, slice_number, number_slices, inverted, border_size, stop
+    ):
+        """
+        Renders the given slice into the slice cache. It runs in the
+        prefetcher thread so it must not change the slice buffer state. Masks
+        are not prefetched because calculating them may write into the mask
+        matrix.
+        """
+        # The generation must be read before the key, if anything changes
+        # while rendering the cache will refuse the stale slice.
+        generation = buffer_.image_cache.generation
+        key = self._get_slice_cache_key(slice_number, number_slices, inverted, border_size)
+        if ("colour",) + key in buffer_.image_cache:
+            return
+        n_image = buffer_.image_cache.get(("image",) + key)
+        if n_image is None:
+            n_image = self._calc_image_slice(
+                orientation, slice_number, number_slices, inverted, border_size
+            )
+        if stop.is_set():
+            return
+        image = self._colour_image_slice(n_image, orientation, slice_number)
+        buffer_.image_cache.put(("image",) + key, n_image, generation)
+        buffer_.image_cache.put(("colour",) + key, image, generation)
 
     def get_image_slice(
         self,
@@ -751,280 +1027,91 @@ class Slice(metaclass=utils.Singleton):
         inverted=False,
         border_size=1.0,
     ):
-        dz, dy, dx = self.matrix.shape
-        if (
-            self.buffer_slices[orientation].index == slice_number
-            and self.buffer_slices[orientation].image is not None
-        ):
-            n_image = self.buffer_slices[orientation].image
+        buffer_ = self.buffer_slices[orientation]
+        if buffer_.index == slice_number and buffer_.image is not None:
+            n_image = buffer_.image
         else:
+            generation = buffer_.image_cache.generation
+            key = ("image",) + self._get_slice_cache_key(
+                slice_number, number_slices, inverted, border_size
+            )
+            n_image = buffer_.image_cache.get(key)
+            if n_image is None:
+                n_image = self._calc_image_slice(
+                    orientation, slice_number, number_slices, inverted, border_size
+                )
+                buffer_.image_cache.put(key, n_image, generation)
+            buffer_.image = n_image
+        return n_image
+
+    def _calc_image_slice(
+        self,
+        orientation,
+        slice_number,
+        number_slices=1,
+        inverted=False,
+        border_size=1.0,
+    ):
+        """
+        Calculates the given slice from the image matrix. It doesn't touch the
+        slice buffers.
+        """
+        if self._type_projection == const.PROJECTION_NORMAL:
+            number_slices = 1
+
+        axis = projection.ORIENTATION_AXIS[orientation]
+
+        if np.any(self.q_orientation[1::]):
+            cx, cy, cz = self.center
+            T0 = transformations.translation_matrix((-cz, -cy, -cx))
+            #  Rx = transformations.rotation_matrix(rx, (0, 0, 1))
+            #  Ry = transformations.rotation_matrix(ry, (0, 1, 0))
+            #  Rz = transformations.rotation_matrix(rz, (1, 0, 0))
+            #  #  R = transformations.euler_matrix(rz, ry, rx, 'rzyx')
+            #  R = transformations.concatenate_matrices(Rx, Ry, Rz)
+            R = transformations.quaternion_matrix(self.q_orientation)
+            T1 = transformations.translation_matrix((cz, cy, cx))
+            M = transformations.concatenate_matrices(T1, R.T, T0)
+
+            # The reoriented slab is written into tmp_array, so here a copy
+            # is needed.
+            tmp_array = np.array(
+                projection.get_slab(self.matrix, axis, slice_number, slice_number + number_slices)
+            )
+            transforms.apply_view_matrix_transform(
+                self.matrix,
+                self.spacing,
+                M,
+                slice_number,
+                orientation,
+                self.interp_method,
+                self.get_scalar_range()[0],
+                tmp_array,
+            )
             if self._type_projection == const.PROJECTION_NORMAL:
-                number_slices = 1
-
-            if np.any(self.q_orientation[1::]):
-                cx, cy, cz = self.center
-                T0 = transformations.translation_matrix((-cz, -cy, -cx))
-                #  Rx = transformations.rotation_matrix(rx, (0, 0, 1))
-                #  Ry = transformations.rotation_matrix(ry, (0, 1, 0))
-                #  Rz = transformations.rotation_matrix(rz, (1, 0, 0))
-                #  #  R = transformations.euler_matrix(rz, ry, rx, 'rzyx')
-                #  R = transformations.concatenate_matrices(Rx, Ry, Rz)
-                R = transformations.quaternion_matrix(self.q_orientation)
-                T1 = transformations.translation_matrix((cz, cy, cx))
-                M = transformations.concatenate_matrices(T1, R.T, T0)
+                return np.take(tmp_array, 0, axis)
+            return projection.project_slab(
+                tmp_array,
+                axis,
+                self._type_projection,
+                self.window_level,
+                border_size,
+                inverted,
+            )
 
-            if orientation == "AXIAL":
-                tmp_array = np.array(self.matrix[slice_number : slice_number + number_slices])
-                if np.any(self.q_orientation[1::]):
-                    transforms.apply_view_matrix_transform(
-                        self.matrix,
-                        self.spacing,
-                        M,
-                        slice_number,
-                        orientation,
-                        self.interp_method,
-                        self.matrix.min(),
-                        tmp_array,
-                    )
-                if self._type_projection == const.PROJECTION_NORMAL:
-                    n_image = tmp_array.reshape(dy, dx)
-                else:
-                    if inverted:
-                        tmp_array = tmp_array[::-1]
-
-                    if self._type_projection == const.PROJECTION_MaxIP:
-                        n_image = np.array(tmp_array).max(0)
-                    elif self._type_projection == const.PROJECTION_MinIP:
-                        n_image = np.array(tmp_array).min(0)
-                    elif self._type_projection == const.PROJECTION_MeanIP:
-                        n_image = np.array(tmp_array).mean(0)
-                    elif self._type_projection == const.PROJECTION_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.lmip(tmp_array, 0, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.mida(tmp_array, 0, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            0,
-                            self.window_level,
-                            self.window_level,
-                            0,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            0,
-                            self.window_level,
-                            self.window_level,
-                            1,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            0,
-                            self.window_level,
-                            self.window_level,
-                            2,
-                            n_image,
-                        )
-                    else:
-                        n_image = np.array(self.matrix[slice_number])
+        if self._type_projection == const.PROJECTION_NORMAL:
+            return np.array(projection.get_slice(self.matrix, axis, slice_number))
 
-            elif orientation == "CORONAL":
-                tmp_array = np.array(self.matrix[:, slice_number : slice_number + number_slices, :])
-                if np.any(self.q_orientation[1::]):
-                    transforms.apply_view_matrix_transform(
-                        self.matrix,
-                        self.spacing,
-                        M,
-                        slice_number,
-                        orientation,
-                        self.interp_method,
-                        self.matrix.min(),
-                        tmp_array,
-                    )
-
-                if self._type_projection == const.PROJECTION_NORMAL:
-                    n_image = tmp_array.reshape(dz, dx)
-                else:
-                    # if slice_number == 0:
-                    # slice_number = 1
-                    # if slice_number - number_slices < 0:
-                    # number_slices = slice_number
-                    if inverted:
-                        tmp_array = tmp_array[:, ::-1, :]
-                    if self._type_projection == const.PROJECTION_MaxIP:
-                        n_image = np.array(tmp_array).max(1)
-                    elif self._type_projection == const.PROJECTION_MinIP:
-                        n_image = np.array(tmp_array).min(1)
-                    elif self._type_projection == const.PROJECTION_MeanIP:
-                        n_image = np.array(tmp_array).mean(1)
-                    elif self._type_projection == const.PROJECTION_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.lmip(tmp_array, 1, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.mida(tmp_array, 1, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            1,
-                            self.window_level,
-                            self.window_level,
-                            0,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            1,
-                            self.window_level,
-                            self.window_level,
-                            1,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            1,
-                            self.window_level,
-                            self.window_level,
-                            2,
-                            n_image,
-                        )
-                    else:
-                        n_image = np.array(self.matrix[:, slice_number, :])
-            elif orientation == "SAGITAL":
-                tmp_array = np.array(self.matrix[:, :, slice_number : slice_number + number_slices])
-                if np.any(self.q_orientation[1::]):
-                    transforms.apply_view_matrix_transform(
-                        self.matrix,
-                        self.spacing,
-                        M,
-                        slice_number,
-                        orientation,
-                        self.interp_method,
-                        self.matrix.min(),
-                        tmp_array,
-                    )
-
-                if self._type_projection == const.PROJECTION_NORMAL:
-                    n_image = tmp_array.reshape(dz, dy)
-                else:
-                    if inverted:
-                        tmp_array = tmp_array[:, :, ::-1]
-                    if self._type_projection == const.PROJECTION_MaxIP:
-                        n_image = np.array(tmp_array).max(2)
-                    elif self._type_projection == const.PROJECTION_MinIP:
-                        n_image = np.array(tmp_array).min(2)
-                    elif self._type_projection == const.PROJECTION_MeanIP:
-                        n_image = np.array(tmp_array).mean(2)
-                    elif self._type_projection == const.PROJECTION_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.lmip(tmp_array, 2, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.mida(tmp_array, 2, self.window_level, self.window_level, n_image)
-
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            2,
-                            self.window_level,
-                            self.window_level,
-                            0,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            2,
-                            self.window_level,
-                            self.window_level,
-                            1,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            2,
-                            self.window_level,
-                            self.window_level,
-                            2,
-                            n_image,
-                        )
-                    else:
-                        n_image = np.array(self.matrix[:, :, slice_number])
-
-            self.buffer_slices[orientation].image = n_image
-        return n_image
+        return self.projection_engine.project(
+            self.matrix,
+            orientation,
+            slice_number,
+            number_slices,
+            self._type_projection,
+            self.window_level,
+            border_size,
+            inverted,
+        )
 
     def get_mask_slice(self, orientation, slice_number):
         """
@@ -1204,6 +1291,7 @@ class Slice(metaclass=utils.Singleton):
         # it will be incorrect after self.current_mask = future_mask
         self.current_mask.index = index
         self.current_mask.on_show()
+        self._watch_mask(self.current_mask)
 
         colour = future_mask.colour
         self.SetMaskColour(index, colour, update=False)
@@ -1421,6 +1509,7 @@ class Slice(metaclass=utils.Singleton):
             if self.current_mask:
                 self.current_mask.is_shown = False
             self.current_mask = mask
+            self._watch_mask(mask)
             Publisher.sendMessage("Show mask", index=mask.index, value=True)
             Publisher.sendMessage("Change mask selected", index=mask.index)
             Publisher.sendMessage("Update slice viewer")
@@ -1501,12 +1590,12 @@ class Slice(metaclass=utils.Singleton):
         else:
             thresh_min, thresh_max = self.current_mask.threshold_range
 
-        m = ((slice_matrix >= thresh_min) & (slice_matrix <= thresh_max)) * 255
-        m[mask == 1] = 1
-        m[mask == 2] = 2
-        m[mask == 253] = 253
-        m[mask == 254] = 254
-        return m.astype("uint8")
+        m = np.zeros(slice_matrix.shape, dtype="uint8")
+        m[(slice_matrix >= thresh_min) & (slice_matrix <= thresh_max)] = 255
+        # Keeping the edition labels.
+        edited = (mask == 1) | (mask == 2) | (mask == 253) | (mask == 254)
+        m[edited] = mask[edited]
+        return m
 
     def do_threshold_to_all_slices(self, mask=None):
         """
@@ -1518,13 +1607,8 @@ class Slice(metaclass=utils.Singleton):
         """
         if mask is None:
             mask = self.current_mask
-        for n in range(1, mask.matrix.shape[0]):
-            if mask.matrix[n, 0, 0] == 0:
-                m = mask.matrix[n, 1:, 1:]
-                mask.matrix[n, 1:, 1:] = self.do_threshold_to_a_slice(
-                    self.matrix[n - 1], m, mask.threshold_range
-                )
-
+        thresh_min, thresh_max = mask.threshold_range
+        threshold.threshold_to_mask(self.matrix, mask.matrix, thresh_min, thresh_max)
         mask.matrix.flush()
 
     def do_colour_image(self, imagedata):
@@ -1533,7 +1617,7 @@ class Slice(metaclass=utils.Singleton):
         else:
             # map scalar values into colors
             _min, _max = iu.get_LUT_value_255(
-                np.array((self.matrix.min(), self.matrix.max())),
+                np.array(self.get_scalar_range()),
                 self.window_width,
                 self.window_level,
             )
@@ -1617,20 +1701,6 @@ class Slice(metaclass=utils.Singleton):
 
         return img_colours_mask.GetOutput()
 
-    def do_blend(self, imagedata, mask):
-        """
-        blend image with the mask.
-        """
-        blend_imagedata = vtkImageBlend()
-        blend_imagedata.SetBlendModeToNormal()
-        # blend_imagedata.SetOpacity(0, 1.0)
-        blend_imagedata.SetOpacity(1, 0.8)
-        blend_imagedata.SetInputData(imagedata)
-        blend_imagedata.AddInputData(mask)
-        blend_imagedata.Update()
-
-        return blend_imagedata.GetOutput()
-
     def _do_boolean_op(self, operation, mask1, mask2):
         self.do_boolean_op(operation, mask1, mask2)
 
@@ -1648,31 +1718,26 @@ class Slice(metaclass=utils.Singleton):
         names_list = [mask_dict[i].name for i in mask_dict.keys()]
         new_name = utils.next_copy_name(name, names_list)
 
+        self.do_boolean_expression((op, 0, 1), [m1, m2], new_name)
+
+    def do_boolean_expression(self, expression, masks, name):
+        """
+        Creates a new mask, called name, with the result of the boolean
+        expression (see mask_boolean) over masks.
+        """
+        for mask in masks:
+            self.do_threshold_to_all_slices(mask)
+
         future_mask = Mask()
         future_mask.create_mask(self.matrix.shape)
         future_mask.spacing = self.spacing
-        future_mask.name = new_name
+        future_mask.name = name
 
-        future_mask.matrix[:] = 1
-        m = future_mask.matrix[1:, 1:, 1:]
-
-        self.do_threshold_to_all_slices(m1)
-        m1 = m1.matrix[1:, 1:, 1:]
-
-        self.do_threshold_to_all_slices(m2)
-        m2 = m2.matrix[1:, 1:, 1:]
-
-        if op == const.BOOLEAN_UNION:
-            m[:] = ((m1 > 2) + (m2 > 2)) * 255
-
-        elif op == const.BOOLEAN_DIFF:
-            m[:] = ((m1 > 2) ^ ((m1 > 2) & (m2 > 2))) * 255
-
-        elif op == const.BOOLEAN_AND:
-            m[:] = ((m1 > 2) & (m2 > 2)) * 255
-
-        elif op == const.BOOLEAN_XOR:
-            m[:] = np.logical_xor((m1 > 2), (m2 > 2)) * 255
+        mask_boolean.evaluate(expression, [m.matrix for m in masks], future_mask.matrix)
+        # All slices were calculated.
+        future_mask.matrix[0] = 1
+        future_mask.matrix[:, 0, :] = 1
+        future_mask.matrix[:, :, 0] = 1
 
         for o in self.buffer_slices:
             self.buffer_slices[o].discard_mask()
@@ -1743,7 +1808,7 @@ class Slice(metaclass=utils.Singleton):
             0,
             "AXIAL",
             self.interp_method,
-            mcopy.min(),
+            self.get_scalar_range()[0],
             self.matrix,
         )
 
@@ -1753,12 +1818,17 @@ class Slice(metaclass=utils.Singleton):
 
         self.q_orientation = np.array((1, 0, 0, 0))
         self.center = [(s * d / 2.0) for (d, s) in zip(self.matrix.shape[::-1], self.spacing)]
+        # The values were interpolated.
+        self.statistics = None
+        Project().matrix_version += 1
 
         self.__clean_current_mask()
         if self.current_mask:
             self.current_mask.matrix[:] = 0
             self.current_mask.was_edited = False
+            self.current_mask.version += 1
 
+        self.projection_engine.reset()
         for o in self.buffer_slices:
             self.buffer_slices[o].discard_buffer()
 
@@ -1797,19 +1867,26 @@ class Slice(metaclass=utils.Singleton):
         self.matrix = np.memmap(filename, shape=shape, dtype=dtype, mode="r+")
 
     def OnFlipVolume(self, axis):
+        # Flipping doesn't change the histogram of the image.
         if axis == 0:
             self.matrix[:] = self.matrix[::-1]
         elif axis == 1:
             self.matrix[:] = self.matrix[:, ::-1]
         elif axis == 2:
             self.matrix[:] = self.matrix[:, :, ::-1]
+        Project().matrix_version += 1
 
+        self.projection_engine.reset()
         for buffer_ in self.buffer_slices.values():
             buffer_.discard_buffer()
 
     def OnSwapVolumeAxes(self, axes):
         axis0, axis1 = axes
+        # Swapping the axes doesn't change the histogram of the image.
+        statistics = self._statistics
         self.matrix = self.matrix.swapaxes(axis0, axis1)
+        self._statistics = statistics
+        Project().matrix_version += 1
         if (axis0, axis1) == (2, 1):
             self.spacing = self.spacing[1], self.spacing[0], self.spacing[2]
         elif (axis0, axis1) == (2, 0):
@@ -1851,45 +1928,28 @@ class Slice(metaclass=utils.Singleton):
         self.current_mask.modified(target == "3D")
         Publisher.sendMessage("Reload actual slice")
 
-    def calc_image_density(self, mask=None):
-        if mask is None:
-            mask = self.current_mask
-        self.do_threshold_to_all_slices(mask)
-        values = self.matrix[mask.matrix[1:, 1:, 1:] > 127]
-
-        if len(values):
-            _min = values.min()
-            _max = values.max()
-            _mean = values.mean()
-            _std = values.std()
-            return _min, _max, _mean, _std
-        else:
-            return 0, 0, 0, 0
-
-    def calc_mask_area(self, mask=None):
+    def calc_mask_statistics(self, mask=None) -> mask_statistics.MaskStatistics:
+        """
+        Returns the density (image values), volume and area of mask. They
+        are kept in the mask until it's modified.
+        """
         if mask is None:
             mask = self.current_mask
+        key = (self.statistics, tuple(self.spacing), tuple(mask.threshold_range))
+        if mask.statistics_cache is not None and mask.statistics_cache[0] == key:
+            return mask.statistics_cache[1]
 
         self.do_threshold_to_all_slices(mask)
-        bin_img = mask.matrix[1:, 1:, 1:] > 127
+        statistics = mask_statistics.compute_statistics(self.matrix, mask.matrix, self.spacing)
+        mask.statistics_cache = (key, statistics)
+        return statistics
 
-        sx, sy, sz = self.spacing
-
-        kernel = np.zeros((3, 3, 3))
-        kernel[1, 1, 1] = 2 * sx * sy + 2 * sx * sz + 2 * sy * sz
-        kernel[0, 1, 1] = -(sx * sy)
-        kernel[2, 1, 1] = -(sx * sy)
-
-        kernel[1, 0, 1] = -(sx * sz)
-        kernel[1, 2, 1] = -(sx * sz)
-
-        kernel[1, 1, 0] = -(sy * sz)
-        kernel[1, 1, 2] = -(sy * sz)
-
-        #  area = ndimage.generic_filter(bin_img * 1.0, _conv_area, size=(3, 3, 3), mode='constant', cval=1, extra_arguments=(sx, sy, sz)).sum()
-        area = transforms.convolve_non_zero(bin_img * 1.0, kernel, 1).sum()
+    def calc_image_density(self, mask=None):
+        statistics = self.calc_mask_statistics(mask)
+        return statistics.min, statistics.max, statistics.mean, statistics.std
 
-        return area
+    def calc_mask_area(self, mask=None):
+        return self.calc_mask_statistics(mask).area
 
     def has_affine(self) -> bool:
         return not np.allclose(self.affine, np.eye(4))
@@ -0,0 +1,205 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+import threading
+from collections import OrderedDict
+from concurrent import futures
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+import numpy as np
+
+
+def get_nbytes(value: Any) -> int:
+    """
+    Returns the approximate memory used by value. It understands numpy
+    arrays, vtkDataObjects and tuples/lists of those.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(get_nbytes(v) for v in value)
+    try:
+        # vtkDataObject returns the size in kibibytes.
+        return value.GetActualMemorySize() * 1024
+    except AttributeError:
+        return 0
+
+
+class SliceCache:
+    """
+    LRU cache of slices bounded by a memory budget (in bytes).
+
+    Each time the cache is cleared its generation is incremented. Producers
+    running in background (see SlicePrefetcher) may pass the generation they
+    saw when they started, so values computed from stale data are not
+    inserted after an invalidation.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """
+        Inserts value into the cache, evicting the least recently used entries
+        until it fits into the budget. Returns False if the value was not
+        inserted, because it's bigger than the budget or because the cache
+        was cleared after generation.
+        """
+        size = get_nbytes(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if size > self.max_bytes:
+                return False
+            self._pop(key)
+            while self._entries and self.nbytes + size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            return True
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.generation += 1
+
+    def _pop(self, key: Hashable) -> None:
+        if key in self._entries:
+            del self._entries[key]
+            self.nbytes -= self._sizes.pop(key)
+
+
+class SlicePrefetcher:
+    """
+    Warms the slices ahead of the last one shown, in the direction the user is
+    scrolling. The work is done in a single background thread and it's
+    cancelled as soon as the user moves to another slice.
+    """
+
+    def __init__(self, n_slices: int):
+        self.n_slices = n_slices
+        self._executor: Optional[futures.ThreadPoolExecutor] = None
+        self._last_index: Dict[str, int] = {}
+        self._jobs: Dict[str, "tuple[futures.Future, threading.Event]"] = {}
+
+    def schedule(
+        self,
+        orientation: str,
+        slice_number: int,
+        max_slice_number: int,
+        warm: Callable[[int, threading.Event], None],
+    ) -> None:
+        """
+        Called each time slice_number is shown. warm is called from the
+        background thread with each slice index to be prefetched.
+        """
+        last_index = self._last_index.get(orientation)
+        self._last_index[orientation] = slice_number
+        if self.n_slices <= 0 or last_index is None or last_index == slice_number:
+            return
+
+        self.cancel(orientation)
+
+        step = 1 if slice_number > last_index else -1
+        indexes = [
+            slice_number + step * i
+            for i in range(1, self.n_slices + 1)
+            if 0 <= slice_number + step * i <= max_slice_number
+        ]
+        if not indexes:
+            return
+
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="SlicePrefetcher"
+            )
+        stop = threading.Event()
+        future = self._executor.submit(self._run, indexes, warm, stop)
+        self._jobs[orientation] = (future, stop)
+
+    def cancel(self, orientation: Optional[str] = None, wait: bool = False) -> None:
+        """
+        Cancels the prefetching of the given orientation (or all of them if
+        orientation is None). If wait is True it blocks until the running job
+        stops.
+        """
+        if orientation is None:
+            orientations: Iterable[str] = list(self._jobs)
+        else:
+            orientations = [orientation]
+
+        for o in orientations:
+            try:
+                future, stop = self._jobs.pop(o)
+            except KeyError:
+                continue
+            stop.set()
+            future.cancel()
+            if wait and not future.cancelled():
+                futures.wait([future])
+
+    def reset(self) -> None:
+        self.cancel(wait=True)
+        self._last_index = {}
+
+    def _run(
+        self,
+        indexes: Iterable[int],
+        warm: Callable[[int, threading.Event], None],
+        stop: threading.Event,
+    ) -> None:
+        for index in indexes:
+            if stop.is_set():
+                return
+            try:
+                warm(index, stop)
+            except Exception as err:
+                # Prefetch is only an optimization, the slice is going to be
+                # calculated again in the main thread if needed.
+                print("Error prefetching slice", index, err)
+                return
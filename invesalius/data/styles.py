@@ -17,9 +17,7 @@
 #    detalhes.
 # --------------------------------------------------------------------------
 
-import multiprocessing
 import os
-import tempfile
 import time
 from concurrent import futures
 from typing import Optional
@@ -1505,30 +1503,6 @@ class EditorInteractorStyle(DefaultInteractorStyle):
             self.OnScrollBackward(obj, evt)
 
 
-class WatershedProgressWindow:
-    def __init__(self, process):
-        self.process = process
-        self.title = "InVesalius 3"
-        self.msg = _("Applying watershed ...")
-        self.style = wx.PD_APP_MODAL | wx.PD_APP_MODAL | wx.PD_CAN_ABORT
-
-        self.dlg = wx.ProgressDialog(
-            self.title, self.msg, parent=wx.GetApp().GetTopWindow(), style=self.style
-        )
-
-        self.dlg.Bind(wx.EVT_BUTTON, self.Cancel)
-        self.dlg.Show()
-
-    def Cancel(self, evt):
-        self.process.terminate()
-
-    def Update(self):
-        self.dlg.Pulse()
-
-    def Close(self):
-        self.dlg.Destroy()
-
-
 class WatershedConfig(metaclass=utils.Singleton):
     def __init__(self):
         self.algorithm = "Watershed"
@@ -1572,6 +1546,9 @@ WALGORITHM = {"Watershed": watershed, "Watershed IFT": watershed_ift}
 CON2D = {4: 1, 8: 2}
 CON3D = {6: 1, 18: 2, 26: 3}
 
+# Shared by the watershed styles of all the slice viewers.
+_watershed_runner = watershed_process.WatershedRunner()
+
 
 class WaterShedInteractorStyle(DefaultInteractorStyle):
     def __init__(self, viewer):
@@ -1630,6 +1607,8 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
         Publisher.unsubscribe(self.set_bformat, "Set watershed brush format")
         Publisher.unsubscribe(self.set_bsize, "Set watershed brush size")
         self.RemoveAllObservers()
+        # Also frees the gradient cached by the worker process.
+        _watershed_runner.close()
         self.viewer.slice_.to_show_aux = ""
         self.viewer.OnScrollBar()
 
@@ -1975,95 +1954,75 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
     def expand_watershed(self):
         markers = self.matrix
         image = self.viewer.slice_.matrix
-        self.viewer.slice_.do_threshold_to_all_slices()
-        mask = self.viewer.slice_.current_mask.matrix[1:, 1:, 1:]
         ww = self.viewer.slice_.window_width
         wl = self.viewer.slice_.window_level
         if BRUSH_BACKGROUND in markers and BRUSH_FOREGROUND in markers:
-            # w_algorithm = WALGORITHM[self.config.algorithm]
+            self.viewer.slice_.do_threshold_to_all_slices()
+            # Only the region around the markers is segmented.
+            roi = watershed_process.get_markers_roi(markers)
             bstruct = generate_binary_structure(3, CON3D[self.config.con_3d])
-            fd, tfile = tempfile.mkstemp()
-            tmp_mask = np.memmap(tfile, shape=mask.shape, dtype=mask.dtype, mode="w+")
-            q = multiprocessing.Queue()
-            p = multiprocessing.Process(
-                target=watershed_process.do_watershed,
-                args=(
-                    image,
-                    markers,
-                    tfile,
-                    tmp_mask.shape,
+
+            # The worker process opens the memmaps instead of receiving copies.
+            markers.flush()
+            image_info = watershed_process.get_memmap_info(image, self.viewer.slice_.matrix_version)
+            markers_info = watershed_process.get_memmap_info(markers)
+
+            # The result is dropped if the style is closed (or the mask changed)
+            # before it's applied.
+            generation = _watershed_runner.generation
+            target_mask = self.viewer.slice_.current_mask
+
+            Publisher.sendMessage("Update status text in GUI", label=_("Applying watershed ..."))
+            _watershed_runner.run(
+                (
+                    image if image_info is None else image_info,
+                    markers if markers_info is None else markers_info,
+                    roi,
                     bstruct,
                     self.config.algorithm,
                     self.config.mg_size,
                     self.config.use_ww_wl,
                     wl,
                     ww,
-                    q,
                 ),
+                lambda tmp_mask, roi: wx.CallAfter(
+                    self._apply_watershed, tmp_mask, roi, generation, target_mask
+                ),
+                lambda err: wx.CallAfter(self._watershed_error, err),
             )
 
-            os.close(fd)
-            wp = WatershedProgressWindow(p)
-            p.start()
-
-            while q.empty() and p.is_alive():
-                time.sleep(0.5)
-                wp.Update()
-                wx.Yield()
-
-            wp.Close()
-            del wp
-
-            w_x, w_y = wx.GetMousePosition()
-            x, y = self.viewer.ScreenToClient((w_x, w_y))
-            flag = self.viewer.interactor.HitTest((x, y))
-
-            if flag == wx.HT_WINDOW_INSIDE:
-                self.OnEnterInteractor(None, None)
+    def _apply_watershed(self, tmp_mask, roi, generation, target_mask):
+        if (
+            generation != _watershed_runner.generation
+            or target_mask is not self.viewer.slice_.current_mask
+        ):
+            return
 
-            if q.empty():
-                return
-            # do_watershed(image, markers, tmp_mask, bstruct, self.config.algorithm,
-            # self.config.mg_size, self.config.use_ww_wl, wl, ww)
-            # if self.config.use_ww_wl:
-            # if self.config.algorithm == 'Watershed':
-            # tmp_image = ndimage.morphological_gradient(
-            # get_LUT_value(image, ww, wl).astype('uint16'),
-            # self.config.mg_size)
-            # tmp_mask = watershed(tmp_image, markers.astype('int16'), bstruct)
-            # else:
-            # tmp_image = get_LUT_value(image, ww, wl).astype('uint16')
-            ##tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            ##tmp_image = ndimage.morphological_gradient(
-            ##get_LUT_value(image, ww, wl).astype('uint16'),
-            ##self.config.mg_size)
-            # tmp_mask = watershed_ift(tmp_image, markers.astype('int16'), bstruct)
-            # else:
-            # if self.config.algorithm == 'Watershed':
-            # tmp_image = ndimage.morphological_gradient((image - image.min()).astype('uint16'), self.config.mg_size)
-            # tmp_mask = watershed(tmp_image, markers.astype('int16'), bstruct)
-            # else:
-            # tmp_image = (image - image.min()).astype('uint16')
-            ##tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            ##tmp_image = ndimage.morphological_gradient((image - image.min()).astype('uint16'), self.config.mg_size)
-            # tmp_mask = watershed_ift(tmp_image, markers.astype('int8'), bstruct)
+        mask = self.viewer.slice_.current_mask.matrix[1:, 1:, 1:]
+        if self.viewer.overwrite_mask:
+            mask[:] = 0
+            mask[roi][tmp_mask == 1] = 253
+        else:
+            roi_mask = mask[roi]
+            editable = (roi_mask == 0) | (roi_mask == 2) | (roi_mask == 253)
+            roi_mask[(tmp_mask == 2) & editable] = 2
+            roi_mask[(tmp_mask == 1) & editable] = 253
 
-            if self.viewer.overwrite_mask:
-                mask[:] = 0
-                mask[tmp_mask == 1] = 253
-            else:
-                mask[(tmp_mask == 2) & ((mask == 0) | (mask == 2) | (mask == 253))] = 2
-                mask[(tmp_mask == 1) & ((mask == 0) | (mask == 2) | (mask == 253))] = 253
+        self.viewer.slice_.current_mask.modified(True)
 
-            self.viewer.slice_.current_mask.modified(True)
+        self.viewer.slice_.discard_all_buffers()
+        self.viewer.slice_.current_mask.clear_history()
+        Publisher.sendMessage("Reload actual slice")
+        if not _watershed_runner.running:
+            Publisher.sendMessage("Update status text in GUI", label=_("Ready"))
 
-            self.viewer.slice_.discard_all_buffers()
-            self.viewer.slice_.current_mask.clear_history()
-            Publisher.sendMessage("Reload actual slice")
+        # Marking the project as changed
+        session = ses.Session()
+        session.ChangeProject()
 
-            # Marking the project as changed
-            session = ses.Session()
-            session.ChangeProject()
+    def _watershed_error(self, err):
+        utils.debug(f"Error applying watershed: {err!r}")
+        Publisher.sendMessage("Update status text in GUI", label=_("Error applying watershed"))
 
 
 class ReorientImageInteractorStyle(DefaultInteractorStyle):
@@ -2425,7 +2384,7 @@ class FloodFillMaskInteractorStyle(DefaultInteractorStyle):
         else:
             with futures.ThreadPoolExecutor(max_workers=1) as executor:
                 future = executor.submit(
-                    floodfill.floodfill_threshold,
+                    floodfill.floodfill_threshold_parallel,
                     mask,
                     [[x, y, z]],
                     self.t0,
@@ -2758,8 +2717,7 @@ class FloodFillSegmentInteractorStyle(DefaultInteractorStyle):
     def SetUp(self):
         if not self.config.dlg_visible:
             if self.config.t0 is None:
-                image = self.viewer.slice_.matrix
-                _min, _max = image.min(), image.max()
+                _min, _max = self.viewer.slice_.get_scalar_range()
 
                 self.config.t0 = int(_min + (3.0 / 4.0) * (_max - _min))
                 self.config.t1 = int(_max)
@@ -2915,7 +2873,14 @@ class FloodFillSegmentInteractorStyle(DefaultInteractorStyle):
             out_mask = np.zeros_like(mask)
             with futures.ThreadPoolExecutor(max_workers=1) as executor:
                 future = executor.submit(
-                    floodfill.floodfill_threshold, image, [[x, y, z]], t0, t1, 1, bstruct, out_mask
+                    floodfill.floodfill_threshold_parallel,
+                    image,
+                    [[x, y, z]],
+                    t0,
+                    t1,
+                    1,
+                    bstruct,
+                    out_mask,
                 )
 
                 self.config.dlg.panel_ffill_progress.Enable()
@@ -2939,30 +2904,45 @@ class FloodFillSegmentInteractorStyle(DefaultInteractorStyle):
             ww = self.viewer.slice_.window_width
             wl = self.viewer.slice_.window_level
             image = get_LUT_value_255(image, ww, wl)
-        bool_mask = np.zeros_like(mask, dtype="bool")
         out_mask = np.zeros_like(mask)
 
-        for k in range(int(z - 1), int(z + 2)):
-            if k < 0 or k >= bool_mask.shape[0]:
-                continue
-            for j in range(int(y - 1), int(y + 2)):
-                if j < 0 or j >= bool_mask.shape[1]:
-                    continue
-                for i in range(int(x - 1), int(x + 2)):
-                    if i < 0 or i >= bool_mask.shape[2]:
-                        continue
-                    bool_mask[k, j, i] = True
-
+        # The statistics are taken from the region and the voxels around the
+        # seed. They are updated with the voxels added in each iteration
+        # instead of being computed again from the whole volume.
+        around = (
+            slice(max(z - 1, 0), z + 2),
+            slice(max(y - 1, 0), y + 2),
+            slice(max(x - 1, 0), x + 2),
+        )
+        around_values = image[around].astype("float64")
+        around_counted = np.zeros(around_values.shape, dtype="bool")
+        count = around_values.size
+        total = around_values.sum()
+        total_sq = (around_values**2).sum()
+
+        # Each iteration grows the region from the voxels next to it which
+        # were outside the thresholds of the previous iteration.
+        seeds = [[x, y, z]]
         for i in range(self.config.confid_iters):
-            var = np.std(image[bool_mask])
-            mean = np.mean(image[bool_mask])
+            mean = total / count
+            var = np.sqrt(max(total_sq / count - mean**2, 0))
 
             t0 = mean - var * self.config.confid_mult
             t1 = mean + var * self.config.confid_mult
 
-            floodfill.floodfill_threshold(image, [[x, y, z]], t0, t1, 1, bstruct, out_mask)
+            seeds, (n, s, s2) = floodfill.floodfill_threshold_incremental(
+                image, seeds, t0, t1, 1, bstruct, out_mask
+            )
+
+            # The voxels around the seed were already counted.
+            added = (out_mask[around] == 1) & ~around_counted
+            around_counted |= added
+            count += n - added.sum()
+            total += s - around_values[added].sum()
+            total_sq += s2 - (around_values[added] ** 2).sum()
 
-            bool_mask[out_mask == 1] = True
+            if not len(seeds):
+                break
 
         return out_mask
 
@@ -18,13 +18,16 @@
 # --------------------------------------------------------------------------
 
 import functools
+import math
 import multiprocessing
 import os
 import plistlib
+import queue
 import random
 import shutil
 import sys
 import tempfile
+import threading
 import time
 import traceback
 
@@ -70,7 +73,7 @@ import invesalius.data.vtk_utils as vtk_utils
 import invesalius.project as prj
 import invesalius.session as ses
 import invesalius.utils as utl
-from invesalius.data.converters import convert_custom_bin_to_vtk
+from invesalius.data.converters import convert_custom_bin_to_vtk, numpy_to_polydata
 from invesalius.gui import dialogs
 from invesalius.i18n import tr as _
 from invesalius.utils import new_name_by_pattern
@@ -155,7 +158,8 @@ class Surface:
             self.area = sp["area"]
         except KeyError:
             self.area = 0.0
-        self.polydata = pu.Import(os.path.join(dirpath, sp["polydata"]))
+        self.filename = os.path.join(dirpath, sp["polydata"])
+        self.polydata = pu.Import(self.filename)
         Surface.general_index = max(Surface.general_index, self.index)
 
     def _set_class_index(self, index):
@@ -182,6 +186,13 @@ class SurfaceManager:
         self.convert_to_inv = None
         self.__bind_events()
 
+        # Processes used to create the surfaces, see _get_process_pool.
+        self._pool = None
+        self._manager = None
+        self._msg_queue = None
+        self._pool_timer = None
+        self._pool_lock = threading.Lock()
+
         self._default_parameters = {
             "algorithm": "Default",
             "quality": const.DEFAULT_SURFACE_QUALITY,
@@ -730,6 +741,8 @@ class SurfaceManager:
         # restarting the surface index
         Surface.general_index = -1
 
+        self._terminate_process_pool()
+
         self.affine_vtk = None
         self.convert_to_inv = False
 
@@ -790,10 +803,10 @@ class SurfaceManager:
     # (mask_index, surface_name, quality, fill_holes, keep_largest)
 
     def _on_complete_surface_creation(self, args, overwrite, surface_name, colour, dialog):
-        surface_filename, surface_measures = args
+        surface_arrays, surface_measures = args
         wx.CallAfter(
             self._show_surface,
-            surface_filename,
+            surface_arrays,
             surface_measures,
             overwrite,
             surface_name,
@@ -802,13 +815,10 @@ class SurfaceManager:
         )
 
     def _show_surface(
-        self, surface_filename, surface_measures, overwrite, surface_name, colour, dialog
+        self, surface_arrays, surface_measures, overwrite, surface_name, colour, dialog
     ):
-        print(surface_filename, surface_measures)
-        reader = vtkXMLPolyDataReader()
-        reader.SetFileName(surface_filename)
-        reader.Update()
-        polydata = reader.GetOutput()
+        print(surface_measures)
+        polydata = numpy_to_polydata(surface_arrays)
 
         # Map polygonal data (vtkPolyData) to graphics primitives.
         mapper = vtkPolyDataMapper()
@@ -868,6 +878,70 @@ class SurfaceManager:
 
         dialog.running = False
 
+    def _get_process_pool(self):
+        """
+        Returns the pool of processes (and the queue they use to send
+        messages) used to create surfaces. It's kept alive, so creating
+        several surfaces in a row doesn't start the processes each time,
+        until it's idle for const.SURFACE_POOL_IDLE_TIMEOUT seconds.
+        """
+        with self._pool_lock:
+            if self._pool_timer is not None:
+                self._pool_timer.cancel()
+                self._pool_timer = None
+
+            if self._pool is None:
+                ctx = multiprocessing.get_context("spawn")
+                self._pool = ctx.Pool(processes=multiprocessing.cpu_count())
+                self._manager = multiprocessing.Manager()
+                self._msg_queue = self._manager.Queue(1)
+            else:
+                # Messages left by the last surface.
+                while not self._msg_queue.empty():
+                    try:
+                        self._msg_queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+            return self._pool, self._msg_queue
+
+    def _release_process_pool(self):
+        """
+        Called when the surface creation ends: the processes are terminated
+        if they are not used again in a while.
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                return
+            if self._pool_timer is not None:
+                self._pool_timer.cancel()
+            self._pool_timer = threading.Timer(
+                const.SURFACE_POOL_IDLE_TIMEOUT, self._terminate_process_pool
+            )
+            self._pool_timer.daemon = True
+            self._pool_timer.start()
+
+    def _terminate_process_pool(self):
+        """
+        Terminates the processes, stopping any piece still being created
+        (e.g. when the user cancels the surface creation).
+        """
+        with self._pool_lock:
+            if self._pool_timer is not None:
+                self._pool_timer.cancel()
+                self._pool_timer = None
+            if self._pool is None:
+                return
+            self._pool.close()
+            try:
+                self._pool.terminate()
+            except AssertionError:
+                pass
+            self._manager.shutdown()
+            self._pool = None
+            self._manager = None
+            self._msg_queue = None
+
     def _on_callback_error(self, e, dialog=None):
         dialog.running = False
         msg = utl.log_traceback(e)
@@ -953,15 +1027,15 @@ class SurfaceManager:
         n_processors = multiprocessing.cpu_count()
 
         o_piece = 1
-        piece_size = 20
+        piece_size = surface_process.get_piece_size(
+            matrix.shape, matrix.dtype.itemsize, n_processors
+        )
 
-        n_pieces = int(round(matrix.shape[0] / piece_size + 0.5, 0))
+        n_pieces = math.ceil(matrix.shape[0] / piece_size)
 
-        filenames = []
-        ctx = multiprocessing.get_context("spawn")
-        pool = ctx.Pool(processes=min(n_pieces, n_processors))
-        manager = multiprocessing.Manager()
-        msg_queue = manager.Queue(1)
+        pieces = []
+        pool, msg_queue = self._get_process_pool()
+        cancelled = False
 
         print("Resolution", imagedata_resolution)
 
@@ -996,16 +1070,16 @@ class SurfaceManager:
                         imagedata_resolution,
                         fill_border_holes,
                     ),
-                    callback=lambda x: filenames.append(x),
+                    callback=lambda x: pieces.append(x),
                 )
 
-            while len(filenames) != n_pieces:
+            while len(pieces) != n_pieces:
                 time.sleep(0.25)
 
             f = pool.apply_async(
                 surface_process.join_process_surface,
                 args=(
-                    filenames,
+                    pieces,
                     algorithm,
                     smooth_iterations,
                     smooth_relaxation_factor,
@@ -1021,17 +1095,14 @@ class SurfaceManager:
                 time.sleep(0.25)
 
             try:
-                surface_filename, surface_measures = f.get()
+                surface_arrays, surface_measures = f.get()
             except Exception:
                 print(_("InVesalius was not able to create the surface"))
                 print(traceback.print_exc())
+                self._release_process_pool()
                 return
 
-            reader = vtkXMLPolyDataReader()
-            reader.SetFileName(surface_filename)
-            reader.Update()
-
-            polydata = reader.GetOutput()
+            polydata = numpy_to_polydata(surface_arrays)
 
             proj = prj.Project()
             # Create Surface instance
@@ -1081,11 +1152,11 @@ class SurfaceManager:
                         imagedata_resolution,
                         fill_border_holes,
                     ),
-                    callback=lambda x: filenames.append(x),
+                    callback=lambda x: pieces.append(x),
                     error_callback=functools.partial(self._on_callback_error, dialog=sp),
                 )
 
-            while len(filenames) != n_pieces:
+            while len(pieces) != n_pieces:
                 if sp.WasCancelled() or not sp.running:
                     break
                 time.sleep(0.25)
@@ -1096,7 +1167,7 @@ class SurfaceManager:
                 f = pool.apply_async(
                     surface_process.join_process_surface,
                     args=(
-                        filenames,
+                        pieces,
                         algorithm,
                         smooth_iterations,
                         smooth_relaxation_factor,
@@ -1129,19 +1200,19 @@ class SurfaceManager:
 
             t_end = time.time()
             print(f"Elapsed time - {t_end - t_init}")
+            cancelled = sp.WasCancelled() or bool(sp.error)
             sp.Close()
             if sp.error:
                 dlg = GMD.GenericMessageDialog(None, sp.error, "Exception!", wx.OK | wx.ICON_ERROR)
                 dlg.ShowModal()
             del sp
 
-        pool.close()
-        try:
-            pool.terminate()
-        except AssertionError:
-            pass
+        if cancelled:
+            # Stops the pieces still being created.
+            self._terminate_process_pool()
+        else:
+            self._release_process_pool()
         del pool
-        del manager
         del msg_queue
         import gc
 
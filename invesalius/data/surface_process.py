@@ -1,3 +1,4 @@
+import math
 import os
 import tempfile
 
@@ -7,12 +8,13 @@ except ImportError:
     import Queue as queue
 
 import numpy
+from vtkmodules.util import numpy_support
 from vtkmodules.vtkCommonCore import vtkFileOutputWindow, vtkOutputWindow
+from vtkmodules.vtkCommonDataModel import vtkPolyData
 from vtkmodules.vtkFiltersCore import (
-    vtkAppendPolyData,
     vtkCleanPolyData,
     vtkContourFilter,
-    vtkMassProperties,
+    vtkDecimatePro,
     vtkPolyDataConnectivityFilter,
     vtkPolyDataNormals,
     vtkQuadricDecimation,
@@ -20,11 +22,22 @@ from vtkmodules.vtkFiltersCore import (
 from vtkmodules.vtkFiltersModeling import vtkFillHolesFilter
 from vtkmodules.vtkImagingCore import vtkImageFlip, vtkImageResample
 from vtkmodules.vtkImagingGeneral import vtkImageGaussianSmooth
-from vtkmodules.vtkIOXML import vtkXMLPolyDataReader, vtkXMLPolyDataWriter
 
 import invesalius.data.converters as converters
 from invesalius_cy import cy_mesh
 
+# See get_piece_size.
+PIECES_PER_PROCESSOR = 2
+PIECE_MIN_SIZE = 8
+PIECE_MAX_BYTES = 256 * 1024 * 1024
+
+# Mask voxels with values from this one are inside the surface.
+MASK_THRESHOLD = 127
+
+# Number of polygons measured at once to calculate the surface volume and
+# area.
+MEASURE_CHUNK_SIZE = 1024 * 1024
+
 
 # TODO: Code duplicated from file {imagedata_utils.py}.
 def ResampleImage3D(imagedata, value):
@@ -67,6 +80,31 @@ def pad_image(image, pad_value, pad_bottom, pad_top):
     return paded_image
 
 
+def get_bounding_box(occupied):
+    """
+    Returns the slices (z, y, x) of the bounding box of the True voxels of
+    occupied, grown by one voxel so the contour between them and their empty
+    neighbours is kept. Returns None if there are no True voxels.
+    """
+    z_occupied = numpy.flatnonzero(occupied.any(axis=(1, 2)))
+    if not z_occupied.size:
+        return None
+    z0, z1 = z_occupied[0], z_occupied[-1] + 1
+    yx_occupied = occupied[z0:z1].any(axis=0)
+    y_occupied = numpy.flatnonzero(yx_occupied.any(axis=1))
+    x_occupied = numpy.flatnonzero(yx_occupied.any(axis=0))
+
+    bounds = (
+        (z0, z1),
+        (y_occupied[0], y_occupied[-1] + 1),
+        (x_occupied[0], x_occupied[-1] + 1),
+    )
+    return tuple(
+        slice(max(int(start) - 1, 0), min(int(stop) + 1, size))
+        for (start, stop), size in zip(bounds, occupied.shape)
+    )
+
+
 def create_surface_piece(
     filename,
     shape,
@@ -96,6 +134,24 @@ def create_surface_piece(
     ow.SetInstance(fow)
     os.close(log_fd)
 
+    roi = slice(roi.start, min(roi.stop, shape[0]))
+    if from_binary:
+        mask = numpy.memmap(mask_filename, mode="r", dtype=mask_dtype, shape=mask_shape)
+        occupied = mask[roi.start + 1 : roi.stop + 1, 1:, 1:] >= MASK_THRESHOLD
+    else:
+        image = numpy.memmap(filename, mode="r", dtype=dtype, shape=shape)
+        # Both thresholds are only crossed next to voxels above min_value.
+        occupied = image[roi] >= min_value
+
+    # Only the region with voxels inside the surface is contoured.
+    bbox = get_bounding_box(occupied)
+    del occupied
+    if bbox is None:
+        print("Piece", roi, "is empty")
+        return converters.polydata_to_numpy(vtkPolyData())
+    z_crop, y_crop, x_crop = bbox
+    roi = slice(roi.start + z_crop.start, roi.start + z_crop.stop)
+
     pad_bottom = roi.start == 0
     pad_top = roi.stop >= shape[0]
 
@@ -103,29 +159,36 @@ def create_surface_piece(
         padding = (1, 1, pad_bottom)
     else:
         padding = (0, 0, 0)
+    # Places the cropped region where it is in the volume.
+    padding = (padding[0] - x_crop.start, padding[1] - y_crop.start, padding[2])
+    # The mask has an extra slice, row and column at the start.
+    mask_roi = (
+        slice(roi.start + 1, roi.stop + 1),
+        slice(y_crop.start + 1, y_crop.stop + 1),
+        slice(x_crop.start + 1, x_crop.stop + 1),
+    )
 
     if from_binary:
-        mask = numpy.memmap(mask_filename, mode="r", dtype=mask_dtype, shape=mask_shape)
         if fill_border_holes:
-            a_mask = pad_image(mask[roi.start + 1 : roi.stop + 1, 1:, 1:], 0, pad_bottom, pad_top)
+            a_mask = pad_image(mask[mask_roi], 0, pad_bottom, pad_top)
         else:
-            a_mask = numpy.array(mask[roi.start + 1 : roi.stop + 1, 1:, 1:])
+            a_mask = numpy.array(mask[mask_roi])
         image = converters.to_vtk(a_mask, spacing, roi.start, "AXIAL", padding=padding)
         del a_mask
     else:
-        image = numpy.memmap(filename, mode="r", dtype=dtype, shape=shape)
         mask = numpy.memmap(mask_filename, mode="r", dtype=mask_dtype, shape=mask_shape)
+        image_roi = (roi, y_crop, x_crop)
         if fill_border_holes:
-            a_image = pad_image(image[roi], numpy.iinfo(image.dtype).min, pad_bottom, pad_top)
+            a_image = pad_image(image[image_roi], numpy.iinfo(image.dtype).min, pad_bottom, pad_top)
         else:
-            a_image = numpy.array(image[roi])
+            a_image = numpy.array(image[image_roi])
         #  if z_iadd:
         #  a_image[0, 1:-1, 1:-1] = image[0]
         #  if z_eadd:
         #  a_image[-1, 1:-1, 1:-1] = image[-1]
 
         if algorithm == "InVesalius 3.b2":
-            a_mask = numpy.array(mask[roi.start + 1 : roi.stop + 1, 1:, 1:])
+            a_mask = numpy.array(mask[mask_roi])
             a_image[a_mask == 1] = a_image.min() - 1
             a_image[a_mask == 254] = (min_value + max_value) / 2.0
 
@@ -185,20 +248,181 @@ def create_surface_piece(
     del image
     del contour
 
-    fd, filename = tempfile.mkstemp(suffix="_%d_%d.vtp" % (roi.start, roi.stop))
-    writer = vtkXMLPolyDataWriter()
-    writer.SetInputData(polydata)
-    writer.SetFileName(filename)
-    writer.Write()
+    # The pieces are cleaned and decimated here, in parallel, so the joined
+    # surface doesn't need to be. The context aware smoothing needs the
+    # staircase artifacts, so its surface is decimated after smoothing.
+    polydata = clean_piece(polydata)
+    if algorithm != "ca_smoothing" and decimate_reduction:
+        polydata = decimate_piece(polydata, decimate_reduction)
 
-    print("Writing piece", roi, "to", filename)
+    print("Piece", roi, "with", polydata.GetNumberOfCells(), "polygons")
     print("MY PID MC", os.getpid())
-    os.close(fd)
-    return filename
+    return converters.polydata_to_numpy(polydata)
+
+
+def clean_piece(polydata):
+    """
+    Merges the coincident points of a surface piece and removes its
+    degenerate polygons.
+    """
+    clean = vtkCleanPolyData()
+    clean.SetInputData(polydata)
+    clean.PointMergingOn()
+    clean.Update()
+    return clean.GetOutput()
+
+
+def decimate_piece(polydata, reduction):
+    """
+    Decimates a surface piece keeping its boundary vertices, so the seam
+    with the neighbouring pieces is kept and they can still be joined.
+    """
+    decimation = vtkDecimatePro()
+    decimation.SetInputData(polydata)
+    decimation.SetTargetReduction(reduction)
+    decimation.PreserveTopologyOn()
+    decimation.SplittingOff()
+    decimation.BoundaryVertexDeletionOff()
+    decimation.Update()
+    return decimation.GetOutput()
+
+
+def _get_point_keys(points):
+    # -0.0 and 0.0 are the same point.
+    points = numpy.ascontiguousarray(points + numpy.float32(0), dtype=numpy.float32)
+    return points.view(numpy.dtype((numpy.void, points.itemsize * 3))).ravel()
+
+
+def join_pieces(pieces):
+    """
+    Joins the pieces returned by create_surface_piece into the arrays of one
+    surface (the same format of converters.polydata_to_numpy). The pieces
+    are joined from the bottom to the top, and only the points in the slice
+    shared by neighbouring pieces are merged, so the whole surface is never
+    cleaned at once. pieces is emptied as they are joined. Only points and
+    polygons are kept.
+    """
+    pieces[:] = sorted(
+        (p for p in pieces if len(p["points"])), key=lambda p: p["points"][:, 2].min()
+    )
+    points = []
+    connectivity = []
+    offsets = [numpy.zeros(1, dtype=numpy.int64)]
+    n_points = 0
+    n_connectivity = 0
+
+    previous_points = None
+    previous_ids = None
+    while pieces:
+        piece = pieces.pop(0)
+        piece_points = piece["points"]
+        ids = numpy.empty(len(piece_points), dtype=numpy.int64)
+        shared = numpy.zeros(len(piece_points), dtype=bool)
+
+        if previous_points is not None:
+            z_seam = piece_points[:, 2].min()
+            previous_seam = previous_points[:, 2] >= z_seam
+            seam = piece_points[:, 2] <= previous_points[:, 2].max()
+            previous_keys = _get_point_keys(previous_points[previous_seam])
+            if len(previous_keys) and seam.any():
+                seam_ids = numpy.flatnonzero(seam)
+                keys = _get_point_keys(piece_points[seam_ids])
+                sorter = numpy.argsort(previous_keys)
+                found = numpy.searchsorted(previous_keys, keys, sorter=sorter)
+                found = sorter[numpy.minimum(found, len(sorter) - 1)]
+                matched = previous_keys[found] == keys
+                shared[seam_ids[matched]] = True
+                ids[seam_ids[matched]] = previous_ids[previous_seam][found[matched]]
+
+        n_new = len(piece_points) - numpy.count_nonzero(shared)
+        ids[~shared] = numpy.arange(n_points, n_points + n_new)
+        points.append(piece_points[~shared])
+        connectivity.append(ids[piece["connectivity"]])
+        offsets.append(piece["offsets"][1:].astype(numpy.int64) + n_connectivity)
+        n_points += n_new
+        n_connectivity += len(piece["connectivity"])
+        previous_points, previous_ids = piece_points, ids
+        del piece
+
+    if points:
+        points = numpy.concatenate(points)
+        connectivity = numpy.concatenate(connectivity)
+    else:
+        points = numpy.empty((0, 3), dtype=numpy.float32)
+        connectivity = numpy.empty(0, dtype=numpy.int64)
+
+    return {
+        "points": points,
+        "offsets": numpy.concatenate(offsets),
+        "connectivity": connectivity,
+        "point_data": {},
+        "cell_data": {},
+    }
+
+
+def _get_axis_weights(normals):
+    # Each triangle weighs 1 on the axis of the largest component of its
+    # normal, the weight is split between the axes tied as the largest.
+    components = numpy.abs(normals)
+    largest = components.max(axis=1, keepdims=True)
+    is_largest = components == largest
+    return (is_largest / is_largest.sum(axis=1, keepdims=True)).sum(axis=0)
+
+
+def get_mass_properties(polydata, chunk_size=MEASURE_CHUNK_SIZE):
+    """
+    Returns the volume and the area of the triangles of polydata, calculated
+    as vtkMassProperties does, but accumulated over chunks of chunk_size
+    polygons.
+    """
+    if polydata.GetPoints() is None or not polydata.GetNumberOfPolys():
+        return 0.0, 0.0
+    points = numpy_support.vtk_to_numpy(polydata.GetPoints().GetData())
+    polys = polydata.GetPolys()
+    offsets = numpy_support.vtk_to_numpy(polys.GetOffsetsArray())
+    connectivity = numpy_support.vtk_to_numpy(polys.GetConnectivityArray())
+
+    area = 0.0
+    axis_weights = numpy.zeros(3)
+    # Volume by the divergence theorem using each axis.
+    volumes = numpy.zeros(3)
+    for start in range(0, len(offsets) - 1, chunk_size):
+        chunk_offsets = offsets[start : start + chunk_size + 1]
+        triangles = chunk_offsets[:-1][numpy.diff(chunk_offsets) == 3]
+        if not len(triangles):
+            continue
+        p0, p1, p2 = (points[connectivity[triangles + i]].astype(numpy.float64) for i in range(3))
+        cross = numpy.cross(p1 - p0, p2 - p0)
+        lengths = numpy.linalg.norm(cross, axis=1)
+        normals = numpy.divide(
+            cross, lengths[:, None], out=numpy.zeros_like(cross), where=lengths[:, None] > 0
+        )
+        center = (p0 + p1 + p2) / 3.0
+
+        area += lengths.sum() / 2.0
+        axis_weights += _get_axis_weights(normals)
+        volumes += (lengths[:, None] / 2.0 * normals * center).sum(axis=0)
+
+    axis_weights /= polydata.GetNumberOfCells()
+    return abs(float(numpy.dot(axis_weights, volumes))), float(area)
+
+
+def get_piece_size(shape, itemsize, n_processors):
+    """
+    Returns the number of slices of each piece the volume is split into to
+    create the surface. There are about PIECES_PER_PROCESSOR pieces for each
+    processor, so a processor which gets an easy piece can take another one,
+    but each piece must fit into PIECE_MAX_BYTES.
+    """
+    n_slices = shape[0]
+    slice_bytes = max(1, shape[1] * shape[2] * itemsize)
+    max_size = max(1, PIECE_MAX_BYTES // slice_bytes)
+    size = math.ceil(n_slices / (max(1, n_processors) * PIECES_PER_PROCESSOR))
+    return max(1, min(max(size, PIECE_MIN_SIZE), max_size, n_slices))
 
 
 def join_process_surface(
-    filenames,
+    pieces,
     algorithm,
     smooth_iterations,
     smooth_relaxation_factor,
@@ -222,40 +446,10 @@ def join_process_surface(
     os.close(log_fd)
 
     send_message("Joining surfaces ...")
-    polydata_append = vtkAppendPolyData()
-    for f in filenames:
-        reader = vtkXMLPolyDataReader()
-        reader.SetFileName(f)
-        reader.Update()
-
-        polydata = reader.GetOutput()
-
-        polydata_append.AddInputData(polydata)
-        del reader
-        del polydata
-
-    polydata_append.Update()
-    #  polydata_append.GetOutput().ReleaseDataFlagOn()
-    polydata = polydata_append.GetOutput()
-    # polydata.Register(None)
-    #  polydata.SetSource(None)
-    del polydata_append
-
-    send_message("Cleaning surface ...")
-    clean = vtkCleanPolyData()
-    #  clean.ReleaseDataFlagOn()
-    #  clean.GetOutput().ReleaseDataFlagOn()
-    # clean_ref = weakref.ref(clean)
-    #  clean_ref().AddObserver("ProgressEvent", lambda obj,evt:
-    #  UpdateProgress(clean_ref(), _("Creating 3D surface...")))
-    clean.SetInputData(polydata)
-    clean.PointMergingOn()
-    clean.Update()
-
-    del polydata
-    polydata = clean.GetOutput()
-    #  polydata.SetSource(None)
-    del clean
+    arrays = join_pieces(pieces)
+    del pieces
+    polydata = converters.numpy_to_polydata(arrays)
+    del arrays
 
     if algorithm == "ca_smoothing":
         send_message("Calculating normals ...")
@@ -334,7 +528,8 @@ def join_process_surface(
     #  #  polydata.SetSource(None)
     #  del smoother
 
-    if not decimate_reduction:
+    # The other surfaces are decimated by piece, in create_surface_piece.
+    if algorithm == "ca_smoothing" and decimate_reduction:
         print("Decimating", decimate_reduction)
         send_message("Decimating ...")
         decimation = vtkQuadricDecimation()
@@ -397,6 +592,7 @@ def join_process_surface(
 
     to_measure = polydata
 
+    send_message("Calculating normals ...")
     normals = vtkPolyDataNormals()
     #  normals.ReleaseDataFlagOn()
     #  normals_ref = weakref.ref(normals)
@@ -434,20 +630,7 @@ def join_process_surface(
     #  del stripper
 
     send_message("Calculating area and volume ...")
-    measured_polydata = vtkMassProperties()
-    measured_polydata.SetInputData(to_measure)
-    measured_polydata.Update()
-    volume = float(measured_polydata.GetVolume())
-    area = float(measured_polydata.GetSurfaceArea())
-    del measured_polydata
-
-    fd, filename = tempfile.mkstemp(suffix="_full.vtp")
-    writer = vtkXMLPolyDataWriter()
-    writer.SetInputData(polydata)
-    writer.SetFileName(filename)
-    writer.Write()
-    del writer
+    volume, area = get_mass_properties(to_measure)
 
     print("MY PID", os.getpid())
-    os.close(fd)
-    return filename, {"volume": volume, "area": area}
+    return converters.polydata_to_numpy(polydata), {"volume": volume, "area": area}
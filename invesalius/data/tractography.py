@@ -23,7 +23,6 @@
 
 import queue
 import threading
-import time
 
 import numpy as np
 from vtkmodules.vtkCommonCore import vtkPoints, vtkUnsignedCharArray
@@ -219,7 +218,7 @@ def compute_and_visualize_tracts(trekker, position, affine, affine_vtk, n_tracts
 class ComputeTractsThread(threading.Thread):
     # TODO: Remove this class and create a case where no ACT is provided in the class ComputeTractsACTThread
 
-    def __init__(self, inp, queues, event, sle):
+    def __init__(self, inp, queues, event):
         """Class (threading) to compute real time tractography data for visualization.
 
         Tracts are computed using the Trekker library by Baran Aydogan (https://dmritrekker.github.io/)
@@ -228,7 +227,7 @@ class ComputeTractsThread(threading.Thread):
         bundle, to obtain fast computation and visualization. The bundle dataset is mapped to a single vtkActor.
         Mapper and Actor are computer in the data/viewer_volume.py module for easier handling in the invesalius 3D scene.
 
-        Sleep function in run method is used to avoid blocking GUI and more fluent, real-time navigation
+        The run method waits for new co-registered coordinates and computes the tracts as soon as they arrive.
 
         :param inp: List of inputs: trekker instance, affine numpy array, seed_offset, seed_radius, n_threads
         :type inp: list
@@ -237,8 +236,6 @@ class ComputeTractsThread(threading.Thread):
         :type queues: list[queue.Queue, queue.Queue]
         :param event: Threading event to coordinate when tasks as done and allow UI release
         :type event: threading.Event
-        :param sle: Sleep pause in seconds
-        :type sle: float
         """
 
         threading.Thread.__init__(self, name="ComputeTractsThread")
@@ -248,7 +245,6 @@ class ComputeTractsThread(threading.Thread):
         self.tracts_queue = queues[1]
         # self.visualization_queue = visualization_queue
         self.event = event
-        self.sle = sle
 
     def run(self):
         (
@@ -274,7 +270,7 @@ class ComputeTractsThread(threading.Thread):
                 # print("Computing tracts")
                 # get from the queue the coordinates, coregistration transformation matrix, and flipped matrix
                 # print("Here")
-                m_img_flip = self.coord_tracts_queue.get_nowait()
+                m_img_flip = self.coord_tracts_queue.get(timeout=const.NAVIGATION_WAIT_TIMEOUT)
                 # coord, m_img, m_img_flip = self.coord_queue.get_nowait()
                 # print('ComputeTractsThread: get {}'.format(count))
 
@@ -353,17 +349,10 @@ class ComputeTractsThread(threading.Thread):
             except queue.Empty:
                 # print("Empty queue in tractography")
                 pass
-            # if queue is full mark as done (may not be needed in this new "nowait" method)
-            except queue.Full:
-                # self.coord_queue.task_done()
-                self.coord_tracts_queue.task_done()
-
-            # sleep required to prevent user interface from being unresponsive
-            time.sleep(self.sle)
 
 
 class ComputeTractsACTThread(threading.Thread):
-    def __init__(self, input_list, queues, event, sleep_thread):
+    def __init__(self, input_list, queues, event):
         """Class (threading) to compute real time tractography data for visualization.
 
         Tracts are computed using the Trekker library by Baran Aydogan (https://dmritrekker.github.io/)
@@ -373,7 +362,7 @@ class ComputeTractsACTThread(threading.Thread):
         Mapper and Actor are computer in the data/viewer_volume.py module for easier handling in the
          invesalius 3D scene.
 
-        Sleep function in run method is used to avoid blocking GUI and more fluent, real-time navigation
+        The run method waits for new co-registered coordinates and computes the tracts as soon as they arrive.
 
         :param input_list: List of inputs: trekker instance, affine numpy array, seed offset, total number of tracts,
          seed radius, number of threads in computer, ACT data array, affine vtk matrix,
@@ -384,8 +373,6 @@ class ComputeTractsACTThread(threading.Thread):
         :type queues: list[queue.Queue, queue.Queue]
         :param event: Threading event to coordinate when tasks as done and allow UI release
         :type event: threading.Event
-        :param sleep_thread: Sleep pause in seconds
-        :type sleep_thread: float
         """
 
         threading.Thread.__init__(self, name="ComputeTractsThreadACT")
@@ -393,7 +380,6 @@ class ComputeTractsACTThread(threading.Thread):
         self.coord_tracts_queue = queues[0]
         self.tracts_queue = queues[1]
         self.event = event
-        self.sleep_thread = sleep_thread
 
     def run(self):
         (
@@ -429,7 +415,7 @@ class ComputeTractsACTThread(threading.Thread):
         while not self.event.is_set():
             try:
                 # get from the queue the coordinates, coregistration transformation matrix, and flipped matrix
-                m_img_flip = self.coord_tracts_queue.get_nowait()
+                m_img_flip = self.coord_tracts_queue.get(timeout=const.NAVIGATION_WAIT_TIMEOUT)
 
                 # DEBUG: Uncomment the m_img_flip below so that distance is fixed and tracts keep computing
                 # m_img_flip[:3, -1] = (5., 10., 12.)
@@ -583,12 +569,6 @@ class ComputeTractsACTThread(threading.Thread):
             # if no coordinates pass
             except queue.Empty:
                 pass
-            # if queue is full mark as done (may not be needed in this new "nowait" method)
-            except queue.Full:
-                self.coord_tracts_queue.task_done()
-
-            # sleep required to prevent user interface from being unresponsive
-            time.sleep(self.sleep_thread)
 
 
 def set_trekker_parameters(trekker, params):
@@ -2751,7 +2751,7 @@ class Viewer(wx.Panel):
     def LoadSlicePlane(self):
         self.slice_plane = SlicePlane()
 
-    def LoadVolume(self, volume, colour, ww, wl):
+    def LoadVolume(self, volume, colour, ww, wl, lod=None):
         self.raycasting_volume = True
         # self._to_show_ball += 1
         # self._check_and_set_ball_visibility()
@@ -2759,6 +2759,8 @@ class Viewer(wx.Panel):
         self.light = self.ren.GetLights().GetNextItem()
 
         self.ren.AddVolume(volume)
+        if lod is not None:
+            lod.attach(self.ren)
         self.text.SetValue("WL: %d  WW: %d" % (wl, ww))
 
         if self.on_wl:
@@ -21,13 +21,11 @@ import plistlib
 import weakref
 
 from packaging.version import Version
-from vtkmodules.util import numpy_support
 from vtkmodules.vtkCommonCore import vtkVersion
 from vtkmodules.vtkCommonDataModel import vtkPiecewiseFunction, vtkPlane
 from vtkmodules.vtkFiltersSources import vtkPlaneSource
 from vtkmodules.vtkImagingCore import vtkImageFlip, vtkImageShiftScale
 from vtkmodules.vtkImagingGeneral import vtkImageConvolve
-from vtkmodules.vtkImagingStatistics import vtkImageAccumulate
 from vtkmodules.vtkInteractionWidgets import vtkImagePlaneWidget
 from vtkmodules.vtkRenderingCore import (
     vtkActor,
@@ -45,6 +43,7 @@ from vtkmodules.vtkRenderingVolumeOpenGL2 import vtkOpenGLGPUVolumeRayCastMapper
 import invesalius.constants as const
 import invesalius.data.converters as converters
 import invesalius.data.slice_ as slice_
+import invesalius.data.volume_lod as volume_lod
 import invesalius.data.vtk_utils as vtk_utils
 import invesalius.project as prj
 import invesalius.session as ses
@@ -122,6 +121,7 @@ class Volume:
         self.plane = None
         self.plane_on = False
         self.volume = None
+        self.lod = None
         self.image = None
         self.loaded_image = 0
         self.to_reload = False
@@ -175,6 +175,7 @@ class Volume:
             del self.opacity_transfer_func
             del self.volume_properties
             del self.volume_mapper
+            self._close_lod()
             self.volume = None
             self.exist = False
             self.loaded_image = False
@@ -241,6 +242,7 @@ class Volume:
             del self.opacity_transfer_func
             del self.volume_properties
             del self.volume_mapper
+            self._close_lod()
             self.volume = None
             self.exist = False
             self.loaded_image = False
@@ -250,6 +252,11 @@ class Volume:
             self.color_transfer = None
             Publisher.sendMessage("Render volume viewer")
 
+    def _close_lod(self):
+        if self.lod is not None:
+            self.lod.close()
+            self.lod = None
+
     def OnFlipVolume(self, axis):
         print("Flipping Volume")
         self.loaded_image = False
@@ -645,6 +652,14 @@ class Volume:
             volume_mapper.SetSampleDistance(pix_diag / 5.0)
             volume_properties.SetScalarOpacityUnitDistance(pix_diag)
 
+            # While interacting, lower resolution copies of the volume are
+            # rendered by the CPU raycasting.
+            self._close_lod()
+            self.lod = volume_lod.VolumeLOD(volume_mapper, image2, pix_diag / 5.0)
+            self.lod.start()
+        else:
+            self._close_lod()
+
         self.volume_properties = volume_properties
 
         self.SetShading()
@@ -662,7 +677,12 @@ class Volume:
             self.plane.SetVolumeMapper(volume_mapper)
 
         Publisher.sendMessage(
-            "Load volume into viewer", volume=volume, colour=colour, ww=self.ww, wl=self.wl
+            "Load volume into viewer",
+            volume=volume,
+            colour=colour,
+            ww=self.ww,
+            wl=self.wl,
+            lod=self.lod,
         )
 
         del flip
@@ -683,18 +703,10 @@ class Volume:
                 self.plane = CutPlane(self.final_imagedata, self.volume_mapper)
 
     def CalculateHistogram(self):
-        image = self.image
-        r = int(image.GetScalarRange()[1] - image.GetScalarRange()[0])
-        accumulate = vtkImageAccumulate()
-        accumulate.SetInputData(image)
-        accumulate.SetComponentExtent(0, r - 1, 0, 0, 0, 0)
-        accumulate.SetComponentOrigin(image.GetScalarRange()[0], 0, 0)
-        #  accumulate.ReleaseDataFlagOn()
-        accumulate.Update()
-        n_image = numpy_support.vtk_to_numpy(accumulate.GetOutput().GetPointData().GetScalars())
-        del accumulate
-        init, end = image.GetScalarRange()
-        Publisher.sendMessage("Load histogram", histogram=n_image, init=init, end=end)
+        # The histogram is kept by Slice, so the image is not read again.
+        statistics = slice_.Slice().statistics
+        init, end = statistics.scalar_range
+        Publisher.sendMessage("Load histogram", histogram=statistics.histogram, init=init, end=end)
 
     def TranslateScale(self, scale, value):
         # if value < 0:
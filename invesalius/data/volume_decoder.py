@@ -0,0 +1,196 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Decodes a stack of 2D images (DICOM or bitmap files) into the memmap of the
+volume. When there are enough files they are decoded by a pool of worker
+processes, each one writing its slices straight into the memmap file.
+"""
+
+import multiprocessing
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from invesalius.data.image_statistics import ImageStatistics, get_statistics
+
+# With less files than this starting the worker processes takes longer than
+# decoding the files in the main process.
+PARALLEL_DECODE_MIN_FILES = 64
+PARALLEL_DECODE_CHUNK_SIZE = 4
+
+
+class Placement(NamedTuple):
+    """
+    Where the decoded slice n goes in the volume: at index n along axis
+    (shape[axis] - n - 1 if reverse is True), with the columns flipped if
+    flip is True.
+    """
+
+    axis: int
+    reverse: bool = False
+    flip: bool = False
+
+
+def decode_dicom_slice(filename: str, resolution_percentage: float = 1.0) -> np.ndarray:
+    from invesalius.data.imagedata_utils import read_dcm_slice_as_np2
+
+    return read_dcm_slice_as_np2(filename, resolution_percentage)[::-1]
+
+
+def decode_bitmap_slice(
+    filename: str,
+    spacing: Sequence[float],
+    orientation: str,
+    resolution_percentage: float = 1.0,
+) -> np.ndarray:
+    from vtkmodules.util import numpy_support
+
+    import invesalius.data.converters as converters
+    import invesalius.reader.bitmap_reader as bitmap_reader
+    from invesalius.data.imagedata_utils import ResampleImage2D
+
+    image_as_array = bitmap_reader.ReadBitmap(filename)
+    image = converters.to_vtk(
+        image_as_array,
+        spacing=spacing,
+        slice_number=1,
+        orientation=orientation.upper(),
+    )
+    if resolution_percentage != 1.0:
+        image = ResampleImage2D(
+            image,
+            px=None,
+            py=None,
+            resolution_percentage=resolution_percentage,
+            update_progress=None,
+        )
+
+    x, y = image.GetDimensions()[:2]
+    array = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
+    if array.dtype == "uint16":
+        array = (array.astype(np.int32) - 32768).astype(np.int16)
+    return array.reshape(y, x)
+
+
+def store_slice(
+    matrix: np.ndarray, n: int, array: np.ndarray, placement: Placement
+) -> ImageStatistics:
+    """
+    Writes the slice n into matrix and returns its statistics.
+    """
+    index = [slice(None)] * 3
+    if placement.reverse:
+        index[placement.axis] = matrix.shape[placement.axis] - n - 1
+    else:
+        index[placement.axis] = n
+    if placement.flip:
+        array = array[:, ::-1]
+    matrix[tuple(index)] = array
+    # The statistics are taken after the cast to the matrix dtype.
+    return get_statistics(matrix[tuple(index)])
+
+
+def get_volume_shape(slice_shape: Tuple[int, int], n_slices: int, axis: int) -> Tuple[int, ...]:
+    shape = list(slice_shape)
+    shape.insert(axis, n_slices)
+    return tuple(shape)
+
+
+# State of each worker process, set by _init_worker.
+_worker: dict = {}
+
+
+def _init_worker(filename, shape, dtype, decode, decode_args, placement):
+    _worker["matrix"] = np.memmap(filename, mode="r+", dtype=dtype, shape=shape)
+    _worker["decode"] = decode
+    _worker["decode_args"] = decode_args
+    _worker["placement"] = placement
+
+
+def _decode_task(task: Tuple[int, str]) -> ImageStatistics:
+    n, filename = task
+    array = _worker["decode"](filename, *_worker["decode_args"])
+    return store_slice(_worker["matrix"], n, array, _worker["placement"])
+
+
+def decode_volume(
+    matrix: np.memmap,
+    files: List[str],
+    decode: Callable[..., np.ndarray],
+    decode_args: tuple = (),
+    placement: Placement = Placement(0),
+    update_progress: Optional[Callable[[int, str], object]] = None,
+    message: str = "",
+    first_slice: Optional[np.ndarray] = None,
+) -> ImageStatistics:
+    """
+    Decodes each file with decode(filename, *decode_args) and writes it into
+    matrix, which must be a memmap, according to placement. Returns the
+    statistics of the volume, gathered while the slices are decoded.
+
+    decode must be a module level function, so it can be called from the
+    worker processes. update_progress, if given, is called from the main
+    process with the number of slices already decoded (minus one).
+
+    first_slice may be given if the first file was already decoded, e.g. to
+    know the shape of the volume.
+    """
+    statistics = None
+    tasks = list(enumerate(files))
+    n_done = 0
+
+    if first_slice is not None:
+        statistics = store_slice(matrix, 0, first_slice, placement)
+        tasks = tasks[1:]
+        n_done = 1
+        if update_progress is not None and len(files) > 1:
+            update_progress(0, message)
+
+    if len(tasks) < PARALLEL_DECODE_MIN_FILES:
+        pool = None
+        results = (
+            store_slice(matrix, n, decode(filename, *decode_args), placement)
+            for n, filename in tasks
+        )
+    else:
+        matrix.flush()
+        ctx = multiprocessing.get_context("spawn")
+        pool = ctx.Pool(
+            processes=min(multiprocessing.cpu_count(), len(tasks)),
+            initializer=_init_worker,
+            initargs=(matrix.filename, matrix.shape, matrix.dtype, decode, decode_args, placement),
+        )
+        results = pool.imap_unordered(_decode_task, tasks, chunksize=PARALLEL_DECODE_CHUNK_SIZE)
+
+    try:
+        for slice_statistics in results:
+            if statistics is None:
+                statistics = slice_statistics
+            else:
+                statistics = ImageStatistics.combine((statistics, slice_statistics))
+            if update_progress is not None and len(files) > 1:
+                update_progress(n_done, message)
+            n_done += 1
+    finally:
+        # Also reached if a file could not be decoded.
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    return statistics
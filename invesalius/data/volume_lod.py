@@ -0,0 +1,188 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Levels of detail of the raycasting volume. Half resolution copies of the
+volume are built in a background thread and, while the user interacts with
+the volume viewer, the volume mapper renders the finest one that fits in the
+frame time asked by the interactor (its DesiredUpdateRate). When the
+interaction ends the interactor renders again at its StillUpdateRate, and
+the full resolution volume is used.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonDataModel import vtkImageData
+
+# Maximum number of half resolution levels.
+MAX_LEVELS = 3
+# Levels with a dimension smaller than this are not built.
+MIN_DIMENSION = 64
+# Desired update rates (frames per second) above this are interactive.
+INTERACTIVE_UPDATE_RATE = 1.0
+# Each level is estimated to render this times faster than the previous one,
+# until its frame time is measured.
+LEVEL_SPEEDUP = 4.0
+# Weight of the last frame time in the measured frame time of a level.
+FRAME_TIME_WEIGHT = 0.5
+
+
+def downsample(image: vtkImageData) -> vtkImageData:
+    """
+    Returns image with half the resolution, each voxel is the mean of 2x2x2
+    voxels of image.
+    """
+    x0, x1, y0, y1, z0, z1 = image.GetExtent()
+    dx, dy, dz = x1 - x0 + 1, y1 - y0 + 1, z1 - z0 + 1
+    scalars = image.GetPointData().GetScalars()
+    array = numpy_support.vtk_to_numpy(scalars).reshape(dz, dy, dx)
+
+    hz, hy, hx = dz // 2, dy // 2, dx // 2
+    blocks = array[: hz * 2, : hy * 2, : hx * 2].reshape(hz, 2, hy, 2, hx, 2)
+    half = blocks.mean(axis=(1, 3, 5), dtype=np.float32)
+    half = np.round(half).astype(array.dtype)
+
+    spacing = image.GetSpacing()
+    origin = image.GetOrigin()
+    start = (x0, y0, z0)
+
+    out = vtkImageData()
+    out.SetOrigin([o + (e + 0.5) * s for o, e, s in zip(origin, start, spacing)])
+    out.SetSpacing([s * 2 for s in spacing])
+    out.SetDimensions(hx, hy, hz)
+    out.GetPointData().SetScalars(numpy_support.numpy_to_vtk(half.ravel(), deep=0))
+    return out
+
+
+def get_number_of_levels(dimensions) -> int:
+    """
+    Returns the number of half resolution levels built for a volume with
+    the given dimensions.
+    """
+    levels = 0
+    while levels < MAX_LEVELS and min(dimensions) // 2 ** (levels + 1) >= MIN_DIMENSION:
+        levels += 1
+    return levels
+
+
+def choose_level(frame_times: Dict[int, float], n_levels: int, budget: float) -> int:
+    """
+    Returns the finest level (0 is the full resolution) whose frame time,
+    measured or estimated from the nearest measured one, fits in budget.
+    """
+    if not frame_times:
+        return 0
+    for level in range(n_levels):
+        measured = min(frame_times, key=lambda n: abs(n - level))
+        estimated = frame_times[measured] * LEVEL_SPEEDUP ** (measured - level)
+        if estimated <= budget:
+            return level
+    return n_levels - 1
+
+
+class VolumeLOD:
+    """
+    Switches the input of the volume mapper between the levels of detail of
+    imagedata, according to the desired update rate of the render window.
+    """
+
+    def __init__(self, mapper, imagedata: vtkImageData, sample_distance: float):
+        self.mapper = mapper
+        self.sample_distance = sample_distance
+        self.levels: List[vtkImageData] = [imagedata]
+        self.frame_times: Dict[int, float] = {}
+        self.level = 0
+
+        self._renderer = None
+        self._observers: List[int] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Builds the levels in a background thread.
+        """
+        n_levels = get_number_of_levels(self.levels[0].GetDimensions())
+        if n_levels:
+            self._thread = threading.Thread(target=self._build, args=(n_levels,), daemon=True)
+            self._thread.start()
+
+    def _build(self, n_levels: int) -> None:
+        image = self.levels[0]
+        for _ in range(n_levels):
+            if self._stop.is_set():
+                return
+            image = downsample(image)
+            with self._lock:
+                self.levels.append(image)
+
+    def attach(self, renderer) -> None:
+        self.detach()
+        self._renderer = renderer
+        self._observers = [
+            renderer.AddObserver("StartEvent", self._on_start_render),
+            renderer.AddObserver("EndEvent", self._on_end_render),
+        ]
+
+    def detach(self) -> None:
+        if self._renderer is not None:
+            for observer in self._observers:
+                self._renderer.RemoveObserver(observer)
+        self._renderer = None
+        self._observers = []
+
+    def close(self) -> None:
+        self.detach()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def set_level(self, level: int) -> None:
+        if level == self.level:
+            return
+        with self._lock:
+            image = self.levels[level]
+        self.mapper.SetInputData(image)
+        self.mapper.SetSampleDistance(self.sample_distance * 2**level)
+        self.level = level
+
+    def _on_start_render(self, renderer, event) -> None:
+        rate = renderer.GetRenderWindow().GetDesiredUpdateRate()
+        if rate > INTERACTIVE_UPDATE_RATE:
+            with self._lock:
+                n_levels = len(self.levels)
+            self.set_level(choose_level(self.frame_times, n_levels, 1.0 / rate))
+        else:
+            self.set_level(0)
+
+    def _on_end_render(self, renderer, event) -> None:
+        frame_time = renderer.GetLastRenderTimeInSeconds()
+        if frame_time <= 0:
+            return
+        previous = self.frame_times.get(self.level)
+        if previous is None:
+            self.frame_times[self.level] = frame_time
+        else:
+            self.frame_times[self.level] = (
+                FRAME_TIME_WEIGHT * frame_time + (1 - FRAME_TIME_WEIGHT) * previous
+            )
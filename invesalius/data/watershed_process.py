@@ -1,4 +1,7 @@
-from typing import TYPE_CHECKING, Tuple
+import mmap
+import multiprocessing
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
 
 import numpy as np
 from scipy import ndimage
@@ -12,49 +15,233 @@ except ImportError:
     from skimage.morphology import watershed
 
 if TYPE_CHECKING:
-    import os
-    from multiprocessing import Queue
+    from multiprocessing.pool import Pool
+
+# Voxels added around the bounding box of the markers, the watershed is only
+# computed inside this region.
+ROI_PADDING = 10
+
+# (filename, shape, dtype, offset, version) of an array stored in a memmap
+# file, so it can be opened by the worker process instead of being pickled.
+# version is the number of changes of the array in place, so the images
+# cached from it aren't used after it changes.
+MemmapInfo = Tuple[str, Tuple[int, ...], str, int, int]
+ROI = Tuple[slice, ...]
+
+# Image used by the last watershed computed in this process (the morphological
+# gradient or the LUT values of the region), see get_watershed_image.
+_cache: Dict[str, Any] = {}
+
+
+def get_memmap_info(array: np.ndarray, version: int = 0) -> Optional[MemmapInfo]:
+    """
+    Returns the info needed to open array again from its file, or None if it
+    is not a whole (C ordered) memmap, e.g. a view of one.
+    """
+    if (
+        isinstance(array, np.memmap)
+        and isinstance(array.base, mmap.mmap)
+        and array.filename
+        and array.flags.c_contiguous
+    ):
+        return str(array.filename), array.shape, array.dtype.str, array.offset, version
+    return None
+
+
+def open_array(array: Union[np.ndarray, MemmapInfo]) -> np.ndarray:
+    if isinstance(array, np.ndarray):
+        return array
+    filename, shape, dtype, offset, _version = array
+    return np.memmap(filename, mode="r", dtype=dtype, shape=shape, offset=offset)
+
+
+def get_markers_roi(markers: np.ndarray, padding: int = ROI_PADDING) -> Optional[ROI]:
+    """
+    Returns the bounding box of the markers grown by padding voxels, or None
+    if there are no markers.
+    """
+    marked = markers != 0
+    roi = []
+    for axis in range(marked.ndim):
+        other_axes = tuple(i for i in range(marked.ndim) if i != axis)
+        indices = np.flatnonzero(marked.any(axis=other_axes))
+        if not indices.size:
+            return None
+        roi.append(
+            slice(
+                max(int(indices[0]) - padding, 0),
+                min(int(indices[-1]) + 1 + padding, marked.shape[axis]),
+            )
+        )
+    return tuple(roi)
+
+
+def _contains(outer: ROI, inner: ROI) -> bool:
+    return all(o.start <= i.start and i.stop <= o.stop for o, i in zip(outer, inner))
+
+
+def get_watershed_image(
+    image: Union[np.ndarray, MemmapInfo],
+    roi: ROI,
+    algorithm: str,
+    mg_size: Union[int, Tuple[int, ...]],
+    use_ww_wl: bool,
+    wl: int,
+    ww: int,
+) -> np.ndarray:
+    """
+    Returns the image of roi the watershed is applied to: the morphological
+    gradient of the image (after the window and level LUT if use_ww_wl) for
+    the "Watershed" algorithm, and the image itself for "Watershed IFT".
+
+    The result is kept while the parameters don't change, so expanding the
+    watershed again in the same region doesn't compute the gradient again.
+    Images given as arrays (not MemmapInfo) are not cached.
+    """
+    key = (image, algorithm, mg_size, use_ww_wl, wl, ww) if isinstance(image, tuple) else None
+    if key is not None and _cache.get("key") == key and _contains(_cache["roi"], roi):
+        offset = tuple(
+            slice(r.start - c.start, r.stop - c.start) for r, c in zip(roi, _cache["roi"])
+        )
+        return _cache["image"][offset]
+
+    array = open_array(image)
+    if algorithm == "Watershed":
+        # The gradient of the voxels at the border of roi depends on their
+        # neighbours outside it.
+        margin = int(np.max(mg_size))
+    else:
+        margin = 0
+    region = tuple(
+        slice(max(r.start - margin, 0), min(r.stop + margin, s)) for r, s in zip(roi, array.shape)
+    )
+
+    if use_ww_wl:
+        tmp_image = get_LUT_value(array[region], ww, wl).astype("uint16")
+    else:
+        image_min = _get_image_min(image, array)
+        tmp_image = (array[region] - image_min).astype("uint16")
+
+    if algorithm == "Watershed":
+        tmp_image = ndimage.morphological_gradient(tmp_image, mg_size)
+
+    offset = tuple(slice(r.start - g.start, r.stop - g.start) for r, g in zip(roi, region))
+    tmp_image = tmp_image[offset]
+
+    if key is not None:
+        _cache["key"] = key
+        _cache["roi"] = roi
+        _cache["image"] = tmp_image
+    return tmp_image
+
+
+def _get_image_min(image: Union[np.ndarray, MemmapInfo], array: np.ndarray):
+    if isinstance(image, tuple):
+        if _cache.get("min_key") != image:
+            _cache["min_key"] = image
+            _cache["min"] = array.min()
+        return _cache["min"]
+    return array.min()
 
 
 def do_watershed(
-    image: np.ndarray,
-    markers: np.ndarray,
-    tfile: "str | bytes | os.PathLike[str]",
-    shape: "int | tuple[int, ...] | None",
+    image: Union[np.ndarray, MemmapInfo],
+    markers: Union[np.ndarray, MemmapInfo],
+    roi: ROI,
     bstruct: "int | np.ndarray | None",
     algorithm: str,
-    mg_size: Tuple[int, ...],
+    mg_size: Union[int, Tuple[int, ...]],
     use_ww_wl: bool,
     wl: int,
     ww: int,
-    q: "Queue[int]",
-) -> None:
-    mask = np.memmap(tfile, shape=shape, dtype="uint8", mode="r+")
+) -> np.ndarray:
+    """
+    Applies the watershed to the region roi of image from the markers (1 for
+    foreground and 2 for background). Returns the labels of roi.
+    """
+    tmp_image = get_watershed_image(image, roi, algorithm, mg_size, use_ww_wl, wl, ww)
+    roi_markers = np.asarray(open_array(markers)[roi])
 
-    if use_ww_wl:
-        if algorithm == "Watershed":
-            tmp_image = ndimage.morphological_gradient(
-                get_LUT_value(image, ww, wl).astype("uint16"), mg_size
-            )
-            tmp_mask = watershed(tmp_image, markers.astype("int16"), bstruct)
-        else:
-            tmp_image = get_LUT_value(image, ww, wl).astype("uint16")
-            # tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            # tmp_image = ndimage.morphological_gradient(
-            # get_LUT_value(image, ww, wl).astype('uint16'),
-            # self.config.mg_size)
-            tmp_mask = watershed_ift(tmp_image, markers.astype("int16"), bstruct)
+    if algorithm == "Watershed":
+        tmp_mask = watershed(tmp_image, roi_markers.astype("int16"), bstruct)
+    elif use_ww_wl:
+        tmp_mask = watershed_ift(tmp_image, roi_markers.astype("int16"), bstruct)
     else:
-        if algorithm == "Watershed":
-            tmp_image = ndimage.morphological_gradient(
-                (image - image.min()).astype("uint16"), mg_size
-            )
-            tmp_mask = watershed(tmp_image, markers.astype("int16"), bstruct)
-        else:
-            tmp_image = (image - image.min()).astype("uint16")
-            # tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            # tmp_image = ndimage.morphological_gradient((image - image.min()).astype('uint16'), self.config.mg_size)
-            tmp_mask = watershed_ift(tmp_image, markers.astype("int8"), bstruct)
-    mask[:] = tmp_mask
-    mask.flush()
-    q.put(1)
+        tmp_mask = watershed_ift(tmp_image, roi_markers.astype("int8"), bstruct)
+    return tmp_mask.astype("uint8")
+
+
+class WatershedRunner:
+    """
+    Runs do_watershed in a worker process, which is kept alive (with the
+    cached gradient) until close is called. While a watershed is running,
+    only the last one requested is kept to run after it.
+
+    run is called from the GUI thread and the watershed ends in the thread
+    of the pool that handles the results, so the state is guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool: "Optional[Pool]" = None
+        self._running = False
+        self._pending: Optional[Tuple[tuple, Callable, Callable]] = None
+        # Bumped by close, so results of watersheds requested before it (e.g.
+        # already queued to the GUI thread) can be told apart and dropped.
+        self.generation = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def run(
+        self,
+        args: tuple,
+        callback: Callable[[np.ndarray, ROI], None],
+        error_callback: Callable[[BaseException], None],
+    ) -> None:
+        """
+        Calls callback(result, roi) (from another thread) when done.
+        """
+        with self._lock:
+            if self._running:
+                self._pending = (args, callback, error_callback)
+                return
+
+            if self._pool is None:
+                ctx = multiprocessing.get_context("spawn")
+                self._pool = ctx.Pool(processes=1)
+
+            self._running = True
+            self._submit(args, callback, error_callback)
+
+    def _submit(self, args, callback, error_callback) -> None:
+        # Must be called with the lock held.
+        roi = args[2]
+        self._pool.apply_async(
+            do_watershed,
+            args,
+            callback=lambda result: self._done(callback, result, roi),
+            error_callback=lambda err: self._done(error_callback, err),
+        )
+
+    def _done(self, callback, *args) -> None:
+        try:
+            callback(*args)
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if pending is not None and self._pool is not None:
+                    self._submit(*pending)
+                else:
+                    self._running = False
+
+    def close(self) -> None:
+        with self._lock:
+            self._pending = None
+            self._running = False
+            self.generation += 1
+            pool, self._pool = self._pool, None
+        # Outside the lock: terminate waits for the thread that calls _done.
+        if pool is not None:
+            pool.terminate()
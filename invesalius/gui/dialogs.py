@@ -3912,7 +3912,7 @@ class MaskDensityDialog(wx.Dialog):
         slc = Slice()
 
         with futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(slc.calc_image_density, mask)
+            future = executor.submit(slc.calc_mask_statistics, mask)
             for c in itertools.cycle(["", ".", "..", "..."]):
                 s = _("Calculating ") + c
                 self.mean_density.SetValue(s)
@@ -3925,14 +3925,14 @@ class MaskDensityDialog(wx.Dialog):
                     break
                 time.sleep(0.1)
 
-            _min, _max, _mean, _std = future.result()
+            statistics = future.result()
 
-        self.mean_density.SetValue(str(_mean))
-        self.min_density.SetValue(str(_min))
-        self.max_density.SetValue(str(_max))
-        self.std_density.SetValue(str(_std))
+        self.mean_density.SetValue(str(statistics.mean))
+        self.min_density.SetValue(str(statistics.min))
+        self.max_density.SetValue(str(statistics.max))
+        self.std_density.SetValue(str(statistics.std))
 
-        print(">>>> Area of mask", slc.calc_mask_area(mask))
+        print(">>>> Area of mask", statistics.area)
 
 
 class ObjectCalibrationDialog(wx.Dialog):
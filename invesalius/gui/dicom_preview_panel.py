@@ -20,6 +20,7 @@
 # -*- coding: UTF-8 -*-
 
 # TODO: To create a beautiful API
+import os
 import sys
 import time
 
@@ -132,11 +133,16 @@ class DicomInfo:
     @property
     def preview(self):
         if not self._preview:
-            if isinstance(self.dicom.image.thumbnail_path, list):
-                bmp = wx.Bitmap(self.dicom.image.thumbnail_path[self._slice], wx.BITMAP_TYPE_PNG)
+            thumbnail_path = self.dicom.image.thumbnail_path
+            if isinstance(thumbnail_path, list):
+                thumbnail_path = thumbnail_path[self._slice]
+            if thumbnail_path and os.path.exists(thumbnail_path):
+                bmp = wx.Bitmap(thumbnail_path, wx.BITMAP_TYPE_PNG)
+                self._preview = bmp.ConvertToImage()
             else:
-                bmp = wx.Bitmap(self.dicom.image.thumbnail_path, wx.BITMAP_TYPE_PNG)
-            self._preview = bmp.ConvertToImage()
+                # The thumbnail couldn't be created (e.g. the pixel data of
+                # the file can't be read), a black image is shown instead.
+                self._preview = wx.Image(PREVIEW_WIDTH, PREVIEW_HEIGTH)
         return self._preview
 
     def release_thumbnail(self):
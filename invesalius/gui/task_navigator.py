@@ -2073,6 +2073,15 @@ class ControlPanel(wx.Panel):
         )
         self.show_motor_map_button = show_motor_map_button
 
+        # Latency of the navigation and button for saving the latency of each pose
+        latency_text = wx.StaticText(self, -1, _("Latency: -"))
+        latency_text.SetToolTip(_("Median and 95th percentile of the navigation latency"))
+        self.latency_text = latency_text
+
+        btn_save_latency = wx.Button(self, -1, _("Save latency"), style=wx.BU_EXACTFIT)
+        btn_save_latency.SetToolTip(_("Save the latency of each pose of the navigation"))
+        btn_save_latency.Bind(wx.EVT_BUTTON, self.OnSaveLatency)
+
         # Sizers
         start_navigation_button_sizer = wx.BoxSizer(wx.VERTICAL)
         start_navigation_button_sizer.AddMany(
@@ -2105,12 +2114,21 @@ class ControlPanel(wx.Panel):
             ]
         )
 
+        latency_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        latency_sizer.AddMany(
+            [
+                (latency_text, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5),
+                (btn_save_latency, 0, wx.ALIGN_CENTER_VERTICAL),
+            ]
+        )
+
         main_sizer = wx.BoxSizer(wx.VERTICAL)
         main_sizer.AddMany(
             [
                 (start_navigation_button_sizer, 0, wx.EXPAND | wx.ALL, 10),
                 (navigation_buttons_sizer, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.TOP | wx.BOTTOM, 10),
                 (robot_buttons_sizer, 0, wx.ALIGN_LEFT | wx.TOP | wx.BOTTOM, 5),
+                (latency_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10),
             ]
         )
 
@@ -2123,6 +2141,7 @@ class ControlPanel(wx.Panel):
 
     def __bind_events(self):
         Publisher.subscribe(self.OnStartNavigation, "Start navigation")
+        Publisher.subscribe(self.OnNavigationLatency, "Navigation latency")
         Publisher.subscribe(self.OnStopNavigation, "Stop navigation")
         Publisher.subscribe(self.OnCheckStatus, "Navigation status")
         Publisher.subscribe(self.SetTarget, "Set target")
@@ -2247,6 +2266,26 @@ class ControlPanel(wx.Panel):
 
         self.navigation.StopNavigation()
 
+    def OnNavigationLatency(self, statistics):
+        total = statistics["total"]
+        self.latency_text.SetLabel(
+            _("Latency: {:.0f} ms (p95 {:.0f} ms), dropped {}").format(
+                total["p50"] * 1000, total["p95"] * 1000, sum(statistics["dropped"].values())
+            )
+        )
+
+    def OnSaveLatency(self, evt):
+        filename = dlg.ShowLoadSaveDialog(
+            message=_("Save latency as..."),
+            wildcard=_("Latency files (*.csv)|*.csv"),
+            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+            default_filename="latency.csv",
+            save_ext="csv",
+        )
+        if not filename:
+            return
+        Publisher.sendMessage("Save navigation latency", filename=filename)
+
     def UnsetTarget(self, marker):
         self.navigation.target = None
         self.target_selected = False
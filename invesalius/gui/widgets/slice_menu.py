@@ -245,8 +245,7 @@ class SliceMenu(wx.Menu):
             if self.cdialog is None:
                 slc = sl.Slice()
                 histogram = slc.histogram
-                init = int(slc.matrix.min())
-                end = int(slc.matrix.max())
+                init, end = slc.get_scalar_range()
                 nodes = slc.nodes
                 self.cdialog = ClutImagedataDialog(histogram, init, end, nodes)
                 self.cdialog.Show()
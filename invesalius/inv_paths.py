@@ -29,6 +29,7 @@ USER_PRESET_DIR = USER_INV_DIR.joinpath("presets")
 USER_LOG_DIR = USER_INV_DIR.joinpath("logs")
 USER_DL_WEIGHTS = USER_INV_DIR.joinpath("deep_learning/weights/")
 USER_RAYCASTING_PRESETS_DIRECTORY = USER_PRESET_DIR.joinpath("raycasting")
+USER_DICOM_INDEX_FILE = USER_INV_DIR.joinpath("dicom_index.sqlite")
 TEMP_DIR = tempfile.gettempdir()
 
 USER_PLUGINS_DIRECTORY = USER_INV_DIR.joinpath("plugins")
@@ -0,0 +1,219 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Latency of the navigation. Each pose read from the tracker carries a
+PoseRecord with the times it passed through the stages of the navigation,
+from the tracker to the render of the viewers. The records of the rendered
+poses are collected by a LatencyMonitor, with a histogram of the latency of
+each stage and the number of poses dropped in each stage.
+"""
+
+import collections
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Stages of the navigation:
+# - acquisition: reading the pose from the tracker.
+# - coregistration: from the pose set by the tracker thread to its
+#   co-registration, including the wait of the co-registration thread.
+# - queue: waiting in the coordinate queue for the scene thread.
+# - dispatch: building the scene update and waiting for the GUI thread.
+# - render: updating and rendering the viewers.
+LATENCY_STAGES = ("acquisition", "coregistration", "queue", "dispatch", "render")
+
+# Edges (in seconds) of the bins of the latency histograms, from 0.1 ms to
+# 1 s, each bin about 2.3% wider than the previous one. There is an extra bin
+# before the first and after the last edge.
+LATENCY_HISTOGRAM_EDGES = np.geomspace(1e-4, 1.0, 401)
+
+# Maximum number of records kept to save to CSV.
+LATENCY_MAX_RECORDS = 100000
+
+
+class PoseRecord:
+    """
+    Times (time.perf_counter) at which a pose read from the tracker passed
+    through the stages of the navigation. sequence is the number of the pose
+    in the tracker thread.
+    """
+
+    __slots__ = (
+        "sequence",
+        "started",
+        "acquired",
+        "coregistered",
+        "dequeued",
+        "delivered",
+        "rendered",
+    )
+
+    def __init__(self, sequence: int, started: float, acquired: float):
+        self.sequence = sequence
+        self.started = started
+        self.acquired = acquired
+        self.coregistered: Optional[float] = None
+        self.dequeued: Optional[float] = None
+        self.delivered: Optional[float] = None
+        self.rendered: Optional[float] = None
+
+    def get_latencies(self) -> Tuple[float, ...]:
+        """
+        Returns the latency (in seconds) of each stage of LATENCY_STAGES and
+        the total latency. The record must have passed through all of them.
+        """
+        times = (
+            self.started,
+            self.acquired,
+            self.coregistered,
+            self.dequeued,
+            self.delivered,
+            self.rendered,
+        )
+        return (*(t1 - t0 for t0, t1 in zip(times[:-1], times[1:])), self.rendered - self.started)
+
+
+def get_histogram_percentile(counts: np.ndarray, minimum: float, maximum: float, q: float) -> float:
+    """
+    Returns the q-th percentile of the latencies counted in a histogram with
+    the bins of LATENCY_HISTOGRAM_EDGES, interpolated linearly inside the
+    bin. minimum and maximum are the smallest and largest latencies, which
+    narrow the first and last bins with latencies, so the percentile is
+    never out of their range.
+    """
+    cumulative = np.cumsum(counts)
+    position = q / 100.0 * cumulative[-1]
+    i = min(int(np.searchsorted(cumulative, position, side="left")), len(counts) - 1)
+    lower = 0.0 if i == 0 else LATENCY_HISTOGRAM_EDGES[i - 1]
+    upper = maximum if i == len(counts) - 1 else LATENCY_HISTOGRAM_EDGES[i]
+    lower, upper = max(lower, minimum), min(upper, maximum)
+    before = cumulative[i - 1] if i else 0
+    fraction = (position - before) / counts[i] if counts[i] else 0.0
+    return float(np.clip(lower + fraction * (upper - lower), minimum, maximum))
+
+
+class LatencyMonitor:
+    """
+    Collects the records of the rendered poses. The methods can be called
+    from any thread.
+    """
+
+    def __init__(self, max_records: int = LATENCY_MAX_RECORDS):
+        self._lock = threading.Lock()
+        # sequence, time the pose was read and the latencies of each record.
+        self.records = collections.deque(maxlen=max_records)
+        self.histograms = np.zeros(
+            (len(LATENCY_STAGES) + 1, len(LATENCY_HISTOGRAM_EDGES) + 1), dtype=np.int64
+        )
+        # Running sums, sums of squares, minima and maxima of the latencies of
+        # each stage and the total, so the statistics don't need the records.
+        self.sums = np.zeros(len(LATENCY_STAGES) + 1)
+        self.sums_squares = np.zeros(len(LATENCY_STAGES) + 1)
+        self.minima = np.full(len(LATENCY_STAGES) + 1, np.inf)
+        self.maxima = np.zeros(len(LATENCY_STAGES) + 1)
+        self.dropped = dict.fromkeys(LATENCY_STAGES, 0)
+        self.rendered_count = 0
+        self.start_time: Optional[float] = None
+
+    def add(self, record: PoseRecord) -> None:
+        latencies = record.get_latencies()
+        values = np.array(latencies)
+        bins = np.searchsorted(LATENCY_HISTOGRAM_EDGES, values, side="right")
+        with self._lock:
+            if self.start_time is None:
+                self.start_time = record.started
+            self.records.append((record.sequence, record.started - self.start_time, *latencies))
+            self.histograms[np.arange(len(values)), bins] += 1
+            self.sums += values
+            self.sums_squares += values * values
+            np.minimum(self.minima, values, out=self.minima)
+            np.maximum(self.maxima, values, out=self.maxima)
+            self.rendered_count += 1
+
+    def drop(self, stage: str, count: int = 1) -> None:
+        """
+        Counts count poses dropped in stage, i.e. replaced by newer poses
+        before passing to the next stage.
+        """
+        if count > 0:
+            with self._lock:
+                self.dropped[stage] += count
+
+    def get_statistics(self) -> Dict:
+        """
+        Returns a dict with, for each stage and for the total ("total"), the
+        mean, standard deviation (jitter), median, 95th percentile and
+        maximum of the latency in seconds and the histogram counts. Also has
+        the number of rendered poses ("rendered"), the number of poses
+        dropped in each stage ("dropped") and the edges of the histogram
+        bins ("histogram_edges").
+
+        The statistics come from the histograms and running sums, so this is
+        cheap enough to call from the GUI thread. The percentiles are
+        interpolated inside the histogram bins, within the range of the
+        latencies.
+        """
+        with self._lock:
+            n = self.rendered_count
+            histograms = self.histograms.copy()
+            sums = self.sums.copy()
+            sums_squares = self.sums_squares.copy()
+            minima = self.minima.copy()
+            maxima = self.maxima.copy()
+            statistics = {
+                "rendered": n,
+                "dropped": dict(self.dropped),
+                "histogram_edges": LATENCY_HISTOGRAM_EDGES,
+            }
+
+        for i, stage in enumerate((*LATENCY_STAGES, "total")):
+            if n:
+                mean = sums[i] / n
+                variance = max(sums_squares[i] / n - mean * mean, 0.0)
+                stage_statistics = {
+                    "mean": float(mean),
+                    "std": float(np.sqrt(variance)),
+                    "p50": get_histogram_percentile(histograms[i], minima[i], maxima[i], 50),
+                    "p95": get_histogram_percentile(histograms[i], minima[i], maxima[i], 95),
+                    "max": float(maxima[i]),
+                }
+            else:
+                stage_statistics = dict.fromkeys(("mean", "std", "p50", "p95", "max"), 0.0)
+            stage_statistics["histogram"] = histograms[i]
+            statistics[stage] = stage_statistics
+        return statistics
+
+    def save_csv(self, filename: str) -> None:
+        """
+        Saves the records to a CSV file, one row for each rendered pose with
+        its sequence, the time it was read (relative to the first pose) and
+        the latencies, all times in milliseconds.
+        """
+        with self._lock:
+            records = np.array(self.records, dtype=np.float64).reshape(-1, len(LATENCY_STAGES) + 3)
+        records[:, 1:] *= 1000.0
+        np.savetxt(
+            filename,
+            records,
+            delimiter=",",
+            fmt=["%d"] + ["%.4f"] * (records.shape[1] - 1),
+            header=", ".join(("sequence", "time", *LATENCY_STAGES, "total")),
+            comments="",
+        )
@@ -0,0 +1,156 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Headless benchmark of the navigation latency. The tracker and
+co-registration threads of the navigation run with a debug tracker, while
+the scene thread and the GUI thread are replaced by threads that only pass
+the poses along, so it runs without the GUI or a registered image.
+
+    python -m invesalius.navigation.latency_benchmark --tracker approach --duration 10
+"""
+
+import argparse
+import queue
+import threading
+import time
+import types
+from typing import Optional
+
+import numpy as np
+
+import invesalius.constants as const
+import invesalius.data.coordinates as dco
+import invesalius.data.coregistration as dcr
+from invesalius.data.tracker_connection import TRACKER_CONNECTION_CLASSES
+from invesalius.navigation.latency import LATENCY_STAGES, LatencyMonitor
+from invesalius.navigation.navigation import FrameScheduler, QueueCustom
+
+BENCHMARK_TRACKERS = {
+    "random": const.DEBUGTRACKRANDOM,
+    "approach": const.DEBUGTRACKAPPROACH,
+}
+
+
+def run_benchmark(
+    tracker_id: int = const.DEBUGTRACKRANDOM,
+    duration: float = 10.0,
+    sleep_coord: Optional[float] = None,
+) -> LatencyMonitor:
+    """
+    Runs the navigation with the debug tracker tracker_id for duration
+    seconds and returns the latency monitor with the records of the poses.
+    sleep_coord replaces the interval between the tracker reads of the
+    session.
+    """
+    event = threading.Event()
+    latency_monitor = LatencyMonitor()
+
+    tracker_connection = TRACKER_CONNECTION_CLASSES[tracker_id]()
+    tracker_connection.Connect()
+    tracker_coordinates = dco.TrackerCoordinates(publish=False)
+    receive_coordinates = dco.ReceiveCoordinates(
+        tracker_connection, tracker_id, tracker_coordinates, event
+    )
+    if sleep_coord is not None:
+        receive_coordinates.sleep_coord = sleep_coord
+
+    # A single coil in the marker 2, with identity registrations.
+    obj_datas = {"coil": (2, *(np.identity(4) for _ in range(6)))}
+    coord_queue = QueueCustom(maxsize=1)
+    queues = [coord_queue, QueueCustom(maxsize=1), QueueCustom(maxsize=1), QueueCustom(maxsize=1)]
+    target = np.zeros(6) if tracker_id == const.DEBUGTRACKAPPROACH else None
+    coordinate_corregistrate = dcr.CoordinateCorregistrate(
+        const.DEFAULT_REF_MODE,
+        types.SimpleNamespace(TrackerCoordinates=tracker_coordinates),
+        (np.identity(4), None),
+        obj_datas,
+        False,
+        queues,
+        event,
+        tracker_id,
+        target,
+        types.SimpleNamespace(use_icp=False, m_icp=None),
+        False,
+        latency_monitor=latency_monitor,
+    )
+
+    # The calls scheduled in the GUI thread.
+    gui_calls = queue.Queue()
+    frame_scheduler = FrameScheduler(latency_monitor, call_after=gui_calls.put)
+
+    def update_scene():
+        while not event.is_set():
+            try:
+                coords, marker_visibilities, m_imgs, record = coord_queue.get(
+                    timeout=const.NAVIGATION_WAIT_TIMEOUT
+                )
+            except queue.Empty:
+                continue
+            record.dequeued = time.perf_counter()
+            frame_scheduler.submit({"Set cross focal point": {"position": coords["probe"]}}, record)
+            coord_queue.task_done()
+
+    def gui_loop():
+        while not event.is_set():
+            try:
+                call = gui_calls.get(timeout=const.NAVIGATION_WAIT_TIMEOUT)
+            except queue.Empty:
+                continue
+            call()
+
+    threads = [
+        receive_coordinates,
+        coordinate_corregistrate,
+        threading.Thread(target=update_scene, name="UpdateSceneBenchmark"),
+        threading.Thread(target=gui_loop, name="GUIBenchmark"),
+    ]
+    for thread in threads:
+        thread.start()
+    event.wait(duration)
+    event.set()
+    for thread in threads:
+        thread.join()
+    tracker_connection.Disconnect()
+
+    return latency_monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the navigation latency.")
+    parser.add_argument("--tracker", choices=BENCHMARK_TRACKERS, default="random")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--sleep-coord", type=float, help="seconds between the tracker reads")
+    parser.add_argument("--csv", help="save the latency of each pose to this file")
+    args = parser.parse_args()
+
+    latency_monitor = run_benchmark(
+        BENCHMARK_TRACKERS[args.tracker], args.duration, args.sleep_coord
+    )
+    statistics = latency_monitor.get_statistics()
+    print("Poses rendered:", statistics["rendered"], "dropped:", statistics["dropped"])
+    print("Latency (ms)        mean     std     p50     p95     max")
+    for stage in (*LATENCY_STAGES, "total"):
+        values = [statistics[stage][k] * 1000 for k in ("mean", "std", "p50", "p95", "max")]
+        print(f"{stage:16}" + "".join(f"{v:8.2f}" for v in values))
+    if args.csv:
+        latency_monitor.save_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@
 
 import queue
 import threading
-from time import sleep
+import time
 
 import numpy as np
 import wx
@@ -41,6 +41,7 @@ from invesalius.data.visualization.mep_visualizer import MEPVisualizer
 from invesalius.i18n import tr as _
 from invesalius.navigation.image import Image
 from invesalius.navigation.iterativeclosestpoint import IterativeClosestPoint
+from invesalius.navigation.latency import LatencyMonitor
 from invesalius.navigation.markers import MarkersControl
 from invesalius.navigation.robot import Robot
 from invesalius.navigation.tracker import Tracker
@@ -77,12 +78,38 @@ class QueueCustom(queue.Queue):
     """
     A custom queue subclass that provides a :meth:`clear` method.
     https://stackoverflow.com/questions/6517953/clear-all-items-from-the-queue
-    Modified to a LIFO Queue type (Last-in-first-out). Seems to make sense for the navigation
-    threads, as the last added coordinate should be the first to be processed.
-    In the first tests in a short run, seems to increase the coord queue size considerably,
-    possibly limiting the queue size is good.
+
+    When the queue is full, putting an item replaces the oldest one instead of blocking or
+    raising queue.Full, so the navigation threads waiting on get always receive the latest
+    data. The time each item waited in the queue is kept to measure the latency between the
+    navigation threads.
     """
 
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.put_count = 0
+        self.dropped_count = 0
+        self.last_wait_time = 0.0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize():
+                self.queue.popleft()
+                self.unfinished_tasks -= 1
+                self.dropped_count += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.put_count += 1
+            self.not_empty.notify()
+
+    def _put(self, item):
+        self.queue.append((time.perf_counter(), item))
+
+    def _get(self):
+        put_time, item = self.queue.popleft()
+        self.last_wait_time = time.perf_counter() - put_time
+        return item
+
     def clear(self):
         """
         Clears all items from the queue.
@@ -99,11 +126,84 @@ class QueueCustom(queue.Queue):
             self.not_full.notify_all()
 
 
+class FrameScheduler:
+    """
+    Coalesces the scene updates of the navigation into frames delivered to the GUI thread.
+
+    A frame is a dict of Publisher messages (topic: keyword arguments) with the latest state of
+    the scene. While a frame waits to be delivered, the new ones are merged into it, the newer
+    messages replacing the older ones with the same topic, so the GUI thread only gets a single
+    update (followed by a single render of the viewers) however far it falls behind.
+
+    With a latency monitor, the pose record of each frame is finished when it is rendered, and the
+    latency statistics are sent to "Navigation latency" every const.NAVIGATION_LATENCY_INTERVAL
+    seconds. call_after schedules the delivery in the GUI thread, wx.CallAfter by default.
+    """
+
+    def __init__(self, latency_monitor=None, call_after=None):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._record = None
+        self.rendered_count = 0
+        self.dropped_count = 0
+        self.latency_monitor = latency_monitor
+        self.call_after = call_after
+        self.last_latency_time = time.perf_counter()
+
+    def submit(self, frame, record=None):
+        with self._lock:
+            if self._frame is None:
+                self._frame = dict(frame)
+                schedule = True
+            else:
+                self._frame.update(frame)
+                self.dropped_count += 1
+                schedule = False
+            self._record = record
+        if not schedule:
+            if self.latency_monitor is not None:
+                self.latency_monitor.drop("dispatch")
+        elif self.call_after is not None:
+            self.call_after(self.deliver)
+        else:
+            # use of CallAfter is mandatory otherwise crashes the wx interface
+            wx.CallAfter(self.deliver)
+
+    def deliver(self):
+        with self._lock:
+            frame, self._frame = self._frame, None
+            record, self._record = self._record, None
+        if frame is None:
+            return
+        if record is not None:
+            record.delivered = time.perf_counter()
+        for topic, kwargs in frame.items():
+            Publisher.sendMessage(topic, **kwargs)
+
+        # Render the volume viewer and the slice viewers.
+        Publisher.sendMessage("Render volume viewer")
+        Publisher.sendMessage("Update slice viewer")
+        self.rendered_count += 1
+
+        if record is not None and self.latency_monitor is not None:
+            record.rendered = time.perf_counter()
+            self.latency_monitor.add(record)
+            if record.rendered - self.last_latency_time >= const.NAVIGATION_LATENCY_INTERVAL:
+                self.last_latency_time = record.rendered
+                Publisher.sendMessage(
+                    "Navigation latency", statistics=self.latency_monitor.get_statistics()
+                )
+
+
 class UpdateNavigationScene(threading.Thread):
-    def __init__(self, vis_queues, vis_components, event, sle, neuronavigation_api):
+    def __init__(
+        self, vis_queues, vis_components, event, sle, neuronavigation_api, frame_scheduler=None
+    ):
         """Class (threading) to update the navigation scene with all graphical elements.
 
-        Sleep function in run method is used to avoid blocking GUI and more fluent, real-time navigation
+        The thread waits for new coordinates in the coordinate queue and updates the scene as soon as
+        they arrive, but at most once every sle seconds to avoid blocking the GUI. As the queue keeps
+        only the latest coordinates, the ones received while waiting are skipped.
 
         :param affine_vtk: Affine matrix in vtkMatrix4x4 instance to update objects position in 3D scene
         :type affine_vtk: vtkMatrix4x4
@@ -111,10 +211,12 @@ class UpdateNavigationScene(threading.Thread):
         :type visualization_queue: queue.Queue
         :param event: Threading event to coordinate when tasks as done and allow UI release
         :type event: threading.Event
-        :param sle: Sleep pause in seconds
+        :param sle: Minimum interval in seconds between the scene updates
         :type sle: float
         :param neuronavigation_api: An API object for communicating the coil position.
         :type neuronavigation_api: invesalius.net.neuronavigation_api.NeuronavigationAPI
+        :param frame_scheduler: Scheduler that delivers the scene updates to the GUI thread
+        :type frame_scheduler: FrameScheduler
         """
 
         threading.Thread.__init__(self, name="UpdateScene")
@@ -135,14 +237,26 @@ class UpdateNavigationScene(threading.Thread):
         self.sle = sle
         self.event = event
         self.neuronavigation_api = neuronavigation_api
+        self.frame_scheduler = frame_scheduler or FrameScheduler()
         self.navigation = Navigation()
 
     def run(self):
+        last_update = -self.sle
         while not self.event.is_set():
+            remaining = last_update + self.sle - time.perf_counter()
+            if remaining > 0:
+                self.event.wait(remaining)
+                continue
+
             got_coords = False
             try:
-                coords, marker_visibilities, m_imgs = self.coord_queue.get_nowait()
+                coords, marker_visibilities, m_imgs, record = self.coord_queue.get(
+                    timeout=const.NAVIGATION_WAIT_TIMEOUT
+                )
                 got_coords = True
+                if record is not None:
+                    record.dequeued = time.perf_counter()
+                last_update = time.perf_counter()
 
                 probe_visible = marker_visibilities[0]
                 coil_visible = any(marker_visibilities[2:])  # is any coil visible?
@@ -156,26 +270,25 @@ class UpdateNavigationScene(threading.Thread):
                 probe_coord = coords.pop("probe")
                 probe_m_img = m_imgs.pop("probe")
 
-                # use of CallAfter is mandatory otherwise crashes the wx interface
+                frame = {}
                 if self.view_tracts:
                     bundle, affine_vtk, coord_offset, coord_offset_w = (
                         self.tracts_queue.get_nowait()
                     )
                     # TODO: Check if possible to combine the Remove tracts with Update tracts in a single command
-                    wx.CallAfter(Publisher.sendMessage, "Remove tracts")
-                    wx.CallAfter(
-                        Publisher.sendMessage,
-                        "Update tracts",
-                        root=bundle,
-                        affine_vtk=affine_vtk,
-                        coord_offset=coord_offset,
-                        coord_offset_w=coord_offset_w,
-                    )
+                    frame["Remove tracts"] = {}
+                    frame["Update tracts"] = {
+                        "root": bundle,
+                        "affine_vtk": affine_vtk,
+                        "coord_offset": coord_offset,
+                        "coord_offset_w": coord_offset_w,
+                    }
                     self.tracts_queue.task_done()
 
                 if self.serial_port_enabled:
                     trigger_on = self.serial_port_queue.get_nowait()
                     if trigger_on:
+                        # A marker for each trigger, so it is not coalesced with the scene updates.
                         wx.CallAfter(
                             Publisher.sendMessage, "Create marker", marker_type=MarkerType.COIL_POSE
                         )
@@ -185,69 +298,51 @@ class UpdateNavigationScene(threading.Thread):
                 # see the red cross in the position of the offset marker
 
                 # Update the slice viewers to show the current position of the tracked object.
-                wx.CallAfter(Publisher.sendMessage, "Update slices position", position=coord[:3])
+                frame["Update slices position"] = {"position": coord[:3]}
 
                 # Update the cross position to the current position of the tracked object, so that, e.g., when a
                 # new marker is created, it is created in the current position of the object.
-                wx.CallAfter(Publisher.sendMessage, "Set cross focal point", position=coord)
+                frame["Set cross focal point"] = {"position": coord}
 
-                wx.CallAfter(
-                    Publisher.sendMessage,
-                    "Update volume viewer pointer",
-                    position=[coord[0], -coord[1], coord[2]],
-                )
+                frame["Update volume viewer pointer"] = {
+                    "position": [coord[0], -coord[1], coord[2]]
+                }
 
                 if coil_visible:
                     # Check pubsub "Update coil pose" dependencies
-                    wx.CallAfter(
-                        Publisher.sendMessage, "Update coil poses", m_imgs=m_imgs, coords=coords
-                    )
-                    wx.CallAfter(  # LUKATODO: this is just for viewer_volume... which will be updated later to support multicoil (target, tracts & efield)
-                        Publisher.sendMessage,
-                        "Update coil pose",
-                        m_img=m_imgs[main_coil],
-                        coord=coords[main_coil],
-                    )
-                    wx.CallAfter(
-                        Publisher.sendMessage,
-                        "Update object arrow matrix",
-                        m_img=m_imgs[main_coil],
-                        coord=coords[main_coil],
-                        flag=self.peel_loaded,
-                    )
+                    frame["Update coil poses"] = {"m_imgs": m_imgs, "coords": coords}
+                    # LUKATODO: this is just for viewer_volume... which will be updated later to support multicoil (target, tracts & efield)
+                    frame["Update coil pose"] = {
+                        "m_img": m_imgs[main_coil],
+                        "coord": coords[main_coil],
+                    }
+                    frame["Update object arrow matrix"] = {
+                        "m_img": m_imgs[main_coil],
+                        "coord": coords[main_coil],
+                        "flag": self.peel_loaded,
+                    }
 
                     if self.e_field_loaded:
-                        wx.CallAfter(
-                            Publisher.sendMessage,
-                            "Update point location for e-field calculation",
-                            m_img=m_imgs[main_coil],
-                            coord=coords[main_coil],
-                            queue_IDs=self.e_field_IDs_queue,
-                        )
+                        frame["Update point location for e-field calculation"] = {
+                            "m_img": m_imgs[main_coil],
+                            "coord": coords[main_coil],
+                            "queue_IDs": self.e_field_IDs_queue,
+                        }
                         try:
                             enorm_data = self.e_field_norms_queue.get_nowait()
-                            wx.CallAfter(
-                                Publisher.sendMessage,
-                                "Get enorm",
-                                enorm_data=enorm_data,
-                                plot_vector=self.plot_efield_vectors,
-                            )
+                            frame["Get enorm"] = {
+                                "enorm_data": enorm_data,
+                                "plot_vector": self.plot_efield_vectors,
+                            }
                         except queue.Empty:
                             pass
                         else:
                             self.e_field_norms_queue.task_done()
 
                 if probe_visible:
-                    wx.CallAfter(
-                        Publisher.sendMessage,
-                        "Update probe pose",
-                        m_img=probe_m_img,
-                        coord=probe_coord,
-                    )
+                    frame["Update probe pose"] = {"m_img": probe_m_img, "coord": probe_coord}
 
-                # Render the volume viewer and the slice viewers.
-                wx.CallAfter(Publisher.sendMessage, "Render volume viewer")
-                wx.CallAfter(Publisher.sendMessage, "Update slice viewer")
+                self.frame_scheduler.submit(frame, record)
 
                 self.coord_queue.task_done()
 
@@ -255,8 +350,6 @@ class UpdateNavigationScene(threading.Thread):
                 if got_coords:
                     self.coord_queue.task_done()
 
-            sleep(self.sle)
-
 
 class Navigation(metaclass=Singleton):
     def __init__(self, pedal_connector, neuronavigation_api):
@@ -283,6 +376,8 @@ class Navigation(metaclass=Singleton):
         self.serial_port_queue = QueueCustom(maxsize=1)
         self.coord_tracts_queue = QueueCustom(maxsize=1)
         self.tracts_queue = QueueCustom(maxsize=1)
+        self.latency_monitor = LatencyMonitor()
+        self.frame_scheduler = FrameScheduler(self.latency_monitor)
 
         # Tracker parameters
         self.ref_mode_id = const.DEFAULT_REF_MODE
@@ -330,6 +425,7 @@ class Navigation(metaclass=Singleton):
         Publisher.subscribe(self.SelectCoil, "Select coil")
         Publisher.subscribe(self.UpdateSerialPort, "Update serial port")
         Publisher.subscribe(self.TrackObject, "Track object")
+        Publisher.subscribe(self.SaveLatency, "Save navigation latency")
 
     def SaveConfig(self, key=None, value=None):
         """
@@ -415,6 +511,11 @@ class Navigation(metaclass=Singleton):
         self.track_coil = enabled
         self.SaveConfig()
 
+    def SaveLatency(self, filename):
+        # Latency of each pose rendered in the last (or current) navigation, see
+        # LatencyMonitor.save_csv.
+        self.latency_monitor.save_csv(filename)
+
     def SetLockToTarget(self, value):
         self.lock_to_target = value
 
@@ -513,6 +614,8 @@ class Navigation(metaclass=Singleton):
         if self.event.is_set():
             self.event.clear()
 
+        self.latency_monitor = LatencyMonitor()
+
         vis_components = [
             self.serial_port_in_use,
             self.view_tracts,
@@ -596,11 +699,11 @@ class Navigation(metaclass=Singleton):
                     self.view_tracts,
                     queues,
                     self.event,
-                    self.sleep_nav,
                     tracker.tracker_id,
                     self.target,
                     icp,
                     self.e_field_loaded,
+                    latency_monitor=self.latency_monitor,
                 )
             )
 
@@ -637,13 +740,9 @@ class Navigation(metaclass=Singleton):
                 # print("Appending the tract computation thread!")
                 queues = [self.coord_tracts_queue, self.tracts_queue]
                 if self.enable_act:
-                    jobs_list.append(
-                        dti.ComputeTractsACTThread(self.trk_inp, queues, self.event, self.sleep_nav)
-                    )
+                    jobs_list.append(dti.ComputeTractsACTThread(self.trk_inp, queues, self.event))
                 else:
-                    jobs_list.append(
-                        dti.ComputeTractsThread(self.trk_inp, queues, self.event, self.sleep_nav)
-                    )
+                    jobs_list.append(dti.ComputeTractsThread(self.trk_inp, queues, self.event))
 
             if self.e_field_loaded:
                 queues = [self.efield_queue, self.e_field_norms_queue, self.e_field_IDs_queue]
@@ -651,13 +750,13 @@ class Navigation(metaclass=Singleton):
                     e_field.Visualize_E_field_Thread(
                         queues,
                         self.event,
-                        2 * self.sleep_nav,
                         self.neuronavigation_api,
                         self.debug_efield_enorm,
                         self.plot_efield_vectors,
                     )
                 )
 
+            self.frame_scheduler = FrameScheduler(self.latency_monitor)
             jobs_list.append(
                 UpdateNavigationScene(
                     vis_queues=vis_queues,
@@ -665,6 +764,7 @@ class Navigation(metaclass=Singleton):
                     event=self.event,
                     sle=self.sleep_nav,
                     neuronavigation_api=self.neuronavigation_api,
+                    frame_scheduler=self.frame_scheduler,
                 )
             )
 
@@ -683,6 +783,10 @@ class Navigation(metaclass=Singleton):
         self.coord_queue.clear()
         self.coord_queue.join()
 
+        Publisher.sendMessage(
+            "Navigation latency", statistics=self.latency_monitor.get_statistics()
+        )
+
         if self.serial_port_connection is not None:
             self.serial_port_connection.join()
 
@@ -23,26 +23,38 @@ import time
 import socketio
 import wx
 
+from invesalius.net.remote_transport import REMOTE_TOPICS, RemoteTransport, decode
 from invesalius.pubsub import pub as Publisher
 
 
 class RemoteControl:
-    def __init__(self, remote_host):
+    def __init__(self, remote_host, topics=REMOTE_TOPICS, batch=False):
+        """
+        :param remote_host: Address and port of the remote host
+        :param topics: Topics (fnmatch patterns) of the messages sent to the remote host
+        :param batch: Send the messages in batches, a "from_neuronavigation_batch" event with the
+            list of messages, instead of a "from_neuronavigation" event for each message
+        """
         self._remote_host = remote_host
         self._connected = False
         self._sio = None
+        self._batch = batch
+        self._transport = RemoteTransport(self._emit, topics)
 
     def _on_connect(self):
         print("Connected to {}".format(self._remote_host))
         self._connected = True
+        # Also restarts the transport, closed on disconnect, when the client reconnects.
+        self._transport.start()
 
     def _on_disconnect(self):
         print("Disconnected")
         self._connected = False
+        self._transport.close()
 
     def _to_neuronavigation(self, msg):
         topic = msg["topic"]
-        data = msg["data"]
+        data = decode(msg["data"])
         if data is None:
             data = {}
 
@@ -54,12 +66,27 @@ class RemoteControl:
         # Socket.IO listener runs inside a thread. (See WxPython and thread-safety for more information.)
         wx.CallAfter(self._to_neuronavigation, msg)
 
+    def _to_neuronavigation_batch_wrapper(self, msg):
+        for message in msg["messages"]:
+            wx.CallAfter(self._to_neuronavigation, message)
+
+    def _emit(self, messages):
+        try:
+            if self._batch:
+                self._sio.emit("from_neuronavigation_batch", {"messages": messages})
+            else:
+                for message in messages:
+                    self._sio.emit("from_neuronavigation", message)
+        except socketio.exceptions.BadNamespaceError:
+            pass
+
     def connect(self):
         self._sio = socketio.Client()
 
         self._sio.on("connect", self._on_connect)
         self._sio.on("disconnect", self._on_disconnect)
         self._sio.on("to_neuronavigation", self._to_neuronavigation_wrapper)
+        self._sio.on("to_neuronavigation_batch", self._to_neuronavigation_batch_wrapper)
 
         self._sio.connect(self._remote_host)
         self._sio.emit("restart_robot_main_loop")
@@ -68,20 +95,6 @@ class RemoteControl:
             print("Connecting...")
             time.sleep(1.0)
 
-        def _emit(topic, data):
-            # print("Emitting data {} to topic {}".format(data, topic))
-            try:
-                if isinstance(topic, str):
-                    self._sio.emit(
-                        "from_neuronavigation",
-                        {
-                            "topic": topic,
-                            "data": data,
-                        },
-                    )
-            except TypeError:
-                pass
-            except socketio.exceptions.BadNamespaceError:
-                pass
-
-        Publisher.add_sendMessage_hook(_emit)
+        # Only the messages of the selected topics are sent, with the NumPy arrays as binary data.
+        # See remote_transport.py.
+        Publisher.add_sendMessage_hook(self._transport.send)
@@ -0,0 +1,235 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Transport of the Publisher messages to the remote host. Only the messages of
+the topics in an allowlist are sent. They are collected in batches sent
+together every REMOTE_BATCH_INTERVAL seconds, and the messages of the topics
+with a minimum interval are coalesced (only the latest one in a batch is
+sent) and rate limited. NumPy arrays in the messages are sent as binary
+data, the raw bytes with their dtype and shape.
+"""
+
+import collections
+import fnmatch
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Topics (fnmatch patterns) sent to the remote host.
+REMOTE_TOPICS = (
+    "Neuronavigation to Robot: *",
+    "From Neuronavigation: *",
+)
+
+# Minimum interval (in seconds) between the messages of these topics. Only
+# the latest message of each of them waiting to be sent is kept.
+REMOTE_TOPIC_INTERVALS = {
+    "From Neuronavigation: Update tracker poses": 0.0,
+    "Neuronavigation to Robot: Update displacement to target": 0.0,
+}
+
+# Interval (in seconds) between the batches of messages.
+REMOTE_BATCH_INTERVAL = 0.01
+
+# Key of the dicts that replace the NumPy arrays in the encoded messages.
+NDARRAY_KEY = "__ndarray__"
+
+Message = Dict[str, object]
+
+
+def encode(value):
+    """
+    Returns value with the NumPy arrays replaced by dicts with their dtype,
+    shape and bytes, and NumPy scalars by Python scalars, so it can be sent
+    by Socket.IO. Raises TypeError if value has other objects that can't be
+    sent.
+    """
+    if value is None or isinstance(value, (str, bool, int, float, bytes)):
+        return value
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("Arrays of objects can't be sent to the remote host")
+        return {
+            NDARRAY_KEY: value.dtype.str,
+            "shape": list(value.shape),
+            "data": np.ascontiguousarray(value).tobytes(),
+        }
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        encoded = {}
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise TypeError(f"Dict keys sent to the remote host must be str, not {key!r}")
+            encoded[key] = encode(item)
+        return encoded
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    raise TypeError(f"{type(value).__name__} can't be sent to the remote host")
+
+
+def decode(value):
+    """
+    Returns value with the dicts made by encode replaced by NumPy arrays.
+    """
+    if isinstance(value, dict):
+        if NDARRAY_KEY in value:
+            array = np.frombuffer(value["data"], dtype=np.dtype(value[NDARRAY_KEY]))
+            return array.reshape(value["shape"]).copy()
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+class RemoteTransport:
+    """
+    Sends the Publisher messages to the remote host in batches, see the
+    module docstring. send is the Publisher hook and emit is called, in the
+    thread of the transport, with each batch: a list of messages, dicts with
+    the topic and the encoded data.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[List[Message]], None],
+        topics: Iterable[str] = REMOTE_TOPICS,
+        intervals: Optional[Dict[str, float]] = None,
+        batch_interval: float = REMOTE_BATCH_INTERVAL,
+    ):
+        self.emit = emit
+        self.topics = tuple(topics)
+        self.intervals = REMOTE_TOPIC_INTERVALS if intervals is None else intervals
+        self.batch_interval = batch_interval
+
+        self._allowed: Dict[str, bool] = {}
+        self._last_sent: Dict[str, float] = {}
+        # Messages waiting to be sent. The coalesced messages are keyed by
+        # their topic, the others by a counter.
+        self._messages: "collections.OrderedDict[object, Message]" = collections.OrderedDict()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._failed_topics = set()
+
+        self.sent_count = 0
+        self.batch_count = 0
+        self.filtered_count = 0
+        self.coalesced_count = 0
+        self.failed_count = 0
+
+    def is_allowed(self, topic: str) -> bool:
+        try:
+            return self._allowed[topic]
+        except KeyError:
+            allowed = any(fnmatch.fnmatchcase(topic, pattern) for pattern in self.topics)
+            self._allowed[topic] = allowed
+            return allowed
+
+    def send(self, topic, data) -> None:
+        if not isinstance(topic, str) or not self.is_allowed(topic):
+            with self._condition:
+                self.filtered_count += 1
+            return
+        try:
+            message = {"topic": topic, "data": encode(data)}
+        except TypeError as e:
+            with self._condition:
+                self.failed_count += 1
+                first_failure = topic not in self._failed_topics
+                self._failed_topics.add(topic)
+            if first_failure:
+                print(f"Messages to topic '{topic}' not sent to the remote host: {e}")
+            return
+
+        with self._condition:
+            # The messages sent while the transport is closed (e.g. the remote host is
+            # disconnected) are discarded.
+            if self._closed:
+                return
+            if topic in self.intervals:
+                if self._messages.pop(topic, None) is not None:
+                    self.coalesced_count += 1
+                self._messages[topic] = message
+            else:
+                self._messages[next(self._counter)] = message
+            self._condition.notify()
+
+    def take_batch(self) -> List[Message]:
+        """
+        Removes and returns the messages that can be sent now. The coalesced
+        messages sent less than their topic's interval ago are kept.
+        """
+        now = time.perf_counter()
+        batch = []
+        with self._condition:
+            for key, message in list(self._messages.items()):
+                topic = message["topic"]
+                interval = self.intervals.get(topic)
+                if interval is not None:
+                    if now - self._last_sent.get(topic, -np.inf) < interval:
+                        continue
+                    self._last_sent[topic] = now
+                del self._messages[key]
+                batch.append(message)
+        return batch
+
+    def flush(self) -> None:
+        batch = self.take_batch()
+        if batch:
+            self.emit(batch)
+            self.sent_count += len(batch)
+            self.batch_count += 1
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._condition:
+            self._closed = False
+        self._thread = threading.Thread(target=self._run, name="RemoteTransport", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stops the thread of the transport after sending the messages that can
+        be sent now.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._messages or self._closed)
+                closed = self._closed
+            if not closed:
+                # Waits for more messages to send in the same batch.
+                time.sleep(self.batch_interval)
+            self.flush()
+            if closed:
+                return
@@ -18,13 +18,15 @@
 # --------------------------------------------------------------------------
 
 import datetime
+import gzip
 import os
 import plistlib
 import shutil
 import sys
 import tarfile
 import tempfile
-from typing import TYPE_CHECKING, Dict, List, Union
+import zlib
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 
 import numpy as np
 from vtkmodules.vtkCommonCore import vtkFileOutputWindow, vtkOutputWindow
@@ -32,6 +34,7 @@ from vtkmodules.vtkCommonCore import vtkFileOutputWindow, vtkOutputWindow
 import invesalius
 import invesalius.constants as const
 from invesalius import inv_paths
+from invesalius.data.image_statistics import ImageStatistics, compute_statistics
 from invesalius.gui.dialogs import ErrorMessageBox
 
 # from invesalius.data import imagedata_utils
@@ -52,6 +55,19 @@ if sys.platform == "win32":
 else:
     _has_win32api = False
 
+# Projects saved again to the same file only get the members that changed
+# appended to it (see SavePlistProject). The archive is written again from
+# scratch when the old copies of its members would make it larger than this
+# ratio of the size of its current members.
+ARCHIVE_COMPACT_RATIO = 1.5
+
+# End of the tar archive in compressed projects, a gzip member of its own so
+# it can be replaced by the members appended to the archive.
+TAR_GZIP_END = gzip.compress(b"\0" * (2 * tarfile.BLOCKSIZE), mtime=0)
+
+# Size of the chunks read when decompressing an incomplete archive.
+FILE_CHUNK_SIZE = 16 * 1024 * 1024
+
 
 # Only one project will be initialized per time. Therefore, we use
 # Singleton design pattern for implementing it
@@ -80,12 +96,22 @@ class Project(metaclass=Singleton):
 
         self.compress = False
 
+        # State of the .inv3 file last saved or opened, used to save only
+        # the members that changed, see SavePlistProject.
+        self.archive_state: Optional[Dict] = None
+        # Number of changes of the image matrix (flips, swaps of the axes and
+        # reorientations), so it's only saved again when it changed.
+        self.matrix_version = 0
+
         self.invesalius_version = invesalius.__version__
 
         self.presets = Presets()
 
         self.threshold_modes = self.presets.thresh_ct
         self.threshold_range = ""
+        # Histogram of the image, saved so opening the project doesn't need
+        # to read the whole image to calculate it again.
+        self.image_statistics: Optional[ImageStatistics] = None
 
         self.raycasting_preset = ""
 
@@ -238,6 +264,8 @@ class Project(metaclass=Singleton):
         }
         project["matrix"] = matrix
         filelist[self.matrix_filename] = "matrix.dat"
+        if self.image_statistics is not None:
+            project["image_statistics"] = self.image_statistics.to_dict()
         # shutil.copyfile(self.matrix_filename, filename_tmp)
 
         # Saving the masks
@@ -265,16 +293,34 @@ class Project(metaclass=Singleton):
         # Saving the annotations (empty in this version)
         project["annotations"] = {}
 
+        path = os.path.abspath(os.path.join(dir_, filename))
+        versions = self._get_member_versions(filelist)
+        sizes = {filelist[f]: os.path.getsize(f) for f in filelist}
+        changed, stale_size = self._get_changed_members(path, compress, filelist, versions, sizes)
+        # Size of the old copies of the members in the archive, so the next
+        # save (even after opening the project again) knows when to compact it.
+        project["archive_stale_size"] = stale_size
+
         # Saving the main plist
         temp_fd, temp_plist = tempfile.mkstemp()
         with open(temp_plist, "w+b") as f:
             plistlib.dump(project, f)
         filelist[temp_plist] = "main.plist"
+        sizes["main.plist"] = os.path.getsize(temp_plist)
         os.close(temp_fd)
 
-        # Compressing and generating the .inv3 file
-        path = os.path.join(dir_, filename)
-        Compress(dir_temp, path, filelist, compress)
+        if changed is None:
+            # Compressing and generating the .inv3 file
+            Compress(dir_temp, path, filelist, compress)
+            prefix = os.path.basename(dir_temp)
+        else:
+            # Only the members that changed (and main.plist) are added, the
+            # last copy of a member is the one extracted.
+            prefix = self.archive_state["prefix"]
+            changed[temp_plist] = "main.plist"
+            Append(path, prefix, changed, compress)
+
+        self._set_archive_state(path, compress, prefix, versions, sizes, stale_size)
 
         # Removing the temp folder.
         shutil.rmtree(dir_temp)
@@ -283,6 +329,75 @@ class Project(metaclass=Singleton):
             if filelist[f].endswith(".plist"):
                 os.remove(f)
 
+    def _get_member_versions(self, filelist):
+        """
+        Returns the version of each member of filelist (but main.plist): the
+        path and number of changes of the image and masks, the path of the
+        surfaces (their files aren't changed) and the content of the plists,
+        which are small and written on every save.
+        """
+        data_versions = {os.path.abspath(self.matrix_filename): self.matrix_version}
+        for mask in self.mask_dict.values():
+            data_versions[os.path.abspath(mask.temp_file)] = mask.version
+
+        versions = {}
+        for f, arcname in filelist.items():
+            if arcname.endswith(".plist"):
+                with open(f, "rb") as plist:
+                    versions[arcname] = plist.read()
+            else:
+                path = os.path.abspath(f)
+                versions[arcname] = (path, data_versions.get(path, 0))
+        return versions
+
+    def _get_changed_members(self, path, compress, filelist, versions, sizes):
+        """
+        Returns the members of filelist that changed since the project was
+        saved to (or opened from) path and the size of the old copies of the
+        members in the archive after appending them. The members are None if
+        the whole archive must be written: it's another file, it was modified
+        by someone else, its compression changed or it has too many old
+        copies of its members.
+        """
+        state = self.archive_state
+        if state is None or state["compress"] != compress or state["path"] != path:
+            return None, 0
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, 0
+        if (stat.st_mtime, stat.st_size) != state["stat"]:
+            return None, 0
+        if compress and not _has_tar_gzip_end(path):
+            return None, 0
+
+        changed = {
+            f: arcname
+            for f, arcname in filelist.items()
+            if state["versions"].get(arcname) != versions[arcname]
+        }
+        # The members replaced or removed, and main.plist, become old copies.
+        stale_size = state["stale_size"] + sum(
+            _get_member_size(size)
+            for arcname, size in state["sizes"].items()
+            if arcname not in sizes or arcname in changed.values() or arcname == "main.plist"
+        )
+        if stale_size > (ARCHIVE_COMPACT_RATIO - 1.0) * _get_tar_size(list(sizes.values())):
+            return None, 0
+        return changed, stale_size
+
+    def _set_archive_state(self, path, compress, prefix, versions, sizes, stale_size):
+        stat = os.stat(path)
+        self.archive_state = {
+            "path": path,
+            "compress": compress,
+            "prefix": prefix,
+            "stat": (stat.st_mtime, stat.st_size),
+            "versions": versions,
+            "sizes": sizes,
+            "stale_size": stale_size,
+        }
+
     def OpenPlistProject(self, filename):
         if not const.VTK_WARNING:
             log_path = os.path.join(inv_paths.USER_LOG_DIR, "vtkoutput.txt")
@@ -295,6 +410,25 @@ class Project(metaclass=Singleton):
         dirpath = os.path.abspath(os.path.split(filelist[0])[0])
         self.load_from_folder(dirpath)
 
+        # Projects saved by older versions don't have the size of the old
+        # copies of the members, so the first save writes the whole archive.
+        with open(os.path.join(dirpath, "main.plist"), "rb") as f:
+            stale_size = plistlib.load(f).get("archive_stale_size")
+        if stale_size is not None:
+            members = {f: os.path.basename(f) for f in filelist if os.path.isfile(f)}
+            main_plist = [f for f in members if members[f] == "main.plist"]
+            sizes = {members[f]: os.path.getsize(f) for f in members}
+            for f in main_plist:
+                del members[f]
+            self._set_archive_state(
+                os.path.abspath(filename),
+                _is_gzip(filename),
+                os.path.basename(dirpath),
+                self._get_member_versions(members),
+                sizes,
+                stale_size,
+            )
+
     def load_from_folder(self, dirpath):
         """
         Loads invesalius3 project files from dipath.
@@ -322,8 +456,13 @@ class Project(metaclass=Singleton):
         self.level = project["window_level"]
         self.threshold_range = project["scalar_range"]
         self.spacing = project["spacing"]
+        if project.get("image_statistics"):
+            self.image_statistics = ImageStatistics.from_dict(project["image_statistics"])
+        else:
+            self.image_statistics = None
 
         self.compress = project.get("compress", True)
+        self.archive_state = None
 
         # Opening the matrix containing the slices
         filepath: str = os.path.join(dirpath, project["matrix"]["filename"])
@@ -384,6 +523,7 @@ class Project(metaclass=Singleton):
         image,
         affine="",
         folder=None,
+        statistics=None,
     ):
         if folder is None:
             folder = tempfile.mkdtemp()
@@ -392,6 +532,8 @@ class Project(metaclass=Singleton):
         # image_file = os.path.join(folder, "matrix.dat")
         # image_mmap = imagedata_utils.array2memmap(image, image_file)
         matrix = {"filename": "matrix.dat", "shape": image.shape, "dtype": str(image.dtype)}
+        if statistics is None:
+            statistics = compute_statistics(image)
         project = {
             # Format info
             "format_version": const.INVESALIUS_ACTUAL_FORMAT_VERSION,
@@ -404,11 +546,12 @@ class Project(metaclass=Singleton):
             "orientation": orientation,
             "window_width": window_width,
             "window_level": window_level,
-            "scalar_range": (int(image.min()), int(image.max())),
+            "scalar_range": statistics.scalar_range,
             "spacing": spacing,
             "affine": affine,
             "image_fiducials": np.full([3, 3], np.nan).tolist(),
             "matrix": matrix,
+            "image_statistics": statistics.to_dict(),
         }
 
         path = os.path.join(folder, "main.plist")
@@ -499,19 +642,127 @@ def Compress(
     # os.chdir(tmpdir)
     # file_list = glob.glob(os.path.join(tmpdir_,"*"))
     if compress:
-        tar = tarfile.open(temp_inv3, "w:gz")
+        # The end of the archive goes in its own gzip member, so members can
+        # be appended to the archive (see Append).
+        with open(temp_inv3, "wb") as f:
+            with gzip.GzipFile(fileobj=f, mode="wb") as gz:
+                _write_tar_members(gz, tmpdir_, filelist)
+            f.write(TAR_GZIP_END)
     else:
         tar = tarfile.open(temp_inv3, "w")
+        for name in filelist:
+            sanit_name = os.path.normpath(filelist[name])  # Sanitizing path
+            if ".." in sanit_name or os.path.isabs(sanit_name):
+                continue
+
+            tar.add(name, arcname=os.path.join(tmpdir_, filelist[name]))
+        tar.close()
+    os.close(fd_inv3)
+    shutil.move(temp_inv3, filename)
+    # os.chdir(current_dir)
+
+
+def Append(
+    filename: Union[str, os.PathLike],
+    prefix: str,
+    filelist: Dict[Union[str, os.PathLike], Union[str, os.PathLike]],
+    compress: bool = False,
+) -> None:
+    """
+    Appends the files in filelist to the archive filename, in the folder
+    prefix. Compressed archives must end with TAR_GZIP_END (see Compress),
+    which is replaced by a gzip member with the files.
+
+    The archive is changed in place, so if anything fails its end is
+    restored. The data is synced to the disk before returning. If the save
+    is interrupted anyway (e.g. a crash), Extract opens the archive as it was
+    at the end of the last complete save.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, "r+b") as f:
+        # The end of the archive, the only part overwritten by the new members.
+        tail_start = max(size - 2 * tarfile.RECORDSIZE, 0)
+        f.seek(tail_start)
+        tail = f.read()
+        try:
+            if compress:
+                f.seek(-len(TAR_GZIP_END), os.SEEK_END)
+                f.truncate()
+                with gzip.GzipFile(fileobj=f, mode="wb") as gz:
+                    _write_tar_members(gz, prefix, filelist)
+                f.write(TAR_GZIP_END)
+            else:
+                f.seek(0)
+                with tarfile.open(fileobj=f, mode="a") as tar:
+                    for name in filelist:
+                        sanit_name = os.path.normpath(filelist[name])  # Sanitizing path
+                        if ".." in sanit_name or os.path.isabs(sanit_name):
+                            continue
+
+                        tar.add(name, arcname=os.path.join(prefix, filelist[name]))
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.seek(tail_start)
+            f.truncate()
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+            raise
+
+
+def _write_tar_members(
+    fileobj,
+    prefix: str,
+    filelist: Dict[Union[str, os.PathLike], Union[str, os.PathLike]],
+) -> None:
+    """
+    Writes the files in filelist as tar members, in the folder prefix,
+    without the end of the archive.
+    """
     for name in filelist:
         sanit_name = os.path.normpath(filelist[name])  # Sanitizing path
         if ".." in sanit_name or os.path.isabs(sanit_name):
             continue
 
-        tar.add(name, arcname=os.path.join(tmpdir_, filelist[name]))
-    tar.close()
-    os.close(fd_inv3)
-    shutil.move(temp_inv3, filename)
-    # os.chdir(current_dir)
+        tarinfo = tarfile.TarInfo(os.path.join(prefix, filelist[name]))
+        stat = os.stat(name)
+        tarinfo.size = stat.st_size
+        tarinfo.mtime = int(stat.st_mtime)
+        tarinfo.mode = stat.st_mode & 0o777
+        fileobj.write(tarinfo.tobuf(tarfile.DEFAULT_FORMAT, tarfile.ENCODING, "surrogateescape"))
+        with open(name, "rb") as f:
+            shutil.copyfileobj(f, fileobj)
+        fileobj.write(b"\0" * (_get_member_size(tarinfo.size) - tarfile.BLOCKSIZE - tarinfo.size))
+
+
+def _get_member_size(size: int) -> int:
+    """
+    Size of a file with size bytes in an uncompressed tar archive (header and
+    data padded to blocks).
+    """
+    return (1 + -(-size // tarfile.BLOCKSIZE)) * tarfile.BLOCKSIZE
+
+
+def _get_tar_size(sizes: List[int]) -> int:
+    """
+    Size of an uncompressed tar archive with files of the given sizes.
+    """
+    size = sum(_get_member_size(s) for s in sizes) + 2 * tarfile.BLOCKSIZE
+    return -(-size // tarfile.RECORDSIZE) * tarfile.RECORDSIZE
+
+
+def _is_gzip(filename: Union[str, os.PathLike]) -> bool:
+    with open(filename, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
+def _has_tar_gzip_end(filename: Union[str, os.PathLike]) -> bool:
+    with open(filename, "rb") as f:
+        if f.seek(0, os.SEEK_END) < len(TAR_GZIP_END):
+            return False
+        f.seek(-len(TAR_GZIP_END), os.SEEK_END)
+        return f.read() == TAR_GZIP_END
 
 
 def custom_tar_filter(file: tarfile.TarInfo, path: Union[str, os.PathLike]):
@@ -533,12 +784,75 @@ def Extract(filename: Union[str, bytes, os.PathLike], folder: Union[str, bytes,
     if _has_win32api:
         folder = win32api.GetShortPathName(folder)
     folder = decode(folder, const.FS_ENCODE)
-    tar = tarfile.open(filename, "r")
-    idir = decode(os.path.split(tar.getnames()[0])[0], "utf8")
+    try:
+        with tarfile.open(filename, "r") as tar:
+            return _extract_members(tar, tar.getmembers(), folder)
+    except (EOFError, zlib.error, tarfile.ReadError) as err:
+        debug(f"Archive {filename} is incomplete ({err}), opening its last complete save")
+
+    # An incremental save (see Append) was interrupted: the members after the
+    # last main.plist, which is the last member of each save, are left out.
+    if _is_gzip(filename):
+        fd, data_filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with open(data_filename, "w+b") as data:
+                _decompress_complete_gzip_members(filename, data)
+            return _extract_last_complete_save(data_filename, folder)
+        finally:
+            os.remove(data_filename)
+    return _extract_last_complete_save(filename, folder)
+
+
+def _decompress_complete_gzip_members(filename: Union[str, bytes, os.PathLike], data) -> None:
+    """
+    Writes to the file data the decompressed content of the gzip members of
+    filename, up to the last one that is complete.
+    """
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    complete_size = 0
+    with open(filename, "rb") as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            try:
+                while chunk:
+                    data.write(decompressor.decompress(chunk))
+                    if not decompressor.eof:
+                        break
+                    complete_size = data.tell()
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+            except zlib.error:
+                break
+    data.truncate(complete_size)
+
+
+def _extract_last_complete_save(filename: Union[str, bytes, os.PathLike], folder: str):
+    size = os.path.getsize(filename)
+    with tarfile.open(filename, "r:") as tar:
+        members = []
+        try:
+            for t in tar:
+                members.append(t)
+        except (EOFError, tarfile.ReadError):
+            pass
+        complete = [t for t in members if t.offset_data + t.size <= size]
+        ends = [i for i, t in enumerate(complete) if os.path.basename(t.name) == "main.plist"]
+        if not ends:
+            raise tarfile.ReadError(f"{filename} has no complete save")
+        return _extract_members(tar, complete[: ends[-1] + 1], folder)
+
+
+def _extract_members(tar: tarfile.TarFile, members: List[tarfile.TarInfo], folder: str):
+    idir = decode(os.path.split(members[0].name)[0], "utf8")
     os.makedirs(os.path.join(folder, idir), exist_ok=True)
     filelist = []
     tar_filter = getattr(tarfile, "tar_filter", None)
-    for t in tar.getmembers():
+    # Archives saved incrementally may have several copies of a member, only
+    # the last one is extracted.
+    last_members = {t.name: t for t in members}
+    for t in members:
+        if last_members[t.name] is not t:
+            continue
         try:
             tar.extract(t, path=folder, filter=tar_filter)
             fname = os.path.join(folder, decode(t.name, "utf-8"))
@@ -550,7 +864,6 @@ def Extract(filename: Union[str, bytes, os.PathLike], folder: Union[str, bytes,
                 fname = os.path.join(folder, decode(filtered.name, "utf-8"))
                 filelist.append(fname)
 
-    tar.close()
     return filelist
 
 
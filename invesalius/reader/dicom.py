@@ -141,11 +141,23 @@ class Parser:
     # def GetImageData(self):
     #    return None#self.vtkgdcm_reader.GetOutput()
 
-    def SetDataImage(self, data_image, filename, thumbnail_path):
+    def SetDataImage(self, data_image, filename, thumbnail_path=None):
         self.data_image = data_image
         self.filename = self.filepath = filename
         self.thumbnail_path = thumbnail_path
 
+    def GetThumbnailPath(self):
+        """
+        Return the thumbnail path (or a list of paths, one for each frame, in
+        multi-frame files). If the thumbnails were not created when the file
+        was read they are created now, reading the pixel data.
+        """
+        if self.thumbnail_path is None:
+            from invesalius.reader.dicom_reader import CreateDicomThumbnails
+
+            self.thumbnail_path = CreateDicomThumbnails(self.filename, self.data_image)
+        return self.thumbnail_path
+
     def __format_time(self, value):
         sp1 = value.split(".")
         sp2 = value.split(":")
@@ -1856,9 +1868,14 @@ class Acquisition:
 
 class Image:
     def __init__(self):
-        pass
+        self.parser = None
+
+    @property
+    def thumbnail_path(self):
+        return self.parser.GetThumbnailPath()
 
     def SetParser(self, parser):
+        self.parser = parser
         self.level = parser.GetImageWindowLevel()
         self.window = parser.GetImageWindowWidth()
 
@@ -1875,7 +1892,6 @@ class Image:
         self.size = (parser.GetDimensionX(), parser.GetDimensionY())
         # self.imagedata = parser.GetImageData()
         self.bits_allocad = parser._GetBitsAllocated()
-        self.thumbnail_path = parser.thumbnail_path
 
         self.number_of_frames = parser.GetNumberOfFrames()
         self.samples_per_pixel = parser.GetImageSamplesPerPixel()
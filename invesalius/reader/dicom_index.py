@@ -0,0 +1,231 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Persistent index of the DICOM headers (and thumbnails) already read, so a
+directory imported before is not parsed again.
+
+Each file is keyed by its path, modification time and size. Files which are
+not DICOM are also recorded, so they are not read again either.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import invesalius.utils as utils
+from invesalius import inv_paths
+
+# Bumped when the content of the header dictionaries changes, so entries
+# written by older versions are read again.
+INDEX_VERSION = 1
+
+# Maximum number of paths in each SELECT (SQLite limits the number of
+# parameters of a query).
+QUERY_SIZE = 500
+
+FileStat = Tuple[float, int]
+ThumbnailPath = Union[str, List[str], None]
+
+
+def get_file_stat(filepath: str) -> Optional[FileStat]:
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+class DicomIndex:
+    """
+    SQLite file mapping (path, mtime, size) to the dictionary returned by
+    dicom_reader.ReadDicomHeader (None for files that are not DICOM) and to
+    the thumbnails of the file, once they are created.
+    """
+
+    def __init__(self, filename: Union[str, os.PathLike]):
+        self.filename = str(filename)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    header TEXT,
+                    thumbnail TEXT
+                )"""
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_many(
+        self, files: Dict[str, FileStat]
+    ) -> Dict[str, Tuple[Optional[dict], ThumbnailPath]]:
+        """
+        Returns {path: (header, thumbnail_path)} for the files whose entry is
+        up to date. Thumbnails that were removed from disk are returned as
+        None.
+        """
+        paths = list(files)
+        rows = []
+        with self._lock:
+            for i in range(0, len(paths), QUERY_SIZE):
+                chunk = paths[i : i + QUERY_SIZE]
+                rows.extend(
+                    self._conn.execute(
+                        "SELECT path, mtime, size, version, header, thumbnail FROM files"
+                        f" WHERE path IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+
+        result = {}
+        removed_thumbnails = []
+        for path, mtime, size, version, header, thumbnail in rows:
+            if version != INDEX_VERSION or files[path] != (mtime, size):
+                continue
+            thumbnail_path = _load_thumbnail(thumbnail)
+            if thumbnail is not None and thumbnail_path is None:
+                removed_thumbnails.append(path)
+            result[path] = (_load_header(header), thumbnail_path)
+        self._clear_thumbnails(removed_thumbnails)
+        return result
+
+    def put_many(self, entries: Iterable[Tuple[str, FileStat, Optional[dict]]]) -> None:
+        """
+        Stores the header of each (path, (mtime, size), header). Thumbnails
+        previously stored for the path are discarded.
+        """
+        rows = [
+            (path, mtime, size, INDEX_VERSION, _dump_header(header))
+            for path, (mtime, size), header in entries
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, mtime, size, version, header)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def set_thumbnail(self, path: str, thumbnail_path: ThumbnailPath) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE files SET thumbnail = ? WHERE path = ?",
+                (json.dumps(thumbnail_path), path),
+            )
+
+    def prune(self) -> int:
+        """
+        Removes the entries of the files that no longer exist and the
+        thumbnails that were removed from disk (they are temporary files).
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path, thumbnail FROM files").fetchall()
+
+        removed_files = []
+        removed_thumbnails = []
+        for path, thumbnail in rows:
+            if not os.path.exists(path):
+                removed_files.append(path)
+            elif thumbnail is not None and _load_thumbnail(thumbnail) is None:
+                removed_thumbnails.append(path)
+
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", _as_rows(removed_files))
+        self._clear_thumbnails(removed_thumbnails)
+        return len(removed_files)
+
+    def _clear_thumbnails(self, paths: List[str]) -> None:
+        if paths:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "UPDATE files SET thumbnail = NULL WHERE path = ?", _as_rows(paths)
+                )
+
+
+def _as_rows(paths: List[str]) -> List[Tuple[str]]:
+    return [(path,) for path in paths]
+
+
+def _dump_header(header: Optional[dict]) -> Optional[str]:
+    if header is None:
+        return None
+    return json.dumps(header)
+
+
+def _load_header(header: Optional[str]) -> Optional[dict]:
+    if header is None:
+        return None
+    data_dict = json.loads(header)
+    if data_dict.get("spacing") is not None:
+        data_dict["spacing"] = tuple(data_dict["spacing"])
+    return data_dict
+
+
+def _load_thumbnail(thumbnail: Optional[str]) -> ThumbnailPath:
+    if thumbnail is None:
+        return None
+    thumbnail_path = json.loads(thumbnail)
+    if isinstance(thumbnail_path, list):
+        paths = thumbnail_path
+    else:
+        paths = [thumbnail_path]
+    if all(p and os.path.exists(p) for p in paths):
+        return thumbnail_path
+    return None
+
+
+_index: Optional[DicomIndex] = None
+
+
+def get_dicom_index() -> Optional[DicomIndex]:
+    """
+    Returns the index stored in the user folder. Returns None if it can't be
+    opened (read-only folder, corrupted file), in this case the files are
+    just read again.
+    """
+    global _index
+    if _index is None:
+        try:
+            inv_paths.USER_INV_DIR.mkdir(parents=True, exist_ok=True)
+            _index = DicomIndex(inv_paths.USER_DICOM_INDEX_FILE)
+        except (OSError, sqlite3.Error) as err:
+            utils.debug(f"Not able to open the DICOM index: {err}")
+            return None
+        # Checking every file of the index may take a while (e.g. on network
+        # drives), so it doesn't hold the import.
+        threading.Thread(target=_prune_index, args=(_index,), daemon=True).start()
+    return _index
+
+
+def _prune_index(index: DicomIndex) -> None:
+    try:
+        removed = index.prune()
+    except sqlite3.Error as err:
+        utils.debug(f"Not able to prune the DICOM index: {err}")
+        return
+    if removed:
+        utils.debug(f"Removed {removed} files that no longer exist from the DICOM index")
@@ -16,7 +16,9 @@
 #    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
 #    detalhes.
 # --------------------------------------------------------------------------
+import multiprocessing
 import os
+import sqlite3
 import sys
 
 import gdcm
@@ -34,6 +36,7 @@ from vtkmodules.vtkCommonCore import vtkFileOutputWindow, vtkOutputWindow
 import invesalius.constants as const
 import invesalius.reader.dicom as dicom
 import invesalius.reader.dicom_grouper as dicom_grouper
+import invesalius.reader.dicom_index as dicom_index
 import invesalius.utils as utils
 from invesalius import inv_paths
 from invesalius.data import imagedata_utils
@@ -83,6 +86,205 @@ main_dict = {}
 dict_file = {}
 
 
+# Scanning directories with less files than this is done in the main process,
+# starting the worker processes would take longer than reading the files.
+PARALLEL_SCAN_MIN_FILES = 64
+PARALLEL_SCAN_CHUNK_SIZE = 16
+
+# Elements bigger than this (overlays, curves, private blobs) are not used by
+# dicom.Parser, so they are not converted to string.
+MAX_ELEMENT_LENGTH = 4096
+
+PIXEL_DATA_TAG = (0x7FE0, 0x0010)
+
+# Number of headers read before they are written to the DICOM index.
+INDEX_BATCH_SIZE = 256
+
+
+def _set_reader_filename(reader, filepath):
+    if _has_win32api:
+        try:
+            reader.SetFileName(utils.encode(win32api.GetShortPathName(filepath), const.FS_ENCODE))
+        except TypeError:
+            reader.SetFileName(win32api.GetShortPathName(filepath))
+    else:
+        try:
+            reader.SetFileName(utils.encode(filepath, const.FS_ENCODE))
+        except TypeError:
+            reader.SetFileName(filepath)
+
+
+def _get_encoding(dataset):
+    tag = gdcm.Tag(0x0008, 0x0005)
+    if not dataset.FindDataElement(tag):
+        return "ISO_IR 100"
+
+    data_element = dataset.GetDataElement(tag)
+    if data_element.IsEmpty():
+        encoding_value = "ISO_IR 100"
+    else:
+        encoding_value = str(data_element.GetValue()).split("\\")[0]
+
+    if encoding_value.startswith("Loaded"):
+        return "ISO_IR 100"
+    try:
+        return const.DICOM_ENCODING_TO_PYTHON[encoding_value]
+    except KeyError:
+        return "ISO_IR 100"
+
+
+def _read_elements(data_elements, stf, data_dict, encoding, errors="strict"):
+    iterator = data_elements.begin()
+    while not iterator.equal(data_elements.end()):
+        dataElement = iterator.next()
+        if dataElement.IsUndefinedLength():
+            continue
+        # gdcm.VL can't be compared in python, but it converts to str.
+        if int(str(dataElement.GetVL())) > MAX_ELEMENT_LENGTH:
+            continue
+        tag = dataElement.GetTag()
+        data = stf.ToStringPair(tag)
+        stag = tag.PrintAsPipeSeparatedString()
+
+        group = str(tag.GetGroup())
+        field = str(tag.GetElement())
+
+        tag_labels[stag] = data[0]
+
+        if group not in data_dict.keys():
+            data_dict[group] = {}
+
+        if not (utils.VerifyInvalidPListCharacter(data[1])):
+            data_dict[group][field] = utils.decode(data[1], encoding, errors)
+        else:
+            data_dict[group][field] = "Invalid Character"
+
+
+def ReadDicomHeader(filepath):
+    """
+    Reads the DICOM header of the given file, stopping before the pixel data.
+
+    Returns the dictionary used by dicom.Parser (tags are keyed by their
+    group and element as decimal strings) or None if the file could not be
+    read.
+    """
+    reader = gdcm.Reader()
+    _set_reader_filename(reader, filepath)
+
+    pixel_data = gdcm.Tag(*PIXEL_DATA_TAG)
+    skip_tags = gdcm.TagSetType()
+    skip_tags.insert(pixel_data)
+    if not reader.ReadUpToTag(pixel_data, skip_tags):
+        return None
+
+    file = reader.GetFile()
+    dataSet = file.GetDataSet()
+    header = file.GetHeader()
+    stf = gdcm.StringFilter()
+    stf.SetFile(file)
+
+    data_dict = {}
+    data_dict["spacing"] = gdcm.ImageHelper.GetSpacingValue(file)
+    encoding = _get_encoding(dataSet)
+
+    _read_elements(header.GetDES(), stf, data_dict, encoding)
+    _read_elements(dataSet.GetDES(), stf, data_dict, encoding, "replace")
+
+    # ------ Verify the orientation --------------------------------
+    direc_cosines = gdcm.ImageHelper.GetDirectionCosinesValue(file)
+    orientation = gdcm.Orientation()
+    try:
+        _type = orientation.GetType(tuple(direc_cosines))
+    except TypeError:
+        _type = orientation.GetType(direc_cosines)
+    label = orientation.GetLabel(_type)
+
+    data_dict["invesalius"] = {"orientation_label": label}
+    return data_dict
+
+
+def _read_dicom_header_task(filepath):
+    try:
+        return filepath, ReadDicomHeader(filepath)
+    except Exception as err:
+        utils.debug(f"Error reading DICOM header {filepath}: {err}")
+        return filepath, None
+
+
+def CreateDicomThumbnails(filepath, data_dict):
+    """
+    Reads the pixel data of the given DICOM file and creates its thumbnails.
+    Returns the thumbnail path (or a list of paths for multi-frame files).
+    """
+    try:
+        data = data_dict[str(0x028)][str(0x1050)]
+        level = [float(value) for value in data.split("\\")][0]
+        data = data_dict[str(0x028)][str(0x1051)]
+        window = [float(value) for value in data.split("\\")][0]
+    except (KeyError, ValueError):
+        level = None
+        window = None
+
+    reader = gdcm.ImageReader()
+    _set_reader_filename(reader, filepath)
+    if not reader.Read():
+        return None
+    thumbnail_path = imagedata_utils.create_dicom_thumbnails(reader.GetImage(), window, level)
+
+    index = dicom_index.get_dicom_index()
+    if index is not None:
+        try:
+            index.set_thumbnail(filepath, thumbnail_path)
+        except sqlite3.Error as err:
+            utils.debug(f"Error updating the DICOM index: {err}")
+    return thumbnail_path
+
+
+def ScanDicomHeaders(filepaths):
+    """
+    Reads the headers of the given files using a pool of worker processes.
+
+    It's a generator yielding (filepath, data_dict) in the order of filepaths,
+    while the next files are still being read. data_dict is None for files
+    that are not DICOM.
+    """
+    if len(filepaths) < PARALLEL_SCAN_MIN_FILES:
+        for filepath in filepaths:
+            yield _read_dicom_header_task(filepath)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    pool = ctx.Pool(processes=min(multiprocessing.cpu_count(), len(filepaths)))
+    try:
+        yield from pool.imap(_read_dicom_header_task, filepaths, chunksize=PARALLEL_SCAN_CHUNK_SIZE)
+    finally:
+        # Also reached when the user cancels the load.
+        pool.terminate()
+        pool.join()
+
+
+def AddDicomFile(grouper, filepath, data_dict, thumbnail_path=None):
+    dict_file[filepath] = data_dict
+
+    # ----------  Verify is DICOMDir -------------------------------
+    is_dicom_dir = 1
+    try:
+        if data_dict[str(0x002)][str(0x002)] != "1.2.840.10008.1.3.10":  # DICOMDIR
+            is_dicom_dir = 0
+    except KeyError:
+        is_dicom_dir = 0
+
+    if not (is_dicom_dir):
+        parser = dicom.Parser()
+        # If thumbnail_path is None the thumbnails are only created when the
+        # serie is shown, see dicom.Parser.GetThumbnailPath.
+        parser.SetDataImage(data_dict, filepath, thumbnail_path)
+
+        dcm = dicom.Dicom()
+        dcm.SetParser(parser)
+        grouper.AddFile(dcm)
+
+
 class LoadDicom:
     def __init__(self, grouper, filepath):
         self.grouper = grouper
@@ -90,203 +292,94 @@ class LoadDicom:
         self.run()
 
     def run(self):
-        grouper = self.grouper
-        reader = gdcm.ImageReader()
-        if _has_win32api:
-            try:
-                reader.SetFileName(
-                    utils.encode(win32api.GetShortPathName(self.filepath), const.FS_ENCODE)
-                )
-            except TypeError:
-                reader.SetFileName(win32api.GetShortPathName(self.filepath))
-        else:
-            try:
-                reader.SetFileName(utils.encode(self.filepath, const.FS_ENCODE))
-            except TypeError:
-                reader.SetFileName(self.filepath)
-        if reader.Read():
-            file = reader.GetFile()
-            # Retrieve data set
-            dataSet = file.GetDataSet()
-            # Retrieve header
-            header = file.GetHeader()
-            stf = gdcm.StringFilter()
-            stf.SetFile(file)
-
-            data_dict = {}
-
-            tag = gdcm.Tag(0x0008, 0x0005)
-            ds = reader.GetFile().GetDataSet()
-            image_helper = gdcm.ImageHelper()
-            data_dict["spacing"] = image_helper.GetSpacingValue(reader.GetFile())
-            if ds.FindDataElement(tag):
-                data_element = ds.GetDataElement(tag)
-                if data_element.IsEmpty():
-                    encoding_value = "ISO_IR 100"
-                else:
-                    encoding_value = str(ds.GetDataElement(tag).GetValue()).split("\\")[0]
-
-                if encoding_value.startswith("Loaded"):
-                    encoding = "ISO_IR 100"
-                else:
-                    try:
-                        encoding = const.DICOM_ENCODING_TO_PYTHON[encoding_value]
-                    except KeyError:
-                        encoding = "ISO_IR 100"
-            else:
-                encoding = "ISO_IR 100"
-
-            # Iterate through the Header
-            iterator = header.GetDES().begin()
-            while not iterator.equal(header.GetDES().end()):
-                dataElement = iterator.next()
-                if not dataElement.IsUndefinedLength():
-                    tag = dataElement.GetTag()
-                    data = stf.ToStringPair(tag)
-                    stag = tag.PrintAsPipeSeparatedString()
-
-                    group = str(tag.GetGroup())
-                    field = str(tag.GetElement())
-
-                    tag_labels[stag] = data[0]
-
-                    if group not in data_dict.keys():
-                        data_dict[group] = {}
-
-                    if not (utils.VerifyInvalidPListCharacter(data[1])):
-                        data_dict[group][field] = utils.decode(data[1], encoding)
-                    else:
-                        data_dict[group][field] = "Invalid Character"
-
-            # Iterate through the Data set
-            iterator = dataSet.GetDES().begin()
-            while not iterator.equal(dataSet.GetDES().end()):
-                dataElement = iterator.next()
-                if not dataElement.IsUndefinedLength():
-                    tag = dataElement.GetTag()
-                    #  if (tag.GetGroup() == 0x0009 and tag.GetElement() == 0x10e3) \
-                    #  or (tag.GetGroup() == 0x0043 and tag.GetElement() == 0x1027):
-                    #  continue
-                    data = stf.ToStringPair(tag)
-                    stag = tag.PrintAsPipeSeparatedString()
-
-                    group = str(tag.GetGroup())
-                    field = str(tag.GetElement())
-
-                    tag_labels[stag] = data[0]
-
-                    if group not in data_dict.keys():
-                        data_dict[group] = {}
-
-                    if not (utils.VerifyInvalidPListCharacter(data[1])):
-                        data_dict[group][field] = utils.decode(data[1], encoding, "replace")
-                    else:
-                        data_dict[group][field] = "Invalid Character"
-
-            # -------------- To Create DICOM Thumbnail -----------
-
-            try:
-                data = data_dict[str(0x028)][str(0x1050)]
-                level = [float(value) for value in data.split("\\")][0]
-                data = data_dict[str(0x028)][str(0x1051)]
-                window = [float(value) for value in data.split("\\")][0]
-            except (KeyError, ValueError):
-                level = None
-                window = None
-
-            img = reader.GetImage()
-            thumbnail_path = imagedata_utils.create_dicom_thumbnails(img, window, level)
-
-            # ------ Verify the orientation --------------------------------
-
-            direc_cosines = img.GetDirectionCosines()
-            orientation = gdcm.Orientation()
-            try:
-                _type = orientation.GetType(tuple(direc_cosines))
-            except TypeError:
-                _type = orientation.GetType(direc_cosines)
-            label = orientation.GetLabel(_type)
-
-            # ----------   Refactory --------------------------------------
-            data_dict["invesalius"] = {"orientation_label": label}
-
-            # -------------------------------------------------------------
-            dict_file[self.filepath] = data_dict
-
-            # ----------  Verify is DICOMDir -------------------------------
-            is_dicom_dir = 1
-            try:
-                if data_dict[str(0x002)][str(0x002)] != "1.2.840.10008.1.3.10":  # DICOMDIR
-                    is_dicom_dir = 0
-            except KeyError:
-                is_dicom_dir = 0
-
-            if not (is_dicom_dir):
-                parser = dicom.Parser()
-                parser.SetDataImage(dict_file[self.filepath], self.filepath, thumbnail_path)
-
-                dcm = dicom.Dicom()
-                # self.l.acquire()
-                dcm.SetParser(parser)
-                grouper.AddFile(dcm)
-
-                # self.l.release()
-
-        # ==========  used in test =======================================
-        # print dict_file
-        # main_dict = dict(
-        #                data  = dict_file,
-        #                labels  = tag_labels)
-        # print main_dict
-        # print "\n"
-        # plistlib.writePlist(main_dict, ".//teste.plist")
+        data_dict = ReadDicomHeader(self.filepath)
+        if data_dict is not None:
+            AddDicomFile(self.grouper, self.filepath, data_dict)
+
+
+def _list_files(directory, recursive):
+    if recursive:
+        filepaths = []
+        for dirpath, dirnames, filenames in os.walk(directory):
+            filepaths.extend(os.path.join(dirpath, name) for name in filenames)
+        return filepaths
+    else:
+        try:
+            dirpath, dirnames, filenames = next(os.walk(directory))
+        except StopIteration:
+            return []
+        return [os.path.join(dirpath, name) for name in filenames]
+
+
+def _get_indexed_files(index, stats):
+    if index is None:
+        return {}
+    try:
+        return index.get_many(stats)
+    except sqlite3.Error as err:
+        utils.debug(f"Error reading the DICOM index: {err}")
+        return {}
+
+
+def _update_index(index, entries):
+    if index is None or not entries:
+        return
+    try:
+        index.put_many(entries)
+    except sqlite3.Error as err:
+        utils.debug(f"Error updating the DICOM index: {err}")
 
 
 def yGetDicomGroups(directory, recursive=True, gui=True):
     """
     Return all full paths to DICOM files inside given directory.
+
+    The directory is listed once. Files already in the DICOM index (with
+    the same modification time and size) are not read again, the headers
+    of the other ones are read in parallel and stored in the index.
+    Files are added to the grouper as they are read, yielding
+    (counter, nfiles) after each one if gui is True, and at last the list
+    of patient groups.
     """
-    nfiles = 0
-    # Find total number of files
-    if recursive:
-        for dirpath, dirnames, filenames in os.walk(directory):
-            nfiles += len(filenames)
-    else:
-        dirpath, dirnames, filenames = os.walk(directory)
-        nfiles = len(filenames)
+    filepaths = [utils.decode(f, const.FS_ENCODE) for f in _list_files(directory, recursive)]
+    stats = {}
+    for filepath in filepaths:
+        stat = dicom_index.get_file_stat(filepath)
+        if stat is not None:
+            stats[filepath] = stat
+    filepaths = [f for f in filepaths if f in stats]
+    nfiles = len(filepaths)
+
+    index = dicom_index.get_dicom_index()
+    indexed = _get_indexed_files(index, stats)
+    to_read = [f for f in filepaths if f not in indexed]
 
-    counter = 0
     grouper = dicom_grouper.DicomPatientGrouper()
-    # q = Queue.Queue()
-    # l = threading.Lock()
-    # threads = []
-    # for i in xrange(cpu_count()):
-    #    t = LoadDicom(grouper, q, l)
-    #    t.start()
-    #    threads.append(t)
-    # Retrieve only DICOM files, splited into groups
-    if recursive:
-        for dirpath, dirnames, filenames in os.walk(directory):
-            for name in filenames:
-                filepath = os.path.join(dirpath, name)
-                counter += 1
-                if gui:
-                    yield (counter, nfiles)
-                LoadDicom(grouper, filepath)
-    else:
-        dirpath, dirnames, filenames = os.walk(directory)
-        for name in filenames:
-            filepath = str(os.path.join(dirpath, name))
+    counter = 0
+    for filepath in filepaths:
+        if filepath in indexed:
             counter += 1
             if gui:
                 yield (counter, nfiles)
-            # q.put(filepath)
-
-    # for t in threads:
-    #    q.put(0)
+            data_dict, thumbnail_path = indexed[filepath]
+            if data_dict is not None:
+                AddDicomFile(grouper, filepath, data_dict, thumbnail_path)
 
-    # for t in threads:
-    #    t.join()
+    new_entries = []
+    try:
+        for filepath, data_dict in ScanDicomHeaders(to_read):
+            counter += 1
+            if gui:
+                yield (counter, nfiles)
+            new_entries.append((filepath, stats[filepath], data_dict))
+            if len(new_entries) >= INDEX_BATCH_SIZE:
+                _update_index(index, new_entries)
+                new_entries = []
+            if data_dict is not None:
+                AddDicomFile(grouper, filepath, data_dict)
+    finally:
+        # Also stores what was read when the user cancels the load.
+        _update_index(index, new_entries)
 
     # TODO: Is this commented update necessary?
     # grouper.Update()
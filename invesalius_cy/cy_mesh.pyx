@@ -15,9 +15,8 @@ cimport numpy as np
 from libc.math cimport sin, cos, acos, exp, sqrt, fabs, M_PI
 from libc.stdlib cimport abs as cabs
 from cython.operator cimport dereference as deref, preincrement as inc
-from libcpp.map cimport map
-from libcpp.unordered_map cimport unordered_map
-from libcpp.set cimport set
+from libcpp.unordered_set cimport unordered_set
+from libcpp.algorithm cimport sort, unique
 from libcpp.vector cimport vector
 from libcpp.pair cimport pair
 from libcpp cimport bool
@@ -42,24 +41,36 @@ cdef struct Point:
 
 ctypedef pair[vertex_id_t, vertex_id_t] key
 
+# Buffers used by Mesh.get_near_vertices_to_v, one per thread, reused between
+# vertices.
+cdef struct NearScratch:
+    cdeque[vertex_id_t] to_visit
+    unordered_set[vertex_id_t] visited
+    vector[vertex_id_t] near_vertices
+
 
 cdef class Mesh:
     cdef vertex_t[:, :] vertices
     cdef vertex_id_t[:, :] faces
     cdef normal_t[:, :] normals
 
-    cdef unordered_map[int, vector[vertex_id_t]] map_vface
-    cdef unordered_map[vertex_id_t, int] border_vertices
+    # Vertex -> faces adjacency in CSR format: the faces of the vertex v are
+    # vface_ids[vface_offsets[v]:vface_offsets[v + 1]], in ascending order.
+    cdef vertex_id_t[:] vface_offsets
+    cdef vertex_id_t[:] vface_ids
+    cdef np.uint8_t[:] border_vertices
+
+    # vtkDataArray of the polydata points, which share their memory with
+    # vertices.
+    cdef object _points
 
     cdef bool _initialized
 
     def __cinit__(self, pd=None, other=None):
-        cdef int i
-        cdef map[key, int] edge_nfaces
-        cdef map[key, int].iterator it
         if pd:
             self._initialized = True
-            _vertices = numpy_support.vtk_to_numpy(pd.GetPoints().GetData())
+            self._points = pd.GetPoints().GetData()
+            _vertices = numpy_support.vtk_to_numpy(self._points)
             _vertices.shape = -1, 3
 
             _faces = numpy_support.vtk_to_numpy(pd.GetPolys().GetData())
@@ -71,36 +82,74 @@ cdef class Mesh:
             self.vertices = _vertices
             self.faces = _faces
             self.normals = _normals
-
-            for i in range(_faces.shape[0]):
-                self.map_vface[self.faces[i, 1]].push_back(i)
-                self.map_vface[self.faces[i, 2]].push_back(i)
-                self.map_vface[self.faces[i, 3]].push_back(i)
-
-                edge_nfaces[key(min(self.faces[i, 1], self.faces[i, 2]), max(self.faces[i, 1], self.faces[i, 2]))] += 1
-                edge_nfaces[key(min(self.faces[i, 2], self.faces[i, 3]), max(self.faces[i, 2], self.faces[i, 3]))] += 1
-                edge_nfaces[key(min(self.faces[i, 1], self.faces[i, 3]), max(self.faces[i, 1], self.faces[i, 3]))] += 1
-
-            it = edge_nfaces.begin()
-
-            while it != edge_nfaces.end():
-                if deref(it).second == 1:
-                    self.border_vertices[deref(it).first.first] = 1
-                    self.border_vertices[deref(it).first.second] = 1
-
-                inc(it)
+            self._build_adjacency()
 
         elif other:
             _other = <Mesh>other
             self._initialized = True
+            self._points = None
             self.vertices = _other.vertices.copy()
             self.faces = _other.faces.copy()
             self.normals = _other.normals.copy()
-            self.map_vface = unordered_map[int, vector[vertex_id_t]](_other.map_vface)
-            self.border_vertices = unordered_map[vertex_id_t, int](_other.border_vertices)
+            self.vface_offsets = _other.vface_offsets.copy()
+            self.vface_ids = _other.vface_ids.copy()
+            self.border_vertices = _other.border_vertices.copy()
         else:
             self._initialized = False
 
+    cdef void _build_adjacency(self):
+        """
+        Builds the vertex -> faces adjacency and finds the border vertices.
+        """
+        cdef Py_ssize_t nv = self.vertices.shape[0]
+        faces = np.asarray(self.faces)
+        counts = np.bincount(faces[:, 1:].ravel(), minlength=nv)
+        offsets = np.zeros(nv + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        self.vface_offsets = offsets
+        self.vface_ids = np.empty(offsets[nv], dtype=np.int64)
+        self.border_vertices = np.zeros(nv, dtype=np.uint8)
+
+        cdef vertex_id_t[:] position = offsets[:nv].copy()
+        with nogil:
+            self._fill_adjacency(position)
+            self._find_border_vertices()
+
+    cdef void _fill_adjacency(self, vertex_id_t[:] position) noexcept nogil:
+        cdef Py_ssize_t f_id, j
+        cdef vertex_id_t v_id
+        for f_id in range(self.faces.shape[0]):
+            for j in range(1, 4):
+                v_id = self.faces[f_id, j]
+                self.vface_ids[position[v_id]] = f_id
+                position[v_id] += 1
+
+    cdef void _find_border_vertices(self) noexcept nogil:
+        """
+        A vertex is in the border if one of its edges is part of a single face,
+        i.e. one of its neighbours appears in a single face of the vertex.
+        """
+        cdef Py_ssize_t nv = self.vertices.shape[0]
+        cdef int n_threads = openmp.omp_get_max_threads()
+        cdef vector[vector[vertex_id_t]] scratch = vector[vector[vertex_id_t]](n_threads)
+        cdef vector[vertex_id_t]* neighbours
+        cdef Py_ssize_t v_id, i, j, n
+
+        for v_id in prange(nv, schedule="guided"):
+            neighbours = &scratch[openmp.omp_get_thread_num()]
+            self._get_neighbours(v_id, neighbours)
+            n = neighbours.size()
+            i = 0
+            while i < n:
+                j = i + 1
+                while j < n and deref(neighbours)[j] == deref(neighbours)[i]:
+                    j = j + 1
+                if j - i == 1:
+                    self.border_vertices[v_id] = 1
+                    break
+                i = j
+
     cdef void copy_to(self, Mesh other):
         """
         Copies self content to other.
@@ -109,23 +158,25 @@ cdef class Mesh:
             other.vertices[:] = self.vertices
             other.faces[:] = self.faces
             other.normals[:] = self.normals
-            other.map_vface = unordered_map[int, vector[vertex_id_t]](self.map_vface)
-            other.border_vertices = unordered_map[vertex_id_t, int](self.border_vertices)
+            other.vface_offsets[:] = self.vface_offsets
+            other.vface_ids[:] = self.vface_ids
+            other.border_vertices[:] = self.border_vertices
         else:
             other.vertices = self.vertices.copy()
             other.faces = self.faces.copy()
             other.normals = self.normals.copy()
 
-            other.map_vface = self.map_vface
+            other.vface_offsets = self.vface_offsets
+            other.vface_ids = self.vface_ids
             other.border_vertices = self.border_vertices
 
     def to_vtk(self):
         """
-        Converts Mesh to vtkPolyData.
+        Converts Mesh to vtkPolyData. The points share their memory with the
+        mesh.
         """
         vertices = np.asarray(self.vertices)
         faces = np.asarray(self.faces)
-        normals = np.asarray(self.normals)
 
         points = vtkPoints()
         points.SetData(numpy_support.numpy_to_vtk(vertices))
@@ -140,90 +191,86 @@ cdef class Mesh:
 
         return pd
 
-    cdef vector[vertex_id_t]* get_faces_by_vertex(self, int v_id) noexcept nogil:
+    def get_faces_by_vertex(self, vertex_id_t v_id):
         """
-        Returns the faces whose vertex `v_id' is part.
+        Returns the ids of the faces whose vertex `v_id' is part.
         """
-        return &self.map_vface[v_id]
+        return np.asarray(self.vface_ids[self.vface_offsets[v_id]:self.vface_offsets[v_id + 1]])
 
-    cdef set[vertex_id_t]* get_ring1(self, vertex_id_t v_id) noexcept nogil:
+    def get_border_vertices(self):
         """
-        Returns the ring1 of vertex `v_id'
+        Returns the ids of the border vertices.
         """
-        cdef vertex_id_t f_id
-        cdef set[vertex_id_t]* ring1 = new set[vertex_id_t]()
-        cdef vector[vertex_id_t].iterator it = self.map_vface[v_id].begin()
-
-        while it != self.map_vface[v_id].end():
-            f_id = deref(it)
-            inc(it)
-            if self.faces[f_id, 1] != v_id:
-                ring1.insert(self.faces[f_id, 1])
-            if self.faces[f_id, 2] != v_id:
-                ring1.insert(self.faces[f_id, 2])
-            if self.faces[f_id, 3] != v_id:
-                ring1.insert(self.faces[f_id, 3])
-
-        return ring1
+        return np.flatnonzero(np.asarray(self.border_vertices))
+
+    cdef void _get_neighbours(self, vertex_id_t v_id, vector[vertex_id_t]* neighbours) noexcept nogil:
+        """
+        Fills neighbours with the other vertices of each face of `v_id', sorted
+        and with repetitions.
+        """
+        cdef vertex_id_t f_id, k
+        cdef int j
+        neighbours.clear()
+        for k in range(self.vface_offsets[v_id], self.vface_offsets[v_id + 1]):
+            f_id = self.vface_ids[k]
+            for j in range(1, 4):
+                if self.faces[f_id, j] != v_id:
+                    neighbours.push_back(self.faces[f_id, j])
+        sort(neighbours.begin(), neighbours.end())
+
+    cdef void get_ring1(self, vertex_id_t v_id, vector[vertex_id_t]* ring1) noexcept nogil:
+        """
+        Fills ring1 with the ring1 of vertex `v_id', in ascending order.
+        """
+        self._get_neighbours(v_id, ring1)
+        ring1.erase(unique(ring1.begin(), ring1.end()), ring1.end())
 
     cdef bool is_border(self, vertex_id_t v_id) noexcept nogil:
         """
         Check if vertex `v_id' is a vertex border.
         """
-        return self.border_vertices.find(v_id) != self.border_vertices.end()
+        return self.border_vertices[v_id] != 0
 
-    cdef vector[vertex_id_t]* get_near_vertices_to_v(self, vertex_id_t v_id, float dmax) noexcept nogil:
+    cdef void get_near_vertices_to_v(self, vertex_id_t v_id, float dmax, NearScratch* scratch) noexcept nogil:
         """
-        Returns all vertices with distance at most `d' to the vertex `v_id'
+        Fills scratch.near_vertices with all vertices with distance at most
+        `dmax' to the vertex `v_id'. scratch is reused between calls.
 
         Params:
             v_id: id of the vertex
             dmax: the maximum distance.
         """
-        cdef vector[vertex_id_t]* idfaces
-        cdef vector[vertex_id_t]* near_vertices = new vector[vertex_id_t]()
-
-        cdef cdeque[vertex_id_t] to_visit
-        cdef unordered_map[vertex_id_t, bool] status_v
-        cdef unordered_map[vertex_id_t, bool] status_f
-
         cdef vertex_t *vip
         cdef vertex_t *vjp
 
         cdef float distance
-        cdef int nf, nid, j
-        cdef vertex_id_t f_id, vj
+        cdef int j
+        cdef vertex_id_t f_id, vj, k
+
+        scratch.to_visit.clear()
+        scratch.visited.clear()
+        scratch.near_vertices.clear()
 
         vip = &self.vertices[v_id, 0]
-        to_visit.push_back(v_id)
+        scratch.to_visit.push_back(v_id)
+        scratch.visited.insert(v_id)
         dmax = dmax * dmax
-        while(not to_visit.empty()):
-            v_id = to_visit.front()
-            to_visit.pop_front()
-
-            status_v[v_id] = True
-
-            idfaces = self.get_faces_by_vertex(v_id)
-            nf = idfaces.size()
-
-            for nid in range(nf):
-                f_id = deref(idfaces)[nid]
-                if status_f.find(f_id) == status_f.end():
-                    status_f[f_id] = True
-
-                    for j in range(3):
-                        vj = self.faces[f_id, j+1]
-                        if status_v.find(vj) == status_v.end():
-                            status_v[vj] = True
-                            vjp = &self.vertices[vj, 0]
-                            distance = (vip[0] - vjp[0]) * (vip[0] - vjp[0]) \
-                                + (vip[1] - vjp[1]) * (vip[1] - vjp[1]) \
-                                + (vip[2] - vjp[2]) * (vip[2] - vjp[2])
-                            if distance <= dmax:
-                                near_vertices.push_back(vj)
-                                to_visit.push_back(vj)
-
-        return near_vertices
+        while(not scratch.to_visit.empty()):
+            v_id = scratch.to_visit.front()
+            scratch.to_visit.pop_front()
+
+            for k in range(self.vface_offsets[v_id], self.vface_offsets[v_id + 1]):
+                f_id = self.vface_ids[k]
+                for j in range(3):
+                    vj = self.faces[f_id, j+1]
+                    if scratch.visited.insert(vj).second:
+                        vjp = &self.vertices[vj, 0]
+                        distance = (vip[0] - vjp[0]) * (vip[0] - vjp[0]) \
+                            + (vip[1] - vjp[1]) * (vip[1] - vjp[1]) \
+                            + (vip[2] - vjp[2]) * (vip[2] - vjp[2])
+                        if distance <= dmax:
+                            scratch.near_vertices.push_back(vj)
+                            scratch.to_visit.push_back(vj)
 
 
 cdef vector[weight_t]* calc_artifacts_weight(Mesh mesh, vector[vertex_id_t]& vertices_staircase, float tmax, float bmin) noexcept nogil:
@@ -239,7 +286,7 @@ cdef vector[weight_t]* calc_artifacts_weight(Mesh mesh, vector[vertex_id_t]& ver
         bmin: The minimum weight.
     """
     cdef int vi_id, vj_id, nnv, n_ids, i, j
-    cdef vector[vertex_id_t]* near_vertices
+    cdef NearScratch* scratch
     cdef weight_t value
     cdef float d
     n_ids = vertices_staircase.size()
@@ -252,19 +299,22 @@ cdef vector[weight_t]* calc_artifacts_weight(Mesh mesh, vector[vertex_id_t]& ver
     cdef vector[weight_t]* weights = new vector[weight_t](msize)
     weights.assign(msize, bmin)
 
+    cdef vector[NearScratch] scratches = vector[NearScratch](openmp.omp_get_max_threads())
+
     cdef openmp.omp_lock_t lock
     openmp.omp_init_lock(&lock)
 
-    for i in prange(n_ids, nogil=True):
+    for i in prange(n_ids, nogil=True, schedule="guided"):
         vi_id = vertices_staircase[i]
         deref(weights)[vi_id] = 1.0
 
         vi = &mesh.vertices[vi_id, 0]
-        near_vertices = mesh.get_near_vertices_to_v(vi_id, tmax)
-        nnv = near_vertices.size()
+        scratch = &scratches[openmp.omp_get_thread_num()]
+        mesh.get_near_vertices_to_v(vi_id, tmax, scratch)
+        nnv = scratch.near_vertices.size()
 
         for j in range(nnv):
-            vj_id = deref(near_vertices)[j]
+            vj_id = scratch.near_vertices[j]
             vj = &mesh.vertices[vj_id, 0]
 
             d = sqrt((vi[0] - vj[0]) * (vi[0] - vj[0])\
@@ -274,145 +324,119 @@ cdef vector[weight_t]* calc_artifacts_weight(Mesh mesh, vector[vertex_id_t]& ver
 
             if value > deref(weights)[vj_id]:
                 openmp.omp_set_lock(&lock)
-                deref(weights)[vj_id] = value
+                if value > deref(weights)[vj_id]:
+                    deref(weights)[vj_id] = value
                 openmp.omp_unset_lock(&lock)
 
-        del near_vertices
-
-    #  for i in range(msize):
-        #  if mesh.is_border(i):
-            #  deref(weights)[i] = 0.0
-
-    #  cdef vertex_id_t v0, v1, v2
-    #  for i in range(mesh.faces.shape[0]):
-        #  for j in range(1, 4):
-            #  v0 = mesh.faces[i, j]
-            #  vi = &mesh.vertices[v0, 0]
-            #  if mesh.is_border(v0):
-                #  deref(weights)[v0] = 0.0
-                #  v1 = mesh.faces[i, (j + 1) % 3 + 1]
-                #  if mesh.is_border(v1):
-                    #  vi = &mesh.vertices[v1, 0]
-                    #  deref(weights)[v0] = 0.0
-
     openmp.omp_destroy_lock(&lock)
     return weights
 
 
-cdef inline Point calc_d(Mesh mesh, vertex_id_t v_id) noexcept nogil:
+cdef inline Point calc_d(Mesh mesh, vertex_id_t v_id, vector[vertex_id_t]* ring1) noexcept nogil:
+    """
+    Returns the mean of the differences between vertex `v_id' and its ring1.
+    ring1 is a scratch buffer reused between calls.
+    """
     cdef Point D
-    cdef int nf, f_id, nid
     cdef float n=0
-    cdef int i
+    cdef size_t i
     cdef vertex_t* vi
     cdef vertex_t* vj
-    cdef set[vertex_id_t]* vertices
-    cdef set[vertex_id_t].iterator it
     cdef vertex_id_t vj_id
+    cdef bool border
 
     D.x = 0.0
     D.y = 0.0
     D.z = 0.0
 
-    vertices = mesh.get_ring1(v_id)
+    mesh.get_ring1(v_id, ring1)
     vi = &mesh.vertices[v_id, 0]
+    border = mesh.is_border(v_id)
 
-    if mesh.is_border(v_id):
-        it = vertices.begin()
-        while it != vertices.end():
-            vj_id = deref(it)
-            if mesh.is_border(vj_id):
-                vj = &mesh.vertices[vj_id, 0]
-
-                D.x = D.x + (vi[0] - vj[0])
-                D.y = D.y + (vi[1] - vj[1])
-                D.z = D.z + (vi[2] - vj[2])
-                n += 1.0
-
-            inc(it)
-    else:
-        it = vertices.begin()
-        while it != vertices.end():
-            vj_id = deref(it)
-            vj = &mesh.vertices[vj_id, 0]
-
-            D.x = D.x + (vi[0] - vj[0])
-            D.y = D.y + (vi[1] - vj[1])
-            D.z = D.z + (vi[2] - vj[2])
-            n += 1.0
-
-            inc(it)
+    for i in range(ring1.size()):
+        vj_id = deref(ring1)[i]
+        if border and not mesh.is_border(vj_id):
+            continue
+        vj = &mesh.vertices[vj_id, 0]
 
-    del vertices
+        D.x = D.x + (vi[0] - vj[0])
+        D.y = D.y + (vi[1] - vj[1])
+        D.z = D.z + (vi[2] - vj[2])
+        n += 1.0
 
     D.x = D.x / n
     D.y = D.y / n
     D.z = D.z / n
     return D
 
-cdef vector[vertex_id_t]* find_staircase_artifacts(Mesh mesh, double[3] stack_orientation, double T) noexcept nogil:
-    """
-    This function is used to find vertices at staircase artifacts, which are
-    those vertices whose incident faces' orientation differences are
-    greater than T.
 
-    Params:
-        mesh: Mesh
-        stack_orientation: orientation of slice stacking
-        T: Min angle (between vertex faces and stack_orientation) to consider a
-           vertex a staircase artifact.
-    """
-    cdef int nv, nf, f_id, v_id
+cdef inline bool is_staircase_artifact(Mesh mesh, vertex_id_t v_id, double* stack_orientation, double T) noexcept nogil:
     cdef double of_z, of_y, of_x, min_z, max_z, min_y, max_y, min_x, max_x;
-    cdef vector[vertex_id_t]* f_ids
     cdef normal_t* normal
+    cdef vertex_id_t f_id, k
 
-    cdef vector[vertex_id_t]* output = new vector[vertex_id_t]()
-    cdef int i
+    max_z = -10000
+    min_z = 10000
+    max_y = -10000
+    min_y = 10000
+    max_x = -10000
+    min_x = 10000
 
-    nv = mesh.vertices.shape[0]
+    for k in range(mesh.vface_offsets[v_id], mesh.vface_offsets[v_id + 1]):
+        f_id = mesh.vface_ids[k]
+        normal = &mesh.normals[f_id, 0]
 
-    for v_id in range(nv):
-        max_z = -10000
-        min_z = 10000
-        max_y = -10000
-        min_y = 10000
-        max_x = -10000
-        min_x = 10000
+        of_z = 1 - fabs(normal[0]*stack_orientation[0] + normal[1]*stack_orientation[1] + normal[2]*stack_orientation[2]);
+        of_y = 1 - fabs(normal[0]*0 + normal[1]*1 + normal[2]*0);
+        of_x = 1 - fabs(normal[0]*1 + normal[1]*0 + normal[2]*0);
 
-        f_ids = mesh.get_faces_by_vertex(v_id)
-        nf = deref(f_ids).size()
+        if (of_z > max_z):
+            max_z = of_z
 
-        for i in range(nf):
-            f_id = deref(f_ids)[i]
-            normal = &mesh.normals[f_id, 0]
+        if (of_z < min_z):
+            min_z = of_z
 
-            of_z = 1 - fabs(normal[0]*stack_orientation[0] + normal[1]*stack_orientation[1] + normal[2]*stack_orientation[2]);
-            of_y = 1 - fabs(normal[0]*0 + normal[1]*1 + normal[2]*0);
-            of_x = 1 - fabs(normal[0]*1 + normal[1]*0 + normal[2]*0);
+        if (of_y > max_y):
+            max_y = of_y
 
-            if (of_z > max_z):
-                max_z = of_z
+        if (of_y < min_y):
+            min_y = of_y
 
-            if (of_z < min_z):
-                min_z = of_z
+        if (of_x > max_x):
+            max_x = of_x
 
-            if (of_y > max_y):
-                max_y = of_y
+        if (of_x < min_x):
+            min_x = of_x
 
-            if (of_y < min_y):
-                min_y = of_y
+        if ((fabs(max_z - min_z) >= T) or (fabs(max_y - min_y) >= T) or (fabs(max_x - min_x) >= T)):
+            return True
+    return False
 
-            if (of_x > max_x):
-                max_x = of_x
 
-            if (of_x < min_x):
-                min_x = of_x
+cdef vector[vertex_id_t]* find_staircase_artifacts(Mesh mesh, double[3] stack_orientation, double T) noexcept nogil:
+    """
+    This function is used to find vertices at staircase artifacts, which are
+    those vertices whose incident faces' orientation differences are
+    greater than T.
+
+    Params:
+        mesh: Mesh
+        stack_orientation: orientation of slice stacking
+        T: Min angle (between vertex faces and stack_orientation) to consider a
+           vertex a staircase artifact.
+    """
+    cdef Py_ssize_t nv, v_id
+    cdef vector[vertex_id_t]* output = new vector[vertex_id_t]()
 
+    nv = mesh.vertices.shape[0]
+    cdef vector[char] flags = vector[char](nv)
+
+    for v_id in prange(nv, schedule="guided"):
+        flags[v_id] = is_staircase_artifact(mesh, v_id, stack_orientation, T)
 
-            if ((fabs(max_z - min_z) >= T) or (fabs(max_y - min_y) >= T) or (fabs(max_x - min_x) >= T)):
-                output.push_back(v_id)
-                break
+    for v_id in range(nv):
+        if flags[v_id]:
+            output.push_back(v_id)
     return output
 
 
@@ -425,10 +449,11 @@ cdef void taubin_smooth(Mesh mesh, vector[weight_t]& weights, float l, float m,
     cdef int s, i, nvertices
     nvertices = mesh.vertices.shape[0]
     cdef vector[Point] D = vector[Point](nvertices)
+    cdef vector[vector[vertex_id_t]] scratches = vector[vector[vertex_id_t]](openmp.omp_get_max_threads())
     cdef vertex_t* vi
     for s in range(steps):
         for i in prange(nvertices, nogil=True):
-            D[i] = calc_d(mesh, i)
+            D[i] = calc_d(mesh, i, &scratches[openmp.omp_get_thread_num()])
 
         for i in prange(nvertices, nogil=True):
             mesh.vertices[i, 0] += weights[i]*l*D[i].x;
@@ -436,7 +461,7 @@ cdef void taubin_smooth(Mesh mesh, vector[weight_t]& weights, float l, float m,
             mesh.vertices[i, 2] += weights[i]*l*D[i].z;
 
         for i in prange(nvertices, nogil=True):
-            D[i] = calc_d(mesh, i)
+            D[i] = calc_d(mesh, i, &scratches[openmp.omp_get_thread_num()])
 
         for i in prange(nvertices, nogil=True):
             mesh.vertices[i, 0] += weights[i]*m*D[i].x;
@@ -476,3 +501,7 @@ def ca_smoothing(Mesh mesh, double T, double tmax, double bmin, int n_iters):
     print("taubin", time.time() - t0)
 
     del weights
+
+    # The vertices share their memory with the polydata points.
+    if mesh._points is not None:
+        mesh._points.Modified()
@@ -12,6 +12,7 @@ cimport cython
 
 from collections import deque
 
+cimport openmp
 from cython.parallel cimport prange
 from libc.math cimport floor, ceil
 from libcpp cimport bool
@@ -154,6 +155,175 @@ def floodfill_threshold(np.ndarray[image_t, ndim=3] data, list seeds, int t0, in
         return out
 
 
+# Each thread grows the region inside slabs of slices, about this number of
+# slabs per thread so the threads stay busy when the region is not uniformly
+# spread over the volume.
+DEF SLABS_PER_THREAD = 4
+
+
+cdef void _grow_slab(const image_t[:, :, :] data, double t0, double t1, mask_t fill,
+                     const mask_t[:, :, :] strct, mask_t[:, :, :] out, int zi, int zf,
+                     vector[coord]* stack, vector[coord]* outbox, vector[coord]* blocked,
+                     bint track_blocked, double* stats) noexcept nogil:
+    """
+    Grows the region from the voxels in stack, only writing in out between the
+    slices zi and zf. Voxels of other slabs inside [t0, t1] are put in outbox,
+    voxels outside [t0, t1] are put in blocked (if track_blocked). stats is
+    incremented with the number, sum and sum of squares of the voxels filled.
+    """
+    cdef int dz = data.shape[0]
+    cdef int dy = data.shape[1]
+    cdef int dx = data.shape[2]
+    cdef int odz = strct.shape[0]
+    cdef int ody = strct.shape[1]
+    cdef int odx = strct.shape[2]
+    cdef int i, j, k, xo, yo, zo
+    cdef double v
+    cdef coord c, n
+
+    while stack.size():
+        c = stack.back()
+        stack.pop_back()
+        for k in range(odz):
+            zo = c.z + k - odz // 2
+            if zo < 0 or zo >= dz:
+                continue
+            for j in range(ody):
+                yo = c.y + j - ody // 2
+                if yo < 0 or yo >= dy:
+                    continue
+                for i in range(odx):
+                    xo = c.x + i - odx // 2
+                    if xo < 0 or xo >= dx or not strct[k, j, i]:
+                        continue
+                    n.x = xo
+                    n.y = yo
+                    n.z = zo
+                    if zi <= zo < zf:
+                        if out[zo, yo, xo] == fill:
+                            continue
+                        v = data[zo, yo, xo]
+                        if t0 <= v <= t1:
+                            out[zo, yo, xo] = fill
+                            stack.push_back(n)
+                            stats[0] += 1
+                            stats[1] += v
+                            stats[2] += v * v
+                        elif track_blocked:
+                            blocked.push_back(n)
+                    else:
+                        v = data[zo, yo, xo]
+                        if t0 <= v <= t1:
+                            outbox.push_back(n)
+                        elif track_blocked:
+                            blocked.push_back(n)
+
+
+cdef _grow_region(const image_t[:, :, :] data, seeds, double t0, double t1, mask_t fill,
+                  const mask_t[:, :, :] strct, mask_t[:, :, :] out, bint track_blocked):
+    cdef int dz = data.shape[0]
+    cdef int dy = data.shape[1]
+    cdef int dx = data.shape[2]
+    cdef int n_slabs = min(dz, openmp.omp_get_max_threads() * SLABS_PER_THREAD)
+    cdef int slab_size = (dz + n_slabs - 1) // n_slabs
+    n_slabs = (dz + slab_size - 1) // slab_size
+
+    cdef vector[vector[coord]] stacks = vector[vector[coord]](n_slabs)
+    cdef vector[vector[coord]] outboxes = vector[vector[coord]](n_slabs)
+    cdef vector[vector[coord]] blocked = vector[vector[coord]](n_slabs)
+    # Number, sum and sum of squares of the voxels filled by each slab.
+    cdef np.ndarray[np.float64_t, ndim=2] stats = np.zeros((n_slabs, 3), dtype=np.float64)
+    cdef double[:, :] stats_view = stats
+
+    cdef int s, x, y, z
+    cdef size_t i, pending
+    cdef double v
+    cdef coord c
+
+    for x, y, z in seeds:
+        if not (0 <= x < dx and 0 <= y < dy and 0 <= z < dz):
+            continue
+        c.x = x
+        c.y = y
+        c.z = z
+        v = data[z, y, x]
+        if out[z, y, x] == fill:
+            # Already in the region, the region grows again from it.
+            stacks[z // slab_size].push_back(c)
+        elif t0 <= v <= t1:
+            out[z, y, x] = fill
+            stacks[z // slab_size].push_back(c)
+            stats_view[0, 0] += 1
+            stats_view[0, 1] += v
+            stats_view[0, 2] += v * v
+        elif track_blocked:
+            blocked[0].push_back(c)
+
+    with nogil:
+        while True:
+            for s in prange(n_slabs, schedule="dynamic"):
+                if stacks[s].size():
+                    _grow_slab(data, t0, t1, fill, strct, out, s * slab_size,
+                               min(dz, (s + 1) * slab_size), &stacks[s], &outboxes[s],
+                               &blocked[s], track_blocked, &stats_view[s, 0])
+
+            # The voxels which crossed to other slabs start the next pass.
+            pending = 0
+            for s in range(n_slabs):
+                for i in range(outboxes[s].size()):
+                    c = outboxes[s][i]
+                    if out[c.z, c.y, c.x] != fill:
+                        out[c.z, c.y, c.x] = fill
+                        stacks[c.z // slab_size].push_back(c)
+                        v = data[c.z, c.y, c.x]
+                        stats_view[s, 0] += 1
+                        stats_view[s, 1] += v
+                        stats_view[s, 2] += v * v
+                        pending += 1
+                outboxes[s].clear()
+            if pending == 0:
+                break
+
+    if not track_blocked:
+        return None
+
+    cdef size_t n_blocked = 0
+    for s in range(n_slabs):
+        n_blocked += blocked[s].size()
+    cdef np.ndarray[np.int32_t, ndim=2] blocked_arr = np.empty((n_blocked, 3), dtype=np.int32)
+    n_blocked = 0
+    for s in range(n_slabs):
+        for i in range(blocked[s].size()):
+            c = blocked[s][i]
+            blocked_arr[n_blocked, 0] = c.x
+            blocked_arr[n_blocked, 1] = c.y
+            blocked_arr[n_blocked, 2] = c.z
+            n_blocked += 1
+    return np.unique(blocked_arr, axis=0), tuple(stats.sum(0))
+
+
+def floodfill_threshold_parallel(const image_t[:, :, :] data, seeds, double t0, double t1, int fill, const mask_t[:, :, :] strct, mask_t[:, :, :] out):
+    """
+    Same as floodfill_threshold, but the region is grown by several threads,
+    each one inside slabs of slices, and exchanging the voxels that cross the
+    slabs between passes. All the seeds ([x, y, z]) are grown in one call.
+    """
+    _grow_region(data, seeds, t0, t1, fill, strct, out, False)
+
+
+def floodfill_threshold_incremental(const image_t[:, :, :] data, seeds, double t0, double t1, int fill, const mask_t[:, :, :] strct, mask_t[:, :, :] out):
+    """
+    Same as floodfill_threshold_parallel, also returning the information to
+    grow the region again later with other thresholds:
+
+        - The voxels ([x, y, z]) next to the region and outside [t0, t1],
+          which are the seeds to grow it again.
+        - The number, sum and sum of squares of the values of the voxels
+          added to the region.
+    """
+    return _grow_region(data, seeds, t0, t1, fill, strct, out, True)
+
+
 def floodfill_auto_threshold(np.ndarray[image_t, ndim=3] data, list seeds, float p, int fill, np.ndarray[mask_t, ndim=3] out):
 
     cdef int to_return = 0
@@ -31,10 +31,12 @@ def lmip(np.ndarray[DTYPE16_t, ndim=3] image, int axis, DTYPE16_t tmin,
     cdef int sy = image.shape[1]
     cdef int sx = image.shape[2]
 
+    cdef int x, y, z
+
     # AXIAL
     if axis == 0:
-        for x in range(sx):
-            for y in range(sy):
+        for y in prange(sy, nogil=True):
+            for x in range(sx):
                 max = image[0, y, x]
                 if max >= tmin and max <= tmax:
                     start = 1
@@ -46,7 +48,7 @@ def lmip(np.ndarray[DTYPE16_t, ndim=3] image, int axis, DTYPE16_t tmin,
 
                     elif image[z, y, x] < max and start:
                         break
-                    
+
                     if image[z, y, x] >= tmin and image[z, y, x] <= tmax:
                         start = 1
 
@@ -54,7 +56,7 @@ def lmip(np.ndarray[DTYPE16_t, ndim=3] image, int axis, DTYPE16_t tmin,
 
     #CORONAL
     elif axis == 1:
-        for z in range(sz):
+        for z in prange(sz, nogil=True):
             for x in range(sx):
                 max = image[z, 0, x]
                 if max >= tmin and max <= tmax:
@@ -67,15 +69,15 @@ def lmip(np.ndarray[DTYPE16_t, ndim=3] image, int axis, DTYPE16_t tmin,
 
                     elif image[z, y, x] < max and start:
                         break
-                    
+
                     if image[z, y, x] >= tmin and image[z, y, x] <= tmax:
                         start = 1
 
                 out[z, x] = max
 
-    #CORONAL
+    #SAGITAL
     elif axis == 2:
-        for z in range(sz):
+        for z in prange(sz, nogil=True):
             for y in range(sy):
                 max = image[z, y, 0]
                 if max >= tmin and max <= tmax:
@@ -88,7 +90,7 @@ def lmip(np.ndarray[DTYPE16_t, ndim=3] image, int axis, DTYPE16_t tmin,
 
                     elif image[z, y, x] < max and start:
                         break
-                    
+
                     if image[z, y, x] >= tmin and image[z, y, x] <= tmax:
                         start = 1
 
@@ -0,0 +1,63 @@
+# distutils: define_macros=NPY_NO_DEPRECATED_API=NPY_1_7_API_VERSION
+# cython: boundscheck=False
+# cython: wraparound=False
+# cython: initializedcheck=False
+# cython: cdivision=True
+# cython: nonecheck=False
+# cython: language_level=3
+
+import numpy as np
+cimport numpy as np
+cimport cython
+
+from cython.parallel cimport prange
+
+from .cy_my_types cimport mask_t
+
+ctypedef fused volume_t:
+    np.int16_t
+    np.uint16_t
+    np.int32_t
+    np.uint8_t
+    np.float32_t
+    np.float64_t
+
+# Edition labels of the mask, kept when the threshold is applied.
+cdef enum:
+    REMOVED = 1
+    REMOVED_EDITED = 2
+    ADDED_EDITED = 253
+    ADDED = 254
+
+
+def threshold_to_mask(const volume_t[:, :, :] image, mask_t[:, :, :] mask, double tmin, double tmax):
+    """
+    Applies the threshold [tmin, tmax] to the slices of image straight into
+    mask (which has an extra slice, row and column at the start): voxels
+    inside are set to 255 and the others to 0, except the ones with edition
+    labels (1, 2, 253 and 254). Slices flagged as already thresholded
+    (mask[n, 0, 0] != 0) are skipped. The slices are processed in parallel.
+    """
+    cdef int dz = image.shape[0]
+    cdef int dy = image.shape[1]
+    cdef int dx = image.shape[2]
+    cdef int z, y, x
+    cdef mask_t v
+    cdef double value
+
+    if mask.shape[0] != dz + 1 or mask.shape[1] != dy + 1 or mask.shape[2] != dx + 1:
+        raise ValueError("Mask shape doesn't match the image shape")
+
+    for z in prange(dz, nogil=True, schedule="guided"):
+        if mask[z + 1, 0, 0] != 0:
+            continue
+        for y in range(dy):
+            for x in range(dx):
+                v = mask[z + 1, y + 1, x + 1]
+                if v == REMOVED or v == REMOVED_EDITED or v == ADDED_EDITED or v == ADDED:
+                    continue
+                value = image[z, y, x]
+                if value >= tmin and value <= tmax:
+                    mask[z + 1, y + 1, x + 1] = 255
+                else:
+                    mask[z + 1, y + 1, x + 1] = 0
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Benchmark of the surface creation pipeline (invesalius/data/surface_process.py),
+# without GUI. It builds synthetic volumes, creates the surface pieces and joins
+# them the same way SurfaceManager.AddNewActor does, and reports the wall time,
+# peak RSS and number of triangles of each stage as JSON, so runs can be
+# compared over time.
+#
+# Example usage:
+#
+#     - python scripts/benchmark_surface.py
+#
+#     - python scripts/benchmark_surface.py --dataset phantom --shape 256 256 256 \
+#           --algorithm ca_smoothing --keep-largest --fill-holes -o phantom.json
+#
+# The pieces are created one after the other in this process, so the time of the
+# "contour" stage is the sum of the time of all pieces.
+
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from invesalius.data import surface_process  # noqa: E402
+
+# Threshold range used to create the masks (bone, as in the threshold presets).
+THRESHOLD_RANGE = (226, 3071)
+
+# Same values as the default ones in the surface creation dialog.
+CA_SMOOTHING_OPTIONS = {"angle": 0.7, "max distance": 3.0, "min weight": 0.5, "steps": 10}
+
+# Interval, in seconds, between the RSS samples.
+RSS_SAMPLING_INTERVAL = 0.005
+
+
+def make_spheres(shape, rng):
+    """
+    Spheres of several sizes spread over the volume.
+    """
+    image = np.full(shape, -1000, dtype=np.int16)
+    z, y, x = np.ogrid[: shape[0], : shape[1], : shape[2]]
+    size = min(shape)
+    for _ in range(8):
+        center = [rng.uniform(0.2, 0.8) * s for s in shape]
+        radius = rng.uniform(0.05, 0.2) * size
+        sphere = (z - center[0]) ** 2 + (y - center[1]) ** 2 + (x - center[2]) ** 2 < radius**2
+        image[sphere] = 1000
+    return image
+
+
+def make_phantom(shape, rng):
+    """
+    CT like head phantom: soft tissue ellipsoid inside a bone shell, with
+    small bone structures and noise.
+    """
+    z, y, x = np.ogrid[: shape[0], : shape[1], : shape[2]]
+    center = [s / 2.0 for s in shape]
+    r = np.sqrt(
+        ((z - center[0]) / (0.45 * shape[0])) ** 2
+        + ((y - center[1]) / (0.45 * shape[1])) ** 2
+        + ((x - center[2]) / (0.40 * shape[2])) ** 2
+    )
+    image = np.full(shape, -1000, dtype=np.float32)
+    image[r < 1.0] = 40
+    image[(r >= 0.85) & (r < 0.95)] = 1200
+    for _ in range(32):
+        c = [rng.uniform(0.3, 0.7) * s for s in shape]
+        radius = rng.uniform(0.01, 0.04) * min(shape)
+        image[(z - c[0]) ** 2 + (y - c[1]) ** 2 + (x - c[2]) ** 2 < radius**2] = 800
+    image += rng.normal(0, 60, size=shape).astype(np.float32)
+    return np.clip(image, -1024, 3071).astype(np.int16)
+
+
+DATASETS = {
+    "sphere": make_spheres,
+    "phantom": make_phantom,
+}
+
+
+class StageRecorder:
+    """
+    Used as the msg_queue of surface_process.join_process_surface: each
+    message starts a new stage. Records the wall time and the peak RSS of
+    each stage, the RSS is sampled from another thread.
+    """
+
+    def __init__(self):
+        self.process = psutil.Process()
+        self.stages = []
+        self._current = None
+        self._lock = threading.Lock()
+        self._running = True
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def _sample(self):
+        while self._running:
+            self._update_rss()
+            time.sleep(RSS_SAMPLING_INTERVAL)
+
+    def _update_rss(self):
+        rss = self.process.memory_info().rss
+        with self._lock:
+            if self._current is not None:
+                self._current["peak_rss"] = max(self._current["peak_rss"], rss)
+
+    def start(self, name, **info):
+        self.end()
+        names = [stage["name"] for stage in self.stages]
+        if name in names:
+            name = f"{name} ({names.count(name) + 1})"
+        with self._lock:
+            self._current = {"name": name, "start": time.perf_counter(), "peak_rss": 0}
+            self._current.update(info)
+        self._update_rss()
+
+    def end(self, **info):
+        self._update_rss()
+        with self._lock:
+            if self._current is None:
+                return
+            stage = self._current
+            self._current = None
+        stage["wall_time"] = time.perf_counter() - stage.pop("start")
+        stage.update(info)
+        self.stages.append(stage)
+
+    def close(self):
+        self.end()
+        self._running = False
+        self._sampler.join()
+
+    # Interface of the queue used by join_process_surface.
+    def put_nowait(self, msg):
+        self.start(msg.rstrip(" .").lower())
+
+
+def count_triangles(arrays):
+    return int(len(arrays["offsets"]) - 1) if len(arrays["offsets"]) else 0
+
+
+def run(args, dataset):
+    rng = np.random.default_rng(args.seed)
+    shape = tuple(args.shape)
+    tmp_dir = tempfile.mkdtemp(prefix="inv_surface_benchmark_")
+    try:
+        image_filename = os.path.join(tmp_dir, "image.dat")
+        mask_filename = os.path.join(tmp_dir, "mask.dat")
+
+        image = np.memmap(image_filename, mode="w+", dtype=np.int16, shape=shape)
+        image[:] = DATASETS[dataset](shape, rng)
+        image.flush()
+
+        # Masks have an extra slice, row and column at the start.
+        mask_shape = tuple(s + 1 for s in shape)
+        mask = np.memmap(mask_filename, mode="w+", dtype=np.uint8, shape=mask_shape)
+        mask[0] = 0
+        mask[:, 0] = 0
+        mask[:, :, 0] = 0
+        mask[1:, 1:, 1:] = np.where(
+            (image >= THRESHOLD_RANGE[0]) & (image <= THRESHOLD_RANGE[1]), 255, 0
+        )
+        mask.flush()
+
+        if args.piece_size:
+            piece_size = args.piece_size
+        else:
+            piece_size = surface_process.get_piece_size(
+                shape, image.dtype.itemsize, psutil.cpu_count() or 1
+            )
+        n_pieces = math.ceil(shape[0] / piece_size)
+
+        recorder = StageRecorder()
+        t_init = time.perf_counter()
+
+        recorder.start("contour", pieces=n_pieces, piece_size=piece_size)
+        pieces = []
+        for i in range(n_pieces):
+            roi = slice(i * piece_size, (i + 1) * piece_size + 1)
+            pieces.append(
+                surface_process.create_surface_piece(
+                    image_filename,
+                    shape,
+                    image.dtype,
+                    mask_filename,
+                    mask_shape,
+                    mask.dtype,
+                    roi,
+                    tuple(args.spacing),
+                    "CONTOUR",
+                    THRESHOLD_RANGE[0],
+                    THRESHOLD_RANGE[1],
+                    args.decimate,
+                    0.3,
+                    2,
+                    "en",
+                    True,
+                    args.algorithm != "Default",
+                    args.algorithm,
+                    0,
+                    args.fill_border_holes,
+                )
+            )
+        recorder.end(triangles=sum(count_triangles(piece) for piece in pieces))
+
+        surface, measures = surface_process.join_process_surface(
+            pieces,
+            args.algorithm,
+            2,
+            0.3,
+            args.decimate,
+            args.keep_largest,
+            args.fill_holes,
+            CA_SMOOTHING_OPTIONS,
+            recorder,
+        )
+        recorder.end(triangles=count_triangles(surface))
+        total_time = time.perf_counter() - t_init
+        recorder.close()
+
+        return {
+            "dataset": dataset,
+            "shape": list(shape),
+            "spacing": list(args.spacing),
+            "algorithm": args.algorithm,
+            "decimate_reduction": args.decimate,
+            "keep_largest": args.keep_largest,
+            "fill_holes": args.fill_holes,
+            "fill_border_holes": args.fill_border_holes,
+            "wall_time": total_time,
+            "peak_rss": max(stage["peak_rss"] for stage in recorder.stages),
+            "triangles": count_triangles(surface),
+            "volume": measures["volume"],
+            "area": measures["area"],
+            "stages": recorder.stages,
+        }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the surface creation pipeline of InVesalius."
+    )
+    parser.add_argument(
+        "--dataset",
+        choices=sorted(DATASETS),
+        action="append",
+        help="Synthetic volume used (may be given more than once, default: all).",
+    )
+    parser.add_argument(
+        "--shape", type=int, nargs=3, default=(128, 128, 128), metavar=("Z", "Y", "X")
+    )
+    parser.add_argument(
+        "--spacing", type=float, nargs=3, default=(1.0, 1.0, 1.0), metavar=("X", "Y", "Z")
+    )
+    parser.add_argument("--algorithm", choices=("Default", "ca_smoothing"), default="Default")
+    parser.add_argument(
+        "--decimate",
+        type=float,
+        default=0.0,
+        help="Target reduction (0 to 1) of the decimation, 0 (the default) to not decimate.",
+    )
+    parser.add_argument("--keep-largest", action="store_true")
+    parser.add_argument("--fill-holes", action="store_true")
+    parser.add_argument("--no-fill-border-holes", dest="fill_border_holes", action="store_false")
+    parser.add_argument("--piece-size", type=int, default=0, help="Slices of each piece.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each dataset.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="JSON file (default: standard output).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    datasets = args.dataset or sorted(DATASETS)
+
+    runs = []
+    for dataset in datasets:
+        for _ in range(args.repeat):
+            runs.append(run(args, dataset))
+
+    report = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": psutil.cpu_count(),
+        "runs": runs,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -84,6 +84,10 @@ setuptools.setup(
                 "invesalius_cy.transforms",
                 ["invesalius_cy/transforms.pyx"],
             ),
+            setuptools.Extension(
+                "invesalius_cy.threshold",
+                ["invesalius_cy/threshold.pyx"],
+            ),
             setuptools.Extension(
                 "invesalius_cy.floodfill",
                 ["invesalius_cy/floodfill.pyx"],
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkImagingColor import vtkImageMapToWindowLevelColors
+from vtkmodules.vtkImagingCore import vtkImageBlend
+
+from invesalius.data import colour_lut, converters
+
+
+def window_level(image, window=400, level=40):
+    colorer = vtkImageMapToWindowLevelColors()
+    colorer.SetInputData(image)
+    colorer.SetWindow(window)
+    colorer.SetLevel(level)
+    colorer.SetOutputFormatToRGB()
+    colorer.Update()
+    return colorer.GetOutput()
+
+
+def get_scalars(image):
+    return numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
+
+
+@pytest.mark.parametrize("orientation", ["AXIAL", "CORONAL", "SAGITAL"])
+def test_lut_same_as_vtk(orientation):
+    rng = np.random.default_rng(0)
+    n_image = rng.integers(-1024, 3000, size=(30, 40)).astype(np.int16)
+    expected = window_level(converters.to_vtk(n_image, (0.5, 0.6, 0.7), 5, orientation))
+
+    lut = colour_lut.build_lut(window_level, n_image.dtype, n_image.min(), n_image.max())
+    image = converters.to_vtk_colour(lut.map(n_image), (0.5, 0.6, 0.7), 5, orientation)
+
+    assert image.GetExtent() == expected.GetExtent()
+    assert image.GetSpacing() == expected.GetSpacing()
+    np.testing.assert_array_equal(get_scalars(image), get_scalars(expected))
+
+
+def test_lut_covers():
+    lut = colour_lut.build_lut(window_level, np.dtype(np.int16), -10, 20)
+    assert lut.min_value == -10 and lut.max_value == 20
+    assert lut.covers(-10, 20)
+    assert not lut.covers(-11, 0)
+    assert not colour_lut.can_use_lut(np.dtype(np.float32), 0, 1)
+    assert not colour_lut.can_use_lut(np.dtype(np.int32), 0, colour_lut.LUT_MAX_SIZE)
+
+
+@pytest.mark.parametrize("opacity", [0.8, 0.3, 1.0])
+def test_blend_same_as_vtk(opacity):
+    rng = np.random.default_rng(1)
+    rgb = rng.integers(0, 256, size=(20, 30, 3)).astype(np.uint8)
+    rgba = rng.integers(0, 256, size=(20, 30, 4)).astype(np.uint8)
+    rgb_image = converters.to_vtk_colour(rgb)
+    rgba_image = converters.to_vtk_colour(rgba)
+
+    blend = vtkImageBlend()
+    blend.SetBlendModeToNormal()
+    blend.SetOpacity(1, opacity)
+    blend.SetInputData(rgb_image)
+    blend.AddInputData(rgba_image)
+    blend.Update()
+
+    out = rgb.reshape(-1, 3).copy()
+    colour_lut.blend(out, rgba.reshape(-1, 4), opacity)
+
+    np.testing.assert_array_equal(out, get_scalars(blend.GetOutput()))
+
+
+def test_blend_buffer_is_reused():
+    rgb = np.full((4, 5, 3), 100, dtype=np.uint8)
+    rgba = np.zeros((4, 5, 4), dtype=np.uint8)
+    rgba[0, 0] = (200, 200, 200, 255)
+    image = converters.to_vtk_colour(rgb, slice_number=2)
+    buffer_ = colour_lut.BlendBuffer()
+
+    first = buffer_.blend(image, [converters.to_vtk_colour(rgba, slice_number=2)])
+    assert tuple(get_scalars(first)[0]) == (180, 180, 180)
+    assert tuple(get_scalars(first)[1]) == (100, 100, 100)
+    # The image blended is not changed.
+    assert (rgb == 100).all()
+
+    image = converters.to_vtk_colour(rgb, slice_number=3)
+    second = buffer_.blend(image, [])
+    assert second is first
+    assert second.GetExtent() == image.GetExtent()
+    assert (get_scalars(second) == 100).all()
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import invesalius.data.coregistration as dcr
+import invesalius.data.transformations as tr
+
+
+def random_pose(rng):
+    angles = rng.uniform(-np.pi, np.pi, 3)
+    return tr.compose_matrix(angles=angles, translate=rng.uniform(-100, 100, 3))
+
+
+def random_obj_data(rng, obj_id):
+    t_obj_raw = tr.translation_matrix(rng.uniform(-50, 50, 3))
+    s0_raw, r_s0_raw, s0_dyn, m_obj_raw, r_obj_img = (random_pose(rng) for _ in range(5))
+    r_s0_raw[:3, -1] = 0
+    r_obj_img[:3, -1] = 0
+    return obj_id, t_obj_raw, s0_raw, r_s0_raw, s0_dyn, m_obj_raw, r_obj_img
+
+
+@pytest.mark.parametrize("axes", ["sxyz", "rzyx", "rxyz", "szxz"])
+def test_euler_matrices(axes):
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-np.pi, np.pi, (20, 3))
+    # Gimbal lock
+    angles[0, 1] = np.pi / 2
+
+    matrices = dcr.euler_matrices(angles, axes)
+    for a, m in zip(angles, matrices):
+        np.testing.assert_allclose(m, tr.euler_matrix(*a, axes=axes), atol=1e-12)
+
+    expected = [tr.euler_from_matrix(m, axes) for m in matrices]
+    np.testing.assert_allclose(dcr.euler_from_matrices(matrices, axes), expected, atol=1e-9)
+
+
+@pytest.mark.parametrize("ref_mode_id", [True, False])
+@pytest.mark.parametrize("use_icp", [True, False])
+@pytest.mark.parametrize("r_stylus", [None, np.eye(3)])
+def test_coregistration_kernel(ref_mode_id, use_icp, r_stylus):
+    rng = np.random.default_rng(1)
+    m_change = random_pose(rng)
+    icp = (use_icp, random_pose(rng) if use_icp else None)
+    obj_datas = {"coil1": random_obj_data(rng, 2), "coil2": random_obj_data(rng, 3)}
+    kernel = dcr.CoregistrationKernel(m_change, r_stylus, obj_datas, ref_mode_id, icp)
+
+    corregistrate_object = (
+        dcr.corregistrate_object_dynamic if ref_mode_id else dcr.corregistrate_object_static
+    )
+    for _ in range(5):
+        coord_raw = np.column_stack(
+            (rng.uniform(-300, 300, (4, 3)), rng.uniform(-180, 180, (4, 3)))
+        )
+        coords, m_imgs = kernel.corregistrate(coord_raw)
+
+        assert list(coords) == ["probe", "coil1", "coil2"]
+        coord, m_img = dcr.corregistrate_probe(m_change, r_stylus, coord_raw, ref_mode_id, icp)
+        np.testing.assert_allclose(coords["probe"], coord, atol=1e-8)
+        np.testing.assert_allclose(m_imgs["probe"], m_img, atol=1e-10)
+        for name, obj_data in obj_datas.items():
+            coord, m_img = corregistrate_object(m_change, obj_data, coord_raw, icp)
+            np.testing.assert_allclose(coords[name], coord, atol=1e-8)
+            np.testing.assert_allclose(m_imgs[name], m_img, atol=1e-10)
@@ -0,0 +1,100 @@
+import collections
+
+import numpy as np
+import pytest
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonDataModel import vtkPlane
+from vtkmodules.vtkFiltersCore import (
+    vtkClipPolyData,
+    vtkPolyDataNormals,
+    vtkTriangleFilter,
+)
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from invesalius_cy import cy_mesh
+
+
+@pytest.fixture
+def polydata():
+    # A sphere with a cap clipped off, so it has border vertices.
+    sphere = vtkSphereSource()
+    sphere.SetRadius(10)
+    sphere.SetThetaResolution(30)
+    sphere.SetPhiResolution(30)
+
+    plane = vtkPlane()
+    plane.SetOrigin(0, 0, 3)
+    plane.SetNormal(0, 0.3, 1)
+    clipper = vtkClipPolyData()
+    clipper.SetInputConnection(sphere.GetOutputPort())
+    clipper.SetClipFunction(plane)
+
+    triangles = vtkTriangleFilter()
+    triangles.SetInputConnection(clipper.GetOutputPort())
+
+    normals = vtkPolyDataNormals()
+    normals.SetInputConnection(triangles.GetOutputPort())
+    normals.ComputeCellNormalsOn()
+    normals.Update()
+    return normals.GetOutput()
+
+
+def get_arrays(polydata):
+    vertices = numpy_support.vtk_to_numpy(polydata.GetPoints().GetData()).reshape(-1, 3)
+    faces = numpy_support.vtk_to_numpy(polydata.GetPolys().GetData()).reshape(-1, 4)[:, 1:]
+    return vertices, faces
+
+
+def get_border_vertices(faces):
+    edges = collections.Counter()
+    for face in faces:
+        for i in range(3):
+            edges[tuple(sorted((face[i], face[(i + 1) % 3])))] += 1
+    return sorted({v for edge, n in edges.items() if n == 1 for v in edge})
+
+
+def test_adjacency(polydata):
+    vertices, faces = get_arrays(polydata)
+    mesh = cy_mesh.Mesh(polydata)
+
+    for v_id in range(len(vertices)):
+        expected = np.flatnonzero((faces == v_id).any(axis=1))
+        np.testing.assert_array_equal(mesh.get_faces_by_vertex(v_id), expected)
+
+    border = get_border_vertices(faces)
+    assert border
+    np.testing.assert_array_equal(mesh.get_border_vertices(), border)
+
+
+def test_ca_smoothing_without_staircase(polydata):
+    # With T above 1 no vertex is a staircase artifact, so every vertex is
+    # moved by taubin smooth with the minimum weight.
+    vertices, faces = get_arrays(polydata)
+    vertices = vertices.astype(np.float64)
+    border = set(get_border_vertices(faces))
+    ring1 = [set() for _ in range(len(vertices))]
+    for face in faces:
+        for v in face:
+            ring1[v].update(face)
+    for v, neighbours in enumerate(ring1):
+        neighbours.discard(v)
+        if v in border:
+            neighbours.intersection_update(border)
+    ring1 = [sorted(neighbours) for neighbours in ring1]
+
+    def calc_d(vertices):
+        return np.array([vertices[v] - vertices[r].mean(axis=0) for v, r in enumerate(ring1)])
+
+    bmin = 0.3
+    for _ in range(2):
+        vertices += bmin * 0.5 * calc_d(vertices)
+        vertices += bmin * -0.53 * calc_d(vertices)
+
+    mesh = cy_mesh.Mesh(polydata)
+    mtime = polydata.GetPoints().GetData().GetMTime()
+    cy_mesh.ca_smoothing(mesh, 1.5, 3, bmin, 2)
+
+    smoothed, _ = get_arrays(polydata)
+    np.testing.assert_allclose(smoothed, vertices, atol=1e-4)
+    assert polydata.GetPoints().GetData().GetMTime() > mtime
+    np.testing.assert_array_equal(get_arrays(mesh.to_vtk())[0], smoothed)
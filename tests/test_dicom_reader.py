@@ -0,0 +1,166 @@
+import gdcm
+import numpy as np
+import pytest
+
+import invesalius.reader.dicom_index as dicom_index
+import invesalius.reader.dicom_reader as dicom_reader
+
+
+def write_dicom(filename, z, serie_number="1"):
+    writer = gdcm.ImageWriter()
+    image = writer.GetImage()
+    image.SetNumberOfDimensions(2)
+    image.SetDimension(0, 8)
+    image.SetDimension(1, 8)
+    pixel_format = gdcm.PixelFormat()
+    pixel_format.SetScalarType(gdcm.PixelFormat.INT16)
+    image.SetPixelFormat(pixel_format)
+    image.SetPhotometricInterpretation(
+        gdcm.PhotometricInterpretation(gdcm.PhotometricInterpretation.MONOCHROME2)
+    )
+    for i, (origin, spacing) in enumerate(zip((0.0, 0.0, float(z)), (0.5, 0.5, 1.0))):
+        image.SetOrigin(i, origin)
+        image.SetSpacing(i, spacing)
+
+    pixel_data = gdcm.DataElement(gdcm.Tag(0x7FE0, 0x0010))
+    pixel_data.SetByteStringValue(np.zeros((8, 8), np.int16).tobytes())
+    image.SetDataElement(pixel_data)
+
+    writer.SetFileName(str(filename))
+    dataset = writer.GetFile().GetDataSet()
+    for group, element, value in (
+        (0x0010, 0x0010, "Doe^John"),
+        (0x0010, 0x0020, "42"),
+        (0x0020, 0x000D, "1.2.3.4"),
+        (0x0020, 0x000E, "1.2.3.4." + serie_number),
+        (0x0020, 0x0010, "1"),
+        (0x0020, 0x0011, serie_number),
+        (0x0020, 0x0013, str(z)),
+        (0x0020, 0x0032, f"0\\0\\{z}"),
+        (0x0020, 0x0037, "1\\0\\0\\0\\1\\0"),
+    ):
+        data_element = gdcm.DataElement(gdcm.Tag(group, element))
+        data_element.SetByteStringValue(value.encode())
+        dataset.Insert(data_element)
+    assert writer.Write()
+
+
+@pytest.fixture(autouse=True)
+def index(tmp_path, monkeypatch):
+    index = dicom_index.DicomIndex(tmp_path / "dicom_index.sqlite")
+    monkeypatch.setattr(dicom_index, "_index", index)
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def dicom_dir(tmp_path):
+    tmp_path = tmp_path / "dicom"
+    tmp_path.mkdir()
+    for z in range(6):
+        write_dicom(tmp_path / f"a{z}.dcm", z, "1")
+    (tmp_path / "sub").mkdir()
+    for z in range(4):
+        write_dicom(tmp_path / "sub" / f"b{z}.dcm", z, "2")
+    (tmp_path / "README.txt").write_text("not a dicom file")
+    return tmp_path
+
+
+@pytest.fixture
+def thumbnails(monkeypatch):
+    created = []
+
+    def create_dicom_thumbnails(filepath, data_dict):
+        created.append(filepath)
+        return filepath + ".png"
+
+    monkeypatch.setattr(dicom_reader, "CreateDicomThumbnails", create_dicom_thumbnails)
+    return created
+
+
+def test_read_dicom_header(dicom_dir):
+    data_dict = dicom_reader.ReadDicomHeader(str(dicom_dir / "a2.dcm"))
+    assert data_dict[str(0x0010)][str(0x0010)] == "Doe^John"
+    assert data_dict["spacing"] == (0.5, 0.5, 1.0)
+    assert data_dict["invesalius"]["orientation_label"] == "AXIAL"
+    # Pixel data is not read.
+    assert str(0x0010) not in data_dict.get(str(0x7FE0), {})
+
+
+def test_read_dicom_header_invalid_file(dicom_dir):
+    assert dicom_reader.ReadDicomHeader(str(dicom_dir / "README.txt")) is None
+
+
+@pytest.mark.parametrize("min_files", [dicom_reader.PARALLEL_SCAN_MIN_FILES, 1])
+def test_get_dicom_groups(dicom_dir, thumbnails, monkeypatch, min_files):
+    monkeypatch.setattr(dicom_reader, "PARALLEL_SCAN_MIN_FILES", min_files)
+    values = list(dicom_reader.yGetDicomGroups(str(dicom_dir)))
+
+    assert values[:-1] == [(i, 11) for i in range(1, 12)]
+    (patient,) = values[-1]
+    nslices = sorted(group.nslices for group in patient.GetGroups())
+    assert nslices == [4, 6]
+
+    # Thumbnails are only created when they are shown.
+    assert thumbnails == []
+    dicom = patient.GetGroups()[0].GetDicomSample()
+    assert dicom.image.thumbnail_path == dicom.image.file + ".png"
+    assert thumbnails == [dicom.image.file]
+
+
+def test_get_dicom_groups_not_recursive(dicom_dir, thumbnails):
+    (patient,) = dicom_reader.GetDicomGroups(str(dicom_dir), recursive=False)
+    assert [group.nslices for group in patient.GetGroups()] == [6]
+
+
+def test_get_dicom_groups_uses_index(dicom_dir, thumbnails, monkeypatch):
+    dicom_reader.GetDicomGroups(str(dicom_dir))
+
+    read = []
+    read_dicom_header = dicom_reader.ReadDicomHeader
+
+    def read_dicom_header_spy(filepath):
+        read.append(filepath)
+        return read_dicom_header(filepath)
+
+    monkeypatch.setattr(dicom_reader, "ReadDicomHeader", read_dicom_header_spy)
+    write_dicom(dicom_dir / "a6.dcm", 6, "1")
+    (patient,) = dicom_reader.GetDicomGroups(str(dicom_dir))
+
+    # Only the new file is read.
+    assert read == [str(dicom_dir / "a6.dcm")]
+    assert sorted(group.nslices for group in patient.GetGroups()) == [4, 7]
+
+
+def test_index_thumbnails(tmp_path, index):
+    filepath = str(tmp_path / "a.dcm")
+    thumbnail = tmp_path / "thumb.png"
+    thumbnail.touch()
+    header = {"spacing": (1.0, 1.0, 2.0), "16": {"16": "Doe^John"}}
+
+    index.put_many([(filepath, (10.0, 100), header)])
+    index.set_thumbnail(filepath, str(thumbnail))
+    assert index.get_many({filepath: (10.0, 100)}) == {filepath: (header, str(thumbnail))}
+
+    # Thumbnails removed from disk are created again.
+    thumbnail.unlink()
+    assert index.get_many({filepath: (10.0, 100)}) == {filepath: (header, None)}
+
+    # The file changed.
+    assert index.get_many({filepath: (11.0, 100)}) == {}
+
+
+def test_index_prune(tmp_path, index):
+    kept = tmp_path / "a.dcm"
+    kept.touch()
+    removed = str(tmp_path / "b.dcm")
+    thumbnail = tmp_path / "thumb.png"
+    thumbnail.touch()
+
+    index.put_many([(str(kept), (10.0, 100), None), (removed, (10.0, 100), None)])
+    index.set_thumbnail(str(kept), str(thumbnail))
+    thumbnail.unlink()
+
+    assert index.prune() == 1
+    rows = index._conn.execute("SELECT path, thumbnail FROM files").fetchall()
+    assert rows == [(str(kept), None)]
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from scipy.ndimage import generate_binary_structure
+
+from invesalius_cy import floodfill
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    return (rng.random((40, 30, 35)) * 100).astype(np.int16)
+
+
+@pytest.mark.parametrize("connectivity", [1, 3])
+def test_floodfill_threshold_parallel(image, connectivity):
+    bstruct = np.array(generate_binary_structure(3, connectivity), dtype="uint8")
+    seeds = [[1, 2, 3], [30, 25, 35], [34, 29, 39]]
+    expected = np.zeros(image.shape, dtype=np.uint8)
+    floodfill.floodfill_threshold(image, seeds, 0, 55, 1, bstruct, expected)
+
+    out = np.zeros(image.shape, dtype=np.uint8)
+    floodfill.floodfill_threshold_parallel(image, seeds, 0, 55, 1, bstruct, out)
+
+    assert expected.any()
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_floodfill_threshold_parallel_in_place(image):
+    bstruct = np.array(generate_binary_structure(3, 1), dtype="uint8")
+    mask = np.where(image > 40, 255, 0).astype(np.uint8)
+    expected = mask.copy()
+    floodfill.floodfill_threshold(expected, [[1, 2, 3]], 254, 255, 0, bstruct, expected)
+
+    floodfill.floodfill_threshold_parallel(mask, [[1, 2, 3]], 254, 255, 0, bstruct, mask)
+
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_floodfill_threshold_incremental(image):
+    image[1, 2, 3] = 10
+    bstruct = np.array(generate_binary_structure(3, 1), dtype="uint8")
+    out = np.zeros(image.shape, dtype=np.uint8)
+
+    blocked, (n, s, s2) = floodfill.floodfill_threshold_incremental(
+        image, [[3, 2, 1]], 0, 30, 1, bstruct, out
+    )
+    region = out == 1
+    assert (n, s, s2) == (region.sum(), image[region].sum(), (image[region] ** 2.0).sum())
+    # The blocked voxels are next to the region and outside the thresholds.
+    x, y, z = blocked.T
+    assert np.all(image[z, y, x] > 30)
+    assert not region[z, y, x].any()
+
+    # Growing again from the blocked voxels is the same as growing from the
+    # seed with the new thresholds.
+    blocked, (n2, _, _) = floodfill.floodfill_threshold_incremental(
+        image, blocked, 0, 55, 1, bstruct, out
+    )
+    expected = np.zeros(image.shape, dtype=np.uint8)
+    floodfill.floodfill_threshold(image, [[3, 2, 1]], 0, 55, 1, bstruct, expected)
+    np.testing.assert_array_equal(out, expected)
+    assert n + n2 == expected.sum()
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from invesalius.data import image_statistics
+from invesalius.data.image_statistics import ImageStatistics
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    return rng.integers(-1024, 3000, size=(40, 20, 30)).astype(np.int16)
+
+
+@pytest.mark.parametrize("chunk_size", [7, 16, 100])
+def test_compute_statistics(image, chunk_size):
+    statistics = image_statistics.compute_statistics(image, chunk_size)
+
+    assert statistics.scalar_range == (image.min(), image.max())
+    assert statistics.number_of_voxels == image.size
+    i, e = image.min(), image.max()
+    expected = np.histogram(image, int(e) - int(i), (i, e))[0]
+    np.testing.assert_array_equal(statistics.histogram, expected)
+
+
+@pytest.mark.parametrize("q", [0, 2, 37.5, 50, 98, 100])
+def test_percentile(image, q):
+    statistics = image_statistics.compute_statistics(image)
+    assert statistics.percentile(q) == pytest.approx(np.percentile(image, q))
+
+
+def test_full_int16_range():
+    image = np.array([[[-32768, 0, 32767]]], dtype=np.int16)
+    statistics = image_statistics.compute_statistics(image)
+    assert statistics.scalar_range == (-32768, 32767)
+    assert statistics.counts[[0, 32768, 65535]].tolist() == [1, 1, 1]
+
+
+def test_statistics_unchanged_by_flips_and_swaps(image):
+    statistics = image_statistics.compute_statistics(image)
+    for changed in (image[::-1], image[:, :, ::-1], image.swapaxes(0, 2)):
+        other = image_statistics.compute_statistics(changed)
+        assert other.scalar_range == statistics.scalar_range
+        np.testing.assert_array_equal(other.counts, statistics.counts)
+
+
+def test_to_dict(image):
+    statistics = image_statistics.compute_statistics(image)
+    loaded = ImageStatistics.from_dict(statistics.to_dict())
+    assert loaded.scalar_range == statistics.scalar_range
+    np.testing.assert_array_equal(loaded.counts, statistics.counts)
+
+
+@pytest.mark.parametrize("chunk_size", [7, 100])
+def test_float_image(chunk_size):
+    rng = np.random.default_rng(0)
+    image = rng.normal(100.0, 300.0, size=(40, 20, 30)).astype(np.float32)
+    statistics = image_statistics.compute_statistics(image, chunk_size)
+
+    assert statistics.scalar_range == pytest.approx((image.min(), image.max()))
+    assert statistics.number_of_voxels == image.size
+    expected = np.histogram(image, len(statistics.counts), statistics.scalar_range)[0]
+    np.testing.assert_array_equal(statistics.counts, expected)
+    assert statistics.percentile(50) == pytest.approx(np.percentile(image, 50), abs=1.0)
+
+    loaded = ImageStatistics.from_dict(statistics.to_dict())
+    assert loaded.scalar_range == pytest.approx(statistics.scalar_range)
+    np.testing.assert_array_equal(loaded.counts, statistics.counts)
+
+
+@pytest.mark.parametrize("chunk_size", [7, 100])
+def test_wide_integer_range(chunk_size):
+    rng = np.random.default_rng(0)
+    image = rng.integers(-(2**30), 2**30, size=(40, 20, 30)).astype(np.int32)
+    statistics = image_statistics.compute_statistics(image, chunk_size)
+
+    assert statistics.scalar_range == (image.min(), image.max())
+    assert len(statistics.counts) == image_statistics.STATISTICS_MAX_BINS
+    assert statistics.number_of_voxels == image.size
+
+
+def test_combine_wide_range():
+    # Each part is exact, but together they have too many values.
+    parts = [np.array([0, 1, 1]), np.array([10**6, 10**6 + 2])]
+    statistics = ImageStatistics.combine(image_statistics.get_statistics(p) for p in parts)
+
+    assert statistics.scalar_range == (0, 10**6 + 2)
+    assert statistics.counts[0] == 3
+    assert statistics.counts[-1] == 2
+    assert statistics.number_of_voxels == 5
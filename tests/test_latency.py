@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+import invesalius.constants as const
+from invesalius.navigation.latency import (
+    LATENCY_HISTOGRAM_EDGES,
+    LATENCY_STAGES,
+    LatencyMonitor,
+    PoseRecord,
+)
+from invesalius.navigation.latency_benchmark import run_benchmark
+from invesalius.navigation.navigation import FrameScheduler
+
+
+def make_record(sequence, started, latencies):
+    record = PoseRecord(sequence, started, 0.0)
+    times = started + np.cumsum(latencies)
+    (
+        record.acquired,
+        record.coregistered,
+        record.dequeued,
+        record.delivered,
+        record.rendered,
+    ) = times
+    return record
+
+
+def test_latency_monitor(tmp_path):
+    monitor = LatencyMonitor()
+    latencies = [0.012, 0.0015, 0.00025, 0.0023, 0.021]
+    monitor.add(make_record(1, 10.0, latencies))
+    monitor.add(make_record(3, 10.1, [2 * t for t in latencies]))
+    monitor.drop("acquisition")
+    monitor.drop("dispatch", 0)
+
+    statistics = monitor.get_statistics()
+    assert statistics["rendered"] == 2
+    assert statistics["dropped"] == {
+        "acquisition": 1,
+        "coregistration": 0,
+        "queue": 0,
+        "dispatch": 0,
+        "render": 0,
+    }
+    for stage, latency in zip(LATENCY_STAGES, latencies):
+        assert statistics[stage]["mean"] == pytest.approx(1.5 * latency)
+        assert statistics[stage]["std"] == pytest.approx(0.5 * latency)
+        assert statistics[stage]["max"] == pytest.approx(2 * latency)
+        histogram = statistics[stage]["histogram"]
+        assert histogram.sum() == 2
+        bin = np.searchsorted(LATENCY_HISTOGRAM_EDGES, latency, side="right")
+        assert histogram[bin] == 1
+    assert statistics["total"]["mean"] == pytest.approx(1.5 * sum(latencies))
+
+    filename = tmp_path / "latency.csv"
+    monitor.save_csv(str(filename))
+    saved = np.loadtxt(filename, delimiter=",", skiprows=1)
+    np.testing.assert_allclose(saved[:, :2], [[1, 0], [3, 100]], atol=1e-6)
+    np.testing.assert_allclose(saved[1, 2:-1], [2000 * t for t in latencies], atol=1e-4)
+
+
+def test_latency_percentiles():
+    monitor = LatencyMonitor()
+    totals = np.linspace(0.149, 0.152, 50)
+    for i, total in enumerate(totals):
+        monitor.add(make_record(i, float(i), [0.0, 0.0, 0.0, 0.0, total]))
+
+    statistics = monitor.get_statistics()["total"]
+    assert totals[0] <= statistics["p50"] <= statistics["p95"] <= totals[-1]
+    assert statistics["p50"] == pytest.approx(np.percentile(totals, 50), abs=0.002)
+    assert statistics["p95"] == pytest.approx(np.percentile(totals, 95), abs=0.002)
+
+
+def test_frame_scheduler_finishes_records(mocker):
+    send_message = mocker.patch("invesalius.navigation.navigation.Publisher.sendMessage")
+    mocker.patch.object(const, "NAVIGATION_LATENCY_INTERVAL", 0.0)
+    calls = []
+    monitor = LatencyMonitor()
+    scheduler = FrameScheduler(monitor, call_after=calls.append)
+
+    records = [PoseRecord(i, 0.0, 0.0) for i in range(3)]
+    for record in records:
+        record.coregistered = record.dequeued = 0.0
+        scheduler.submit({"Update slices position": {"position": record.sequence}}, record)
+    assert calls == [scheduler.deliver]
+    scheduler.deliver()
+
+    statistics = monitor.get_statistics()
+    assert statistics["rendered"] == 1
+    assert statistics["dropped"]["dispatch"] == 2
+    assert records[2].rendered >= records[2].delivered > 0
+    assert records[0].delivered is None
+    send_message.assert_any_call("Navigation latency", statistics=mocker.ANY)
+
+
+@pytest.mark.parametrize("tracker_id", [const.DEBUGTRACKRANDOM, const.DEBUGTRACKAPPROACH])
+def test_benchmark(tracker_id):
+    monitor = run_benchmark(tracker_id, duration=0.5, sleep_coord=0.0)
+
+    statistics = monitor.get_statistics()
+    assert statistics["rendered"] > 0
+    assert statistics["total"]["p50"] > 0
+    sequences = [record[0] for record in monitor.records]
+    assert sequences == sorted(sequences)
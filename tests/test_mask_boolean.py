@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import invesalius.constants as const
+from invesalius.data import mask_boolean
+
+
+@pytest.fixture
+def masks():
+    rng = np.random.default_rng(0)
+    values = np.array([0, 1, 2, 253, 254, 255], dtype=np.uint8)
+    return [rng.choice(values, size=(11, 13, 17)) for _ in range(4)]
+
+
+def evaluate(expression, masks, chunk_size=mask_boolean.BOOLEAN_CHUNK_SIZE):
+    out = np.full(masks[0].shape, 7, dtype=np.uint8)
+    mask_boolean.evaluate(expression, masks, out, chunk_size)
+    # The extra slice, row and column are not changed.
+    assert (out[0] == 7).all() and (out[:, 0] == 7).all() and (out[:, :, 0] == 7).all()
+    return out[1:, 1:, 1:]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 12 * 16 * 3, mask_boolean.BOOLEAN_CHUNK_SIZE])
+def test_binary_operations(masks, chunk_size):
+    m1 = masks[0][1:, 1:, 1:]
+    m2 = masks[1][1:, 1:, 1:]
+    expected = {
+        const.BOOLEAN_UNION: ((m1 > 2) + (m2 > 2)) * 255,
+        const.BOOLEAN_DIFF: ((m1 > 2) ^ ((m1 > 2) & (m2 > 2))) * 255,
+        const.BOOLEAN_AND: ((m1 > 2) & (m2 > 2)) * 255,
+        const.BOOLEAN_XOR: np.logical_xor((m1 > 2), (m2 > 2)) * 255,
+    }
+    for op, result in expected.items():
+        np.testing.assert_array_equal(evaluate((op, 0, 1), masks, chunk_size), result)
+
+
+def test_nary_expression(masks):
+    m = [mask[1:, 1:, 1:] > 2 for mask in masks]
+    expression = (
+        const.BOOLEAN_DIFF,
+        (const.BOOLEAN_UNION, 0, 1, (const.BOOLEAN_AND, 2, 3)),
+        3,
+        (const.BOOLEAN_XOR, 0, 2),
+    )
+    expected = (m[0] | m[1] | (m[2] & m[3])) & ~m[3] & ~(m[0] ^ m[2])
+    np.testing.assert_array_equal(evaluate(expression, masks, 1), expected * 255)
+
+
+def test_invalid_expression(masks):
+    with pytest.raises(ValueError):
+        evaluate((const.BOOLEAN_UNION, 0, 4), masks)
+    with pytest.raises(ValueError):
+        evaluate((const.BOOLEAN_UNION, 0), masks)
+    with pytest.raises(ValueError):
+        evaluate((99, 0, 1), masks)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import invesalius.data.slice_  # noqa: F401 (slice_ and mask import each other)
+from invesalius.data.mask import EditionHistory, get_changed_bbox
+
+
+@pytest.fixture
+def mask():
+    rng = np.random.default_rng(0)
+    return rng.choice(np.array([0, 255], dtype=np.uint8), size=(11, 13, 15))
+
+
+def edit(history, mvolume, orientation, index, region):
+    """
+    Fills region of the slice index and saves it in history, as the editing
+    tools do.
+    """
+    view = {
+        "AXIAL": lambda: mvolume[index + 1, 1:, 1:],
+        "CORONAL": lambda: mvolume[1:, index + 1, 1:],
+        "SAGITAL": lambda: mvolume[1:, 1:, index + 1],
+        "VOLUME": lambda: mvolume,
+    }[orientation]()
+    p_array = view.copy()
+    view[region] = 254
+    history.new_node(index, orientation, view.copy(), p_array, False)
+
+
+def test_get_changed_bbox():
+    a = np.zeros((6, 7), dtype=np.uint8)
+    b = a.copy()
+    assert [s.stop - s.start for s in get_changed_bbox(a, b)] == [0, 0]
+    b[2, 3] = 1
+    b[4, 1] = 1
+    assert get_changed_bbox(a, b) == (slice(2, 5), slice(1, 4))
+
+
+@pytest.mark.parametrize("orientation", ["AXIAL", "CORONAL", "SAGITAL", "VOLUME"])
+@pytest.mark.parametrize("memory_budget", [2**30, 0])
+def test_undo_redo(mask, orientation, memory_budget):
+    history = EditionHistory(memory_budget=memory_budget)
+    actual_slices = {"AXIAL": 3, "CORONAL": 3, "SAGITAL": 3}
+    states = [mask.copy()]
+    for region in [np.s_[2:4, 3:6], np.s_[5:7, 1:2], np.s_[0:1, 0:10]]:
+        edit(history, mask, orientation, 3, region)
+        states.append(mask.copy())
+
+    # Only the changed region is stored.
+    assert history.history[-1].shape[:2] == (1, 10)
+    if memory_budget == 0:
+        assert all(node.nbytes == 0 for node in history.history)
+
+    # Volume nodes are undone (and redone) one at a time.
+    steps = 2 if orientation == "VOLUME" else 1
+    for state in states[-2::-1]:
+        for _ in range(steps):
+            history.undo(mask, actual_slices)
+        np.testing.assert_array_equal(mask, state)
+
+    for state in states[1:]:
+        for _ in range(steps):
+            history.redo(mask, actual_slices)
+        np.testing.assert_array_equal(mask, state)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from invesalius.data import mask_statistics
+from invesalius_cy import transforms
+
+
+def get_area(inside, spacing):
+    sx, sy, sz = spacing
+    kernel = np.zeros((3, 3, 3))
+    kernel[1, 1, 1] = 2 * sx * sy + 2 * sx * sz + 2 * sy * sz
+    kernel[0, 1, 1] = kernel[2, 1, 1] = -(sx * sy)
+    kernel[1, 0, 1] = kernel[1, 2, 1] = -(sx * sz)
+    kernel[1, 1, 0] = kernel[1, 1, 2] = -(sy * sz)
+    return transforms.convolve_non_zero(inside * 1.0, kernel, 1).sum()
+
+
+@pytest.fixture
+def image_and_mask():
+    rng = np.random.default_rng(0)
+    image = rng.integers(-1024, 3000, size=(37, 20, 30)).astype(np.int16)
+    mask = np.zeros((38, 21, 31), dtype=np.uint8)
+    mask[1:, 1:, 1:] = rng.choice(np.array([0, 1, 2, 253, 254, 255], dtype=np.uint8), image.shape)
+    return image, mask
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 16, 100])
+def test_compute_statistics(image_and_mask, chunk_size):
+    image, mask = image_and_mask
+    spacing = (0.5, 0.7, 1.2)
+    inside = mask[1:, 1:, 1:] > 127
+    values = image[inside]
+
+    statistics = mask_statistics.compute_statistics(image, mask, spacing, chunk_size)
+
+    assert statistics.min == values.min()
+    assert statistics.max == values.max()
+    assert statistics.mean == pytest.approx(values.mean())
+    assert statistics.std == pytest.approx(values.std())
+    assert statistics.voxels == inside.sum()
+    assert statistics.volume == pytest.approx(inside.sum() * 0.5 * 0.7 * 1.2)
+    assert statistics.area == pytest.approx(get_area(inside, spacing))
+
+
+def test_empty_mask(image_and_mask):
+    image, mask = image_and_mask
+    mask[:] = 0
+    statistics = mask_statistics.compute_statistics(image, mask, (1.0, 1.0, 1.0))
+    assert statistics == (0, 0, 0, 0, 0, 0.0, 0.0)
@@ -0,0 +1,106 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+import wx
+
+import invesalius.data.coordinates as dco
+import invesalius.navigation.navigation as navigation
+from invesalius.navigation.navigation import FrameScheduler, QueueCustom
+
+if not wx.GetApp():
+    app = wx.App(False)
+
+
+def test_queue_keeps_latest_item():
+    q = QueueCustom(maxsize=1)
+    q.put_nowait(1)
+    q.put_nowait(2)
+    q.put_nowait(3)
+
+    assert q.qsize() == 1
+    assert q.get_nowait() == 3
+    assert (q.put_count, q.dropped_count) == (3, 2)
+    q.task_done()
+    # All the items were either dropped or processed.
+    q.join()
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_queue_get_wakes_on_put():
+    q = QueueCustom(maxsize=1)
+    received = []
+
+    def consumer():
+        received.append((q.get(timeout=5), time.perf_counter()))
+        q.task_done()
+
+    thread = threading.Thread(target=consumer)
+    thread.start()
+    time.sleep(0.05)
+    put_time = time.perf_counter()
+    q.put_nowait("coord")
+    thread.join()
+
+    item, get_time = received[0]
+    assert item == "coord"
+    assert get_time - put_time < 0.05
+    assert 0 <= q.last_wait_time < 0.05
+
+
+def test_queue_clear():
+    q = QueueCustom(maxsize=1)
+    q.put_nowait(1)
+    q.clear()
+    assert q.empty()
+    q.join()
+
+
+def test_wait_coordinates():
+    tracker_coordinates = dco.TrackerCoordinates()
+    tracker_coordinates.nav_status = True
+    sequence = tracker_coordinates.sequence
+
+    assert tracker_coordinates.WaitCoordinates(sequence, timeout=0.01) == sequence
+
+    coord = np.zeros((3, 6))
+    timer = threading.Timer(
+        0.05, tracker_coordinates.SetCoordinates, args=(coord, [True, True, True])
+    )
+    timer.start()
+    new_sequence = tracker_coordinates.WaitCoordinates(sequence, timeout=5)
+    timer.join()
+
+    assert new_sequence == sequence + 1
+    assert tracker_coordinates.timestamp > 0
+    assert tracker_coordinates.coord is coord
+
+
+def test_frame_scheduler_coalesces_frames(mocker):
+    call_after = mocker.patch.object(navigation.wx, "CallAfter", create=True)
+    send_message = mocker.patch.object(navigation.Publisher, "sendMessage")
+    scheduler = FrameScheduler()
+
+    scheduler.submit({"Remove tracts": {}, "Update slices position": {"position": 1}})
+    scheduler.submit({"Update slices position": {"position": 2}})
+    scheduler.submit({"Update slices position": {"position": 3}, "Update probe pose": {"coord": 3}})
+
+    call_after.assert_called_once_with(scheduler.deliver)
+    scheduler.deliver()
+    # Nothing left to deliver.
+    scheduler.deliver()
+
+    assert send_message.call_args_list == [
+        mocker.call("Remove tracts"),
+        mocker.call("Update slices position", position=3),
+        mocker.call("Update probe pose", coord=3),
+        mocker.call("Render volume viewer"),
+        mocker.call("Update slice viewer"),
+    ]
+    assert (scheduler.rendered_count, scheduler.dropped_count) == (1, 2)
+
+    scheduler.submit({"Update slices position": {"position": 4}})
+    assert call_after.call_count == 2
@@ -0,0 +1,192 @@
+import tarfile
+
+import numpy as np
+import pytest
+
+import invesalius.data.slice_  # noqa: F401 (slice_ and mask import each other)
+import invesalius.project as prj
+from invesalius.data.image_statistics import compute_statistics
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = prj.Project()
+    project.Close()
+    matrix = np.memmap(tmp_path / "matrix.dat", mode="w+", dtype=np.int16, shape=(16, 64, 64))
+    matrix[:] = np.arange(matrix.size).reshape(matrix.shape)
+    matrix.flush()
+
+    project.name = "Doe^John"
+    project.modality = "CT"
+    project.original_orientation = "AXIAL"
+    project.window = 400
+    project.level = 40
+    project.threshold_range = (0, 119)
+    project.spacing = (1.0, 1.0, 1.0)
+    project.matrix_filename = str(tmp_path / "matrix.dat")
+    project.matrix_shape = matrix.shape
+    project.matrix_dtype = "int16"
+    yield project, matrix
+    project.Close()
+
+
+def get_members(path):
+    with tarfile.open(path) as tar:
+        return [m.name.split("/")[-1] for m in tar.getmembers()]
+
+
+def test_save_only_changed_members(tmp_path, project, monkeypatch):
+    monkeypatch.setattr(prj, "ARCHIVE_COMPACT_RATIO", 10)
+    project, matrix = project
+    path = tmp_path / "project.inv3"
+
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    assert sorted(get_members(path)) == ["main.plist", "matrix.dat", "measurements.plist"]
+
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    assert get_members(path)[3:] == ["main.plist"]
+
+    # The image is only saved again when it's modified (e.g. flipped).
+    matrix[0] = -1
+    matrix.flush()
+    project.matrix_version += 1
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    assert get_members(path)[4:] == ["matrix.dat", "main.plist"]
+
+    # The last copy of each member is the one opened.
+    project.Close()
+    project.OpenPlistProject(str(path))
+    saved = np.memmap(project.matrix_filename, mode="r", dtype=np.int16, shape=matrix.shape)
+    np.testing.assert_array_equal(saved, matrix)
+
+    # Opened projects also know which members changed.
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    assert get_members(path)[6:] == ["main.plist"]
+
+
+def test_save_whole_archive(tmp_path, project):
+    project, matrix = project
+    path = tmp_path / "project.inv3"
+
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=True)
+    with tarfile.open(path, "r:gz") as tar:
+        assert len(tar.getmembers()) == 3
+
+    # Too many old copies of the matrix.
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    for i in range(3):
+        matrix[0] = i
+        matrix.flush()
+        project.matrix_version += 1
+        project.SavePlistProject(str(tmp_path), "project.inv3")
+    assert len(get_members(path)) < 3 + 3 * 2
+    assert get_members(path).count("matrix.dat") < 3
+
+
+def test_save_only_changed_members_compressed(tmp_path, project, monkeypatch):
+    monkeypatch.setattr(prj, "ARCHIVE_COMPACT_RATIO", 10)
+    project, matrix = project
+    path = tmp_path / "project.inv3"
+
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=True)
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=True)
+    assert get_members(path)[3:] == ["main.plist"]
+
+    matrix[0] = -1
+    matrix.flush()
+    project.matrix_version += 1
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=True)
+    assert get_members(path)[4:] == ["matrix.dat", "main.plist"]
+
+    project.Close()
+    project.OpenPlistProject(str(path))
+    saved = np.memmap(project.matrix_filename, mode="r", dtype=np.int16, shape=matrix.shape)
+    np.testing.assert_array_equal(saved, matrix)
+
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=True)
+    assert get_members(path)[6:] == ["main.plist"]
+
+
+def test_save_image_statistics(tmp_path, project):
+    project, matrix = project
+    path = tmp_path / "project.inv3"
+
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    project.Close()
+    project.OpenPlistProject(str(path))
+    assert project.image_statistics is None
+
+    project.image_statistics = compute_statistics(matrix)
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    project.Close()
+    project.OpenPlistProject(str(path))
+    assert project.image_statistics.scalar_range == (matrix.min(), matrix.max())
+    expected = np.bincount(matrix.ravel().astype(int) - matrix.min())
+    np.testing.assert_array_equal(project.image_statistics.counts, expected)
+
+
+def test_save_only_changed_masks(tmp_path, project, monkeypatch):
+    from invesalius.data.mask import Mask
+
+    monkeypatch.setattr(prj, "ARCHIVE_COMPACT_RATIO", 10)
+    project, matrix = project
+    path = tmp_path / "project.inv3"
+    mask = Mask()
+    mask.create_mask(matrix.shape)
+    project.AddMask(mask)
+
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    assert get_members(path)[5:] == ["main.plist"]
+
+    mask.clean()
+    project.SavePlistProject(str(tmp_path), "project.inv3")
+    assert get_members(path)[6:] == ["mask_0.dat", "main.plist"]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_failed_save_keeps_archive(tmp_path, project, monkeypatch, compress):
+    monkeypatch.setattr(prj, "ARCHIVE_COMPACT_RATIO", 10)
+    project, matrix = project
+    path = tmp_path / "project.inv3"
+
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=compress)
+    saved = path.read_bytes()
+
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(prj, "_write_tar_members", fail)
+    monkeypatch.setattr(tarfile.TarFile, "add", fail)
+    matrix[0] = -1
+    matrix.flush()
+    project.matrix_version += 1
+    with pytest.raises(OSError):
+        project.SavePlistProject(str(tmp_path), "project.inv3", compress=compress)
+    assert path.read_bytes() == saved
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_open_interrupted_save(tmp_path, project, monkeypatch, compress):
+    monkeypatch.setattr(prj, "ARCHIVE_COMPACT_RATIO", 10)
+    project, matrix = project
+    path = tmp_path / "project.inv3"
+
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=compress)
+    expected = np.array(matrix)
+    size = path.stat().st_size
+
+    matrix[0] = -1
+    matrix.flush()
+    project.matrix_version += 1
+    project.SavePlistProject(str(tmp_path), "project.inv3", compress=compress)
+
+    # Crash in the middle of the second save, after the first one.
+    with open(path, "r+b") as f:
+        f.truncate(size + (path.stat().st_size - size) // 2)
+
+    project.Close()
+    project.OpenPlistProject(str(path))
+    saved = np.memmap(project.matrix_filename, mode="r", dtype=np.int16, shape=matrix.shape)
+    np.testing.assert_array_equal(saved, expected)
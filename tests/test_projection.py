@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import invesalius.constants as const
+from invesalius.data.projection import ProjectionEngine, get_slab, project_slab
+
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(0)
+    return rng.integers(-1000, 3000, size=(20, 16, 12)).astype(np.int16)
+
+
+@pytest.mark.parametrize(
+    "projection",
+    [const.PROJECTION_MaxIP, const.PROJECTION_MinIP, const.PROJECTION_MeanIP],
+)
+@pytest.mark.parametrize("orientation, axis", [("AXIAL", 0), ("CORONAL", 1), ("SAGITAL", 2)])
+def test_sliding_slab_matches_full_reduction(matrix, projection, orientation, axis):
+    engine = ProjectionEngine()
+    number_slices = 4
+    reduce = {
+        const.PROJECTION_MaxIP: np.max,
+        const.PROJECTION_MinIP: np.min,
+        const.PROJECTION_MeanIP: np.mean,
+    }[projection]
+
+    # Forward and then backward, so both directions use the incremental path.
+    n = matrix.shape[axis]
+    for slice_number in list(range(n)) + list(range(n - 2, -1, -1)):
+        expected = reduce(get_slab(matrix, axis, slice_number, slice_number + number_slices), axis)
+        result = engine.project(matrix, orientation, slice_number, number_slices, projection, 0)
+        np.testing.assert_allclose(result, expected)
+
+
+def test_reset_discards_previous_slab(matrix):
+    engine = ProjectionEngine()
+    engine.project(matrix, "AXIAL", 0, 4, const.PROJECTION_MaxIP, 0)
+    matrix[:] = matrix[::-1]
+    engine.reset()
+    result = engine.project(matrix, "AXIAL", 1, 4, const.PROJECTION_MaxIP, 0)
+    np.testing.assert_array_equal(result, matrix[1:5].max(0))
+
+
+def test_project_slab_reads_memmap_without_copy(tmp_path, matrix):
+    mmap = np.memmap(tmp_path / "image.dat", dtype=matrix.dtype, mode="w+", shape=matrix.shape)
+    mmap[:] = matrix
+    slab = get_slab(mmap, 1, 2, 6)
+    assert np.shares_memory(slab, mmap)
+    result = project_slab(slab, 1, const.PROJECTION_MaxIP, 0)
+    np.testing.assert_array_equal(result, matrix[:, 2:6, :].max(1))
+
+
+@pytest.mark.parametrize("axis", [0, 1, 2])
+def test_lmip_inverted(matrix, axis):
+    slab = get_slab(matrix, axis, 0, 5)
+    result = project_slab(slab, axis, const.PROJECTION_LMIP, 100, inverted=True)
+    expected = project_slab(np.flip(slab, axis).copy(), axis, const.PROJECTION_LMIP, 100)
+    np.testing.assert_array_equal(result, expected)
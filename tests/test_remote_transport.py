@@ -0,0 +1,119 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from invesalius.net.remote_transport import RemoteTransport, decode, encode
+
+
+def test_encode_decode():
+    data = {
+        "m_img": np.arange(16, dtype=np.float64).reshape(4, 4),
+        "coords": {"probe": (np.float64(1.5), 2, np.int32(3)), "coil": np.arange(6)[::2]},
+        "visible": [True, np.bool_(False)],
+        "name": "coil",
+        "nothing": None,
+    }
+    encoded = encode(data)
+
+    # Everything but the array bytes is JSON.
+    assert json.dumps(encoded, default=lambda b: b.hex())
+    assert encoded["coords"]["probe"] == [1.5, 2, 3]
+    assert encoded["visible"] == [True, False]
+    assert isinstance(encoded["m_img"]["data"], bytes)
+
+    decoded = decode(encoded)
+    np.testing.assert_array_equal(decoded["m_img"], data["m_img"])
+    np.testing.assert_array_equal(decoded["coords"]["coil"], [0, 2, 4])
+    assert decoded["m_img"].flags.writeable
+    assert decoded["name"] == "coil"
+
+    with pytest.raises(TypeError):
+        encode({"queue": threading.Lock()})
+    with pytest.raises(TypeError):
+        encode({1: "a"})
+
+
+def test_transport_filters_and_coalesces():
+    batches = []
+    transport = RemoteTransport(
+        batches.append,
+        topics=("Neuronavigation to Robot: *",),
+        intervals={"Neuronavigation to Robot: Update displacement to target": 0.0},
+    )
+
+    transport.send("Render volume viewer", {})
+    transport.send("Neuronavigation to Robot: Update displacement to target", {"displacement": 1})
+    transport.send("Neuronavigation to Robot: Set target", {"target": np.identity(4)})
+    transport.send("Neuronavigation to Robot: Update displacement to target", {"displacement": 2})
+    transport.send("Neuronavigation to Robot: Set objective", {"objective": threading.Lock()})
+    transport.flush()
+    # Nothing left to send.
+    transport.flush()
+
+    assert len(batches) == 1
+    topics = [message["topic"] for message in batches[0]]
+    assert topics == [
+        "Neuronavigation to Robot: Set target",
+        "Neuronavigation to Robot: Update displacement to target",
+    ]
+    np.testing.assert_array_equal(decode(batches[0][0]["data"])["target"], np.identity(4))
+    assert batches[0][1]["data"] == {"displacement": 2}
+    assert (transport.filtered_count, transport.coalesced_count, transport.failed_count) == (
+        1,
+        1,
+        1,
+    )
+    assert (transport.sent_count, transport.batch_count) == (2, 1)
+
+
+def test_transport_rate_limits():
+    batches = []
+    topic = "From Neuronavigation: Update tracker poses"
+    transport = RemoteTransport(batches.append, intervals={topic: 60.0})
+
+    transport.send(topic, {"poses": 1})
+    transport.flush()
+    transport.send(topic, {"poses": 2})
+    transport.send("From Neuronavigation: Coil at target", {"state": True})
+    transport.flush()
+
+    assert [[m["data"] for m in batch] for batch in batches] == [[{"poses": 1}], [{"state": True}]]
+    # The latest poses wait for the interval.
+    assert transport.take_batch() == []
+
+
+def test_transport_thread_batches_messages():
+    batches = []
+    sent = threading.Event()
+
+    def emit(batch):
+        batches.append(batch)
+        sent.set()
+
+    transport = RemoteTransport(emit, batch_interval=0.05)
+    transport.start()
+    for i in range(3):
+        transport.send("From Neuronavigation: Coil at target", {"state": i})
+    assert sent.wait(5)
+    transport.close()
+
+    assert [[m["data"]["state"] for m in batch] for batch in batches] == [[0, 1, 2]]
+
+
+def test_transport_discards_messages_while_closed():
+    batches = []
+    transport = RemoteTransport(batches.append, batch_interval=0.0)
+    transport.start()
+    transport.close()
+
+    transport.send("From Neuronavigation: Coil at target", {"state": 0})
+    assert transport.take_batch() == []
+
+    # Started again, e.g. when the remote host reconnects.
+    transport.start()
+    transport.send("From Neuronavigation: Coil at target", {"state": 1})
+    transport.close()
+
+    assert [[m["data"]["state"] for m in batch] for batch in batches] == [[1]]
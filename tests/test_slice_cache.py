@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+
+from invesalius.data.slice_cache import SliceCache, SlicePrefetcher, get_nbytes
+
+
+def test_get_nbytes():
+    a = np.zeros((10, 10), dtype=np.uint8)
+    b = np.zeros((10, 10), dtype=np.int16)
+    assert get_nbytes(a) == 100
+    assert get_nbytes((a, b)) == 300
+    assert get_nbytes(None) == 0
+
+
+def test_cache_get_and_put():
+    cache = SliceCache(1000)
+    a = np.zeros(100, dtype=np.uint8)
+    assert cache.put(1, a)
+    assert cache.get(1) is a
+    assert cache.get(2) is None
+    assert 1 in cache
+    assert cache.nbytes == 100
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SliceCache(300)
+    for i in range(3):
+        cache.put(i, np.zeros(100, dtype=np.uint8))
+    # 0 becomes the most recently used, so 1 is evicted.
+    cache.get(0)
+    cache.put(3, np.zeros(100, dtype=np.uint8))
+    assert 1 not in cache
+    assert 0 in cache and 2 in cache and 3 in cache
+    assert cache.nbytes == 300
+
+
+def test_cache_refuses_values_bigger_than_budget():
+    cache = SliceCache(50)
+    assert not cache.put(0, np.zeros(100, dtype=np.uint8))
+    assert len(cache) == 0
+
+
+def test_cache_clear_refuses_stale_generation():
+    cache = SliceCache(1000)
+    generation = cache.generation
+    cache.clear()
+    assert not cache.put(0, np.zeros(10), generation)
+    assert cache.put(0, np.zeros(10), cache.generation)
+
+
+def test_prefetcher_warms_in_scroll_direction():
+    prefetcher = SlicePrefetcher(3)
+    warmed = []
+    done = threading.Event()
+
+    def warm(n, stop):
+        warmed.append(n)
+        if len(warmed) == 3:
+            done.set()
+
+    # The first slice shown doesn't have a direction.
+    prefetcher.schedule("AXIAL", 10, 100, warm)
+    prefetcher.schedule("AXIAL", 9, 100, warm)
+    assert done.wait(5)
+    assert warmed == [8, 7, 6]
+    prefetcher.reset()
+
+
+def test_prefetcher_respects_volume_bounds():
+    prefetcher = SlicePrefetcher(3)
+    warmed = []
+    prefetcher.schedule("AXIAL", 97, 99, lambda n, stop: warmed.append(n))
+    prefetcher.schedule("AXIAL", 98, 99, lambda n, stop: warmed.append(n))
+    prefetcher.reset()
+    assert warmed == [99]
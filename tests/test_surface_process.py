@@ -0,0 +1,190 @@
+import pickle
+import queue
+
+import numpy as np
+import pytest
+from vtkmodules.vtkFiltersCore import vtkMassProperties, vtkPolyDataNormals
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from invesalius.data import converters, surface_process
+
+
+@pytest.fixture
+def sphere():
+    source = vtkSphereSource()
+    source.SetCenter(0, 0, 0)
+    normals = vtkPolyDataNormals()
+    normals.SetInputConnection(source.GetOutputPort())
+    normals.Update()
+    return normals.GetOutput()
+
+
+def test_polydata_numpy_round_trip(sphere):
+    arrays = pickle.loads(pickle.dumps(converters.polydata_to_numpy(sphere)))
+    polydata = converters.numpy_to_polydata(arrays)
+
+    assert polydata.GetNumberOfPoints() == sphere.GetNumberOfPoints()
+    assert polydata.GetNumberOfPolys() == sphere.GetNumberOfPolys()
+    assert polydata.GetPointData().GetNormals() is not None
+    np.testing.assert_array_equal(
+        converters.polydata_to_numpy(polydata)["connectivity"], arrays["connectivity"]
+    )
+
+
+def test_join_pieces_without_seam(sphere):
+    piece = converters.polydata_to_numpy(sphere)
+    moved = dict(piece, points=piece["points"] + np.float32(10))
+    empty = converters.polydata_to_numpy(converters.numpy_to_polydata(piece).NewInstance())
+
+    arrays = surface_process.join_pieces([moved, empty, piece])
+
+    n_points = sphere.GetNumberOfPoints()
+    assert len(arrays["points"]) == 2 * n_points
+    assert len(arrays["offsets"]) == 2 * sphere.GetNumberOfPolys() + 1
+    # Joined from the bottom to the top.
+    n = len(piece["connectivity"])
+    np.testing.assert_array_equal(arrays["connectivity"][:n], piece["connectivity"])
+    np.testing.assert_array_equal(arrays["connectivity"][n:], piece["connectivity"] + n_points)
+
+
+def test_join_pieces_empty():
+    arrays = surface_process.join_pieces([])
+    assert converters.numpy_to_polydata(arrays).GetNumberOfPoints() == 0
+
+
+def test_get_mass_properties(sphere):
+    measured = vtkMassProperties()
+    measured.SetInputData(sphere)
+    measured.Update()
+
+    for chunk_size in (7, surface_process.MEASURE_CHUNK_SIZE):
+        volume, area = surface_process.get_mass_properties(sphere, chunk_size)
+        assert volume == pytest.approx(measured.GetVolume())
+        assert area == pytest.approx(measured.GetSurfaceArea())
+
+
+@pytest.mark.parametrize(
+    "shape, n_processors",
+    [((300, 512, 512), 8), ((30, 64, 64), 4), ((5, 64, 64), 16), ((1000, 4096, 4096), 2)],
+)
+def test_get_piece_size(shape, n_processors):
+    itemsize = 2
+    size = surface_process.get_piece_size(shape, itemsize, n_processors)
+
+    assert 1 <= size <= shape[0]
+    assert size * shape[1] * shape[2] * itemsize <= surface_process.PIECE_MAX_BYTES
+    if shape[0] >= n_processors * surface_process.PIECE_MIN_SIZE:
+        # Enough pieces to keep every processor busy.
+        assert -(-shape[0] // size) >= n_processors
+
+
+def test_get_bounding_box():
+    occupied = np.zeros((10, 12, 14), dtype=bool)
+    assert surface_process.get_bounding_box(occupied) is None
+
+    occupied[3:5, 0:2, 7] = True
+    assert surface_process.get_bounding_box(occupied) == (
+        slice(2, 6),
+        slice(0, 3),
+        slice(6, 9),
+    )
+
+
+@pytest.fixture
+def volume(tmp_path):
+    shape = (30, 24, 20)
+    image = np.memmap(tmp_path / "image.dat", mode="w+", dtype=np.int16, shape=shape)
+    image[:] = -1000
+    z, y, x = np.ogrid[: shape[0], : shape[1], : shape[2]]
+    image[((z - 20) ** 2 + (y - 8) ** 2 + (x - 12) ** 2) < 16] = 500
+    image.flush()
+    mask = np.memmap(
+        tmp_path / "mask.dat", mode="w+", dtype=np.uint8, shape=tuple(s + 1 for s in shape)
+    )
+    mask[:] = 0
+    mask[1:, 1:, 1:] = np.where(image >= 200, 255, 0)
+    mask.flush()
+    return image, mask
+
+
+def create_piece(image, mask, roi, from_binary, decimate_reduction=0.0):
+    return surface_process.create_surface_piece(
+        image.filename,
+        image.shape,
+        image.dtype,
+        mask.filename,
+        mask.shape,
+        mask.dtype,
+        roi,
+        (1.0, 1.0, 1.0),
+        "CONTOUR",
+        200,
+        3000,
+        decimate_reduction,
+        0.0,
+        0,
+        "en",
+        True,
+        from_binary,
+        "ca_smoothing" if from_binary else "Default",
+        0,
+        True,
+    )
+
+
+@pytest.mark.parametrize("from_binary", [False, True])
+def test_create_surface_piece_crops_to_mask(volume, from_binary):
+    image, mask = volume
+
+    assert len(create_piece(image, mask, slice(0, 11), from_binary)["points"]) == 0
+
+    points = create_piece(image, mask, slice(10, 31), from_binary)["points"]
+    assert len(points)
+    # Flipped about the origin in y.
+    np.testing.assert_allclose(points.min(0), (8, -12, 16), atol=1)
+    np.testing.assert_allclose(points.max(0), (16, -4, 24), atol=1)
+
+
+def test_create_surface_piece_decimates(volume):
+    image, mask = volume
+
+    piece = create_piece(image, mask, slice(10, 31), False)
+    decimated = create_piece(image, mask, slice(10, 31), False, 0.4)
+    assert 0 < len(decimated["offsets"]) < len(piece["offsets"])
+
+
+def test_join_process_surface(tmp_path):
+    # A sphere split by the seam between two pieces.
+    shape = (30, 24, 20)
+    image = np.memmap(tmp_path / "image.dat", mode="w+", dtype=np.int16, shape=shape)
+    z, y, x = np.ogrid[: shape[0], : shape[1], : shape[2]]
+    image[:] = np.where(((z - 14) ** 2 + (y - 12) ** 2 + (x - 10) ** 2) < 36, 500, -1000)
+    image.flush()
+    mask = np.memmap(
+        tmp_path / "mask.dat", mode="w+", dtype=np.uint8, shape=tuple(s + 1 for s in shape)
+    )
+    mask[:] = 0
+    mask.flush()
+
+    whole = create_piece(image, mask, slice(0, 31), False)
+    pieces = [
+        create_piece(image, mask, slice(15, 31), False),
+        create_piece(image, mask, slice(0, 16), False),
+    ]
+    arrays, measures = surface_process.join_process_surface(
+        pieces, "Default", 0, 0, 0.4, False, False, {}, queue.Queue()
+    )
+
+    assert not pieces
+    assert len(arrays["points"]) == len(whole["points"])
+    assert len(arrays["offsets"]) == len(whole["offsets"])
+    volume, area = surface_process.get_mass_properties(converters.numpy_to_polydata(whole))
+    assert measures["volume"] == pytest.approx(volume)
+    assert measures["area"] == pytest.approx(area)
+    # Closed, every edge is shared by two triangles.
+    triangles = arrays["connectivity"].reshape(-1, 3)
+    edges = np.sort(
+        np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [0, 2]]])
+    )
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    assert (counts == 2).all()
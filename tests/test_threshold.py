@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from invesalius_cy import threshold
+
+
+def threshold_reference(image, mask, tmin, tmax):
+    for n in range(1, mask.shape[0]):
+        if mask[n, 0, 0] == 0:
+            m = ((image[n - 1] >= tmin) & (image[n - 1] <= tmax)) * 255
+            for label in (1, 2, 253, 254):
+                m[mask[n, 1:, 1:] == label] = label
+            mask[n, 1:, 1:] = m
+
+
+@pytest.mark.parametrize("dtype", [np.int16, np.uint8, np.float32])
+def test_threshold_to_mask(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 250, size=(12, 10, 9)).astype(dtype)
+    mask = np.memmap(tmp_path / "mask.dat", mode="w+", dtype=np.uint8, shape=(13, 11, 10))
+    mask[:] = rng.choice(np.array([0, 1, 2, 253, 254, 255], dtype=np.uint8), size=mask.shape)
+    mask[:, 0, 0] = 0
+    # Slices already thresholded.
+    mask[3, 0, 0] = 1
+    mask[7, 0, 0] = 2
+    expected = np.array(mask)
+
+    threshold_reference(image, expected, 50, 180)
+    threshold.threshold_to_mask(image, mask, 50, 180)
+
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_threshold_to_mask_strided():
+    rng = np.random.default_rng(1)
+    image = rng.integers(-1000, 3000, size=(9, 12, 10)).astype(np.int16).swapaxes(0, 1)
+    mask = np.zeros((13, 10, 11), dtype=np.uint8)
+    expected = mask.copy()
+
+    threshold_reference(image, expected, 226, 3071)
+    threshold.threshold_to_mask(image, mask, 226, 3071)
+
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_threshold_to_mask_shape_mismatch():
+    with pytest.raises(ValueError):
+        threshold.threshold_to_mask(
+            np.zeros((3, 4, 5), np.int16), np.zeros((3, 4, 5), np.uint8), 0, 1
+        )
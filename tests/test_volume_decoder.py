@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from invesalius.data import volume_decoder
+from invesalius.data.volume_decoder import Placement
+
+
+def decode_npy(filename, offset=0):
+    return np.load(filename) + offset
+
+
+@pytest.fixture
+def slices(tmp_path):
+    rng = np.random.default_rng(0)
+    slices = rng.integers(-1000, 3000, size=(8, 5, 6)).astype(np.int16)
+    files = []
+    for n, s in enumerate(slices):
+        filename = str(tmp_path / f"{n}.npy")
+        np.save(filename, s)
+        files.append(filename)
+    return slices, files
+
+
+def create_matrix(tmp_path, shape):
+    return np.memmap(tmp_path / "matrix.dat", mode="w+", dtype=np.int16, shape=shape)
+
+
+@pytest.mark.parametrize("min_files", [volume_decoder.PARALLEL_DECODE_MIN_FILES, 1])
+def test_decode_volume(tmp_path, slices, monkeypatch, min_files):
+    monkeypatch.setattr(volume_decoder, "PARALLEL_DECODE_MIN_FILES", min_files)
+    slices, files = slices
+    matrix = create_matrix(tmp_path, slices.shape)
+    progress = []
+
+    statistics = volume_decoder.decode_volume(
+        matrix,
+        files,
+        decode_npy,
+        (10,),
+        update_progress=lambda n, message: progress.append(n),
+    )
+
+    np.testing.assert_array_equal(matrix, slices + 10)
+    assert statistics.scalar_range == (slices.min() + 10, slices.max() + 10)
+    np.testing.assert_array_equal(statistics.counts, np.bincount((slices - slices.min()).ravel()))
+    assert progress == list(range(len(files)))
+
+
+@pytest.mark.parametrize(
+    "placement, expected",
+    [
+        (Placement(1, reverse=True), lambda s: np.moveaxis(s, 0, 1)[:, ::-1]),
+        (Placement(2, flip=True), lambda s: np.moveaxis(s, 0, 2)[:, ::-1, :]),
+    ],
+)
+def test_decode_volume_placement(tmp_path, slices, placement, expected):
+    slices, files = slices
+    shape = volume_decoder.get_volume_shape(slices.shape[1:], len(files), placement.axis)
+    matrix = create_matrix(tmp_path, shape)
+    first_slice = decode_npy(files[0])
+
+    volume_decoder.decode_volume(matrix, files, decode_npy, (), placement, first_slice=first_slice)
+
+    np.testing.assert_array_equal(matrix, expected(slices))
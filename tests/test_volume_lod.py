@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkRenderingCore import vtkRenderer, vtkRenderWindow
+from vtkmodules.vtkRenderingVolume import vtkFixedPointVolumeRayCastMapper
+
+from invesalius.data import converters, volume_lod
+
+
+def get_array(image):
+    dx, dy, dz = image.GetDimensions()
+    return numpy_support.vtk_to_numpy(image.GetPointData().GetScalars()).reshape(dz, dy, dx)
+
+
+def test_downsample():
+    array = np.arange(5 * 6 * 8, dtype=np.uint16).reshape(5, 6, 8)
+    image = converters.to_vtk(array, spacing=(0.5, 1.0, 2.0))
+    image.SetOrigin(10, 20, 30)
+
+    half = volume_lod.downsample(image)
+
+    assert half.GetDimensions() == (4, 3, 2)
+    assert half.GetSpacing() == (1.0, 2.0, 4.0)
+    assert half.GetOrigin() == (10.25, 20.5, 31.0)
+    expected = array[:4].reshape(2, 2, 3, 2, 4, 2).mean(axis=(1, 3, 5))
+    np.testing.assert_array_equal(get_array(half), np.round(expected))
+    assert get_array(half).dtype == np.uint16
+
+
+def test_get_number_of_levels():
+    assert volume_lod.get_number_of_levels((100, 100, 100)) == 0
+    assert volume_lod.get_number_of_levels((128, 512, 512)) == 1
+    assert volume_lod.get_number_of_levels((1024, 1024, 800)) == volume_lod.MAX_LEVELS
+
+
+def test_choose_level():
+    assert volume_lod.choose_level({}, 4, 0.1) == 0
+    # Full resolution takes 1 s, the levels are estimated to take 0.25, 0.0625
+    # and 0.015625 s.
+    assert volume_lod.choose_level({0: 1.0}, 4, 2.0) == 0
+    assert volume_lod.choose_level({0: 1.0}, 4, 0.1) == 2
+    # Level 2 was measured slower than estimated.
+    assert volume_lod.choose_level({0: 1.0, 2: 0.2}, 4, 0.1) == 3
+    assert volume_lod.choose_level({0: 1.0, 2: 0.2}, 3, 0.1) == 2
+
+
+def test_volume_lod_switches_levels():
+    # The mapper needs the OpenGL2 overrides of the volume rendering classes,
+    # without them VTK crashes when it's created.
+    pytest.importorskip("vtkmodules.vtkRenderingOpenGL2")
+    pytest.importorskip("vtkmodules.vtkRenderingVolumeOpenGL2")
+
+    array = np.zeros((128, 128, 128), dtype=np.uint16)
+    image = converters.to_vtk(array)
+    mapper = vtkFixedPointVolumeRayCastMapper()
+    mapper.SetInputData(image)
+    renderer = vtkRenderer()
+    window = vtkRenderWindow()
+    window.AddRenderer(renderer)
+
+    lod = volume_lod.VolumeLOD(mapper, image, 0.4)
+    lod.start()
+    lod._thread.join()
+    assert len(lod.levels) == 2
+    lod.attach(renderer)
+    lod.frame_times[0] = 1.0
+
+    window.SetDesiredUpdateRate(15.0)
+    lod._on_start_render(renderer, "StartEvent")
+    assert lod.level == 1
+    assert mapper.GetInput() is lod.levels[1]
+    assert mapper.GetSampleDistance() == pytest.approx(0.8)
+
+    window.SetDesiredUpdateRate(0.0001)
+    lod._on_start_render(renderer, "StartEvent")
+    assert lod.level == 0
+    assert mapper.GetInput() is image
+
+    lod.close()
+    assert not renderer.HasObserver("StartEvent")
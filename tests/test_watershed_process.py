@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+from scipy.ndimage import generate_binary_structure
+
+from invesalius.data import watershed_process
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    watershed_process._cache.clear()
+
+
+def create_image(tmp_path):
+    rng = np.random.default_rng(0)
+    image = np.memmap(tmp_path / "image.dat", mode="w+", dtype=np.int16, shape=(20, 24, 24))
+    image[:] = rng.normal(0, 20, size=image.shape)
+    z, y, x = np.ogrid[:20, :24, :24]
+    image[(z - 10) ** 2 + (y - 12) ** 2 + (x - 12) ** 2 < 25] += 500
+    image.flush()
+    return image
+
+
+def create_markers(tmp_path, shape):
+    markers = np.memmap(tmp_path / "markers.dat", mode="w+", dtype=np.uint8, shape=shape)
+    markers[:] = 0
+    markers[10, 12, 12] = 1
+    markers[10, 12, 4] = 2
+    markers[10, 12, 20] = 2
+    markers.flush()
+    return markers
+
+
+def test_get_markers_roi():
+    markers = np.zeros((10, 20, 30), dtype=np.uint8)
+    assert watershed_process.get_markers_roi(markers) is None
+
+    markers[5, 2, 10] = 1
+    markers[6, 8, 28] = 2
+    assert watershed_process.get_markers_roi(markers, 3) == (
+        slice(2, 10),
+        slice(0, 12),
+        slice(7, 30),
+    )
+
+
+def test_get_memmap_info(tmp_path):
+    image = create_image(tmp_path)
+    info = watershed_process.get_memmap_info(image, 2)
+    assert info == (str(tmp_path / "image.dat"), image.shape, image.dtype.str, 0, 2)
+    np.testing.assert_array_equal(watershed_process.open_array(info), image)
+
+    assert watershed_process.get_memmap_info(image[1:]) is None
+    assert watershed_process.get_memmap_info(np.asarray(image)) is None
+
+
+@pytest.mark.parametrize("algorithm", ["Watershed", "Watershed IFT"])
+@pytest.mark.parametrize("use_ww_wl", [True, False])
+def test_watershed_image_roi(tmp_path, algorithm, use_ww_wl):
+    image = create_image(tmp_path)
+    roi = (slice(4, 16), slice(0, 20), slice(3, 24))
+    full_roi = tuple(slice(0, s) for s in image.shape)
+
+    expected = watershed_process.get_watershed_image(
+        np.asarray(image), full_roi, algorithm, 3, use_ww_wl, 100, 400
+    )[roi]
+    result = watershed_process.get_watershed_image(
+        watershed_process.get_memmap_info(image), roi, algorithm, 3, use_ww_wl, 100, 400
+    )
+
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_watershed_image_cache(tmp_path, monkeypatch):
+    image = create_image(tmp_path)
+    info = watershed_process.get_memmap_info(image)
+    roi = (slice(2, 18), slice(2, 22), slice(2, 22))
+    calls = []
+    gradient = watershed_process.ndimage.morphological_gradient
+
+    def morphological_gradient(*args):
+        calls.append(args)
+        return gradient(*args)
+
+    monkeypatch.setattr(watershed_process.ndimage, "morphological_gradient", morphological_gradient)
+
+    first = watershed_process.get_watershed_image(info, roi, "Watershed", 3, True, 100, 400)
+    inner = watershed_process.get_watershed_image(
+        info, (slice(4, 10), slice(2, 22), slice(5, 20)), "Watershed", 3, True, 100, 400
+    )
+    np.testing.assert_array_equal(inner, first[2:8, :, 3:18])
+    assert len(calls) == 1
+
+    # Other window and level or a region not inside the cached one.
+    watershed_process.get_watershed_image(info, roi, "Watershed", 3, True, 200, 400)
+    watershed_process.get_watershed_image(
+        info, (slice(0, 18), slice(2, 22), slice(2, 22)), "Watershed", 3, True, 200, 400
+    )
+    assert len(calls) == 3
+
+
+def test_do_watershed(tmp_path):
+    image = create_image(tmp_path)
+    markers = create_markers(tmp_path, image.shape)
+    bstruct = generate_binary_structure(3, 1)
+    roi = watershed_process.get_markers_roi(markers, 2)
+
+    result = watershed_process.do_watershed(
+        watershed_process.get_memmap_info(image),
+        watershed_process.get_memmap_info(markers),
+        roi,
+        bstruct,
+        "Watershed",
+        3,
+        True,
+        100,
+        400,
+    )
+
+    assert result.shape == tuple(s.stop - s.start for s in roi)
+    assert result.dtype == np.uint8
+    # The sphere is segmented as foreground, the rest of the region as background.
+    z, y, x = np.ogrid[roi]
+    inside = (z - 10) ** 2 + (y - 12) ** 2 + (x - 12) ** 2 < 16
+    assert np.all(result[inside] == 1)
+    assert np.all(result[(z - 10) ** 2 + (y - 12) ** 2 + (x - 12) ** 2 > 36] == 2)
+
+
+def test_watershed_image_cache_image_changed(tmp_path):
+    image = create_image(tmp_path)
+    roi = (slice(2, 18), slice(2, 22), slice(2, 22))
+
+    first = watershed_process.get_watershed_image(
+        watershed_process.get_memmap_info(image), roi, "Watershed", 3, False, 100, 400
+    )
+    # The image flipped in place, as Slice.OnFlipVolume does.
+    image[:] = image[::-1]
+    image.flush()
+    flipped = watershed_process.get_watershed_image(
+        watershed_process.get_memmap_info(image, 1), roi, "Watershed", 3, False, 100, 400
+    )
+
+    expected = watershed_process.get_watershed_image(
+        np.asarray(image), roi, "Watershed", 3, False, 100, 400
+    )
+    np.testing.assert_array_equal(flipped, expected)
+    assert not np.array_equal(flipped, first)
+
+
+class FakePool:
+    def __init__(self):
+        self.tasks = []
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.tasks.append((args, callback))
+
+    def terminate(self):
+        pass
+
+
+def test_watershed_runner_keeps_last_request():
+    runner = watershed_process.WatershedRunner()
+    pool = runner._pool = FakePool()
+    results = []
+    callback = results.append
+
+    runner.run((1, None, "roi1"), lambda tmp_mask, roi: callback(roi), callback)
+    runner.run((2, None, "roi2"), lambda tmp_mask, roi: callback(roi), callback)
+    runner.run((3, None, "roi3"), lambda tmp_mask, roi: callback(roi), callback)
+    assert [args[0] for args, _ in pool.tasks] == [1]
+
+    # Only the last request runs after the first one ends.
+    pool.tasks[0][1](None)
+    assert results == ["roi1"]
+    assert [args[0] for args, _ in pool.tasks] == [1, 3]
+    assert runner.running
+
+    pool.tasks[1][1](None)
+    assert results == ["roi1", "roi3"]
+    assert not runner.running
+
+    runner.close()
+    assert runner._pool is None
+    assert runner.generation == 1